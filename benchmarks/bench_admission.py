@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Overload test for admission control.
+
+A flood of large batch requests is sent while a client measures the latency
+of small single calculations. The run is repeated with one shared FIFO lane
+(no isolation) and with the default separate ``single``/``batch`` lanes,
+and the single-request latency percentiles are compared.
+
+Usage:
+    python benchmarks/bench_admission.py [--duration 3] [--batch-size 20000]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from service import (  # noqa: E402
+    AdmissionController,
+    CalculationService,
+    Lane,
+    ServiceOverloaded,
+)
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of a sorted list."""
+    if not ordered:
+        return float("nan")
+    return ordered[max(int(fraction * len(ordered) + 0.5) - 1, 0)]
+
+
+def run(service, duration, batch_size, flooders):
+    """Flood batches while timing singles; return (latencies, batch stats)."""
+    stop = threading.Event()
+    batch = [(i, i + 1, "*") for i in range(batch_size)]
+    stats = {"accepted": 0, "rejected": 0}
+    lock = threading.Lock()
+
+    def flood():
+        # Each flooder keeps a few batches in flight and backs off when rejected.
+        pending = []
+        while not stop.is_set():
+            future = service.submit_batch(batch)
+            if future.done() and isinstance(future.exception(), ServiceOverloaded):
+                outcome = "rejected"
+            else:
+                outcome = "accepted"
+                pending.append(future)
+            with lock:
+                stats[outcome] += 1
+            if outcome == "rejected":
+                time.sleep(0.005)
+            if len(pending) >= 4:
+                pending.pop(0).result()
+
+    threads = [threading.Thread(target=flood, daemon=True) for _ in range(flooders)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)
+
+    latencies = []
+    deadline = time.monotonic() + duration
+    i = 0
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            service.calculate(i, 1, "+")
+        except ServiceOverloaded:
+            pass
+        latencies.append(time.perf_counter() - started)
+        i += 1
+        time.sleep(0.002)
+
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sorted(latencies), stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--batch-size", type=int, default=20000)
+    parser.add_argument("--flooders", type=int, default=4)
+    args = parser.parse_args()
+
+    shared = Lane("shared", workers=4, capacity=100000)
+    configurations = {
+        "shared lane": AdmissionController({"single": shared, "batch": shared}),
+        "separate lanes": AdmissionController(),
+    }
+
+    print(
+        f"{'mode':>15} {'singles':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}"
+        f" {'batches ok':>10} {'rejected':>9}"
+    )
+    for mode, admission in configurations.items():
+        service = CalculationService(admission=admission)
+        latencies, stats = run(service, args.duration, args.batch_size, args.flooders)
+        service.close()
+        print(
+            f"{mode:>15} {len(latencies):>8} "
+            f"{percentile(latencies, 0.50) * 1000:>8.2f} "
+            f"{percentile(latencies, 0.99) * 1000:>8.2f} "
+            f"{latencies[-1] * 1000:>8.2f} "
+            f"{stats['accepted']:>10} {stats['rejected']:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
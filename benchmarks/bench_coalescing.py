@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Load test for in-flight request coalescing.
+
+Many client threads send calculations drawn from a small set of expensive
+big-integer multiplications. The same load is run with and without
+coalescing, and the process CPU time and number of executions are compared
+at several duplicate ratios.
+
+Usage:
+    python benchmarks/bench_coalescing.py [--clients 16] [--requests 400]
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from service import CalculationService  # noqa: E402
+
+
+def run(service, workload, clients):
+    """Send ``workload`` from ``clients`` threads; return (wall, cpu) seconds."""
+    barrier = threading.Barrier(clients)
+    chunks = [workload[i::clients] for i in range(clients)]
+
+    def client(chunk):
+        barrier.wait()
+        for a, b in chunk:
+            service.calculate(a, b, "*")
+
+    threads = [threading.Thread(target=client, args=(chunk,)) for chunk in chunks]
+    wall, cpu = time.perf_counter(), time.process_time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - wall, time.process_time() - cpu
+
+
+def make_workload(requests, duplicate_ratio, digits, seed=0):
+    """Build requests where ``duplicate_ratio`` of them repeat a hot operand pair."""
+    rng = random.Random(seed)
+    hot = (rng.getrandbits(digits * 3), rng.getrandbits(digits * 3))
+    workload = []
+    for _ in range(requests):
+        if rng.random() < duplicate_ratio:
+            workload.append(hot)
+        else:
+            workload.append((rng.getrandbits(digits * 3), rng.getrandbits(digits * 3)))
+    return workload
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--digits", type=int, default=60000)
+    args = parser.parse_args()
+
+    print(f"{'dup ratio':>9} {'mode':>9} {'executions':>10} {'wall s':>8} {'cpu s':>8}")
+    for ratio in (0.0, 0.5, 0.9, 0.99):
+        workload = make_workload(args.requests, ratio, args.digits)
+        for coalesce in (False, True):
+            service = CalculationService(coalesce=coalesce)
+            wall, cpu = run(service, workload, args.clients)
+            executions = (
+                service.metrics()["coalescing"]["executions"]
+                if coalesce
+                else len(workload)
+            )
+            mode = "coalesce" if coalesce else "baseline"
+            print(f"{ratio:>9.2f} {mode:>9} {executions:>10} {wall:>8.3f} {cpu:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
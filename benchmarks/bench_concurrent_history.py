@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Append rate of the thread-safe history under 1 to 16 writer threads.
+
+Each thread appends pre-built calculations as fast as it can; all threads
+start together. ``CalculatorHistory`` behind one global lock (what a
+threaded server needs without ``ConcurrentHistory``) is compared with
+``ConcurrentHistory`` in its default and strict modes. The time to read
+the merged history back is reported too.
+
+Usage:
+    python benchmarks/bench_concurrent_history.py [--appends 200000]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calculation import CalculationFactory  # noqa: E402
+from calculator import CalculatorHistory  # noqa: E402
+from calculator.history import ConcurrentHistory  # noqa: E402
+
+THREADS = (1, 2, 4, 8, 16)
+
+
+class LockedHistory(CalculatorHistory):
+    """``CalculatorHistory`` with every append under one lock."""
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+
+    def add_calculation(self, calculation):
+        with self._lock:
+            super().add_calculation(calculation)
+
+
+def make_calculations(count):
+    """Build executed calculations to append."""
+    calculations = []
+    for i in range(count):
+        calculation = CalculationFactory.create_calculation(i, 1, "+")
+        calculation.execute()
+        calculations.append(calculation)
+    return calculations
+
+
+def run(history, calculations, threads):
+    """Append ``calculations`` split across ``threads``; return appends/s."""
+    barrier = threading.Barrier(threads + 1)
+    share = len(calculations) // threads
+
+    def writer(part):
+        add = history.add_calculation
+        barrier.wait()
+        for calculation in part:
+            add(calculation)
+
+    workers = [
+        threading.Thread(
+            target=writer, args=(calculations[i * share : (i + 1) * share],)
+        )
+        for i in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    return share * threads / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--appends", type=int, default=200000)
+    args = parser.parse_args()
+
+    calculations = make_calculations(args.appends)
+    kinds = {
+        "locked": LockedHistory,
+        "concurrent": ConcurrentHistory,
+        "strict": lambda: ConcurrentHistory(strict=True),
+    }
+    print(f"{'threads':>7} " + " ".join(f"{name + ' /s':>14}" for name in kinds))
+    for threads in THREADS:
+        rates = []
+        for factory in kinds.values():
+            history = factory()
+            rates.append(run(history, calculations, threads))
+            history.clear_history()
+        print(f"{threads:>7} " + " ".join(f"{rate:>14,.0f}" for rate in rates))
+
+    history = ConcurrentHistory()
+    run(history, calculations, THREADS[-1])
+    started = time.perf_counter()
+    merged = history.get_history()
+    seconds = time.perf_counter() - started
+    print(
+        f"read {len(merged):,} merged from {THREADS[-1]} threads: "
+        f"{seconds * 1000:.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Deferred bulk execution against evaluating calculations one at a time.
+
+Creates calculations through ``CalculationFactory`` and sums their results,
+once as-is and once inside a ``DeferredExecution`` context, which evaluates
+them with one ``execute_many`` pass per operation. Each mode reports its
+best of ``--repeat`` runs, alternating between the two, so that garbage
+collection and CPU frequency changes do not favour either.
+
+Usage:
+    python benchmarks/bench_deferred.py [--count 1000000] [--repeat 5]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calculation import CalculationFactory  # noqa: E402
+from calculation.deferred import DeferredExecution  # noqa: E402
+
+
+def run(count, operation):
+    """Create ``count`` calculations and sum their results."""
+    create = CalculationFactory.create_calculation
+    calculations = [create(i, 3, operation) for i in range(count)]
+    return sum(c.result for c in calculations)
+
+
+def timed(count, operation, deferred):
+    """Return (seconds, total) for one run, starting from a collected heap."""
+    gc.collect()
+    started = time.perf_counter()
+    if deferred:
+        with DeferredExecution():
+            total = run(count, operation)
+    else:
+        total = run(count, operation)
+    return time.perf_counter() - started, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(
+        f"{'operation':<10} {'eager calc/s':>14} {'deferred calc/s':>16} "
+        f"{'speedup':>8}"
+    )
+    for operation in "+*/":
+        eager_seconds = deferred_seconds = float("inf")
+        for _ in range(args.repeat):
+            seconds, eager = timed(args.count, operation, False)
+            eager_seconds = min(eager_seconds, seconds)
+            seconds, deferred = timed(args.count, operation, True)
+            deferred_seconds = min(deferred_seconds, seconds)
+            assert deferred == eager
+        print(
+            f"{operation:<10} {args.count / eager_seconds:>14,.0f} "
+            f"{args.count / deferred_seconds:>16,.0f} "
+            f"{eager_seconds / deferred_seconds - 1:>+8.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Cost per call of the functional API against the object-oriented path.
+
+Times one calculation per call through ``calculator.evaluate``, through a
+bare ``calculator.core`` helper, and through
+``CalculationFactory.create_calculation(...).execute()``, which also
+allocates a ``Calculation`` and reads the clock.
+
+Usage:
+    python benchmarks/bench_evaluate.py [--calls 1000000]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calculation import CalculationFactory  # noqa: E402
+from calculator import core  # noqa: E402
+
+HELPERS = {"+": core.add, "*": core.multiply, "/": core.divide}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=1000000)
+    args = parser.parse_args()
+
+    print(f"{'operation':<10} {'evaluate':>10} {'helper':>10} {'Calculation':>12}")
+    for symbol, helper in HELPERS.items():
+        paths = [
+            lambda: core.evaluate(symbol, 7, 3),
+            lambda: helper(7, 3),
+            lambda: CalculationFactory.create_calculation(7, 3, symbol).execute(),
+        ]
+        costs = [
+            min(timeit.repeat(path, number=args.calls, repeat=3)) / args.calls * 1e9
+            for path in paths
+        ]
+        print(
+            f"{symbol:<10} {costs[0]:>7.0f} ns {costs[1]:>7.0f} ns "
+            f"{costs[2]:>9.0f} ns"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Event throughput of the history change feed with many subscribers.
+
+One thread appends calculations to a history while ``--subscribers``
+asyncio tasks consume its feed. Each run reports appends per second,
+events delivered per second across all subscribers, and the events
+dropped by subscribers whose queues overflowed, for several queue
+lengths. ``--rate`` paces the producer to see the steady state below
+saturation.
+
+Usage:
+    python benchmarks/bench_feed.py [--subscribers 100] [--appends 20000]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calculation import CalculationFactory  # noqa: E402
+from calculator import CalculatorHistory  # noqa: E402
+
+
+def calculations(count):
+    """Executed calculations to append."""
+    items = []
+    for i in range(count):
+        calculation = CalculationFactory.create_calculation(i, 7, "*")
+        calculation.execute()
+        items.append(calculation)
+    return items
+
+
+def produce(history, items, rate):
+    """Append ``items``, pacing to ``rate`` appends per second if given."""
+    started = time.perf_counter()
+    for i, calculation in enumerate(items):
+        history.add_calculation(calculation)
+        if rate and i % 100 == 99:
+            delay = started + (i + 1) / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+
+async def bench_feed(subscribers, items, maxsize, rate):
+    """Subscribers iterate the feed until the producer finishes."""
+    history = CalculatorHistory()
+    subscriptions = [
+        history.feed.subscribe(maxsize=maxsize) for _ in range(subscribers)
+    ]
+    received = [0] * subscribers
+
+    async def consume(index, subscription):
+        while True:
+            events = await subscription.get_batch()
+            if not events:
+                return
+            received[index] += len(events)
+
+    tasks = [asyncio.ensure_future(consume(i, s)) for i, s in enumerate(subscriptions)]
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, produce, history, items, rate)
+    appended = time.perf_counter() - started
+    for subscription in subscriptions:
+        subscription.close()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    dropped = sum(s.dropped for s in subscriptions)
+    return len(items) / appended, sum(received) / elapsed, dropped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--subscribers", type=int, default=100)
+    parser.add_argument("--appends", type=int, default=20000)
+    parser.add_argument("--rate", type=float, default=0, help="appends/s (0: max)")
+    parser.add_argument("--maxsizes", default="64,1024,65536")
+    args = parser.parse_args()
+
+    items = calculations(args.appends)
+    print(f"{args.subscribers} subscribers, {args.appends} appends")
+    print(f"{'consumer':>18} {'appends/s':>11} {'events/s':>12} {'dropped':>10}")
+    for maxsize in (int(m) for m in args.maxsizes.split(",")):
+        row = asyncio.run(bench_feed(args.subscribers, items, maxsize, args.rate))
+        print(
+            f"{f'feed maxsize={maxsize}':>18} {row[0]:>11.0f} {row[1]:>12.0f} {row[2]:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Event-loop latency while huge multiplications run.
+
+A ticker coroutine sleeps for 1 ms at a time and records how late it wakes
+while a series of multi-million-bit multiplications is awaited, run inline,
+in a thread (which still holds the GIL) and with ``Calculation.execute_async``
+(which offloads them to a worker process).
+
+Usage:
+    python benchmarks/bench_offload.py [--bits 4194304] [--count 4]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calculation import CalculationFactory  # noqa: E402
+from calculation.offload import dispatcher  # noqa: E402
+
+TICK = 0.001
+
+
+async def ticker(lags, stop):
+    """Record how late each 1 ms sleep wakes up."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(TICK)
+        lags.append(loop.time() - started - TICK)
+
+
+async def measure(mode, calculations):
+    """Run the calculations in the given mode and return (seconds, lags)."""
+    lags = []
+    stop = asyncio.Event()
+    task = asyncio.ensure_future(ticker(lags, stop))
+    await asyncio.sleep(0.05)
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    for calculation in calculations:
+        if mode == "inline":
+            calculation.execute()
+        elif mode == "thread":
+            await loop.run_in_executor(None, calculation.execute)
+        else:
+            await calculation.execute_async()
+    seconds = time.perf_counter() - started
+    stop.set()
+    await task
+    return seconds, lags
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--bits", type=int, default=1 << 22)
+    parser.add_argument("--count", type=int, default=4)
+    args = parser.parse_args()
+
+    generator = random.Random(42)
+    operands = [
+        (generator.getrandbits(args.bits), generator.getrandbits(args.bits))
+        for _ in range(args.count)
+    ]
+    # Start the worker before measuring.
+    dispatcher.pool.run(CalculationFactory.get_operation("*"), 1, 1)
+
+    print(f"{'mode':<10} {'total s':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for mode in ("inline", "thread", "offload"):
+        threshold = dispatcher.threshold_bits
+        if mode != "offload":
+            dispatcher.threshold_bits = None
+        calculations = [
+            CalculationFactory.create_calculation(a, b, "*") for a, b in operands
+        ]
+        try:
+            seconds, lags = asyncio.run(measure(mode, calculations))
+        finally:
+            dispatcher.threshold_bits = threshold
+        lags = sorted(lags) or [0.0]
+        p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))]
+        print(
+            f"{mode:<10} {seconds:>8.2f} {statistics.median(lags) * 1000:>8.2f} "
+            f"{p99 * 1000:>8.2f} {lags[-1] * 1000:>8.2f}"
+        )
+    dispatcher.close()
+
+
+if __name__ == "__main__":
+    main()
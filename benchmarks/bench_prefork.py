@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Throughput scaling of the pre-fork HTTP service with worker count.
+
+For each worker count a ``PreforkServer`` is started in its own process,
+and load-generator processes (so that the clients are not limited by one
+interpreter) send CPU-bound batch requests over keep-alive connections for
+a fixed time. Throughput should grow close
+to linearly until the workers and clients together use every core.
+
+Usage:
+    python benchmarks/bench_prefork.py [--workers 1 2 4] [--clients 8] [--seconds 5]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from client import CalculatorClient  # noqa: E402
+from service import (  # noqa: E402
+    AdmissionController,
+    CalculationHTTPServer,
+    CalculationService,
+    ResponseCache,
+)
+from service.prefork import PreforkServer  # noqa: E402
+
+
+def serve(workers, ports):
+    """Supervisor process: pre-fork ``workers`` and report the port."""
+    server = PreforkServer(
+        lambda host, port: CalculationHTTPServer(
+            CalculationService(coalesce=False, admission=AdmissionController()),
+            host,
+            port,
+            cache=ResponseCache(max_entries=1),
+        ),
+        workers=workers,
+        port=0,
+    )
+    ports.put(server.bind())
+    server.serve_forever()
+
+
+def start_service(workers):
+    """Start the service; return (process, base URL) once it answers."""
+    ports = multiprocessing.Queue()
+    process = multiprocessing.Process(target=serve, args=(workers, ports))
+    process.start()
+    url = f"http://127.0.0.1:{ports.get()}"
+    with CalculatorClient(url) as client:
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                client.calculate(1, 1, "+")
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+    return process, url
+
+
+def load(url, seconds, batch, digits, results):
+    """Client process: send batches until time is up; report the count."""
+    items = [(10**digits + i, 10**digits - i, "*") for i in range(batch)]
+    done = 0
+    with CalculatorClient(url, pool_size=1) as client:
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            client.calculate_batch(items)
+            done += 1
+    results.put(done)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--batch", type=int, default=50)
+    parser.add_argument("--digits", type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"cores: {os.cpu_count()}")
+    print(f"{'workers':>7} {'batches/s':>10} {'calcs/s':>10} {'speedup':>8}")
+    baseline = None
+    for workers in args.workers:
+        process, url = start_service(workers)
+        try:
+            results = multiprocessing.Queue()
+            clients = [
+                multiprocessing.Process(
+                    target=load,
+                    args=(url, args.seconds, args.batch, args.digits, results),
+                )
+                for _ in range(args.clients)
+            ]
+            for client in clients:
+                client.start()
+            total = sum(results.get() for _ in clients)
+            for client in clients:
+                client.join()
+        finally:
+            process.terminate()
+            process.join()
+        rate = total / args.seconds
+        baseline = baseline or rate
+        print(
+            f"{workers:>7} {rate:>10.1f} {rate * args.batch:>10.0f} "
+            f"{rate / baseline:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Speed and accuracy of n-ary reductions against folding binary operations.
+
+Sums a column of floats three ways: a fold of ``AddOperation`` calculations
+through ``CalculationFactory`` (one ``Calculation`` per value), a plain
+``AddOperation.execute`` fold, and ``SumReduction``. Reports values/s and
+the error of each against the correctly rounded ``math.fsum``, then the
+products of factors whose running product overflows part way.
+
+Usage:
+    python benchmarks/bench_reductions.py [--values 1000000]
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calculation import CalculationFactory  # noqa: E402
+from operation import AddOperation, ProductReduction, SumReduction  # noqa: E402
+
+
+def fold_calculations(values):
+    """Sum by creating and executing one calculation per value."""
+    total = 0.0
+    for value in values:
+        total = CalculationFactory.create_calculation(total, value, "+").execute()
+    return total
+
+
+def fold_operation(values):
+    """Sum by calling the binary operation directly."""
+    execute = AddOperation().execute
+    total = 0.0
+    for value in values:
+        total = execute(total, value)
+    return total
+
+
+def measure(fn, values):
+    """Return (values/s, result)."""
+    started = time.perf_counter()
+    result = fn(values)
+    return len(values) / (time.perf_counter() - started), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--values", type=int, default=1000000)
+    args = parser.parse_args()
+
+    generator = random.Random(42)
+    # Mixed magnitudes make naive summation lose digits.
+    values = [
+        generator.uniform(-1, 1) * 10 ** generator.randint(-6, 6)
+        for _ in range(args.values)
+    ]
+    exact = math.fsum(values)
+
+    print(f"{'method':<22} {'values/s':>14} {'abs error':>12}")
+    for name, fn in [
+        ("fold Calculation", fold_calculations),
+        ("fold AddOperation", fold_operation),
+        ("SumReduction", SumReduction().reduce),
+    ]:
+        rate, result = measure(fn, values)
+        print(f"{name:<22} {rate:>14,.0f} {abs(result - exact):>12.3g}")
+
+    # The true product is ~1, but the running product leaves the float range.
+    growth = [generator.uniform(1.0, 2.0) for _ in range(args.values // 2)]
+    factors = growth + [1 / factor for factor in growth]
+    print()
+    print(f"{'product':<22} {'values/s':>14} {'result':>12}")
+    for name, reduction in [
+        ("ProductReduction", ProductReduction()),
+        ("ProductReduction(log)", ProductReduction(log_space=True)),
+    ]:
+        rate, result = measure(reduction.reduce, factors)
+        print(f"{name:<22} {rate:>14,.0f} {result:>12.4g}")
+    print(f"{'math.prod':<22} {'':>14} {math.prod(factors):>12.4g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Compare the Unix-socket binary RPC path with the HTTP/JSON path.
+
+Both servers run in-process on background event loops. For each transport
+the benchmark measures round-trip latency with one request in flight, then
+throughput with many concurrent requests (pipelined on one connection for
+RPC, one keep-alive connection per in-flight request for HTTP).
+
+Usage:
+    python benchmarks/bench_rpc.py [--requests 5000] [--concurrency 64]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from service import (  # noqa: E402
+    CalculationHTTPServer,
+    CalculationRPCServer,
+    RPCClient,
+    ServerThread,
+)
+
+
+class HTTPConnection:
+    """Minimal keep-alive HTTP/1.1 client on asyncio streams."""
+
+    def __init__(self, port):
+        self.port = port
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+        return self
+
+    async def calculate(self, a, b, operation):
+        self.writer.write(
+            f"GET /calculate?a={a}&b={b}&operation={operation} HTTP/1.1\r\n"
+            f"Host: localhost\r\n\r\n".encode()
+        )
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line == b"\r\n":
+                break
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":")[1])
+        return json.loads(await self.reader.readexactly(length))["result"]
+
+    def close(self):
+        self.writer.close()
+
+
+def summarize(name, latencies, elapsed, requests):
+    """Print latency percentiles and throughput."""
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1e6
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1e6
+    print(f"{name:>28} {p50:>9.1f} {p99:>9.1f} {requests / elapsed:>12.0f}")
+
+
+async def bench_rpc(path, requests, concurrency):
+    client = await RPCClient(path).connect()
+    latencies = []
+    for i in range(requests):
+        started = time.perf_counter()
+        await client.calculate(i, 7, "*")
+        latencies.append(time.perf_counter() - started)
+    summarize("rpc sequential", latencies, sum(latencies), requests)
+
+    latencies = []
+
+    async def worker(offset):
+        for i in range(offset, requests, concurrency):
+            started = time.perf_counter()
+            await client.calculate(i, 11, "*")
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    summarize(
+        f"rpc pipelined x{concurrency}",
+        latencies,
+        time.perf_counter() - started,
+        requests,
+    )
+    await client.close()
+
+
+async def bench_http(port, requests, concurrency):
+    connection = await HTTPConnection(port).connect()
+    latencies = []
+    for i in range(requests):
+        started = time.perf_counter()
+        await connection.calculate(i, 7, "multiply")
+        latencies.append(time.perf_counter() - started)
+    summarize("http sequential", latencies, sum(latencies), requests)
+    connection.close()
+
+    connections = [await HTTPConnection(port).connect() for _ in range(concurrency)]
+    latencies = []
+
+    async def worker(offset, connection):
+        for i in range(offset, requests, concurrency):
+            started = time.perf_counter()
+            await connection.calculate(i, 11, "multiply")
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i, c) for i, c in enumerate(connections)))
+    summarize(
+        f"http concurrent x{concurrency}",
+        latencies,
+        time.perf_counter() - started,
+        requests,
+    )
+    for connection in connections:
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "calc.sock")
+    print(f"{'transport':>28} {'p50 us':>9} {'p99 us':>9} {'calls/sec':>12}")
+    with ServerThread(CalculationRPCServer(path)):
+        asyncio.run(bench_rpc(path, args.requests, args.concurrency))
+    with ServerThread(CalculationHTTPServer(port=0)) as server:
+        asyncio.run(bench_http(server.port, args.requests, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
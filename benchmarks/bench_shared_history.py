@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Append rate of the shared-memory history under concurrent writer processes.
+
+Each writer process appends pre-built calculations to one
+``SharedMemoryHistory`` as fast as it can; all writers start together and
+the aggregate appends per second are reported for 1 to ``--writers``
+processes, next to the in-process ``CalculatorHistory`` for reference.
+
+Usage:
+    python benchmarks/bench_shared_history.py [--writers 8] [--appends 50000]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calculation import CalculationFactory  # noqa: E402
+from calculator import CalculatorHistory  # noqa: E402
+from calculator.history import SharedMemoryHistory  # noqa: E402
+
+
+def make_calculations(count, worker=0):
+    """Build executed calculations to append."""
+    calculations = []
+    for i in range(count):
+        calculation = CalculationFactory.create_calculation(worker, i, "+")
+        calculation.execute()
+        calculations.append(calculation)
+    return calculations
+
+
+def writer(history, worker, count, barrier, elapsed):
+    """Writer process: wait for the others, then append ``count`` times."""
+    calculations = make_calculations(count, worker)
+    add = history.add_calculation
+    barrier.wait()
+    started = time.perf_counter()
+    for calculation in calculations:
+        add(calculation)
+    elapsed.put(time.perf_counter() - started)
+
+
+def run(writers, appends):
+    """Return aggregate appends/s with ``writers`` processes."""
+    with SharedMemoryHistory(capacity=writers * appends) as history:
+        barrier = multiprocessing.Barrier(writers + 1)
+        elapsed = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(
+                target=writer, args=(history, worker, appends, barrier, elapsed)
+            )
+            for worker in range(writers)
+        ]
+        for process in processes:
+            process.start()
+        barrier.wait()
+        # Writers start together, so the slowest one spans the whole run.
+        slowest = max(elapsed.get() for _ in processes)
+        for process in processes:
+            process.join()
+        assert len(history.get_history()) == writers * appends
+    return writers * appends / slowest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--appends", type=int, default=50000)
+    args = parser.parse_args()
+
+    calculations = make_calculations(args.appends)
+    local = CalculatorHistory()
+    started = time.perf_counter()
+    for calculation in calculations:
+        local.add_calculation(calculation)
+    local_rate = args.appends / (time.perf_counter() - started)
+
+    print(f"cores: {os.cpu_count()}")
+    print(f"{'writers':>8} {'appends/s':>12}")
+    print(f"{'local':>8} {local_rate:>12,.0f}   (in-process CalculatorHistory)")
+    writers = 1
+    while writers <= args.writers:
+        print(f"{writers:>8} {run(writers, args.appends):>12,.0f}")
+        writers *= 2
+
+
+if __name__ == "__main__":
+    main()
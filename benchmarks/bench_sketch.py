@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Accuracy, memory and speed of result sketches against exact answers.
+
+Executes a batch of calculations, then compares the exact way of answering
+"p50/p99 of results and number of distinct expressions" (keep every
+result and sort it, keep a set of every expression) with ``KLLSketch`` for
+several ``k`` and ``HyperLogLog`` for several precisions. Reports the
+worst rank error over a few quantiles, the distinct-count error, the
+memory held and the time per item.
+
+Usage:
+    python benchmarks/bench_sketch.py [--items 1000000] [--distinct 200000]
+"""
+
+import argparse
+import bisect
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calculation.batch import execute_batch  # noqa: E402
+from sketch import HyperLogLog, KLLSketch, expression_key  # noqa: E402
+
+QUANTILES = (0.01, 0.5, 0.9, 0.99, 0.999)
+
+
+def make_items(count, distinct, seed=1):
+    """Calculations drawn from ``distinct`` expressions with skewed reuse."""
+    rng = random.Random(seed)
+    pool = [
+        (rng.randint(-(10**6), 10**6), rng.randint(1, 1000), rng.choice("+-*/%"))
+        for _ in range(distinct)
+    ]
+    return [pool[int(distinct * rng.random() ** 3)] for _ in range(count)]
+
+
+def rank_error(ordered, value, q):
+    """Distance from ``q`` to the range of ranks ``value`` holds (ties span one)."""
+    low = bisect.bisect_left(ordered, value) / len(ordered)
+    high = bisect.bisect_right(ordered, value) / len(ordered)
+    return max(low - q, q - high, 0.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=1000000)
+    parser.add_argument("--distinct", type=int, default=200000)
+    args = parser.parse_args()
+
+    items = make_items(args.items, args.distinct)
+    results = [r for r in execute_batch(items) if not isinstance(r, Exception)]
+    print(f"{len(items)} calculations, {len(results)} results")
+
+    started = time.perf_counter()
+    ordered = sorted(results)
+    elapsed = time.perf_counter() - started
+    memory = sys.getsizeof(ordered) + len(ordered) * 32
+    print(f"\n{'quantiles':<14}{'max rank err':>14}{'memory':>12}{'ns/item':>10}")
+    print(
+        f"{'sorted list':<14}{0:>14.4f}{memory / 1024:>10.0f}Ki{elapsed / len(results) * 1e9:>10.0f}"
+    )
+    for k in (50, 200, 800):
+        sketch = KLLSketch(k)
+        started = time.perf_counter()
+        sketch.update(results)
+        elapsed = time.perf_counter() - started
+        error = max(rank_error(ordered, sketch.quantile(q), q) for q in QUANTILES)
+        print(
+            f"{f'kll k={k}':<14}{error:>14.4f}"
+            f"{sketch.memory_usage() / 1024:>10.1f}Ki"
+            f"{elapsed / len(results) * 1e9:>10.0f}"
+        )
+
+    keys = [expression_key(*item) for item in items]
+    started = time.perf_counter()
+    expressions = set(keys)
+    elapsed = time.perf_counter() - started
+    truth = len(expressions)
+    memory = sys.getsizeof(expressions) + sum(map(sys.getsizeof, expressions))
+    print(f"\n{'distinct':<14}{'rel error':>14}{'memory':>12}{'ns/item':>10}")
+    print(
+        f"{'exact set':<14}{0:>14.4f}{memory / 1024:>10.0f}Ki{elapsed / len(keys) * 1e9:>10.0f}"
+    )
+    for precision in (10, 12, 14, 16):
+        sketch = HyperLogLog(precision)
+        started = time.perf_counter()
+        sketch.update(keys)
+        elapsed = time.perf_counter() - started
+        error = abs(sketch.estimate() - truth) / truth
+        print(
+            f"{f'hll p={precision}':<14}{error:>14.4f}"
+            f"{sketch.memory_usage() / 1024:>10.1f}Ki"
+            f"{elapsed / len(keys) * 1e9:>10.0f}"
+        )
+    print(f"\n{truth} distinct expressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Size and speed of columnar history snapshots against text dumps.
+
+Builds a history, then compares writing it as ``str(calculation)`` lines
+and re-parsing them with saving a snapshot (raw and compressed), opening it
+as a ``SnapshotHistory`` and answering filter/aggregate queries from the
+memory-mapped file.
+
+Usage:
+    python benchmarks/bench_snapshot.py [--rows 1000000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calculation import Calculation, CalculationFactory  # noqa: E402
+from calculator import CalculatorHistory  # noqa: E402
+from calculator.snapshot import (  # noqa: E402
+    SnapshotHistory,
+    SnapshotReader,
+    save_snapshot,
+)
+
+
+def build_history(rows):
+    """Build a history of mixed operations on random operands."""
+    generator = random.Random(42)
+    operations = [CalculationFactory.get_operation(op) for op in "+-*/"]
+    history = CalculatorHistory()
+    for i in range(rows):
+        a = generator.random() * 1000 if i % 2 else generator.randint(-1000, 1000)
+        calculation = Calculation(a, generator.randint(1, 99), operations[i % 4])
+        calculation.execute()
+        history.add_calculation(calculation)
+    return history
+
+
+def timed(fn):
+    """Return (seconds, result)."""
+    started = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - started, result
+
+
+def write_text(history, path):
+    """Dump history as ``str(calculation)`` lines."""
+    with open(path, "w") as file:
+        file.writelines(f"{c}\n" for c in history.get_history())
+
+
+def parse_text(path):
+    """Parse dumped lines back into calculations."""
+    calculations = []
+    with open(path) as file:
+        for line in file:
+            a, operation, b, _, result = line.split()
+            calculation = CalculationFactory.create_calculation(
+                float(a), float(b), operation
+            )
+            calculation._result = float(result)
+            calculation._executed = True
+            calculations.append(calculation)
+    return calculations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1000000)
+    args = parser.parse_args()
+
+    history = build_history(args.rows)
+    directory = tempfile.mkdtemp()
+    text_path = os.path.join(directory, "history.txt")
+    write_seconds, _ = timed(lambda: write_text(history, text_path))
+    parse_seconds, _ = timed(lambda: parse_text(text_path))
+    text_size = os.path.getsize(text_path)
+
+    print(f"{'format':<20} {'bytes/row':>10} {'write s':>9} {'load s':>9}")
+    print(
+        f"{'text lines':<20} {text_size / args.rows:>10.1f} "
+        f"{write_seconds:>9.2f} {parse_seconds:>9.2f}"
+    )
+    for compress in (False, True):
+        path = os.path.join(directory, f"history-{compress}.snap")
+        seconds, _ = timed(lambda: save_snapshot(history, path, compress=compress))
+        load_seconds, loaded = timed(lambda: SnapshotHistory(path))
+        name = "snapshot (zlib)" if compress else "snapshot"
+        print(
+            f"{name:<20} {os.path.getsize(path) / args.rows:>10.1f} "
+            f"{seconds:>9.2f} {load_seconds:>9.4f}"
+        )
+        loaded.clear_history()
+
+        with SnapshotReader(path) as snapshot:
+            queries = [
+                ("count(*)", lambda: snapshot.count(operation="*")),
+                (
+                    "sum(result) where a>500",
+                    lambda: snapshot.aggregate(
+                        "sum", "result", where=[("a", ">", 500)]
+                    ),
+                ),
+                (
+                    "max(a) where op=/",
+                    lambda: snapshot.aggregate("max", "a", operation="/"),
+                ),
+            ]
+            for label, query in queries:
+                seconds, _ = timed(query)
+                print(f"  {label:<28} {args.rows / seconds:>14,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
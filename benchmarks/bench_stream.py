@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Sustained throughput and tail latency of WebSocket calculation streams.
+
+An HTTP server runs in-process on a background event loop. One client
+connection upgrades to ``/stream`` and keeps a fixed window of calculations
+in flight for the whole run, sending a new one as each result arrives. For
+each window size the benchmark reports sustained messages per second and
+the p50/p99/max latency from sending a calculation to receiving its result.
+A keep-alive HTTP connection doing one ``GET /calculate`` at a time is
+measured for comparison.
+
+Usage:
+    python benchmarks/bench_stream.py [--messages 50000] [--windows 1,16,256]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from service import CalculationHTTPServer, ServerThread, StreamClient  # noqa: E402
+
+
+def summarize(name, latencies, elapsed):
+    """Print latency percentiles and throughput."""
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1e6
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1e6
+    print(
+        f"{name:>18} {p50:>9.1f} {p99:>9.1f} {latencies[-1] * 1e6:>10.1f} "
+        f"{len(latencies) / elapsed:>11.0f}"
+    )
+
+
+async def bench_stream(port, messages, window):
+    """Keep ``window`` calculations in flight until ``messages`` complete."""
+    latencies = []
+    async with StreamClient("127.0.0.1", port) as client:
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+        sent = 0
+
+        def send():
+            nonlocal sent
+            i = sent
+            sent += 1
+            future = client.submit(i, 7, "*" if i % 2 else "+")
+            future.add_done_callback(
+                lambda _, started=time.perf_counter(): finish(started)
+            )
+
+        def finish(started):
+            latencies.append(time.perf_counter() - started)
+            if sent < messages:
+                send()
+            elif len(latencies) == messages and not done.done():
+                done.set_result(None)
+
+        started = time.perf_counter()
+        for _ in range(min(window, messages)):
+            send()
+        await done
+        summarize(f"stream x{window}", latencies, time.perf_counter() - started)
+
+
+async def bench_http(port, messages):
+    """One keep-alive ``GET /calculate`` at a time."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    latencies = []
+    started = time.perf_counter()
+    for i in range(messages):
+        sent = time.perf_counter()
+        writer.write(
+            f"GET /calculate?a={i}&b=7&operation=add HTTP/1.1\r\n"
+            "Host: localhost\r\n\r\n".encode()
+        )
+        length = 0
+        while True:
+            line = await reader.readline()
+            if line == b"\r\n":
+                break
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":")[1])
+        await reader.readexactly(length)
+        latencies.append(time.perf_counter() - sent)
+    summarize("http keep-alive", latencies, time.perf_counter() - started)
+    writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--windows", default="1,16,256")
+    args = parser.parse_args()
+
+    print(f"{'client':>18} {'p50 us':>9} {'p99 us':>9} {'max us':>10} {'msgs/sec':>11}")
+    with ServerThread(CalculationHTTPServer(port=0)) as server:
+        asyncio.run(bench_http(server.port, min(args.messages, 10000)))
+        for window in (int(w) for w in args.windows.split(",")):
+            asyncio.run(bench_stream(server.port, args.messages, window))
+
+
+if __name__ == "__main__":
+    main()
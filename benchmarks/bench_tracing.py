@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Overhead of stage tracing on the calculation hot path.
+
+Evaluates the same calculations through ``Calculator._evaluate`` with
+sampling off and at several sample rates. With sampling off each
+instrumented stage (evaluate, factory, execute and history) costs a single
+``tracer.enabled`` or ``tracer.recording`` check; the benchmark times that
+check on its own and reports it as a share of a calculation.
+
+Requests that are not sampled run the same code as with sampling off plus
+the head-based sampling decision (``tracer.start``). The benchmark times
+that decision the same way and fails if it exceeds
+``--max-unsampled-overhead`` of a calculation, so that low sample rates stay
+cheap: their remaining overhead is the share of requests actually sampled.
+
+Usage:
+    python benchmarks/bench_tracing.py [--calculations 200000] [--repeat 5]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calculator import Calculator  # noqa: E402
+from tracing import tracer  # noqa: E402
+
+#: Number of ``tracer.enabled``/``tracer.recording`` checks on the REPL
+#: evaluation path.
+CHECKS_PER_CALCULATION = 4
+
+#: Sample rates compared, the first being sampling off.
+RATES = (0.0, 0.01, 1.0)
+
+
+def timed(rate, inputs):
+    """Wall time per calculation in nanoseconds for one run at ``rate``."""
+    tracer.configure(sample_rate=rate)
+    tracer.clear()
+    calculator = Calculator()
+    evaluate = calculator._evaluate
+    gc.collect()
+    gc.disable()
+    try:
+        started = time.perf_counter()
+        for parts in inputs:
+            evaluate(parts)
+        elapsed = time.perf_counter() - started
+    finally:
+        gc.enable()
+        tracer.configure(sample_rate=0.0)
+    return elapsed / len(inputs) * 1e9
+
+
+def best_of(repeat, inputs):
+    """
+    Best time per calculation for each rate over ``repeat`` rounds.
+
+    Each round runs every rate once, so drift in machine speed affects all
+    of them alike.
+    """
+    best = dict.fromkeys(RATES, float("inf"))
+    for _ in range(repeat):
+        for rate in RATES:
+            best[rate] = min(best[rate], timed(rate, inputs))
+    return best
+
+
+def per_call(statement):
+    """Best time of ``statement`` in nanoseconds."""
+    best = min(
+        timeit.repeat(statement, globals={"tracer": tracer}, number=1000000, repeat=5)
+    )
+    return best / 1000000 * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calculations", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-unsampled-overhead", type=float, default=0.05)
+    args = parser.parse_args()
+
+    operators = ["+", "-", "*", "/"]
+    inputs = [
+        [str(i), operators[i % 4], str(i % 97 + 1)] for i in range(args.calculations)
+    ]
+
+    costs = best_of(args.repeat, inputs)
+    off = costs[0.0]
+    print(f"{'mode':>14} {'ns/calc':>9} {'vs off':>8}")
+    for rate, cost in costs.items():
+        label = "sampling off" if rate == 0 else f"sample {rate:g}"
+        print(f"{label:>14} {cost:>9.0f} {(cost / off - 1) * 100:>7.1f}%")
+
+    check = per_call("tracer.enabled")
+    checks = check * CHECKS_PER_CALCULATION
+    print(
+        f"\ndisabled checks: {checks:.1f} ns/calc "
+        f"({checks / off * 100:.2f}% of a calculation with sampling off)"
+    )
+
+    # A rate that never samples isolates the decision made for every request.
+    tracer.configure(sample_rate=1e-12)
+    try:
+        decision = per_call("tracer.start('calculation')")
+    finally:
+        tracer.configure(sample_rate=0.0)
+    print(
+        f"unsampled decision: {decision:.1f} ns/calc "
+        f"({decision / off * 100:.2f}% of a calculation with sampling off)"
+    )
+    assert decision <= off * args.max_unsampled_overhead, (
+        f"the sampling decision costs {decision / off:.1%} of a calculation, "
+        f"more than {args.max_unsampled_overhead:.0%}"
+    )
+
+
+if __name__ == "__main__":
+    main()
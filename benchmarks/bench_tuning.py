@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Fixed batch engines against the autotuner's choice.
+
+Calibrates an ``Autotuner`` (or loads its cached calibration), then times
+single-operation batches of several sizes and operand types on every
+engine and on the engine the tuner picks. The ``auto`` column should track
+the fastest fixed engine in each row.
+
+Usage:
+    python benchmarks/bench_tuning.py [--operation *] [--cache PATH]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calculation import CalculationFactory  # noqa: E402
+from calculation.tuning import (  # noqa: E402
+    DTYPES,
+    STRATEGIES,
+    Autotuner,
+    sample_operands,
+)
+
+
+def timed(fn, repeat=3):
+    """Best of ``repeat`` runs, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--operation", default="*")
+    parser.add_argument("--sizes", default="1,16,256,4096,65536")
+    parser.add_argument("--cache", metavar="PATH")
+    parser.add_argument("--recalibrate", action="store_true")
+    args = parser.parse_args()
+
+    tuner = Autotuner(args.cache)
+    started = time.perf_counter()
+    cached = tuner.ensure_calibrated(args.recalibrate)
+    source = "loaded" if cached else "measured"
+    print(f"calibration {source} in {time.perf_counter() - started:.2f}s")
+
+    operation = CalculationFactory.get_operation(args.operation)
+    sizes = [int(size) for size in args.sizes.split(",")]
+    header = "".join(f"{name:>12}" for name in STRATEGIES)
+    print(f"{'dtype':<8}{'size':>7}{header}{'auto':>12}  chosen (us/item)")
+    try:
+        for dtype in DTYPES:
+            left, right = sample_operands(operation, dtype, max(sizes))
+            for size in sizes:
+                a, b = left[:size], right[:size]
+                row = [
+                    timed(lambda: tuner.execute_group(operation, a, b, strategy))
+                    for strategy in STRATEGIES
+                ]
+                auto = timed(lambda: tuner.execute_group(operation, a, b))
+                chosen = tuner.choose(operation, dtype, size)
+                cells = "".join(f"{seconds / size * 1e6:>12.3f}" for seconds in row)
+                print(
+                    f"{dtype:<8}{size:>7}{cells}"
+                    f"{auto / size * 1e6:>12.3f}  {chosen}"
+                )
+    finally:
+        tuner.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,30 @@ Calculation module for calculator application.
 This module defines the Calculation class and CalculationFactory for creating calculations.
 """
 
+import threading
+from contextvars import ContextVar
 from datetime import datetime
-from typing import Union
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
 
-from operation import Operation
+from operation import (
+    AddOperation,
+    DivideOperation,
+    FloorDivideOperation,
+    MaxReduction,
+    MeanReduction,
+    MinReduction,
+    ModuloOperation,
+    MultiplyOperation,
+    Operation,
+    PowerOperation,
+    ProductReduction,
+    Reduction,
+    SubtractOperation,
+    SumReduction,
+)
+from tracing import span, tracer
+
+from .offload import dispatcher
 
 Number = Union[int, float]
 
@@ -24,25 +44,61 @@ class Calculation:
             b: Second operand
             operation: Operation to perform
         """
+        self._initialize(a, b, operation)
+        self.timestamp = datetime.now()
+
+    def _initialize(self, a: Number, b: Number, operation: Operation) -> None:
+        """Set the operands and the not-yet-executed state."""
         self.a = a
         self.b = b
         self.operation = operation
-        self.timestamp = datetime.now()
         self._result = None
         self._executed = False
+        self._formatted = None
 
     def execute(self) -> Number:
         """
         Execute the calculation and return the result.
 
+        Calculations on huge integers run in a worker process, so they do
+        not hold the GIL and can be interrupted.
+
+        Returns:
+            Result of the calculation
+
+        Raises:
+            ValueError: If operation cannot be performed
+        """
+        if not self._executed:
+            if tracer.recording:
+                with span("execute"):
+                    self._result = dispatcher.execute(self.operation, self.a, self.b)
+            else:
+                self._result = dispatcher.execute(self.operation, self.a, self.b)
+            self._executed = True
+        return self._result
+
+    async def execute_async(self, timeout: Optional[float] = None) -> Number:
+        """
+        Execute the calculation without blocking the event loop.
+
+        Calculations on huge integers run in a worker process (see
+        ``calculation.offload``); cancelling the awaiting task stops them.
+
+        Args:
+            timeout: Seconds an offloaded calculation may take
+
         Returns:
             Result of the calculation
 
         Raises:
             ValueError: If operation cannot be performed
+            TimeoutError: If the calculation missed its deadline
         """
         if not self._executed:
-            self._result = self.operation.execute(self.a, self.b)
+            self._result = await dispatcher.execute_async(
+                self.operation, self.a, self.b, timeout
+            )
             self._executed = True
         return self._result
 
@@ -52,39 +108,213 @@ class Calculation:
         return self.execute()
 
     def __str__(self) -> str:
-        """String representation of the calculation."""
+        """String representation of the calculation.
+
+        Once the calculation has been executed its result can no longer
+        change, so the formatted line is built once and cached.
+        """
         if self._executed:
-            return f"{self.a} {self._get_operation_symbol()} {self.b} = {self._result}"
-        else:
-            return f"{self.a} {self._get_operation_symbol()} {self.b} = ?"
+            if self._formatted is None:
+                self._formatted = (
+                    f"{self.a} {self.operation.symbol} {self.b} = {self._result}"
+                )
+            return self._formatted
+        return f"{self.a} {self.operation.symbol} {self.b} = ?"
 
     def __repr__(self) -> str:
         """Developer representation of the calculation."""
         return f"Calculation({self.a}, {self.b}, {self.operation.__class__.__name__})"
 
-    def _get_operation_symbol(self) -> str:
-        """Get the symbol for the operation."""
-        operation_symbols = {
-            "AddOperation": "+",
-            "SubtractOperation": "-",
-            "MultiplyOperation": "*",
-            "DivideOperation": "/",
-        }
-        return operation_symbols.get(self.operation.__class__.__name__, "?")
-
 
 class CalculationFactory:
     """Factory for creating calculations based on operation type."""
 
-    @staticmethod
-    def create_calculation(a: Number, b: Number, operation_type: str) -> Calculation:
+    #: Registered operations keyed by lower-case name or symbol.
+    _operations: Dict[str, Operation] = {}
+
+    #: Functions executing each registered operation (offloading huge
+    #: integer work), keyed like ``_operations``; see ``calculator.evaluate``.
+    _executors: Dict[str, Callable[[Number, Number], Number]] = {}
+
+    #: Registered operations keyed by their binary ``code``.
+    _operations_by_code: Dict[int, Operation] = {}
+
+    #: Registered n-ary reductions keyed by lower-case name or alias.
+    _reductions: Dict[str, Reduction] = {}
+
+    @classmethod
+    def register_operation(cls, operation: Operation, *aliases: str) -> None:
+        """
+        Register an operation under its name, its symbol and any aliases.
+
+        Args:
+            operation: Operation instance; operations are stateless and the
+                same instance is shared by every calculation that uses it
+            aliases: Additional names the operation can be requested by
+        """
+        execute = dispatcher.executor(operation)
+        for alias in (operation.name, operation.symbol) + aliases:
+            cls._operations[alias.lower()] = operation
+            cls._executors[alias.lower()] = execute
+        if operation.code:
+            cls._operations_by_code[operation.code] = operation
+
+    @classmethod
+    def register_reduction(cls, reduction: Reduction, *aliases: str) -> None:
+        """
+        Register a reduction under its name and any aliases.
+
+        Args:
+            reduction: Reduction instance, shared like operations
+            aliases: Additional names the reduction can be requested by
+        """
+        for alias in (reduction.name,) + aliases:
+            cls._reductions[alias.lower()] = reduction
+
+    @classmethod
+    def valid_reductions(cls) -> List[str]:
+        """Return every registered reduction name."""
+        return list(cls._reductions)
+
+    @classmethod
+    def get_reduction(cls, reduction_type: str) -> Reduction:
+        """
+        Look up a reduction by name (case insensitive).
+
+        Raises:
+            ValueError: If the reduction type is not supported
+        """
+        reduction = None
+        if reduction_type is not None:
+            reduction = cls._reductions.get(reduction_type.lower().strip())
+        if reduction is None:
+            raise ValueError(
+                f"Unsupported reduction: {reduction_type}. "
+                f"Valid reductions are: {cls.valid_reductions()}"
+            )
+        return reduction
+
+    @classmethod
+    def reduce(cls, reduction_type: str, values: Iterable[Number]) -> Number:
+        """
+        Reduce many numbers to one, e.g. ``reduce("sum", values)``.
+
+        Args:
+            reduction_type: Reduction name ('sum', 'product', 'mean', 'min', 'max')
+            values: Iterable, generator or array of numbers, consumed in chunks
+
+        Returns:
+            Result of the reduction
+
+        Raises:
+            ValueError: If the reduction is unsupported or undefined for the
+                values (e.g. the mean of no values)
+        """
+        return cls.get_reduction(reduction_type).reduce(values)
+
+    @classmethod
+    def valid_operations(cls) -> List[str]:
+        """Return every registered operation name and symbol."""
+        return list(cls._operations)
+
+    @classmethod
+    def get_operation(cls, operation_type: str) -> Operation:
+        """
+        Look up the operation for a name or symbol.
+
+        Lookup is case insensitive and ignores surrounding whitespace.
+
+        Args:
+            operation_type: Operation name or symbol (e.g. 'add' or '+')
+
+        Returns:
+            The registered operation
+
+        Raises:
+            ValueError: If operation type is not supported
+        """
+        operation = None
+        if operation_type is not None:
+            operation = cls._operations.get(operation_type.lower().strip())
+        if operation is None:
+            raise ValueError(
+                f"Unsupported operation: {operation_type}. "
+                f"Valid operations are: {cls.valid_operations()}"
+            )
+        return operation
+
+    @classmethod
+    def get_executor(cls, operation_type: str) -> Callable[[Number, Number], Number]:
+        """
+        Look up the function executing an operation name or symbol.
+
+        Lookup is normalized like ``get_operation``.
+
+        Raises:
+            ValueError: If operation type is not supported
+        """
+        return cls._executors[cls.get_operation(operation_type).name]
+
+    @classmethod
+    def get_operation_by_code(cls, code: int) -> Operation:
+        """
+        Look up an operation by its binary ``code``.
+
+        Raises:
+            ValueError: If no operation is registered under the code
+        """
+        operation = cls._operations_by_code.get(code)
+        if operation is None:
+            raise ValueError(f"Unsupported operation code: {code}")
+        return operation
+
+    @classmethod
+    def canonical_operation(cls, operation_type: str) -> str:
+        """
+        Normalize an operation name or symbol to its canonical name.
+
+        ``"+"``, ``" ADD "`` and ``"add"`` all map to ``"add"``.
+
+        Raises:
+            ValueError: If operation type is not supported
+        """
+        return cls.get_operation(operation_type).name
+
+    @classmethod
+    def canonical_key(cls, a: Number, b: Number, operation_type: str) -> Tuple:
+        """
+        Build a hashable key identifying a calculation.
+
+        Two requests share a key only if they are guaranteed to produce the
+        same result: the operation is canonicalized, and floats are keyed by
+        their exact hex form so that ``1`` and ``1.0`` (or ``0.0`` and
+        ``-0.0``) stay distinct even though they compare equal.
+
+        Raises:
+            ValueError: If operation type is not supported
+        """
+        return (
+            cls.canonical_operation(operation_type),
+            _operand_key(a),
+            _operand_key(b),
+        )
+
+    @classmethod
+    def create_calculation(
+        cls, a: Number, b: Number, operation_type: str
+    ) -> Calculation:
         """
         Create a calculation instance based on operation type.
 
+        Inside a ``calculation.deferred.DeferredExecution`` context the
+        calculation is queued and evaluated with the rest of the queue when
+        any queued result is first needed.
+
         Args:
             a: First operand
             b: Second operand
-            operation_type: Type of operation ('add', 'subtract', 'multiply', 'divide')
+            operation_type: Type of operation ('add', 'subtract', 'multiply',
+                'divide', 'power', 'modulo', 'floordiv')
 
         Returns:
             Calculation instance
@@ -92,39 +322,80 @@ class CalculationFactory:
         Raises:
             ValueError: If operation type is not supported
         """
-        from operation import (
-            AddOperation,
-            DivideOperation,
-            MultiplyOperation,
-            SubtractOperation,
-        )
+        if tracer.recording:
+            with span("factory"):
+                return _new_calculation(a, b, cls.get_operation(operation_type))
+        return _new_calculation(a, b, cls.get_operation(operation_type))
 
-        # Handle None case
-        if operation_type is None:
-            raise ValueError(
-                "Unsupported operation: None. "
-                "Valid operations are: ['add', 'subtract', 'multiply', 'divide', '+', '-', '*', '/']"
-            )
 
-        operations_map = {
-            "add": AddOperation(),
-            "subtract": SubtractOperation(),
-            "multiply": MultiplyOperation(),
-            "divide": DivideOperation(),
-            "+": AddOperation(),
-            "-": SubtractOperation(),
-            "*": MultiplyOperation(),
-            "/": DivideOperation(),
-        }
-
-        operation_type_lower = operation_type.lower().strip()
-
-        if operation_type_lower not in operations_map:
-            valid_operations = list(set(operations_map.keys()))
-            raise ValueError(
-                f"Unsupported operation: {operation_type}. "
-                f"Valid operations are: {valid_operations}"
-            )
+#: The active ``calculation.deferred.DeferredExecution``, if any.
+_deferred: ContextVar = ContextVar("deferred_execution", default=None)
+_deferred_lock = threading.Lock()
+_deferred_entered = 0
 
-        operation = operations_map[operation_type_lower]
+
+def _create(a: Number, b: Number, operation: Operation) -> Calculation:
+    """Create a calculation; the factory used while nothing is deferred."""
+    return Calculation(a, b, operation)
+
+
+def _create_deferred(a: Number, b: Number, operation: Operation) -> Calculation:
+    """Create a calculation, queued if this context is deferring."""
+    execution = _deferred.get()
+    if execution is None:
         return Calculation(a, b, operation)
+    return execution.defer(a, b, operation)
+
+
+#: Factory behind ``create_calculation``. The context variable is only
+#: consulted while some ``DeferredExecution`` is entered, in any thread.
+_new_calculation = _create
+
+
+def _enter_deferred(execution):
+    """Make ``execution`` active in this context; return a reset token."""
+    global _deferred_entered, _new_calculation
+    with _deferred_lock:
+        _deferred_entered += 1
+        _new_calculation = _create_deferred
+    return _deferred.set(execution)
+
+
+def _exit_deferred(token) -> None:
+    """Undo ``_enter_deferred``."""
+    global _deferred_entered, _new_calculation
+    try:
+        _deferred.reset(token)
+    finally:
+        with _deferred_lock:
+            _deferred_entered -= 1
+            if not _deferred_entered:
+                _new_calculation = _create
+
+
+def _operand_key(value: Number):
+    """Key an operand so that only identical values compare equal."""
+    if isinstance(value, float):
+        return value.hex()
+    return value
+
+
+for _operation, _aliases in (
+    (AddOperation(), ()),
+    (SubtractOperation(), ()),
+    (MultiplyOperation(), ()),
+    (DivideOperation(), ()),
+    (PowerOperation(), ("**", "pow")),
+    (ModuloOperation(), ("mod",)),
+    (FloorDivideOperation(), ("floor_divide",)),
+):
+    CalculationFactory.register_operation(_operation, *_aliases)
+
+for _reduction, _aliases in (
+    (SumReduction(), ()),
+    (ProductReduction(), ("prod",)),
+    (MeanReduction(), ("avg", "average")),
+    (MinReduction(), ()),
+    (MaxReduction(), ()),
+):
+    CalculationFactory.register_reduction(_reduction, *_aliases)
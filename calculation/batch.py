@@ -0,0 +1,76 @@
+"""
+Batch execution for calculations.
+
+Requests are grouped by operation and each group is evaluated in one pass,
+so the per-request cost is an operation lookup and a call rather than a
+``Calculation`` object per item.
+"""
+
+from typing import Dict, List, Sequence, Tuple, Union
+
+from operation import Operation
+
+from . import CalculationFactory, Number
+
+BatchItem = Tuple[Number, Number, str]
+BatchResult = Union[Number, ValueError]
+
+
+def execute_batch(items: Sequence[BatchItem]) -> List[BatchResult]:
+    """
+    Execute many calculations, grouped by operation.
+
+    Args:
+        items: ``(a, b, operation_type)`` tuples
+
+    Returns:
+        One entry per item, in input order: the result, or the ``ValueError``
+        the item raised (unsupported operation, division by zero, ...)
+    """
+    results: List[BatchResult] = [None] * len(items)
+    groups: Dict[Operation, List[int]] = {}
+    for index, (_, _, operation_type) in enumerate(items):
+        try:
+            operation = CalculationFactory.get_operation(operation_type)
+        except ValueError as e:
+            results[index] = e
+            continue
+        groups.setdefault(operation, []).append(index)
+
+    for operation, indices in groups.items():
+        left = [items[i][0] for i in indices]
+        right = [items[i][1] for i in indices]
+        for index, value in zip(indices, execute_group(operation, left, right)):
+            results[index] = value
+    return results
+
+
+def execute_group(
+    operation: Operation, left: Sequence[Number], right: Sequence[Number]
+) -> List[BatchResult]:
+    """
+    Execute one operation over pairs of operands in a single pass.
+
+    Args:
+        operation: Operation shared by every pair
+        left: First operands
+        right: Second operands, one per first operand
+
+    Returns:
+        The result, or the ``ValueError`` raised, for each pair
+    """
+    try:
+        return operation.execute_many(left, right)
+    except (ValueError, ArithmeticError):
+        return [_execute_one(operation, a, b) for a, b in zip(left, right)]
+
+
+def _execute_one(operation: Operation, a: Number, b: Number) -> BatchResult:
+    """Execute a single item, returning its error instead of raising."""
+    try:
+        return operation.execute(a, b)
+    except ValueError as e:
+        return e
+    except ArithmeticError as e:
+        # Overflow such as a huge int divided or multiplied by a float.
+        return ValueError(str(e))
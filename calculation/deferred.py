@@ -0,0 +1,178 @@
+"""
+Deferred bulk execution of calculations.
+
+Inside a ``DeferredExecution`` context, ``CalculationFactory`` queues the
+calculations it creates instead of leaving each to be evaluated alone. The
+first time any queued result is needed (``execute()``, ``result``), or when
+the context exits, the whole queue is evaluated through the batch engine,
+one pass per operation. Results, string forms and errors are the same as
+for ordinary calculations, so existing code needs no changes:
+
+    from calculation.deferred import DeferredExecution
+
+    with DeferredExecution():
+        calculations = [
+            CalculationFactory.create_calculation(a, b, "*") for a, b in pairs
+        ]
+        total = sum(c.result for c in calculations)  # one flush, one pass
+"""
+
+import threading
+from datetime import datetime
+from time import time
+from typing import Dict, List, Optional
+
+from operation import Operation
+
+from . import Calculation, Number, _enter_deferred, _exit_deferred
+from .batch import execute_group
+from .offload import dispatcher
+
+
+class DeferredCalculation(Calculation):
+    """A calculation evaluated with the rest of its execution's queue."""
+
+    def __init__(
+        self,
+        a: Number,
+        b: Number,
+        operation: Operation,
+        execution: "DeferredExecution",
+    ):
+        """
+        Initialize a queued calculation.
+
+        Args:
+            a: First operand
+            b: Second operand
+            operation: Operation to perform
+            execution: Execution whose queue holds the calculation
+        """
+        # Creation is the per-item cost here, so the clock is read raw and
+        # converted only if the timestamp is looked at.
+        self._initialize(a, b, operation)
+        self._created = time()
+        self._timestamp = None
+        self._execution = execution
+
+    @property
+    def timestamp(self) -> datetime:
+        """Creation time of the calculation."""
+        if self._timestamp is None:
+            self._timestamp = datetime.fromtimestamp(self._created)
+        return self._timestamp
+
+    @timestamp.setter
+    def timestamp(self, value: datetime) -> None:
+        self._timestamp = value
+
+    def execute(self) -> Number:
+        """
+        Flush the queue this calculation is in, then return its result.
+
+        Raises:
+            ValueError: If operation cannot be performed
+        """
+        if self._executed:
+            return self._result
+        if self._execution is not None:
+            self._execution.flush()
+        return super().execute()
+
+    def __getstate__(self):
+        """Pickle without the execution, which holds a lock."""
+        state = self.__dict__.copy()
+        state["_execution"] = None
+        return state
+
+
+class DeferredExecution:
+    """Context that queues factory-created calculations and runs them in bulk."""
+
+    #: Queue length at which calculations are flushed without being asked for.
+    MAX_PENDING = 1 << 16
+
+    def __init__(self, max_pending: Optional[int] = None):
+        """
+        Initialize the execution.
+
+        Args:
+            max_pending: Queue length that triggers a flush, bounding the
+                memory held by operands awaiting evaluation
+        """
+        self.max_pending = max_pending or self.MAX_PENDING
+        self._pending: List[DeferredCalculation] = []
+        self._lock = threading.Lock()
+        self._tokens: list = []
+        self.flushes = 0
+        self.executed = 0
+
+    def defer(self, a: Number, b: Number, operation: Operation) -> Calculation:
+        """Create a calculation and add it to the queue."""
+        calculation = DeferredCalculation(a, b, operation, self)
+        pending = self._pending
+        pending.append(calculation)
+        if len(pending) >= self.max_pending:
+            self.flush()
+        return calculation
+
+    def flush(self) -> int:
+        """
+        Evaluate every queued calculation, grouped by operation.
+
+        Calculations that fail are left unexecuted, so that accessing their
+        result raises the operation's ``ValueError`` as usual. Calculations
+        big enough to be offloaded are also left for ``execute()``.
+
+        Returns:
+            Number of calculations evaluated
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+        groups: Dict[Operation, List[DeferredCalculation]] = {}
+        for calculation in pending:
+            calculation._execution = None
+            if not calculation._executed:
+                groups.setdefault(calculation.operation, []).append(calculation)
+
+        executed = 0
+        threshold = dispatcher.threshold_bits
+        for operation, calculations in groups.items():
+            left = [c.a for c in calculations]
+            right = [c.b for c in calculations]
+            if (
+                operation.offloadable
+                and threshold is not None
+                and operation.max_work_bits(left, right) >= threshold
+            ):
+                work_bits = operation.work_bits
+                calculations = [
+                    c for c in calculations if work_bits(c.a, c.b) < threshold
+                ]
+                left = [c.a for c in calculations]
+                right = [c.b for c in calculations]
+            for calculation, value in zip(
+                calculations, execute_group(operation, left, right)
+            ):
+                if not isinstance(value, ValueError):
+                    calculation._result = value
+                    calculation._executed = True
+                    executed += 1
+        if pending:
+            self.flushes += 1
+            self.executed += executed
+        return executed
+
+    def __len__(self) -> int:
+        """Number of queued calculations."""
+        return len(self._pending)
+
+    def __enter__(self) -> "DeferredExecution":
+        """Start queueing calculations created in this context."""
+        self._tokens.append(_enter_deferred(self))
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Stop queueing and evaluate whatever is still queued."""
+        _exit_deferred(self._tokens.pop())
+        self.flush()
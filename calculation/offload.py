@@ -0,0 +1,331 @@
+"""
+Offloading of huge integer calculations to worker processes.
+
+Python ints make multiplication, long division and powers of numbers with
+millions of digits take seconds, and the GIL is held throughout, so running
+them in a thread still stalls every other thread and the event loop. The
+``OffloadDispatcher`` estimates each calculation's cost with
+``Operation.work_bits`` and runs it inline when it is small (nearly always)
+or in an ``OffloadPool`` worker process when it reaches ``threshold_bits``.
+
+Waiting for a worker releases the GIL. Workers can be stopped mid-
+calculation: when a deadline passes or the caller is cancelled (or
+interrupted with Ctrl-C) the worker is killed and replaced, which a
+``concurrent.futures`` process pool cannot do.
+
+Usage:
+    from calculation.offload import dispatcher
+
+    result = dispatcher.execute(operation, a, b, timeout=5.0)
+    result = await dispatcher.execute_async(operation, a, b, timeout=5.0)
+"""
+
+import asyncio
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import CancelledError
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from operation import Operation
+
+Number = Union[int, float]
+
+#: Default ``threshold_bits``: multiplying two numbers of this size takes a
+#: few milliseconds, well above the cost of a round trip to a worker.
+OFFLOAD_BITS = 1 << 17
+
+
+def _serve(connection) -> None:
+    """Worker process main loop: execute calculations until the pipe closes."""
+    # Ctrl-C reaches the whole process group; the parent decides what to do.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    while True:
+        try:
+            operation, a, b = connection.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            reply = (True, operation.execute(a, b))
+        except Exception as e:
+            reply = (False, e)
+        connection.send(reply)
+
+
+class _Worker:
+    """A worker process and the parent's end of its pipe."""
+
+    def __init__(self, context):
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+class OffloadPool:
+    """Pool of worker processes whose calculations can be abandoned."""
+
+    #: Seconds between checks for cancellation while waiting for a worker.
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, max_workers: Optional[int] = None, context=None):
+        """
+        Initialize the pool; workers are started on first use.
+
+        Args:
+            max_workers: Maximum concurrent worker processes (defaults to
+                the number of CPUs)
+            context: ``multiprocessing`` context. Defaults to ``spawn``,
+                which is safe to use from multi-threaded processes.
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._context = context or multiprocessing.get_context("spawn")
+        self._slots = threading.BoundedSemaphore(self.max_workers)
+        self._lock = threading.Lock()
+        self._idle: List[_Worker] = []
+        self._closed = False
+        self.started = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.timeouts = 0
+
+    def run(
+        self,
+        operation: Operation,
+        a: Number,
+        b: Number,
+        timeout: Optional[float] = None,
+        cancel: Optional[threading.Event] = None,
+    ) -> Number:
+        """
+        Execute a calculation in a worker and wait for the result.
+
+        Args:
+            operation: Operation to execute (sent to the worker by pickle)
+            a: First operand
+            b: Second operand
+            timeout: Seconds allowed, including waiting for a free worker
+            cancel: Event that abandons the calculation when set
+
+        Returns:
+            Result of the calculation
+
+        Raises:
+            ValueError: If the calculation cannot be performed
+            TimeoutError: If the timeout expired
+            concurrent.futures.CancelledError: If ``cancel`` was set
+            RuntimeError: If the pool is closed or the worker died
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        worker = self._acquire(deadline)
+        finished = False
+        try:
+            worker.connection.send((operation, a, b))
+            while not worker.connection.poll(self._wait(deadline)):
+                if cancel is not None and cancel.is_set():
+                    self.cancelled += 1
+                    raise CancelledError()
+                if deadline is not None and time.monotonic() >= deadline:
+                    self.timeouts += 1
+                    raise TimeoutError(f"Calculation exceeded its {timeout}s deadline")
+            ok, value = worker.connection.recv()
+            finished = True
+        except (EOFError, BrokenPipeError, ConnectionResetError) as e:
+            raise RuntimeError("Offload worker exited unexpectedly") from e
+        finally:
+            self._release(worker, finished)
+        self.completed += 1
+        if not ok:
+            raise value
+        return value
+
+    def _wait(self, deadline: Optional[float]) -> float:
+        """Seconds to wait for a reply before checking cancellation."""
+        if deadline is None:
+            return self.POLL_INTERVAL
+        return max(min(self.POLL_INTERVAL, deadline - time.monotonic()), 0)
+
+    def _acquire(self, deadline: Optional[float]) -> _Worker:
+        """Take an idle worker, starting one if needed."""
+        if self._closed:
+            raise RuntimeError("Offload pool is closed")
+        timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+        if not self._slots.acquire(timeout=timeout):
+            self.timeouts += 1
+            raise TimeoutError("No worker became free before the deadline")
+        try:
+            with self._lock:
+                if self._idle:
+                    return self._idle.pop()
+            self.started += 1
+            return _Worker(self._context)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _release(self, worker: _Worker, healthy: bool) -> None:
+        """Return a worker to the pool, or kill it if it is still busy."""
+        if healthy and not self._closed:
+            with self._lock:
+                self._idle.append(worker)
+        else:
+            worker.kill()
+        self._slots.release()
+
+    def close(self) -> None:
+        """Stop idle workers; busy ones stop when their calculation ends."""
+        self._closed = True
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.kill()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return pool counters."""
+        return {
+            "max_workers": self.max_workers,
+            "idle_workers": len(self._idle),
+            "started": self.started,
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "timeouts": self.timeouts,
+        }
+
+
+class OffloadDispatcher:
+    """Runs small calculations inline and huge ones in an ``OffloadPool``."""
+
+    def __init__(
+        self,
+        threshold_bits: Optional[int] = OFFLOAD_BITS,
+        pool: Optional[OffloadPool] = None,
+    ):
+        """
+        Initialize the dispatcher.
+
+        Args:
+            threshold_bits: Offload calculations whose ``work_bits`` reach
+                this size, or never offload if None
+            pool: Worker pool, created on first use if not given
+        """
+        self.threshold_bits = threshold_bits
+        self._pool = pool
+        self._pool_lock = threading.Lock()
+        self.offloaded = 0
+
+    @property
+    def pool(self) -> OffloadPool:
+        """The worker pool (created on first access)."""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = OffloadPool()
+        return self._pool
+
+    def executor(self, operation: Operation) -> Callable[[Number, Number], Number]:
+        """
+        Return a function that executes ``operation``, offloading if needed.
+
+        Operations that are never offloaded get their own ``execute``, so
+        calling the result costs no more than calling the operation; the
+        others check ``work_bits`` directly, like ``execute`` does.
+        """
+        if not operation.offloadable:
+            return operation.execute
+        execute = operation.execute
+        work_bits = operation.work_bits
+
+        def run(a: Number, b: Number) -> Number:
+            threshold = self.threshold_bits
+            if threshold is None or work_bits(a, b) < threshold:
+                return execute(a, b)
+            self.offloaded += 1
+            return self.pool.run(operation, a, b)
+
+        return run
+
+    def should_offload(self, operation: Operation, a: Number, b: Number) -> bool:
+        """Check whether a calculation is expensive enough to offload."""
+        return (
+            operation.offloadable
+            and self.threshold_bits is not None
+            and operation.work_bits(a, b) >= self.threshold_bits
+        )
+
+    def execute(
+        self,
+        operation: Operation,
+        a: Number,
+        b: Number,
+        timeout: Optional[float] = None,
+    ) -> Number:
+        """
+        Execute a calculation, in a worker process if it is huge.
+
+        Inline calculations are small by definition and are not subject to
+        the timeout.
+
+        Raises:
+            ValueError: If the calculation cannot be performed
+            TimeoutError: If an offloaded calculation missed its deadline
+        """
+        if not self.should_offload(operation, a, b):
+            return operation.execute(a, b)
+        self.offloaded += 1
+        return self.pool.run(operation, a, b, timeout)
+
+    async def execute_async(
+        self,
+        operation: Operation,
+        a: Number,
+        b: Number,
+        timeout: Optional[float] = None,
+    ) -> Number:
+        """
+        Execute a calculation without blocking the event loop on huge ones.
+
+        Cancelling the awaiting task kills the worker running the
+        calculation.
+
+        Raises:
+            ValueError: If the calculation cannot be performed
+            TimeoutError: If an offloaded calculation missed its deadline
+        """
+        if not self.should_offload(operation, a, b):
+            return operation.execute(a, b)
+        self.offloaded += 1
+        cancel = threading.Event()
+        run = partial(self.pool.run, operation, a, b, timeout, cancel)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(None, run)
+        except asyncio.CancelledError:
+            cancel.set()
+            raise
+
+    def close(self) -> None:
+        """Stop the worker pool, if one was started."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return dispatcher and pool counters."""
+        metrics: Dict[str, Any] = {
+            "threshold_bits": self.threshold_bits,
+            "offloaded": self.offloaded,
+        }
+        if self._pool is not None:
+            metrics["pool"] = self._pool.metrics()
+        return metrics
+
+
+#: The process-wide dispatcher used by ``Calculation``.
+dispatcher = OffloadDispatcher()
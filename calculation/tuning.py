@@ -0,0 +1,574 @@
+"""
+Cost-model autotuning of batch execution.
+
+A group of calculations sharing one operation can be evaluated by several
+engines, and which is fastest depends on the machine, the operation, the
+operand types and the group size:
+
+- ``serial``: one ``Operation.execute`` call per item
+- ``vectorized``: one ``Operation.execute_many`` pass (the default engine
+  of ``execute_batch``)
+- ``thread``: ``execute_many`` over chunks in a thread pool
+- ``process``: ``execute_many`` over chunks in a process pool
+
+The ``Autotuner`` times each engine on this machine at two group sizes per
+operation and operand type (``int``, ``bigint`` or ``float``) and fits a
+linear cost, ``fixed + per_item * size``. Each group is then routed to the
+engine with the lowest predicted cost. With a single worker the pools
+cannot beat ``vectorized`` and are not calibrated. Calibrations are cached in a JSON
+file and reused while the machine and interpreter stay the same. Until a
+calibration is loaded, every group uses ``vectorized``, as
+``execute_batch`` does.
+
+Usage:
+    from calculation.tuning import tuner
+
+    tuner.ensure_calibrated()
+    results = tuner.execute_batch(items)
+    print(tuner.report())
+
+    python -m calculation.tuning [--recalibrate] [--cache PATH]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from operation import Operation
+
+from . import CalculationFactory, Number
+from .batch import BatchItem, BatchResult, _execute_one, execute_group
+
+STRATEGIES = ("serial", "vectorized", "thread", "process")
+DTYPES = ("int", "bigint", "float")
+
+#: Engine used when no calibration covers a group.
+DEFAULT_STRATEGY = "vectorized"
+
+#: Engines are considered in this order, and one replaces an earlier choice
+#: only when predicted to be ``MARGIN`` cheaper, so that timing noise does
+#: not flip groups between engines of equal cost.
+_PREFERENCE = (DEFAULT_STRATEGY,) + tuple(
+    strategy for strategy in STRATEGIES if strategy != DEFAULT_STRATEGY
+)
+MARGIN = 0.1
+
+#: Integers outside the int64 range make a group ``bigint``.
+INT_MIN = -(1 << 63)
+INT_MAX = (1 << 63) - 1
+
+#: Operands per side inspected to classify a group.
+SAMPLE = 16
+
+#: Width of the integers used to calibrate ``bigint`` groups.
+BIGINT_BITS = 1 << 12
+
+#: Incremented when the cache format or the calibration method changes.
+CACHE_VERSION = 1
+
+#: Largest group size considered when reporting thresholds.
+MAX_REPORTED_SIZE = 1 << 24
+
+Cost = Tuple[float, float]
+
+
+def default_cache_path() -> str:
+    """Return the calibration cache file under the user's cache directory."""
+    root = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(root, "calculator", "autotune.json")
+
+
+def fingerprint(workers: int) -> Dict[str, Any]:
+    """Describe what a calibration depends on; a change invalidates it."""
+    return {
+        "version": CACHE_VERSION,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "workers": workers,
+    }
+
+
+def operand_dtype(left: Sequence[Number], right: Sequence[Number]) -> str:
+    """
+    Classify a group's operands as ``int``, ``bigint`` or ``float``.
+
+    Only up to ``SAMPLE`` evenly spaced operands per side are looked at, so
+    that classifying costs nothing next to evaluating the group. A group
+    misclassified from its sample still gets correct results, on an engine
+    that may not be the fastest for it.
+    """
+    step = len(left) // SAMPLE + 1
+    sample = [*left[::step], *right[::step]]
+    types = set(map(type, sample))
+    if int in types:
+        ints = sample if len(types) == 1 else [v for v in sample if type(v) is int]
+        if max(ints) > INT_MAX or min(ints) < INT_MIN:
+            return "bigint"
+    return "float" if float in types else "int"
+
+
+def sample_operands(
+    operation: Operation, dtype: str, size: int, seed: int = 0
+) -> Tuple[List[Number], List[Number]]:
+    """Generate calibration operands of one type that the operation accepts."""
+    generator = random.Random(seed)
+    if dtype == "float":
+        left = [generator.uniform(-1e6, 1e6) for _ in range(size)]
+        right = [generator.uniform(1.0, 1e3) for _ in range(size)]
+    elif dtype == "bigint":
+        left = [generator.getrandbits(BIGINT_BITS) | 1 for _ in range(size)]
+        right = [generator.getrandbits(BIGINT_BITS - 16) | 1 for _ in range(size)]
+    else:
+        left = [generator.randrange(-(1 << 31), 1 << 31) for _ in range(size)]
+        right = [generator.randrange(1, 1 << 16) for _ in range(size)]
+    if operation.name == "power":
+        right = [generator.randrange(2, 8) for _ in range(size)]
+        if dtype == "float":
+            left = [abs(value) for value in left]
+    return left, right
+
+
+def _chunks(values: Sequence[Number], count: int) -> List[Sequence[Number]]:
+    """Split ``values`` into ``count`` contiguous, nearly equal chunks."""
+    size = -(-len(values) // count)
+    return [values[i : i + size] for i in range(0, len(values), size)]
+
+
+def _execute_serial(
+    operation: Operation, left: Sequence[Number], right: Sequence[Number]
+) -> List[BatchResult]:
+    """Execute a group one item at a time."""
+    return [_execute_one(operation, a, b) for a, b in zip(left, right)]
+
+
+class Autotuner:
+    """Routes each operation group to the engine measured to be cheapest."""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        strategy: Optional[str] = None,
+        workers: Optional[int] = None,
+    ):
+        """
+        Initialize the tuner; pools are started on first use.
+
+        Args:
+            path: Calibration cache file (defaults to ``default_cache_path()``)
+            strategy: Engine to use for every group instead of the cost model
+            workers: Threads or processes per pool (defaults to the number
+                of CPUs)
+        """
+        self.path = path or default_cache_path()
+        self.workers = workers or os.cpu_count() or 1
+        self.strategy = strategy
+        self.costs = {}
+        self.routed = {name: 0 for name in STRATEGIES}
+        self._pools: Dict[str, Executor] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def strategy(self) -> Optional[str]:
+        """Engine forced for every group, or None to use the cost model."""
+        return self._strategy
+
+    @strategy.setter
+    def strategy(self, value: Optional[str]) -> None:
+        self._strategy = _check_strategy(value)
+        self._routes: Dict[Tuple[Operation, str, int], str] = {}
+
+    @property
+    def costs(self) -> Dict[str, Cost]:
+        """Fitted ``(fixed, per_item)`` seconds by operation, type and engine."""
+        return self._costs
+
+    @costs.setter
+    def costs(self, value: Dict[str, Cost]) -> None:
+        self._costs = value
+        self._routes = {}
+
+    @property
+    def calibrated(self) -> bool:
+        """Whether a calibration has been measured or loaded."""
+        return bool(self.costs)
+
+    def _pool(self, strategy: str) -> Executor:
+        """The thread or process pool (created on first use)."""
+        pool = self._pools.get(strategy)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(strategy)
+                if pool is None:
+                    if strategy == "thread":
+                        pool = ThreadPoolExecutor(self.workers)
+                    else:
+                        pool = ProcessPoolExecutor(
+                            self.workers, multiprocessing.get_context("spawn")
+                        )
+                    self._pools[strategy] = pool
+        return pool
+
+    def _engine(self, strategy: str) -> Callable[..., List[BatchResult]]:
+        """Return the function that runs a group with ``strategy``."""
+        if strategy == "serial":
+            return _execute_serial
+        if strategy == "vectorized":
+            return execute_group
+        return self._execute_pooled if strategy == "thread" else self._execute_process
+
+    def _execute_pooled(
+        self,
+        operation: Operation,
+        left: Sequence[Number],
+        right: Sequence[Number],
+        strategy: str = "thread",
+    ) -> List[BatchResult]:
+        """Execute a group as one ``execute_group`` call per worker."""
+        count = min(self.workers, len(left))
+        if count <= 1:
+            return execute_group(operation, left, right)
+        chunks = self._pool(strategy).map(
+            execute_group,
+            [operation] * count,
+            _chunks(left, count),
+            _chunks(right, count),
+        )
+        return [result for chunk in chunks for result in chunk]
+
+    def _execute_process(
+        self, operation: Operation, left: Sequence[Number], right: Sequence[Number]
+    ) -> List[BatchResult]:
+        """Execute a group across the process pool."""
+        if not left:
+            return []
+        return self._execute_pooled(operation, left, right, "process")
+
+    def choose(self, operation: Operation, dtype: str, size: int) -> str:
+        """
+        Pick the engine for a group.
+
+        Sizes are rounded down to a power of two and choices are memoized,
+        so routing a group costs a dictionary lookup.
+
+        Args:
+            operation: Operation shared by the group
+            dtype: Operand type, from ``operand_dtype``
+            size: Number of items in the group
+
+        Returns:
+            The override if one is set, else the engine with the lowest
+            predicted cost, else ``DEFAULT_STRATEGY``
+        """
+        if self._strategy is not None:
+            return self._strategy
+        route = (operation, dtype, size.bit_length())
+        best = self._routes.get(route)
+        if best is not None:
+            return best
+        size = 1 << size.bit_length() >> 1
+        best = DEFAULT_STRATEGY
+        best_cost = None
+        for strategy in _PREFERENCE:
+            cost = self._costs.get(_key(operation.name, dtype, strategy))
+            if cost is None:
+                continue
+            predicted = cost[0] + cost[1] * size
+            if best_cost is None or predicted < best_cost * (1 - MARGIN):
+                best, best_cost = strategy, predicted
+        self._routes[route] = best
+        return best
+
+    def execute_group(
+        self,
+        operation: Operation,
+        left: Sequence[Number],
+        right: Sequence[Number],
+        strategy: Optional[str] = None,
+    ) -> List[BatchResult]:
+        """
+        Execute one operation over pairs of operands with the cheapest engine.
+
+        Args:
+            operation: Operation shared by every pair
+            left: First operands
+            right: Second operands, one per first operand
+            strategy: Engine to use for this group only
+
+        Returns:
+            The result, or the ``ValueError`` raised, for each pair
+        """
+        if strategy is not None:
+            _check_strategy(strategy)
+        elif self._strategy is not None:
+            strategy = self._strategy
+        elif self._costs:
+            strategy = self.choose(operation, operand_dtype(left, right), len(left))
+        else:
+            strategy = DEFAULT_STRATEGY
+        self.routed[strategy] += 1
+        return self._engine(strategy)(operation, left, right)
+
+    def execute_batch(
+        self, items: Sequence[BatchItem], strategy: Optional[str] = None
+    ) -> List[BatchResult]:
+        """
+        Execute many calculations, grouped by operation; see ``execute_batch``.
+
+        Args:
+            items: ``(a, b, operation_type)`` tuples
+            strategy: Engine to use for every group of this batch
+
+        Returns:
+            One entry per item, in input order: the result or ``ValueError``
+        """
+        results: List[BatchResult] = [None] * len(items)
+        groups: Dict[Operation, List[int]] = {}
+        for index, (_, _, operation_type) in enumerate(items):
+            try:
+                operation = CalculationFactory.get_operation(operation_type)
+            except ValueError as e:
+                results[index] = e
+                continue
+            groups.setdefault(operation, []).append(index)
+
+        for operation, indices in groups.items():
+            left = [items[i][0] for i in indices]
+            right = [items[i][1] for i in indices]
+            values = self.execute_group(operation, left, right, strategy)
+            for index, value in zip(indices, values):
+                results[index] = value
+        return results
+
+    def calibrate(
+        self,
+        operations: Optional[Sequence[str]] = None,
+        sizes: Tuple[int, int] = (64, 4096),
+        repeat: int = 3,
+        strategies: Optional[Sequence[str]] = None,
+    ) -> Dict[str, Cost]:
+        """
+        Measure every engine and fit its cost for each operation and type.
+
+        Each engine runs ``repeat`` times at both sizes; the fastest run at
+        each size gives the two points of the fitted line. Pools are started
+        before timing, so their start-up cost is not counted.
+
+        Args:
+            operations: Operation names or symbols (defaults to all)
+            sizes: Small and large group sizes to time
+            repeat: Runs per engine and size
+            strategies: Engines to measure (defaults to every engine, or
+                ``serial`` and ``vectorized`` with a single worker)
+
+        Returns:
+            The fitted costs, also stored in ``costs``
+        """
+        small, large = sizes
+        if not 0 < small < large:
+            raise ValueError("Calibration sizes must satisfy 0 < small < large")
+        if strategies is None:
+            strategies = STRATEGIES if self.workers > 1 else STRATEGIES[:2]
+        for strategy in strategies:
+            _check_strategy(strategy)
+        if operations is None:
+            operations = CalculationFactory.valid_operations()
+        selected = list(
+            dict.fromkeys(CalculationFactory.get_operation(op) for op in operations)
+        )
+        warm = CalculationFactory.get_operation("+")
+        for strategy in strategies:
+            self._engine(strategy)(warm, [1] * self.workers, [2] * self.workers)
+
+        costs: Dict[str, Cost] = {}
+        for operation in selected:
+            for dtype in DTYPES:
+                left, right = sample_operands(operation, dtype, large)
+                for strategy in strategies:
+                    engine = self._engine(strategy)
+                    timings = []
+                    for size in sizes:
+                        a, b = left[:size], right[:size]
+                        best = float("inf")
+                        for _ in range(repeat):
+                            started = time.perf_counter()
+                            engine(operation, a, b)
+                            best = min(best, time.perf_counter() - started)
+                        timings.append(best)
+                    per_item = max((timings[1] - timings[0]) / (large - small), 0.0)
+                    fixed = max(timings[0] - per_item * small, 0.0)
+                    costs[_key(operation.name, dtype, strategy)] = (fixed, per_item)
+        self.costs = costs
+        return costs
+
+    def load(self) -> bool:
+        """
+        Load the cached calibration.
+
+        Returns:
+            False if there is no cache, it cannot be read, or it was measured
+            on a different machine, interpreter or worker count
+        """
+        try:
+            with open(self.path) as file:
+                data = json.load(file)
+            if data.get("fingerprint") != fingerprint(self.workers):
+                return False
+            costs = {key: (float(f), float(p)) for key, (f, p) in data["costs"].items()}
+        except (OSError, ValueError, TypeError, KeyError, AttributeError):
+            return False
+        self.costs = costs
+        return True
+
+    def save(self) -> None:
+        """Write the calibration to the cache file."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        data = {"fingerprint": fingerprint(self.workers), "costs": self.costs}
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(data, file, indent=1, sort_keys=True)
+        os.replace(temporary, self.path)
+
+    def ensure_calibrated(self, recalibrate: bool = False, **options: Any) -> bool:
+        """
+        Load the cached calibration, or measure and cache a new one.
+
+        Args:
+            recalibrate: Measure even if a valid cache exists
+            options: Passed to ``calibrate``
+
+        Returns:
+            True if the calibration came from the cache
+        """
+        if not recalibrate and self.load():
+            return True
+        self.calibrate(**options)
+        self.save()
+        return False
+
+    def thresholds(self, operation: Operation, dtype: str) -> List[Tuple[int, str]]:
+        """
+        Group sizes at which the chosen engine changes.
+
+        Sizes are powers of two up to ``MAX_REPORTED_SIZE``.
+
+        Returns:
+            ``(size, strategy)`` pairs: ``strategy`` is chosen from ``size``
+            up to the next pair's size
+        """
+        changes: List[Tuple[int, str]] = []
+        size = 1
+        while size <= MAX_REPORTED_SIZE:
+            strategy = self.choose(operation, dtype, size)
+            if not changes or changes[-1][1] != strategy:
+                changes.append((size, strategy))
+            size *= 2
+        return changes
+
+    def report(self) -> Dict[str, Any]:
+        """Return the calibration state and the thresholds it implies."""
+        operations = dict.fromkeys(
+            CalculationFactory.get_operation(op)
+            for op in CalculationFactory.valid_operations()
+        )
+        return {
+            "calibrated": self.calibrated,
+            "override": self._strategy,
+            "cache": self.path,
+            "fingerprint": fingerprint(self.workers),
+            "thresholds": {
+                operation.name: {
+                    dtype: self.thresholds(operation, dtype) for dtype in DTYPES
+                }
+                for operation in operations
+            },
+            "routed": dict(self.routed),
+        }
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return routing counters."""
+        return {
+            "calibrated": self.calibrated,
+            "override": self._strategy,
+            "routed": dict(self.routed),
+        }
+
+    def close(self) -> None:
+        """Shut down the thread and process pools, if started."""
+        with self._lock:
+            pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            pool.shutdown()
+
+
+def _key(operation: str, dtype: str, strategy: str) -> str:
+    """Key of a fitted cost in ``Autotuner.costs`` and the cache file."""
+    return f"{operation}/{dtype}/{strategy}"
+
+
+def _check_strategy(strategy: Optional[str]) -> Optional[str]:
+    """Validate an engine name."""
+    if strategy is not None and strategy not in STRATEGIES:
+        raise ValueError(
+            f"Unknown strategy: {strategy}. Valid strategies are: {list(STRATEGIES)}"
+        )
+    return strategy
+
+
+def format_report(report: Dict[str, Any]) -> List[str]:
+    """Format ``Autotuner.report()`` as lines of text."""
+    state = "calibrated" if report["calibrated"] else "not calibrated"
+    lines = [f"Autotuner: {state} (cache: {report['cache']})"]
+    if report["override"]:
+        lines.append(f"Override: every group uses {report['override']}")
+    for name, dtypes in report["thresholds"].items():
+        for dtype, changes in dtypes.items():
+            ranges = ", ".join(f"{strategy} from {size}" for size, strategy in changes)
+            lines.append(f"  {name:<10} {dtype:<7} {ranges}")
+    return lines
+
+
+#: The process-wide tuner used by the calculation service's batch lane.
+tuner = Autotuner()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Calibrate (or load the cached calibration) and print the thresholds."""
+    parser = argparse.ArgumentParser(
+        description="Measure batch engines and show the chosen thresholds"
+    )
+    parser.add_argument("--cache", metavar="PATH", help="calibration cache file")
+    parser.add_argument(
+        "--recalibrate", action="store_true", help="ignore the cached calibration"
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="print the raw report")
+    args = parser.parse_args(argv)
+
+    autotuner = Autotuner(args.cache)
+    try:
+        cached = autotuner.ensure_calibrated(args.recalibrate, repeat=args.repeat)
+        report = autotuner.report()
+    finally:
+        autotuner.close()
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print("\n".join(format_report(report)))
+    print("Loaded from cache." if cached else "Measured and cached.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,892 @@
-"""Calculator package"""
+"""
+Calculator package.
 
-from .core import add
+This module provides the interactive REPL interface (``Calculator``), the
+calculation history (``CalculatorHistory``) and input validation
+(``InputValidator``). The fast functional API (``evaluate`` and the bare
+arithmetic helpers) lives in ``calculator.core``.
 
-__all__ = ["add"]
+Usage:
+    python -m calculator
+"""
+
+import argparse
+import codecs
+import itertools
+import sys
+import tracemalloc
+from typing import Iterable, Iterator, List, Optional, TextIO, Tuple, Union
+
+from calculation import Calculation, CalculationFactory
+from memory import PRIORITY_HISTORY, budget, format_size, parse_size
+from operation import powmod
+from tracing import span, tracer
+
+from sketch import ResultSketch
+
+from .core import add, evaluate
+from .feed import HistoryFeed
+
+Number = Union[int, float]
+
+#: Numbers with a smaller magnitude are covered by ``ENTRY_OVERHEAD``.
+_WORD = 1 << 62
+
+__all__ = [
+    "Calculator",
+    "CalculatorHistory",
+    "InputValidator",
+    "add",
+    "evaluate",
+    "main",
+]
+
+
+class CalculatorHistory:
+    """Keeps track of executed calculations in the order they were performed.
+
+    The history is charged to the process-wide memory ``budget``; when the
+    budget is exceeded the oldest calculations are evicted (after caches).
+    Appends and clears are published to the history's ``feed``, if one has
+    been opened; evictions are not.
+    """
+
+    #: Estimated bytes held per calculation, including operands and a result
+    #: of machine-word size: the ``Calculation`` and its attribute dict, the
+    #: timestamp and the list slot (checked against ``tracemalloc`` in the
+    #: tests). Larger integers add their own size.
+    ENTRY_OVERHEAD = 256
+
+    #: Bytes accumulated before they are charged to the budget, so the
+    #: budget's lock is taken once per batch of calculations.
+    CHARGE_BATCH = 16 << 10
+
+    def __init__(self):
+        """Initialize an empty history."""
+        self._calculations: List[Calculation] = []
+        self._account = budget.account(
+            "history", PRIORITY_HISTORY, self._shrink, batch=self.CHARGE_BATCH
+        )
+        self.evicted = 0
+        self._feed: Optional[HistoryFeed] = None
+
+    @property
+    def feed(self) -> HistoryFeed:
+        """Change feed of the history (created on first access)."""
+        if self._feed is None:
+            self._feed = HistoryFeed()
+        return self._feed
+
+    @classmethod
+    def entry_size(cls, calculation: Calculation) -> int:
+        """Estimate the bytes a recorded calculation holds."""
+        a, b, result = calculation.a, calculation.b, calculation._result
+        if abs(a) < _WORD and abs(b) < _WORD and abs(result) < _WORD:
+            return cls.ENTRY_OVERHEAD
+        return cls.ENTRY_OVERHEAD + sum(
+            sys.getsizeof(value) for value in (a, b, result) if not abs(value) < _WORD
+        )
+
+    def add_calculation(self, calculation: Calculation) -> None:
+        """
+        Add a calculation to the history.
+
+        Args:
+            calculation: Executed calculation to record
+        """
+        if tracer.recording:
+            with span("history"):
+                self._calculations.append(calculation)
+        else:
+            self._calculations.append(calculation)
+        self._account.charge(self.entry_size(calculation))
+        if self._feed is not None:
+            self._feed.publish(calculation)
+
+    def _shrink(self, size: int) -> int:
+        """Evict the oldest calculations until ``size`` bytes are freed."""
+        self._account.flush()
+        calculations = self._calculations
+        freed = count = 0
+        while freed < size and count < len(calculations):
+            freed += self.entry_size(calculations[count])
+            count += 1
+        del calculations[:count]
+        self._account.release(freed)
+        self.evicted += count
+        return freed
+
+    def memory_usage(self) -> int:
+        """Return the estimated bytes held by the history."""
+        return self._account.bytes + self._account.pending
+
+    def get_history(self) -> List[Calculation]:
+        """Return a copy of all calculations in the history."""
+        return list(self._calculations)
+
+    def iter_range(self, start: int, stop: int) -> Iterator[Calculation]:
+        """
+        Iterate over a slice of the history without copying it.
+
+        Args:
+            start: Index of the first calculation (inclusive)
+            stop: Index of the last calculation (exclusive)
+
+        Returns:
+            Iterator over the calculations in ``[start, stop)``
+        """
+        calculations = self._calculations
+        stop = min(stop, len(calculations))
+        for index in range(max(start, 0), stop):
+            yield calculations[index]
+
+    def sketch(self) -> ResultSketch:
+        """Return a sketch of every calculation's result and expression."""
+        sketch = ResultSketch()
+        sketch.add_calculations(list(self._calculations))
+        return sketch
+
+    def get_last_calculation(self) -> Optional[Calculation]:
+        """Return the most recent calculation, or None if history is empty."""
+        if not self._calculations:
+            return None
+        return self._calculations[-1]
+
+    def clear_history(self) -> int:
+        """
+        Remove all calculations from the history.
+
+        Returns:
+            Number of calculations that were removed
+        """
+        count = len(self._calculations)
+        self._calculations.clear()
+        self._account.flush()
+        self._account.release(self._account.bytes)
+        if self._feed is not None:
+            self._feed.publish_clear()
+        return count
+
+    def __len__(self) -> int:
+        """Number of calculations in the history."""
+        return len(self._calculations)
+
+
+class InputValidator:
+    """Validates and converts raw user input."""
+
+    @staticmethod
+    def validate_number(value: str) -> Number:
+        """
+        Convert a string to a number.
+
+        Args:
+            value: Raw user input
+
+        Returns:
+            An int when the input is integral, otherwise a float
+
+        Raises:
+            ValueError: If the input is not a valid number
+        """
+        text = value.strip()
+        try:
+            return int(text)
+        except ValueError:
+            pass
+        try:
+            return float(text)
+        except ValueError:
+            raise ValueError(f"Invalid number: '{value}'") from None
+
+    def validate_operation(self, operation: str) -> str:
+        """
+        Check that an operation is registered with ``CalculationFactory``.
+
+        Args:
+            operation: Operation name or symbol
+
+        Returns:
+            The normalized operation string
+
+        Raises:
+            ValueError: If the operation is not supported
+        """
+        normalized = operation.lower().strip()
+        valid_operations = CalculationFactory.valid_operations()
+        if normalized not in valid_operations:
+            raise ValueError(
+                f"Invalid operation: '{operation}'. "
+                f"Valid operations are: {', '.join(valid_operations)}"
+            )
+        return normalized
+
+
+class Calculator:
+    """Interactive calculator with a read-eval-print loop."""
+
+    PROMPT = "Calculator> "
+
+    #: Default number of entries shown per ``history`` page.
+    HISTORY_PAGE_SIZE = 20
+
+    #: Number of formatted lines joined into a single write.
+    WRITE_CHUNK_LINES = 512
+
+    #: Bytes read from the input stream at a time in pipe mode.
+    READ_BLOCK_SIZE = 1 << 16
+
+    #: Error handling modes supported by pipe mode.
+    ERROR_MODES = ("stderr", "inline", "skip")
+
+    FORMAT_HINT = "number operator number (e.g., 5 + 3)"
+
+    def __init__(self, output: Optional[TextIO] = None, history=None):
+        """
+        Initialize the calculator.
+
+        Args:
+            output: Stream used for bulk output such as ``history``.
+                Defaults to the current ``sys.stdout``.
+            history: History store, e.g. a ``SharedMemoryHistory`` shared
+                with other processes. Defaults to a new ``CalculatorHistory``.
+        """
+        self.history = history if history is not None else CalculatorHistory()
+        self.validator = InputValidator()
+        self.running = False
+        self.output = output
+
+    def start(self) -> None:
+        """Run the read-eval-print loop until the user exits."""
+        self.running = True
+        self._show_welcome()
+
+        while self.running:
+            try:
+                user_input = input(self.PROMPT).strip()
+            except (EOFError, KeyboardInterrupt):
+                print()
+                self._exit()
+                break
+
+            if not user_input:
+                continue
+
+            self._handle_input(user_input)
+
+    def _handle_input(self, user_input: str) -> None:
+        """Dispatch a line of input to a command or a calculation."""
+        command, _, args = user_input.partition(" ")
+        command = command.lower()
+
+        if command == "help":
+            self._show_help()
+        elif command == "history":
+            self._show_history(args)
+        elif command == "clear":
+            self._clear_history()
+        elif command == "trace":
+            self._trace(args)
+        elif command == "memory":
+            self._memory(args)
+        elif command == "snapshot":
+            self._snapshot(args)
+        elif command == "stats":
+            self._stats()
+        elif command in ("exit", "quit"):
+            self._exit()
+        elif command in CalculationFactory.valid_reductions():
+            try:
+                print(f"Result: {self._reduce(user_input.split())}")
+            except (ValueError, ArithmeticError) as e:
+                print(f"Error: {e}")
+        elif command == "powmod":
+            try:
+                print(f"Result: {self._powmod(user_input.split())}")
+            except (ValueError, ArithmeticError) as e:
+                print(f"Error: {e}")
+        else:
+            self._handle_calculation(user_input)
+
+    def _handle_calculation(self, user_input: str) -> None:
+        """
+        Parse, execute and record a calculation such as ``5 + 3``.
+
+        Errors are reported to the user and never recorded in history.
+        """
+        parts = user_input.split()
+        if len(parts) != 3:
+            print("Error: Invalid input format.")
+            print(f"Please use format: {self.FORMAT_HINT}")
+            return
+
+        try:
+            calculation = self._evaluate(parts)
+        except (ValueError, ArithmeticError) as e:
+            print(f"Error: {e}")
+            return
+
+        print(f"Result: {calculation}")
+
+    def _evaluate(self, parts: List[str]) -> Calculation:
+        """
+        Validate, execute and record a calculation from its three tokens.
+
+        Args:
+            parts: ``[number, operator, number]`` tokens
+
+        Returns:
+            The executed calculation, already added to history
+
+        Raises:
+            ValueError: If an operand or the operation is invalid, or the
+                operation cannot be performed
+        """
+        if tracer.enabled:
+            scope = tracer.start("calculation")
+            if scope is not None:
+                return self._evaluate_traced(parts, scope)
+
+        a = self.validator.validate_number(parts[0])
+        operation = self.validator.validate_operation(parts[1])
+        b = self.validator.validate_number(parts[2])
+
+        calculation = CalculationFactory.create_calculation(a, b, operation)
+        calculation.execute()
+        self.history.add_calculation(calculation)
+        return calculation
+
+    def _evaluate_traced(self, parts: List[str], scope) -> Calculation:
+        """``_evaluate`` inside a sampled trace ``scope``, with a parse span."""
+        with scope as trace:
+            trace.set_attribute("input", " ".join(parts))
+            with span("parse"):
+                a = self.validator.validate_number(parts[0])
+                operation = self.validator.validate_operation(parts[1])
+                b = self.validator.validate_number(parts[2])
+
+            calculation = CalculationFactory.create_calculation(a, b, operation)
+            calculation.execute()
+            self.history.add_calculation(calculation)
+            return calculation
+
+    def _reduce(self, parts: List[str]) -> str:
+        """
+        Evaluate a reduction such as ``sum 1 2 3``.
+
+        Reductions are not recorded in history, which holds binary
+        calculations only.
+
+        Args:
+            parts: Reduction name followed by the numbers to reduce
+
+        Returns:
+            The formatted result, e.g. ``sum of 3 values = 6``
+
+        Raises:
+            ValueError: If a number is invalid or the reduction is undefined
+        """
+        reduction = CalculationFactory.get_reduction(parts[0])
+        values = [self.validator.validate_number(part) for part in parts[1:]]
+        result = reduction.reduce(values)
+        noun = "value" if len(values) == 1 else "values"
+        return f"{reduction.name} of {len(values)} {noun} = {result}"
+
+    def _powmod(self, parts: List[str]) -> str:
+        """
+        Evaluate modular exponentiation such as ``powmod 4 13 497``.
+
+        Like reductions, the result is not recorded in history.
+
+        Args:
+            parts: ``powmod`` followed by the base, exponent and modulus
+
+        Returns:
+            The formatted result, e.g. ``4 ^ 13 mod 497 = 445``
+
+        Raises:
+            ValueError: If the operands are not three integers, the modulus
+                is zero or a negative exponent has no inverse
+        """
+        if len(parts) != 4:
+            raise ValueError("Please use format: powmod base exponent modulus")
+        base, exponent, modulus = (
+            self.validator.validate_number(part) for part in parts[1:]
+        )
+        result = powmod(base, exponent, modulus)
+        return f"{base} ^ {exponent} mod {modulus} = {result}"
+
+    def run_pipe(
+        self,
+        stream: TextIO,
+        errors: str = "stderr",
+        error_stream: Optional[TextIO] = None,
+    ) -> int:
+        """
+        Evaluate newline-separated calculations without prompts or banners.
+
+        Input is read in large blocks and results are written through a
+        single buffered writer, one ``a op b = result`` line per calculation.
+
+        Args:
+            stream: Input stream (binary or text), e.g. ``sys.stdin``
+            errors: ``"stderr"`` reports errors on ``error_stream``,
+                ``"inline"`` writes them in place of the result and
+                ``"skip"`` drops them silently
+            error_stream: Destination for ``"stderr"`` errors.
+                Defaults to the current ``sys.stderr``.
+
+        Returns:
+            Number of lines that failed to evaluate
+        """
+        if errors not in self.ERROR_MODES:
+            raise ValueError(
+                f"Invalid error mode: '{errors}'. "
+                f"Valid modes are: {', '.join(self.ERROR_MODES)}"
+            )
+        if error_stream is None:
+            error_stream = sys.stderr
+
+        self.running = True
+        failures: List[str] = []
+        count = 0
+        reductions = CalculationFactory.valid_reductions()
+
+        def results() -> Iterator[str]:
+            nonlocal count
+            for line_number, line in enumerate(self._read_lines(stream), 1):
+                parts = line.split()
+                if not parts or parts[0].startswith("#"):
+                    continue
+                command = parts[0].lower()
+                if len(parts) == 1 and command in ("exit", "quit"):
+                    self.running = False
+                    return
+                if len(parts) == 1 and command == "clear":
+                    self.history.clear_history()
+                    continue
+                try:
+                    if command == "history":
+                        yield from self._history_lines(line.strip().partition(" ")[2])
+                        continue
+                    if command in reductions:
+                        yield f"{self._reduce(parts)}\n"
+                        continue
+                    if command == "powmod":
+                        yield f"{self._powmod(parts)}\n"
+                        continue
+                    if len(parts) != 3:
+                        raise ValueError(
+                            f"Invalid input format. Please use format: {self.FORMAT_HINT}"
+                        )
+                    yield f"{self._evaluate(parts)}\n"
+                except (ValueError, ArithmeticError) as e:
+                    count += 1
+                    if errors == "inline":
+                        yield f"Error: {e}\n"
+                    elif errors == "stderr":
+                        failures.append(f"line {line_number}: Error: {e}\n")
+                        if len(failures) >= self.WRITE_CHUNK_LINES:
+                            error_stream.write("".join(failures))
+                            failures.clear()
+
+        try:
+            self._write_lines(results())
+        finally:
+            if failures:
+                error_stream.write("".join(failures))
+            error_stream.flush()
+            self.running = False
+        return count
+
+    def _read_lines(self, stream: TextIO) -> Iterator[str]:
+        """Yield lines from a stream read in ``READ_BLOCK_SIZE`` blocks."""
+        raw = getattr(stream, "buffer", stream)
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        pending = ""
+        while True:
+            block = raw.read(self.READ_BLOCK_SIZE)
+            if not block:
+                break
+            if isinstance(block, bytes):
+                block = decoder.decode(block)
+            lines = (pending + block).split("\n")
+            pending = lines.pop()
+            yield from lines
+        pending += decoder.decode(b"", final=True)
+        if pending:
+            yield pending
+
+    def _show_history(self, args: str = "") -> None:
+        """
+        Show calculation history one page at a time.
+
+        Supported options are ``--page N``, ``--size K`` and ``--tail [K]``.
+        Only the requested slice of the history is formatted, and lines are
+        written in chunks rather than one ``print`` per entry.
+        """
+        try:
+            lines = self._history_lines(args)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+        self._write_lines(lines)
+
+    def _history_lines(self, args: str = "") -> Iterator[str]:
+        """
+        Build the lines of a ``history`` page lazily.
+
+        Raises:
+            ValueError: If the options are invalid or the page is out of range
+        """
+        page, size, tail = self._parse_history_args(args)
+
+        total = len(self.history)
+        if total == 0:
+            return iter(["No calculations in history.\n"])
+
+        pages = (total + size - 1) // size
+        if tail is not None:
+            start, stop = max(total - tail, 0), total
+        else:
+            if page > pages:
+                raise ValueError(f"Page {page} out of range (1-{pages}).")
+            start = (page - 1) * size
+            stop = min(start + size, total)
+
+        header = [f"Calculation History ({total} entries):\n", f"{'=' * 40}\n"]
+        lines = (
+            f"{index:2d}. [{calc.timestamp.strftime('%H:%M:%S')}] {calc}\n"
+            for index, calc in enumerate(
+                self.history.iter_range(start, stop), start + 1
+            )
+        )
+        footer = []
+        if tail is None and pages > 1:
+            footer.append(
+                f"Page {page} of {pages} "
+                "(use 'history --page N --size K' or 'history --tail' to navigate)\n"
+            )
+        return itertools.chain(header, lines, footer)
+
+    def _parse_history_args(self, args: str) -> Tuple[int, int, Optional[int]]:
+        """
+        Parse ``history`` options.
+
+        Returns:
+            Tuple of (page, page size, tail count or None)
+
+        Raises:
+            ValueError: If an option is unknown or its value is invalid
+        """
+        page, size, tail = 1, self.HISTORY_PAGE_SIZE, None
+        tokens = args.split()
+        index = 0
+        while index < len(tokens):
+            option = tokens[index]
+            value = tokens[index + 1] if index + 1 < len(tokens) else None
+            if option == "--tail":
+                if value is not None and value.isdigit():
+                    tail = self._positive_int(option, value)
+                    index += 1
+                else:
+                    tail = -1
+            elif option in ("--page", "--size"):
+                if value is None:
+                    raise ValueError(f"Option {option} requires a value")
+                if option == "--page":
+                    page = self._positive_int(option, value)
+                else:
+                    size = self._positive_int(option, value)
+                index += 1
+            else:
+                raise ValueError(f"Unknown history option: '{option}'")
+            index += 1
+
+        if tail == -1:
+            tail = size
+        return page, size, tail
+
+    @staticmethod
+    def _positive_int(option: str, value: str) -> int:
+        """Convert an option value to a positive integer."""
+        try:
+            number = int(value)
+        except ValueError:
+            number = 0
+        if number < 1:
+            raise ValueError(
+                f"Option {option} expects a positive integer, got '{value}'"
+            )
+        return number
+
+    def _write_lines(self, lines: Iterable[str]) -> None:
+        """Write pre-formatted lines to the output stream in large blocks."""
+        stream = self.output if self.output is not None else sys.stdout
+        buffer: List[str] = []
+        for line in lines:
+            buffer.append(line)
+            if len(buffer) >= self.WRITE_CHUNK_LINES:
+                stream.write("".join(buffer))
+                buffer.clear()
+        if buffer:
+            stream.write("".join(buffer))
+        stream.flush()
+
+    def _trace(self, args: str = "") -> None:
+        """
+        Handle ``trace last|on [RATE]|off|export FILE``.
+
+        Tracing is process-wide; see the ``tracing`` package.
+        """
+        action, _, argument = args.strip().partition(" ")
+        argument = argument.strip()
+        try:
+            if action in ("", "last"):
+                last = tracer.last()
+                if last is None:
+                    print("No traces recorded. Use 'trace on' to enable tracing.")
+                    return
+                self._write_lines(f"{line}\n" for line in last.format())
+            elif action == "on":
+                tracer.configure(sample_rate=float(argument) if argument else 1.0)
+                print(f"Tracing enabled (sample rate {tracer.sample_rate:g}).")
+            elif action == "off":
+                tracer.configure(sample_rate=0.0)
+                print("Tracing disabled.")
+            elif action == "export" and argument:
+                count = tracer.export(argument)
+                print(f"Exported {count} trace(s) to {argument}.")
+            else:
+                raise ValueError(
+                    "Usage: trace last | trace on [RATE] | trace off | trace export FILE"
+                )
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+
+    def _memory(self, args: str = "") -> None:
+        """
+        Handle ``memory [report]|budget SIZE|budget off|trace on|trace off``.
+
+        The budget is process-wide; see the ``memory`` package.
+        """
+        action, _, argument = args.strip().partition(" ")
+        argument = argument.strip().lower()
+        try:
+            if action in ("", "report"):
+                self._write_lines(f"{line}\n" for line in self._memory_report())
+            elif action == "budget" and argument == "off":
+                budget.set_limit(None)
+                print("Memory budget removed.")
+            elif action == "budget" and argument:
+                budget.set_limit(parse_size(argument))
+                print(f"Memory budget set to {format_size(budget.limit)}.")
+            elif action == "trace" and argument == "on":
+                tracemalloc.start()
+                print("Allocation tracing enabled.")
+            elif action == "trace" and argument == "off":
+                tracemalloc.stop()
+                print("Allocation tracing disabled.")
+            else:
+                raise ValueError(
+                    "Usage: memory | memory budget SIZE|off | memory trace on|off"
+                )
+        except ValueError as e:
+            print(f"Error: {e}")
+
+    def _stats(self) -> None:
+        """
+        Show result quantiles and distinct expressions of the history.
+
+        The history is streamed through a ``ResultSketch``, so this holds
+        the sketch rather than a sorted copy of every result.
+        """
+        if hasattr(self.history, "sketch"):
+            sketch = self.history.sketch()
+        else:
+            sketch = ResultSketch()
+            sketch.add_calculations(self.history.iter_range(0, len(self.history)))
+        summary = sketch.summary()
+        lines = [
+            f"Calculations: {summary['count']} "
+            f"({summary['distinct']} distinct expressions, estimated)"
+        ]
+        if "p50" in summary:
+            quantiles = ", ".join(
+                f"{key} {summary[key]:g}" for key in summary if key[0] == "p"
+            )
+            lines.append(
+                f"Results: min {summary['min']:g}, {quantiles}, "
+                f"max {summary['max']:g}"
+            )
+        self._write_lines(f"{line}\n" for line in lines)
+
+    def _memory_report(self) -> List[str]:
+        """Format ``budget.report()`` for the ``memory`` command."""
+        report = budget.report(top=5)
+        limit = report["limit"]
+        lines = [
+            f"Accounted memory: {format_size(report['used'])}"
+            + (f" of {format_size(limit)} budget" if limit else " (no budget)")
+        ]
+        for name, size in report["components"].items():
+            lines.append(f"  {name:<24} {format_size(size):>12}")
+        if report["evictions"]:
+            lines.append(
+                f"Evictions: {report['evictions']} "
+                f"({format_size(report['evicted_bytes'])} freed)"
+            )
+        traced = report.get("traced")
+        if traced is None:
+            lines.append("Allocation tracing is off ('memory trace on' to enable).")
+            return lines
+        lines.append(
+            f"Traced allocations: {format_size(traced['current'])} "
+            f"(peak {format_size(traced['peak'])})"
+        )
+        for site in traced["top"]:
+            lines.append(f"  {site['file']:<48} {format_size(site['bytes']):>12}")
+        return lines
+
+    def _snapshot(self, args: str = "") -> None:
+        """
+        Handle ``snapshot save FILE [--compress]`` and ``snapshot load FILE``.
+
+        Loading replaces the current history with the snapshot's; see
+        ``calculator.snapshot``.
+        """
+        from calculator.snapshot import SnapshotHistory, save_snapshot
+
+        parts = args.split()
+        action = parts[0] if parts else ""
+        options = parts[2:]
+        try:
+            if action == "save" and len(parts) >= 2 and options in ([], ["--compress"]):
+                count = save_snapshot(self.history, parts[1], compress=bool(options))
+                print(f"Saved {count} calculation(s) to {parts[1]}.")
+            elif action == "load" and len(parts) == 2:
+                self.history = SnapshotHistory(parts[1])
+                print(f"Loaded {len(self.history)} calculation(s) from {parts[1]}.")
+            else:
+                raise ValueError(
+                    "Usage: snapshot save FILE [--compress] | snapshot load FILE"
+                )
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+
+    def _clear_history(self) -> None:
+        """Clear the calculation history."""
+        count = self.history.clear_history()
+        print(f"Cleared {count} calculation(s) from history.")
+
+    def _exit(self) -> None:
+        """Stop the read-eval-print loop."""
+        self.running = False
+        print("Thank you for using the calculator. Goodbye!")
+
+    def _show_welcome(self) -> None:
+        """Print the welcome banner."""
+        print("=" * 40)
+        print("Welcome to the Professional Calculator!")
+        print("=" * 40)
+        print("Type 'help' for available commands.")
+        print()
+
+    def _show_help(self) -> None:
+        """Print usage information."""
+        print("""
+Available commands:
+  <number> <operator> <number>   Perform a calculation (e.g., 5 + 3)
+  sum|product|mean|min|max N...  Reduce many numbers (e.g., sum 1 2 3)
+  powmod B E M                   Compute B ^ E mod M (e.g., powmod 4 13 497)
+  history                        Show the first page of calculation history
+  history --page N --size K      Show page N of history, K entries per page
+  history --tail [K]             Show the last K calculations
+  clear                          Clear calculation history
+  trace last                     Show the stages of the last traced calculation
+  trace on [RATE] | trace off    Sample RATE (default 1) of calculations
+  trace export FILE              Write recent traces to FILE as OTLP/JSON
+  snapshot save FILE [--compress]
+                                 Save history in a columnar binary file
+  snapshot load FILE             Replace history with a saved snapshot
+  stats                          Show result percentiles and distinct count
+  memory                         Show memory held by history and caches
+  memory budget SIZE|off         Evict above SIZE bytes (e.g., 64M)
+  memory trace on|off            Measure allocations with tracemalloc
+  help                           Show this help message
+  exit                           Exit the calculator
+
+Supported operators: + - * / ^ % // (or add, subtract, multiply, divide,
+power, modulo, floordiv)
+""")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Run the calculator.
+
+    When standard input is not a terminal (e.g. ``cat exprs.txt | python -m
+    calculator``) the calculator runs in non-interactive pipe mode, otherwise
+    the interactive REPL is started.
+
+    ``python -m calculator loadtest ...`` runs the load generator in
+    ``calculator.loadtest`` instead, and ``python -m calculator batch ...``
+    the checkpointed file evaluator in ``calculator.batchjob``.
+
+    Args:
+        argv: Command line arguments (defaults to ``sys.argv[1:]``)
+
+    Returns:
+        Process exit status
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] == "loadtest":
+        from calculator.loadtest import main as loadtest_main
+
+        return loadtest_main(argv[1:])
+    if argv and argv[0] == "batch":
+        from calculator.batchjob import main as batch_main
+
+        return batch_main(argv[1:])
+
+    parser = argparse.ArgumentParser(
+        prog="calculator", description="Professional calculator."
+    )
+    parser.add_argument(
+        "--errors",
+        choices=Calculator.ERROR_MODES,
+        default="stderr",
+        help="how pipe mode reports invalid lines (default: stderr)",
+    )
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--pipe", action="store_true", help="force non-interactive pipe mode"
+    )
+    mode.add_argument(
+        "--interactive", action="store_true", help="force the interactive REPL"
+    )
+    parser.add_argument(
+        "--trace-sample",
+        type=float,
+        metavar="RATE",
+        help="fraction of calculations to trace, 0 to 1 (default: 0)",
+    )
+    args = parser.parse_args(argv)
+    if args.trace_sample is not None:
+        try:
+            tracer.configure(sample_rate=args.trace_sample)
+        except ValueError as e:
+            parser.error(str(e))
+
+    calculator = Calculator()
+    if args.pipe or (not args.interactive and not sys.stdin.isatty()):
+        failures = calculator.run_pipe(sys.stdin, errors=args.errors)
+        return 1 if failures and args.errors != "skip" else 0
+
+    calculator.start()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,13 @@
+"""
+Entry point for ``python -m calculator``.
+
+Starts the interactive REPL, or the non-interactive pipe mode when standard
+input is not a terminal.
+"""
+
+import sys
+
+from calculator import main
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,446 @@
+"""
+Checkpointed batch evaluation of JSON-lines files.
+
+Each input line is one calculation, ``{"a": 5, "b": 3, "operation": "+"}``,
+or a batch of them, ``{"items": [{"a": ..., "b": ..., "operation": ...}]}``
+(the capture format of ``calculator.loadtest``). Every calculation produces
+one output line, in input order, in the format of ``service.router``:
+``{"a": 5, "b": 3, "operation": "+", "result": 8}``, with ``error`` in place
+of ``result`` if it failed. A line that is not a calculation produces
+``{"line": 7, "error": ...}``; blank lines and ``#`` comments produce
+nothing.
+
+Lines are evaluated in chunks with ``execute_batch``. Every ``interval``
+seconds, after a chunk, the job makes its output durable and then
+atomically replaces a checkpoint file holding the input byte offset, the
+number of lines done, the output byte offset and the running aggregates
+(totals, and a ``sketch.ResultSketch`` of result quantiles and distinct
+expressions).
+A job that dies at any point is resumed from its last checkpoint: output
+written after the checkpoint is truncated away and the input is re-read
+from the checkpointed offset, so the final output is byte-identical to an
+uninterrupted run. The checkpoint is removed when the job completes.
+
+Usage:
+    python -m calculator batch requests.jsonl results.jsonl
+    python -m calculator batch requests.jsonl results.jsonl --resume
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Union
+
+from calculation import CalculationFactory
+from calculation.batch import BatchItem, execute_batch
+from sketch import ResultSketch
+
+Number = Union[int, float]
+
+CHECKPOINT_VERSION = 2
+
+
+class Aggregates:
+    """Running totals over every result of a job."""
+
+    def __init__(self):
+        self.lines = 0
+        self.calculations = 0
+        self.errors = 0
+        self.operations: Dict[str, int] = {}
+        self.total: Number = 0
+        self.minimum: Optional[Number] = None
+        self.maximum: Optional[Number] = None
+        #: Result quantiles and distinct expressions.
+        self.sketch = ResultSketch()
+
+    def add(self, operation: str, result: Any) -> None:
+        """Count one calculation's result or error."""
+        self.calculations += 1
+        if isinstance(result, Exception):
+            self.errors += 1
+            return
+        name = CalculationFactory.get_operation(operation).name
+        self.operations[name] = self.operations.get(name, 0) + 1
+        try:
+            self.total += result
+        except OverflowError:
+            # An integer beyond the float range met a float: the float sum
+            # overflows, so saturate to an infinity as float addition would.
+            self.total = _saturate(self.total) + _saturate(result)
+        if self.minimum is None or result < self.minimum:
+            self.minimum = result
+        if self.maximum is None or result > self.maximum:
+            self.maximum = result
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the totals in checkpoint form (numbers packed exactly)."""
+        return {
+            "lines": self.lines,
+            "calculations": self.calculations,
+            "errors": self.errors,
+            "operations": dict(self.operations),
+            "total": pack_number(self.total),
+            "minimum": pack_number(self.minimum),
+            "maximum": pack_number(self.maximum),
+            "sketch": self.sketch.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Aggregates":
+        """Rebuild totals saved by ``to_dict``."""
+        aggregates = cls()
+        aggregates.lines = int(data["lines"])
+        aggregates.calculations = int(data["calculations"])
+        aggregates.errors = int(data["errors"])
+        aggregates.operations = {k: int(v) for k, v in data["operations"].items()}
+        aggregates.total = unpack_number(data["total"])
+        aggregates.minimum = unpack_number(data["minimum"])
+        aggregates.maximum = unpack_number(data["maximum"])
+        aggregates.sketch = ResultSketch.from_dict(data["sketch"])
+        return aggregates
+
+    def summary(self) -> Dict[str, Any]:
+        """Return the totals as a JSON-ready report."""
+        report = self.to_dict()
+        for field in ("total", "minimum", "maximum"):
+            report[field] = _json_number(getattr(self, field))
+        del report["sketch"]
+        sketched = self.sketch.summary()
+        report["distinct"] = sketched["distinct"]
+        report["quantiles"] = {
+            key: value for key, value in sketched.items() if key[0] == "p"
+        }
+        return report
+
+
+def _saturate(value: Number) -> float:
+    """A number as a float, with integers beyond the float range as infinities."""
+    try:
+        return float(value)
+    except OverflowError:
+        return math.inf if value > 0 else -math.inf
+
+
+def pack_number(value: Optional[Number]) -> Optional[str]:
+    """
+    Encode a number as an exact string.
+
+    Integers are written in hexadecimal, which has no length limit, and
+    floats with ``float.hex`` so that infinities and every bit survive.
+    """
+    if value is None:
+        return None
+    if isinstance(value, float):
+        return "f" + value.hex()
+    return "i" + hex(value)
+
+
+def unpack_number(text: Optional[str]) -> Optional[Number]:
+    """Decode a number written by ``pack_number``."""
+    if text is None:
+        return None
+    if text[0] == "f":
+        return float.fromhex(text[1:])
+    if text[0] == "i":
+        return int(text[1:], 16)
+    raise ValueError(f"Invalid packed number: {text!r}")
+
+
+def _json_number(value: Optional[Number]) -> Any:
+    """A number as JSON can hold it; huge integers become strings."""
+    try:
+        json.dumps(value)
+    except ValueError:
+        return pack_number(value)
+    return value
+
+
+class BatchJob:
+    """A resumable evaluation of one input file into one output file."""
+
+    def __init__(
+        self,
+        input_path: str,
+        output_path: str,
+        checkpoint_path: Optional[str] = None,
+        chunk: int = 4096,
+        interval: float = 5.0,
+    ):
+        """
+        Initialize the job.
+
+        Args:
+            input_path: JSON-lines file of calculations
+            output_path: File the results are written to
+            checkpoint_path: Checkpoint file (defaults to the output path
+                with ``.checkpoint`` appended)
+            chunk: Lines evaluated together
+            interval: Minimum seconds between checkpoints; 0 checkpoints
+                after every chunk
+        """
+        if chunk < 1:
+            raise ValueError("Chunk size must be at least 1")
+        self.input_path = input_path
+        self.output_path = output_path
+        self.checkpoint_path = checkpoint_path or output_path + ".checkpoint"
+        self.chunk = chunk
+        self.interval = interval
+        self.aggregates = Aggregates()
+        self.checkpoints = 0
+        #: Whether the last ``run`` continued from a checkpoint.
+        self.resumed = False
+
+    def run(self, resume: bool = False) -> Aggregates:
+        """
+        Evaluate the input, from the start or from the last checkpoint.
+
+        Args:
+            resume: Continue from the checkpoint if there is one (without
+                it the output is rewritten from the start)
+
+        Returns:
+            The aggregates over the whole input
+
+        Raises:
+            ValueError: If the checkpoint is unreadable or no longer matches
+                the input or output files
+        """
+        stat = os.stat(self.input_path)
+        identity = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        state = self._load(identity) if resume else None
+        self.resumed = state is not None
+        if state is None:
+            state = {"input_offset": 0, "output_offset": 0}
+            self.aggregates = Aggregates()
+            self._remove_checkpoint()
+        with open(self.input_path, "rb") as source, open(
+            self.output_path, "r+b" if self.resumed else "wb"
+        ) as output:
+            source.seek(state["input_offset"])
+            # Drop whatever was written after the checkpoint.
+            output.truncate(state["output_offset"])
+            output.seek(state["output_offset"])
+            self._evaluate(source, output, identity)
+        self._remove_checkpoint()
+        return self.aggregates
+
+    def _remove_checkpoint(self) -> None:
+        """Delete the checkpoint file, if any."""
+        try:
+            os.remove(self.checkpoint_path)
+        except FileNotFoundError:
+            pass
+
+    def _evaluate(self, source: Any, output: Any, identity: Dict[str, int]) -> None:
+        """Evaluate chunks until the input ends, checkpointing as configured."""
+        checkpointed = time.monotonic()
+        while True:
+            lines = []
+            for _ in range(self.chunk):
+                line = source.readline()
+                if not line:
+                    break
+                lines.append(line)
+            if not lines:
+                break
+            output.write(self._process(lines))
+            if time.monotonic() - checkpointed >= self.interval:
+                self._save(source.tell(), output, identity)
+                checkpointed = time.monotonic()
+        output.flush()
+
+    def _process(self, lines: List[bytes]) -> bytes:
+        """Evaluate a chunk of input lines and return their output lines."""
+        aggregates = self.aggregates
+        # Per output line: the index of its calculation, or an error record.
+        order: List[Union[int, Dict[str, Any]]] = []
+        items: List[BatchItem] = []
+        for line in lines:
+            aggregates.lines += 1
+            text = line.strip()
+            if not text or text.startswith(b"#"):
+                continue
+            try:
+                calculations = parse_line(text)
+            except ValueError as e:
+                order.append({"line": aggregates.lines, "error": str(e)})
+                continue
+            order.extend(range(len(items), len(items) + len(calculations)))
+            items.extend(calculations)
+        results = execute_batch(items)
+        aggregates.sketch.add_batch(items, results)
+
+        encoded = []
+        for entry in order:
+            if isinstance(entry, dict):
+                encoded.append(_dump(entry))
+                continue
+            (a, b, operation), result = items[entry], results[entry]
+            aggregates.add(operation, result)
+            record: Dict[str, Any] = {"a": a, "b": b, "operation": operation}
+            if isinstance(result, Exception):
+                record["error"] = str(result)
+            else:
+                record["result"] = result
+            encoded.append(_dump(record))
+        return b"".join(encoded)
+
+    def _save(self, input_offset: int, output: Any, identity: Dict[str, int]) -> None:
+        """Make the output durable, then atomically replace the checkpoint."""
+        output.flush()
+        os.fsync(output.fileno())
+        data = {
+            "version": CHECKPOINT_VERSION,
+            "input": os.path.abspath(self.input_path),
+            "identity": identity,
+            "input_offset": input_offset,
+            "output_offset": output.tell(),
+            "aggregates": self.aggregates.to_dict(),
+        }
+        temporary = f"{self.checkpoint_path}.{os.getpid()}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(data, file, sort_keys=True)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.checkpoint_path)
+        self.checkpoints += 1
+
+    def _load(self, identity: Dict[str, int]) -> Optional[Dict[str, Any]]:
+        """Read the checkpoint and restore the aggregates, if there is one."""
+        try:
+            with open(self.checkpoint_path) as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return None
+        try:
+            if data["version"] != CHECKPOINT_VERSION:
+                raise ValueError(f"unsupported version {data['version']}")
+            aggregates = Aggregates.from_dict(data["aggregates"])
+            state = {
+                "input_offset": int(data["input_offset"]),
+                "output_offset": int(data["output_offset"]),
+            }
+        except (KeyError, TypeError, AttributeError, ValueError) as e:
+            raise ValueError(
+                f"Invalid checkpoint {self.checkpoint_path}: {e}"
+            ) from None
+        if data.get("identity") != identity:
+            raise ValueError(
+                f"{self.input_path} has changed since it was checkpointed; "
+                "run without --resume to start over"
+            )
+        try:
+            written = os.path.getsize(self.output_path)
+        except OSError:
+            written = -1
+        if written < state["output_offset"]:
+            raise ValueError(
+                f"{self.output_path} is shorter than its checkpoint; "
+                "run without --resume to start over"
+            )
+        self.aggregates = aggregates
+        return state
+
+
+def parse_line(text: bytes) -> List[BatchItem]:
+    """
+    Parse one input line into its calculations.
+
+    Raises:
+        ValueError: If the line is not a calculation or batch of them
+    """
+    try:
+        payload = json.loads(text)
+    except ValueError:
+        raise ValueError("Invalid JSON") from None
+    if not isinstance(payload, dict):
+        raise ValueError("Expected a JSON object")
+    try:
+        if "items" in payload:
+            calculations = [_item(item) for item in payload["items"]]
+        else:
+            calculations = [_item(payload)]
+    except (KeyError, TypeError):
+        raise ValueError("Expected 'a', 'b' and 'operation' fields") from None
+    return calculations
+
+
+def _item(payload: Dict[str, Any]) -> BatchItem:
+    """Extract and validate one calculation."""
+    a, b, operation = payload["a"], payload["b"], payload["operation"]
+    for value in (a, b):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise TypeError("operands must be numbers")
+    if not isinstance(operation, str):
+        raise TypeError("operation must be a string")
+    return a, b, operation
+
+
+def _dump(record: Dict[str, Any]) -> bytes:
+    """Serialize one output line."""
+    try:
+        text = json.dumps(record)
+    except ValueError:
+        # Integers past the decimal conversion limit.
+        record = {key: record[key] for key in ("a", "b", "operation")}
+        record["error"] = "Result is too large to encode"
+        text = json.dumps(record)
+    return text.encode() + b"\n"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run ``python -m calculator batch``."""
+    parser = argparse.ArgumentParser(
+        prog="calculator batch",
+        description="Evaluate a JSON-lines file of calculations with checkpoints.",
+    )
+    parser.add_argument("input", help="JSON-lines file of calculations")
+    parser.add_argument("output", help="JSON-lines file of results")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue from the last checkpoint instead of starting over",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        metavar="PATH",
+        help="checkpoint file (default: OUTPUT.checkpoint)",
+    )
+    parser.add_argument(
+        "--checkpoint-interval",
+        type=float,
+        default=5.0,
+        metavar="SECONDS",
+        help="minimum seconds between checkpoints (default: 5)",
+    )
+    parser.add_argument(
+        "--chunk", type=int, default=4096, help="lines evaluated together"
+    )
+    parser.add_argument(
+        "--sketch",
+        metavar="PATH",
+        help="also write the result sketch here, for merging with other shards",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        job = BatchJob(
+            args.input,
+            args.output,
+            args.checkpoint,
+            chunk=args.chunk,
+            interval=args.checkpoint_interval,
+        )
+        aggregates = job.run(resume=args.resume)
+        if args.sketch:
+            with open(args.sketch, "w") as file:
+                json.dump(aggregates.sketch.to_dict(), file)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    print(json.dumps(aggregates.summary(), indent=2))
+    return 0
@@ -1,17 +1,60 @@
-def add(a, b):
-    """Return the sum of a and b."""
-    return a + b
-
-def subtract(a, b):
-    """Return the difference of a and b."""
-    return a - b
-
-def multiply(a, b):
-    """Return the product of a and b."""
-    return a * b
-
-def divide(a, b):
-    """Return the quotient of a and b. Raises ValueError on division by zero."""
-    if b == 0:
-        raise ValueError("Cannot divide by zero.")
-    return a / b
+"""
+Fast functional arithmetic.
+
+``evaluate(operation, a, b)`` computes a single calculation without creating
+a ``Calculation``, reading the clock or recording history. Operation names
+are dispatched through a table precomputed by ``CalculationFactory`` when
+operations are registered, so results and errors are exactly those of the
+``Operation`` classes, and huge integer work is still offloaded (see
+``calculation.offload``).
+
+The bare helpers below are the same executors, bound to one operation.
+
+Usage:
+    from calculator import evaluate
+
+    evaluate("+", 5, 3)  # 8
+    evaluate("divide", 1, 0)  # ValueError: Division by zero is not allowed
+"""
+
+from typing import Union
+
+from calculation import CalculationFactory
+
+Number = Union[int, float]
+
+#: Executors by exact operation name, symbol or alias (shared, kept current
+#: by ``CalculationFactory.register_operation``).
+_executors = CalculationFactory._executors
+
+
+def evaluate(operation: str, a: Number, b: Number) -> Number:
+    """
+    Execute one calculation without allocating a ``Calculation``.
+
+    Args:
+        operation: Operation name, symbol or alias (e.g. 'add' or '+'),
+            looked up case-insensitively like ``CalculationFactory``
+        a: First operand
+        b: Second operand
+
+    Returns:
+        Result of the operation
+
+    Raises:
+        ValueError: If the operation is unsupported or cannot be performed
+    """
+    execute = _executors.get(operation)
+    if execute is None:
+        execute = CalculationFactory.get_executor(operation)
+    return execute(a, b)
+
+
+# The executors themselves, so calls cost no more than the operation.
+add = _executors["add"]
+subtract = _executors["subtract"]
+multiply = _executors["multiply"]
+divide = _executors["divide"]
+power = _executors["power"]
+modulo = _executors["modulo"]
+floor_divide = _executors["floordiv"]
@@ -0,0 +1,333 @@
+"""
+Change feed of a calculation history.
+
+Observers that want every calculation as it is recorded subscribe to the
+history's ``feed`` instead of polling ``get_history()``, which copies the
+whole history each time. Each append publishes one compact
+``HistoryEvent``, and clearing the history publishes a ``clear`` event.
+Every event carries a sequence number. The feed keeps the most recent
+``retain`` events, so a subscriber that reconnects can resume after the
+last sequence number it saw. A history creates its feed the first time
+``feed`` is accessed and publishes nothing before that, so histories
+nobody watches pay nothing for it.
+
+Each subscription has its own bounded queue, so a slow subscriber never
+delays the history or the other subscribers. When a queue is full the
+subscription either drops its oldest event (``drop_oldest``; the gap shows
+in the sequence numbers) or is disconnected (``disconnect``; iteration
+raises ``FeedOverflow`` once the queued events are consumed, and the
+subscriber can resume from ``FeedOverflow.after``).
+
+Usage:
+    subscription = calculator.history.feed.subscribe()
+    async for event in subscription:
+        print(event.sequence, event.operation, event.result)
+
+Publishing is thread-safe, and subscriptions are consumed on an asyncio
+event loop, which need not be the publishing thread's.
+"""
+
+import asyncio
+import threading
+from collections import deque
+from time import time
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Union
+
+from calculation import Calculation
+
+Number = Union[int, float]
+
+#: Full queues drop their oldest event.
+DROP_OLDEST = "drop_oldest"
+
+#: Full queues end the subscription with ``FeedOverflow``.
+DISCONNECT = "disconnect"
+
+POLICIES = (DROP_OLDEST, DISCONNECT)
+
+
+class HistoryEvent(NamedTuple):
+    """One change to a history."""
+
+    #: Position in the feed, starting at 1.
+    sequence: int
+    #: ``"add"`` or ``"clear"``.
+    kind: str
+    #: Time the change was published, in seconds since the epoch.
+    timestamp: float
+    a: Optional[Number] = None
+    b: Optional[Number] = None
+    #: Canonical operation name.
+    operation: Optional[str] = None
+    result: Optional[Number] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the event as a JSON-ready dict without empty fields."""
+        return {
+            field: value
+            for field, value in zip(self._fields, self)
+            if value is not None
+        }
+
+
+class FeedOverflow(Exception):
+    """Raised to a ``disconnect`` subscriber whose queue overflowed."""
+
+    def __init__(self, after: int):
+        super().__init__(
+            f"Subscriber fell behind; resume after sequence {after} to continue"
+        )
+        #: Sequence number of the last event the subscriber received.
+        self.after = after
+
+
+class Subscription:
+    """A subscriber's bounded queue of events, consumed asynchronously."""
+
+    def __init__(
+        self,
+        feed: "HistoryFeed",
+        maxsize: int,
+        policy: str,
+        backlog: List[HistoryEvent],
+        after: int,
+    ):
+        self.feed = feed
+        self.maxsize = maxsize
+        self.policy = policy
+        self.dropped = 0
+        self.overflowed = False
+        if len(backlog) > maxsize:
+            # Deliver what fits; the policy then applies as if the rest had
+            # been published into the full queue.
+            if policy == DROP_OLDEST:
+                self.dropped = len(backlog) - maxsize
+                backlog = backlog[-maxsize:]
+            else:
+                self.overflowed = True
+                backlog = backlog[:maxsize]
+        self._events: Deque[HistoryEvent] = deque(backlog)
+        self._batch: Deque[HistoryEvent] = deque()
+        self.closed = False
+        #: Sequence number of the last event returned to the subscriber.
+        self.after = after
+        self._waiter: Optional[asyncio.Future] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread = 0
+
+    def _wake(self) -> None:
+        """Resume the waiting consumer (lock held)."""
+        waiter, self._waiter = self._waiter, None
+        if waiter is None:
+            return
+        if threading.get_ident() == self._thread:
+            if not waiter.done():
+                waiter.set_result(None)
+        else:
+            self._loop.call_soon_threadsafe(_resolve, waiter)
+
+    def poll(self) -> List[HistoryEvent]:
+        """Return every queued event without waiting."""
+        with self.feed._lock:
+            events = list(self._events)
+            self._events.clear()
+        if events:
+            self.after = events[-1].sequence
+        return events
+
+    async def get_batch(self) -> List[HistoryEvent]:
+        """
+        Wait for events and return every queued one.
+
+        Returns:
+            At least one event, or an empty list once the subscription is
+            closed and drained
+
+        Raises:
+            FeedOverflow: If a ``disconnect`` subscription overflowed and
+                its queued events have been consumed
+        """
+        lock = self.feed._lock
+        while True:
+            with lock:
+                if self._events:
+                    events = list(self._events)
+                    self._events.clear()
+                    self.after = events[-1].sequence
+                    return events
+                if self.overflowed:
+                    raise FeedOverflow(self.after)
+                if self.closed:
+                    return []
+                self._loop = asyncio.get_running_loop()
+                self._thread = threading.get_ident()
+                waiter = self._waiter = self._loop.create_future()
+            try:
+                await waiter
+            finally:
+                with lock:
+                    if self._waiter is waiter:
+                        self._waiter = None
+
+    def __aiter__(self) -> "Subscription":
+        return self
+
+    async def __anext__(self) -> HistoryEvent:
+        if not self._batch:
+            self._batch.extend(await self.get_batch())
+            if not self._batch:
+                raise StopAsyncIteration
+        return self._batch.popleft()
+
+    def __len__(self) -> int:
+        """Number of queued events."""
+        return len(self._events)
+
+    def close(self) -> None:
+        """Unsubscribe; iteration ends after the queued events."""
+        with self.feed._lock:
+            if not self.closed:
+                self.closed = True
+                if self in self.feed._subscribers:
+                    self.feed._subscribers.remove(self)
+                self._wake()
+
+
+def _resolve(waiter: asyncio.Future) -> None:
+    """Complete a waiter on its own loop."""
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class HistoryFeed:
+    """Publishes a history's changes to bounded per-subscriber queues."""
+
+    def __init__(
+        self, retain: int = 4096, maxsize: int = 1024, policy: str = DROP_OLDEST
+    ):
+        """
+        Initialize the feed.
+
+        Args:
+            retain: Recent events kept for subscribers that resume
+            maxsize: Default queue length of a subscription
+            policy: Default overflow policy, ``drop_oldest`` or ``disconnect``
+        """
+        self.retain = retain
+        self.maxsize = maxsize
+        self.policy = _check_policy(policy)
+        self._recent: Deque[HistoryEvent] = deque(maxlen=retain)
+        self._subscribers: List[Subscription] = []
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self.published = 0
+
+    @property
+    def sequence(self) -> int:
+        """Sequence number of the last published event (0 before any)."""
+        return self._sequence
+
+    def publish(self, calculation: Calculation) -> None:
+        """Publish the recording of an executed calculation."""
+        self._publish(
+            "add",
+            calculation.a,
+            calculation.b,
+            calculation.operation.name,
+            calculation._result,
+        )
+
+    def publish_clear(self) -> None:
+        """Publish the clearing of the history."""
+        self._publish("clear")
+
+    def _publish(self, kind: str, *fields: Any) -> None:
+        """Number an event, retain it and queue it for every subscriber."""
+        with self._lock:
+            self._sequence += 1
+            event = HistoryEvent(self._sequence, kind, time(), *fields)
+            self._recent.append(event)
+            self.published += 1
+            overflowed = []
+            for subscription in self._subscribers:
+                events = subscription._events
+                if len(events) < subscription.maxsize:
+                    events.append(event)
+                    if subscription._waiter is not None:
+                        subscription._wake()
+                elif subscription.policy == DROP_OLDEST:
+                    events.popleft()
+                    events.append(event)
+                    subscription.dropped += 1
+                else:
+                    subscription.overflowed = True
+                    overflowed.append(subscription)
+            for subscription in overflowed:
+                self._subscribers.remove(subscription)
+
+    def subscribe(
+        self,
+        after: Optional[int] = None,
+        maxsize: Optional[int] = None,
+        policy: Optional[str] = None,
+    ) -> Subscription:
+        """
+        Start receiving events.
+
+        Args:
+            after: Resume after this sequence number, replaying the retained
+                events that followed it; None receives only new events
+            maxsize: Queue length (defaults to the feed's)
+            policy: Overflow policy (defaults to the feed's)
+
+        Raises:
+            ValueError: If ``after`` is in the future, or events after it
+                are no longer retained
+        """
+        policy = _check_policy(policy or self.policy)
+        maxsize = maxsize or self.maxsize
+        if maxsize < 1:
+            raise ValueError("Queue length must be at least 1")
+        with self._lock:
+            backlog: List[HistoryEvent] = []
+            if after is None:
+                after = self._sequence
+            elif after > self._sequence or after < 0:
+                raise ValueError(
+                    f"Sequence {after} has not been published "
+                    f"(last is {self._sequence})"
+                )
+            elif after < self._sequence:
+                oldest = self._recent[0].sequence if self._recent else 0
+                if after + 1 < oldest or not self._recent:
+                    raise ValueError(
+                        f"Events after sequence {after} are no longer retained"
+                    )
+                backlog = [e for e in self._recent if e.sequence > after]
+            subscription = Subscription(self, maxsize, policy, backlog, after)
+            if not subscription.overflowed:
+                self._subscribers.append(subscription)
+        return subscription
+
+    def __len__(self) -> int:
+        """Number of subscribers."""
+        return len(self._subscribers)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return feed counters."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        return {
+            "sequence": self._sequence,
+            "published": self.published,
+            "subscribers": len(subscribers),
+            "queued": sum(len(s) for s in subscribers),
+            "dropped": sum(s.dropped for s in subscribers),
+        }
+
+
+def _check_policy(policy: str) -> str:
+    """Validate an overflow policy."""
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown policy: {policy}. Valid policies are: {POLICIES}")
+    return policy
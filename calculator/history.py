@@ -0,0 +1,513 @@
+"""
+Calculation histories for concurrent use.
+
+``ConcurrentHistory`` is for many threads in one process; see its docstring.
+
+``SharedMemoryHistory`` keeps the history in a ``multiprocessing.shared_memory``
+segment so that every worker process sees the same history and the same
+"last calculation". It implements the ``CalculatorHistory`` interface and can
+be passed to ``Calculator(history=...)``.
+
+Layout: a 64-byte header followed by ``capacity`` fixed 128-byte records
+used as a ring buffer.
+
+* Appends take a ticket (a sequence number) from a counter in the header.
+  Python has no atomic fetch-and-add on shared memory, so the increment is
+  done under a process-shared lock; the lock is held only for the increment,
+  never while a record is written or read.
+* Each record starts with a sequence stamp. A writer stamps its slot
+  ``2 * ticket + 1`` (busy), writes the record, then stamps ``2 * ticket``
+  (committed), so several processes can write different slots at once.
+* Readers take no lock. A record belongs to ticket ``t`` only if its stamp
+  reads ``2 * t`` both before and after the record is copied; otherwise it
+  is being written or has been overwritten and is skipped.
+
+Operands and results are stored inline: 64-bit integers and floats exactly,
+integers up to 240 bits as bytes, and wider integers as their nearest float.
+"""
+
+import heapq
+import itertools
+import multiprocessing
+import struct
+import threading
+from array import array
+from datetime import datetime
+from multiprocessing import shared_memory
+from typing import Iterator, List, Optional, Tuple, Union
+
+from calculation import Calculation, CalculationFactory
+from memory import PRIORITY_HISTORY, budget
+from tracing import span, tracer
+
+from . import CalculatorHistory
+from .feed import HistoryFeed
+
+Number = Union[int, float]
+
+MAGIC = b"CHR1"
+
+#: magic, capacity, next ticket, first ticket still visible after a clear.
+HEADER = struct.Struct("<4s4xQQQ")
+HEADER_SIZE = 64
+NEXT_OFFSET = 16
+CLEARED_OFFSET = 24
+
+RECORD_SIZE = 128
+STAMP = struct.Struct("<Q")
+#: timestamp, operation code, then three 32-byte values (a, b, result).
+PAYLOAD = struct.Struct("<dB7x32s32s32s")
+
+TAG_INT64 = 1
+TAG_FLOAT64 = 2
+TAG_BIGINT = 3
+TAG_APPROX = 4
+
+INT64 = struct.Struct("<q")
+FLOAT64 = struct.Struct("<d")
+BIGINT_BYTES = 30
+
+
+def encode_value(value: Number) -> bytes:
+    """Encode an operand or result into a 32-byte value field."""
+    if isinstance(value, float):
+        return bytes([TAG_FLOAT64]) + FLOAT64.pack(value)
+    if -(2**63) <= value < 2**63:
+        return bytes([TAG_INT64]) + INT64.pack(value)
+    length = (value.bit_length() + 8) // 8
+    if length <= BIGINT_BYTES:
+        return bytes([TAG_BIGINT, length]) + value.to_bytes(
+            length, "little", signed=True
+        )
+    try:
+        approximate = float(value)
+    except OverflowError:
+        approximate = float("inf") if value > 0 else float("-inf")
+    return bytes([TAG_APPROX]) + FLOAT64.pack(approximate)
+
+
+def decode_value(field: bytes) -> Number:
+    """Decode a 32-byte value field."""
+    tag = field[0]
+    if tag == TAG_INT64:
+        return INT64.unpack_from(field, 1)[0]
+    if tag == TAG_BIGINT:
+        return int.from_bytes(field[2 : 2 + field[1]], "little", signed=True)
+    return FLOAT64.unpack_from(field, 1)[0]
+
+
+class SharedMemoryHistory:
+    """Ring buffer of calculations in shared memory, safe across processes."""
+
+    def __init__(
+        self,
+        capacity: int = 65536,
+        name: Optional[str] = None,
+        create: bool = True,
+        lock=None,
+    ):
+        """
+        Create a new shared history or attach to an existing one.
+
+        Args:
+            capacity: Number of calculations kept; older ones are overwritten
+            name: Shared memory segment name (generated when creating)
+            create: Create the segment; False attaches to ``name``
+            lock: Process-shared lock guarding the sequence counter.
+                Defaults to a new ``multiprocessing.Lock()``; pass one from
+                ``multiprocessing.get_context("spawn")`` to share the history
+                with spawned processes. The history (and its lock) can be
+                passed to ``multiprocessing`` children as an argument;
+                processes attaching by name must pass the creator's lock.
+
+        Raises:
+            ValueError: If the capacity is not positive or the segment is
+                not a history
+        """
+        if create:
+            if capacity < 1:
+                raise ValueError("History capacity must be positive")
+            self._shm = shared_memory.SharedMemory(
+                name=name, create=True, size=HEADER_SIZE + capacity * RECORD_SIZE
+            )
+            HEADER.pack_into(self._shm.buf, 0, MAGIC, capacity, 1, 1)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            magic, capacity, _, _ = HEADER.unpack_from(self._shm.buf, 0)
+            if magic != MAGIC:
+                self._shm.close()
+                raise ValueError(f"Shared memory '{name}' is not a history")
+        self.capacity = capacity
+        self._lock = lock if lock is not None else multiprocessing.Lock()
+        self._owner = create
+
+    @property
+    def name(self) -> str:
+        """Name other processes attach with."""
+        return self._shm.name
+
+    def __reduce__(self):
+        """Pickle as an attachment to the same segment (for child processes)."""
+        return (_attach, (self.name, self._lock))
+
+    def _counters(self) -> Tuple[int, int]:
+        """Return (next ticket, first visible ticket)."""
+        _, _, next_ticket, cleared = HEADER.unpack_from(self._shm.buf, 0)
+        return next_ticket, cleared
+
+    def add_calculation(self, calculation: Calculation) -> None:
+        """
+        Append an executed calculation.
+
+        Args:
+            calculation: Executed calculation to record
+        """
+        payload = PAYLOAD.pack(
+            calculation.timestamp.timestamp(),
+            calculation.operation.code,
+            encode_value(calculation.a),
+            encode_value(calculation.b),
+            encode_value(calculation.result),
+        )
+        buf = self._shm.buf
+        with self._lock:
+            ticket = STAMP.unpack_from(buf, NEXT_OFFSET)[0]
+            STAMP.pack_into(buf, NEXT_OFFSET, ticket + 1)
+        offset = HEADER_SIZE + (ticket - 1) % self.capacity * RECORD_SIZE
+        STAMP.pack_into(buf, offset, 2 * ticket + 1)
+        buf[offset + STAMP.size : offset + STAMP.size + PAYLOAD.size] = payload
+        STAMP.pack_into(buf, offset, 2 * ticket)
+
+    def _read(self, ticket: int) -> Optional[Calculation]:
+        """Read the record for ``ticket``, or None if it is not available."""
+        buf = self._shm.buf
+        offset = HEADER_SIZE + (ticket - 1) % self.capacity * RECORD_SIZE
+        stamp = 2 * ticket
+        if STAMP.unpack_from(buf, offset)[0] != stamp:
+            return None
+        payload = bytes(buf[offset + STAMP.size : offset + STAMP.size + PAYLOAD.size])
+        if STAMP.unpack_from(buf, offset)[0] != stamp:
+            return None
+        timestamp, code, a, b, result = PAYLOAD.unpack(payload)
+        calculation = Calculation(
+            decode_value(a),
+            decode_value(b),
+            CalculationFactory.get_operation_by_code(code),
+        )
+        calculation.timestamp = datetime.fromtimestamp(timestamp)
+        calculation._result = decode_value(result)
+        calculation._executed = True
+        return calculation
+
+    def _visible(self) -> Tuple[int, int]:
+        """Range ``[first, stop)`` of tickets that may still be readable."""
+        next_ticket, cleared = self._counters()
+        return max(cleared, next_ticket - self.capacity), next_ticket
+
+    def get_history(self) -> List[Calculation]:
+        """Return the committed calculations in the ring, oldest first."""
+        first, stop = self._visible()
+        return [
+            calculation
+            for calculation in map(self._read, range(first, stop))
+            if calculation is not None
+        ]
+
+    def iter_range(self, start: int, stop: int) -> Iterator[Calculation]:
+        """
+        Iterate over a slice of the history.
+
+        Args:
+            start: Index of the first calculation (inclusive)
+            stop: Index of the last calculation (exclusive)
+        """
+        return iter(self.get_history()[max(start, 0) : max(stop, 0)])
+
+    def get_last_calculation(self) -> Optional[Calculation]:
+        """Return the most recent committed calculation, or None."""
+        first, stop = self._visible()
+        for ticket in range(stop - 1, first - 1, -1):
+            calculation = self._read(ticket)
+            if calculation is not None:
+                return calculation
+        return None
+
+    def clear_history(self) -> int:
+        """
+        Hide every calculation appended so far.
+
+        Returns:
+            Number of calculations that were removed
+        """
+        buf = self._shm.buf
+        with self._lock:
+            count = len(self)
+            next_ticket = STAMP.unpack_from(buf, NEXT_OFFSET)[0]
+            STAMP.pack_into(buf, CLEARED_OFFSET, next_ticket)
+        return count
+
+    def __len__(self) -> int:
+        """Number of calculations in the ring (including ones being written)."""
+        first, stop = self._visible()
+        return stop - first
+
+    def close(self) -> None:
+        """Detach from the segment; the creator also removes it."""
+        self._shm.close()
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    def __enter__(self) -> "SharedMemoryHistory":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _attach(name: str, lock) -> SharedMemoryHistory:
+    """Unpickle helper: attach to an existing history segment."""
+    return SharedMemoryHistory(name=name, create=False, lock=lock)
+
+
+class _Buffer:
+    """One thread's appends, in order: sequence numbers and calculations."""
+
+    __slots__ = ("sequences", "calculations", "pending")
+
+    def __init__(self):
+        self.sequences = array("q")
+        self.calculations: List[Calculation] = []
+        # Bytes not yet charged to the budget; only the owning thread adds.
+        self.pending = 0
+
+
+class ConcurrentHistory:
+    """History that many threads can append to without a shared lock.
+
+    Each thread appends to its own buffer after taking a sequence number
+    from a shared counter (``itertools.count``, atomic under the GIL), so
+    appends never wait for one another. Reads merge the buffers in sequence
+    order, i.e. the order in which ``add_calculation`` was called.
+
+    A read can see a calculation appended after another one that is still
+    being recorded by a different thread. With ``strict=True`` reads return
+    only the longest gap-free run of sequence numbers, so what is read is
+    always exactly the first appends in order and the last calculation is
+    never ahead of one that is missing.
+
+    Only clearing, eviction and reads take the history's lock. Like
+    ``CalculatorHistory`` it is charged to the memory ``budget``, oldest
+    calculations first when evicting, and publishes appends and clears to
+    its ``feed`` once one is opened. Publishing takes the feed's lock, so
+    while a feed is open appends are serialized briefly.
+    """
+
+    def __init__(self, strict: bool = False):
+        """
+        Initialize an empty history.
+
+        Args:
+            strict: Hide calculations until every earlier one is recorded
+        """
+        self.strict = strict
+        self._sequence = itertools.count()
+        self._local = threading.local()
+        self._buffers: List[_Buffer] = []
+        self._lock = threading.Lock()
+        # Sequence number the history starts at: earlier ones were cleared
+        # or evicted, including appends that completed after the clear.
+        self._start = 0
+        self._account = budget.account("history", PRIORITY_HISTORY, self._shrink)
+        self.evicted = 0
+        self._feed: Optional[HistoryFeed] = None
+        self._feed_lock = threading.Lock()
+
+    @property
+    def feed(self) -> HistoryFeed:
+        """Change feed of the history (created on first access)."""
+        if self._feed is None:
+            with self._feed_lock:
+                if self._feed is None:
+                    self._feed = HistoryFeed()
+        return self._feed
+
+    def add_calculation(self, calculation: Calculation) -> None:
+        """
+        Add a calculation to the calling thread's buffer.
+
+        Args:
+            calculation: Executed calculation to record
+        """
+        try:
+            buffer = self._local.buffer
+        except AttributeError:
+            buffer = self._local.buffer = _Buffer()
+            with self._lock:
+                self._buffers.append(buffer)
+        if tracer.recording:
+            with span("history"):
+                buffer.sequences.append(next(self._sequence))
+                buffer.calculations.append(calculation)
+        else:
+            buffer.sequences.append(next(self._sequence))
+            buffer.calculations.append(calculation)
+        buffer.pending += CalculatorHistory.entry_size(calculation)
+        if buffer.pending >= CalculatorHistory.CHARGE_BATCH:
+            size, buffer.pending = buffer.pending, 0
+            self._account.charge(size)
+        if self._feed is not None:
+            self._feed.publish(calculation)
+
+    def _entries(self) -> List[Optional[Calculation]]:
+        """
+        Merge the buffers into slots indexed by sequence number.
+
+        Returns:
+            Calculations from the start of the history on, with None for
+            sequence numbers taken by appends that are still in progress
+        """
+        with self._lock:
+            first = self._start
+            parts = []
+            for buffer in self._buffers:
+                # Sequence numbers are appended first, so each recorded
+                # calculation has one.
+                count = len(buffer.calculations)
+                if count:
+                    parts.append(
+                        (buffer.sequences[:count], buffer.calculations[:count])
+                    )
+        if not parts:
+            return []
+        last = max(sequences[-1] for sequences, _ in parts)
+        slots: List[Optional[Calculation]] = [None] * max(last - first + 1, 0)
+        for sequences, calculations in parts:
+            for sequence, calculation in zip(sequences, calculations):
+                if sequence >= first:
+                    slots[sequence - first] = calculation
+        return slots
+
+    def get_history(self) -> List[Calculation]:
+        """Return a copy of all calculations in the history, in order."""
+        slots = self._entries()
+        if self.strict:
+            if None in slots:
+                del slots[slots.index(None) :]
+            return slots
+        return [calculation for calculation in slots if calculation is not None]
+
+    def iter_range(self, start: int, stop: int) -> Iterator[Calculation]:
+        """
+        Iterate over a slice of the history.
+
+        Args:
+            start: Index of the first calculation (inclusive)
+            stop: Index of the last calculation (exclusive)
+        """
+        return iter(self.get_history()[max(start, 0) : max(stop, 0)])
+
+    def _bounds(self) -> Tuple[int, bool, Optional[Calculation]]:
+        """
+        Summarize the buffers without merging them.
+
+        Returns:
+            (recorded count, whether the recorded sequence numbers are
+            exactly those from the start of the history to the last one,
+            the calculation with the last sequence number)
+        """
+        count = 0
+        last = -1
+        latest = None
+        with self._lock:
+            for buffer in self._buffers:
+                size = len(buffer.calculations)
+                if size:
+                    count += size
+                    tail = buffer.sequences[size - 1]
+                    if tail > last:
+                        last, latest = tail, buffer.calculations[size - 1]
+            complete = count == last - self._start + 1
+        return count, complete, latest
+
+    def get_last_calculation(self) -> Optional[Calculation]:
+        """Return the most recent calculation, or None if history is empty."""
+        count, complete, latest = self._bounds()
+        if not self.strict or complete or not count:
+            return latest
+        history = self.get_history()
+        return history[-1] if history else None
+
+    def _shrink(self, size: int) -> int:
+        """Evict the oldest calculations until ``size`` bytes are freed."""
+        with self._lock:
+            self._charge_pending()
+            buffers = self._buffers
+            heads = [
+                (buffer.sequences[0], index)
+                for index, buffer in enumerate(buffers)
+                if buffer.calculations
+            ]
+            heapq.heapify(heads)
+            removed = [0] * len(buffers)
+            freed = 0
+            while freed < size and heads:
+                _, index = heapq.heappop(heads)
+                buffer = buffers[index]
+                position = removed[index]
+                freed += CalculatorHistory.entry_size(buffer.calculations[position])
+                removed[index] = position = position + 1
+                if position < len(buffer.calculations):
+                    heapq.heappush(heads, (buffer.sequences[position], index))
+            for buffer, count in zip(buffers, removed):
+                if count:
+                    self._start = max(self._start, buffer.sequences[count - 1] + 1)
+                    del buffer.sequences[:count]
+                    del buffer.calculations[:count]
+            self.evicted += sum(removed)
+        self._account.release(freed)
+        return freed
+
+    def _charge_pending(self) -> None:
+        """Charge every buffer's batched bytes (called with the lock held)."""
+        pending = 0
+        for buffer in self._buffers:
+            size, buffer.pending = buffer.pending, 0
+            pending += size
+        if pending:
+            self._account.charge(pending)
+
+    def memory_usage(self) -> int:
+        """Return the estimated bytes held by the history."""
+        return self._account.bytes + sum(b.pending for b in self._buffers)
+
+    def clear_history(self) -> int:
+        """
+        Remove all calculations recorded so far.
+
+        Returns:
+            Number of calculations that were removed
+        """
+        with self._lock:
+            count = 0
+            for buffer in self._buffers:
+                size = len(buffer.calculations)
+                if size:
+                    self._start = max(self._start, buffer.sequences[size - 1] + 1)
+                del buffer.sequences[:size]
+                del buffer.calculations[:size]
+                buffer.pending = 0
+                count += size
+        self._account.release(self._account.bytes)
+        if self._feed is not None:
+            self._feed.publish_clear()
+        return count
+
+    def __len__(self) -> int:
+        """Number of calculations in the history."""
+        count, complete, _ = self._bounds()
+        if not self.strict or complete:
+            return count
+        return len(self.get_history())
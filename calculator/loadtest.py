@@ -0,0 +1,561 @@
+"""
+Load generator that replays recorded calculation traffic.
+
+Captures are replayed against the in-process engine, the HTTP service or
+the Unix-socket RPC server, entirely on the local machine.
+
+Capture formats (detected from the first non-empty line):
+
+* JSON lines, one request per line: ``{"a": 5, "b": 3, "operation": "+"}``
+  or a batch ``{"items": [{"a": ..., "b": ..., "operation": ...}, ...]}``.
+  An optional ``"t"`` field holds the recorded arrival time in seconds.
+* Recorded REPL sessions: ``5 + 3`` per line, with or without the
+  ``Calculator> `` prompt. Commands such as ``history`` are skipped.
+
+Two load models are supported:
+
+* open loop (``--rate``): requests start on a fixed schedule regardless of
+  how fast earlier ones complete; latency is measured from the scheduled
+  start, so queueing delay caused by a slow target is not hidden.
+* closed loop (``--concurrency``): a fixed number of workers each send the
+  next request as soon as the previous one completes. The corrected
+  histogram back-fills the samples a stalled worker failed to send, using
+  an expected interval between requests (coordinated-omission correction).
+
+Usage:
+    python -m calculator loadtest capture.jsonl --target engine --rate 2000
+    python -m calculator loadtest session.txt --target http://127.0.0.1:8000 \\
+        --concurrency 32 --requests 100000
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import sys
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from .core import evaluate
+
+Number = Union[int, float]
+Record = Dict[str, Any]
+
+PROMPT = "Calculator>"
+
+
+class LatencyHistogram:
+    """
+    Log-linear latency histogram with bounded relative error.
+
+    Values are recorded in microseconds. Each power-of-two range is split
+    into ``2 ** precision_bits`` linear sub-buckets, so every reported value
+    is within ``2 ** -precision_bits`` of the recorded one.
+    """
+
+    def __init__(self, precision_bits: int = 7):
+        self.precision_bits = precision_bits
+        self._sub_buckets = 1 << precision_bits
+        self.counts: Counter = Counter()
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.min = math.inf
+
+    def _index(self, micros: int) -> int:
+        """Bucket index of a value in whole microseconds."""
+        if micros < self._sub_buckets:
+            return micros
+        shift = micros.bit_length() - self.precision_bits - 1
+        return (
+            ((shift + 1) << self.precision_bits) + (micros >> shift) - self._sub_buckets
+        )
+
+    def _upper_bound(self, index: int) -> int:
+        """Largest microsecond value that falls in a bucket."""
+        if index < self._sub_buckets:
+            return index
+        shift = (index >> self.precision_bits) - 1
+        mantissa = (index & (self._sub_buckets - 1)) + self._sub_buckets
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, seconds: float, count: int = 1) -> None:
+        """Record a latency ``count`` times."""
+        micros = max(int(seconds * 1e6), 0)
+        self.counts[self._index(micros)] += count
+        self.total += count
+        self.sum += seconds * count
+        self.max = max(self.max, seconds)
+        self.min = min(self.min, seconds)
+
+    def record_corrected(self, seconds: float, expected_interval: float) -> None:
+        """
+        Record a latency, back-filling coordinated-omission samples.
+
+        When a request took longer than the expected interval between
+        requests, the requests that would have been sent meanwhile are
+        recorded too, with linearly decreasing latencies.
+        """
+        self.record(seconds)
+        if expected_interval <= 0:
+            return
+        missing = seconds - expected_interval
+        while missing >= expected_interval:
+            self.record(missing)
+            missing -= expected_interval
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        """Add another histogram's samples to this one."""
+        self.counts.update(other.counts)
+        self.total += other.total
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+        self.min = min(self.min, other.min)
+
+    def percentile(self, percent: float) -> float:
+        """Latency in seconds at ``percent`` (0-100)."""
+        if not self.total:
+            return 0.0
+        rank = max(math.ceil(percent / 100 * self.total), 1)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self._upper_bound(index) / 1e6, self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        """Percentiles, mean and max in milliseconds."""
+        if not self.total:
+            return {"count": 0}
+        summary: Dict[str, float] = {"count": self.total}
+        for label, percent in (
+            ("p50", 50),
+            ("p90", 90),
+            ("p99", 99),
+            ("p99.9", 99.9),
+        ):
+            summary[label] = self.percentile(percent) * 1e3
+        summary["mean"] = self.sum / self.total * 1e3
+        summary["min"] = self.min * 1e3
+        summary["max"] = self.max * 1e3
+        return summary
+
+    def buckets(self) -> List[List[float]]:
+        """Non-empty buckets as ``[upper bound in ms, count]`` pairs."""
+        return [
+            [self._upper_bound(index) / 1e3, self.counts[index]]
+            for index in sorted(self.counts)
+        ]
+
+
+def parse_capture(lines: Iterable[str]) -> List[Record]:
+    """
+    Parse a capture into request records.
+
+    Returns:
+        Records with either ``a``/``b``/``operation`` or ``items`` and an
+        optional recorded arrival time ``t``
+
+    Raises:
+        ValueError: If a JSON record is malformed or the capture contains no
+            replayable requests
+    """
+    records: List[Record] = []
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("{"):
+            try:
+                record = _parse_json_record(json.loads(line))
+            except ValueError as e:
+                raise ValueError(f"Capture line {number}: {e}") from None
+        else:
+            record = _parse_repl_line(line)
+        if record is not None:
+            records.append(record)
+    if not records:
+        raise ValueError("Capture contains no replayable requests")
+    return records
+
+
+def _parse_json_record(payload: Any) -> Optional[Record]:
+    """
+    Validate a JSON capture record; unrelated objects are skipped.
+
+    Raises:
+        ValueError: If a batch item lacks a field or ``t`` is not a number
+    """
+    if not isinstance(payload, dict):
+        return None
+    record: Record = {}
+    if "items" in payload:
+        try:
+            record["items"] = [
+                (item["a"], item["b"], item["operation"]) for item in payload["items"]
+            ]
+        except (KeyError, TypeError):
+            raise ValueError(
+                "Batch items need 'a', 'b' and 'operation' fields"
+            ) from None
+    elif {"a", "b", "operation"} <= payload.keys():
+        record.update(a=payload["a"], b=payload["b"], operation=payload["operation"])
+    else:
+        return None
+    if "t" in payload:
+        try:
+            record["t"] = float(payload["t"])
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid arrival time: {payload['t']!r}") from None
+    return record
+
+
+def _parse_repl_line(line: str) -> Optional[Record]:
+    """Parse ``[Calculator> ]a op b``; other REPL input is skipped."""
+    if line.startswith(PROMPT):
+        line = line[len(PROMPT) :].strip()
+    parts = line.split()
+    if len(parts) != 3:
+        return None
+    try:
+        a = _number(parts[0])
+        b = _number(parts[2])
+    except ValueError:
+        return None
+    return {"a": a, "b": b, "operation": parts[1]}
+
+
+def _number(text: str) -> Number:
+    """Convert REPL operand text to an int or float."""
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+class EngineTarget:
+    """Executes requests in-process through ``calculator.evaluate``."""
+
+    name = "engine"
+
+    async def open(self) -> None:
+        pass
+
+    async def calculate(self, a: Number, b: Number, operation: str) -> Number:
+        return evaluate(operation, a, b)
+
+    async def calculate_batch(self, items: Sequence[Tuple]) -> List[Any]:
+        from calculation.batch import execute_batch
+
+        return execute_batch(items)
+
+    async def close(self) -> None:
+        pass
+
+
+class HTTPTarget:
+    """Sends requests to the HTTP calculation service."""
+
+    def __init__(self, url: str, pool_size: int):
+        from client import AsyncCalculatorClient
+
+        self.name = url
+        self._client = AsyncCalculatorClient(url, pool_size=pool_size)
+
+    async def open(self) -> None:
+        pass
+
+    async def calculate(self, a: Number, b: Number, operation: str) -> Number:
+        return await self._client.calculate(a, b, operation)
+
+    async def calculate_batch(self, items: Sequence[Tuple]) -> List[Any]:
+        return await self._client.calculate_batch(items)
+
+    async def close(self) -> None:
+        await self._client.close()
+
+
+class SocketTarget:
+    """Sends requests to the Unix-socket RPC server."""
+
+    def __init__(self, url: str):
+        from service.rpc import RPCClient
+
+        self.name = url
+        self._client = RPCClient(url[len("unix://") :])
+
+    async def open(self) -> None:
+        await self._client.connect()
+
+    async def calculate(self, a: Number, b: Number, operation: str) -> Number:
+        return await self._client.calculate(a, b, operation)
+
+    async def calculate_batch(self, items: Sequence[Tuple]) -> List[Any]:
+        return await self._client.calculate_batch(items)
+
+    async def close(self) -> None:
+        await self._client.close()
+
+
+def make_target(spec: str, pool_size: int = 64):
+    """
+    Build a target from ``engine``, ``http://host:port`` or ``unix:///path``.
+
+    Raises:
+        ValueError: If the target is not recognised
+    """
+    if spec == "engine":
+        return EngineTarget()
+    if spec.startswith("http://"):
+        return HTTPTarget(spec, pool_size)
+    if spec.startswith("unix://"):
+        return SocketTarget(spec)
+    raise ValueError(
+        f"Invalid target: '{spec}'. Use 'engine', 'http://host:port' or "
+        "'unix:///path/to/socket'"
+    )
+
+
+class LoadTest:
+    """Replays records against a target and collects latency statistics."""
+
+    def __init__(
+        self,
+        records: Sequence[Record],
+        target: Any,
+        requests: Optional[int] = None,
+        duration: Optional[float] = None,
+        max_outstanding: int = 10000,
+    ):
+        """
+        Initialize the load test.
+
+        Args:
+            records: Parsed capture; replayed cyclically
+            target: Target returned by ``make_target``
+            requests: Number of requests to send (defaults to one pass
+                over the capture)
+            duration: Stop scheduling new requests after this many seconds
+            max_outstanding: Open loop only: cap on requests in flight
+        """
+        self.records = records
+        self.target = target
+        self.requests = requests if requests is not None else len(records)
+        self.duration = duration
+        self.max_outstanding = max_outstanding
+        self.uncorrected = LatencyHistogram()
+        self.corrected = LatencyHistogram()
+        self.errors: Counter = Counter()
+        self.completed = 0
+        self._latencies: List[float] = []
+
+    async def _send(self, record: Record) -> None:
+        """Send one record; errors are counted by exception type."""
+        try:
+            if "items" in record:
+                await self.target.calculate_batch(record["items"])
+            else:
+                await self.target.calculate(
+                    record["a"], record["b"], record["operation"]
+                )
+        except Exception as e:
+            self.errors[type(e).__name__] += 1
+        self.completed += 1
+
+    async def run_open(
+        self, rate: Optional[float] = None, speed: float = 1.0
+    ) -> Dict[str, Any]:
+        """
+        Open-loop replay at a fixed arrival rate, or at recorded times.
+
+        Args:
+            rate: Requests per second. When None, the recorded ``t`` offsets
+                are replayed, compressed by ``speed``.
+            speed: Replay speed multiplier for recorded timings
+        """
+        if rate is None and any("t" not in record for record in self.records):
+            raise ValueError("Capture has no recorded timings; pass a rate")
+        if rate is not None and rate <= 0:
+            raise ValueError("Rate must be positive")
+
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.max_outstanding)
+        tasks = set()
+        first_t = self.records[0].get("t", 0.0)
+        # Recorded timings repeat after one pass, one mean gap apart.
+        span = self.records[-1].get("t", 0.0) - first_t
+        cycle_length = span + span / max(len(self.records) - 1, 1)
+
+        async def one(record: Record, intended: float, sent: float) -> None:
+            try:
+                await self._send(record)
+                finished = loop.time()
+                # Corrected latency counts from the scheduled start, so time
+                # spent waiting behind a slow target is not omitted.
+                self.corrected.record(finished - intended)
+                self.uncorrected.record(finished - sent)
+            finally:
+                slots.release()
+
+        start = loop.time()
+        for index in range(self.requests):
+            record = self.records[index % len(self.records)]
+            if rate is not None:
+                offset = index / rate
+            else:
+                cycle = index // len(self.records)
+                offset = (record["t"] - first_t + cycle * cycle_length) / speed
+            if self.duration is not None and offset >= self.duration:
+                break
+            intended = start + offset
+            delay = intended - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await slots.acquire()
+            task = asyncio.ensure_future(one(record, intended, loop.time()))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+        return self._report("open", loop.time() - start, {"rate": rate, "speed": speed})
+
+    async def run_closed(
+        self, concurrency: int, expected_interval: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Closed-loop replay with a fixed number of concurrent workers.
+
+        Args:
+            concurrency: Number of workers
+            expected_interval: Expected time between requests of one worker,
+                used for coordinated-omission correction. Defaults to the
+                median observed latency.
+        """
+        if concurrency < 1:
+            raise ValueError("Concurrency must be positive")
+        loop = asyncio.get_running_loop()
+        counter = iter(range(self.requests))
+        start = loop.time()
+        deadline = start + self.duration if self.duration is not None else None
+
+        async def worker() -> None:
+            for index in counter:
+                if deadline is not None and loop.time() >= deadline:
+                    return
+                sent = loop.time()
+                await self._send(self.records[index % len(self.records)])
+                latency = loop.time() - sent
+                self.uncorrected.record(latency)
+                self._latencies.append(latency)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = loop.time() - start
+
+        if expected_interval is None:
+            expected_interval = self.uncorrected.percentile(50)
+        for latency in self._latencies:
+            self.corrected.record_corrected(latency, expected_interval)
+        return self._report(
+            "closed",
+            elapsed,
+            {
+                "concurrency": concurrency,
+                "expected_interval_ms": expected_interval * 1e3,
+            },
+        )
+
+    def _report(
+        self, mode: str, elapsed: float, settings: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Build the JSON report."""
+        error_count = sum(self.errors.values())
+        return {
+            "target": self.target.name,
+            "mode": mode,
+            "settings": settings,
+            "requests": self.completed,
+            "duration_s": elapsed,
+            "throughput_rps": self.completed / elapsed if elapsed > 0 else 0.0,
+            "errors": {
+                "count": error_count,
+                "rate": error_count / self.completed if self.completed else 0.0,
+                "by_type": dict(self.errors),
+            },
+            "latency_ms": {
+                "uncorrected": self.uncorrected.summary(),
+                "corrected": self.corrected.summary(),
+            },
+            "histogram_ms": {
+                "uncorrected": self.uncorrected.buckets(),
+                "corrected": self.corrected.buckets(),
+            },
+        }
+
+
+async def run_load_test(args: argparse.Namespace, records: List[Record]) -> Dict:
+    """Open the target, run the configured load model and close the target."""
+    target = make_target(args.target, pool_size=args.concurrency or 64)
+    await target.open()
+    try:
+        test = LoadTest(
+            records, target, args.requests, args.duration, args.max_outstanding
+        )
+        if args.concurrency:
+            return await test.run_closed(args.concurrency, args.expected_interval)
+        return await test.run_open(args.rate, args.speed)
+    finally:
+        await target.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run ``python -m calculator loadtest``."""
+    parser = argparse.ArgumentParser(
+        prog="calculator loadtest",
+        description="Replay recorded calculation traffic and report latency as JSON.",
+    )
+    parser.add_argument(
+        "capture", help="JSON-lines capture or recorded REPL session ('-' for stdin)"
+    )
+    parser.add_argument(
+        "--target",
+        default="engine",
+        help="'engine' (in-process), 'http://host:port' or 'unix:///path' (default: engine)",
+    )
+    model = parser.add_mutually_exclusive_group()
+    model.add_argument("--rate", type=float, help="open loop: requests per second")
+    model.add_argument("--concurrency", type=int, help="closed loop: number of workers")
+    parser.add_argument(
+        "--requests", type=int, help="requests to send (default: one pass)"
+    )
+    parser.add_argument("--duration", type=float, help="stop after this many seconds")
+    parser.add_argument(
+        "--speed", type=float, default=1.0, help="replay speed for recorded timings"
+    )
+    parser.add_argument(
+        "--expected-interval",
+        type=float,
+        help="closed loop: expected seconds between requests for correction",
+    )
+    parser.add_argument("--max-outstanding", type=int, default=10000)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.capture == "-":
+            records = parse_capture(sys.stdin)
+        else:
+            with open(args.capture, encoding="utf-8") as capture:
+                records = parse_capture(capture)
+        report = asyncio.run(run_load_test(args, records))
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            output.write(text + "\n")
+    else:
+        print(text)
+    return 0
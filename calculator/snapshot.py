@@ -0,0 +1,660 @@
+"""
+Columnar snapshots of calculation history.
+
+A snapshot stores a history as columns rather than as formatted lines, so it
+is compact, quick to write and can be queried without parsing or loading
+every row. Rows are split into blocks of ``BLOCK_ROWS``; each block of each
+column is one segment:
+
+* ``a``, ``b`` and ``result`` are typed: ``f8`` (all floats) or ``i8`` (all
+  64-bit integers) segments are the raw array, and ``mixed`` segments hold
+  a type tag per row, an 8-byte slot per row and any wider integers.
+* ``operation`` is dictionary encoded: one byte per row indexing the
+  snapshot's list of operation names.
+* ``timestamp`` is microseconds since the epoch, stored as zig-zag varint
+  deltas from the first timestamp of the block.
+
+Segments can be zlib-compressed individually (``compress=True``); segments
+that do not shrink are kept raw. The column directory is JSON, written
+after the data and located through a fixed-size trailer::
+
+    b"CSNP" version | segments... | directory | offset, length, b"CSNP"
+
+``SnapshotReader`` memory-maps the file. Raw segments are read in place
+through ``memoryview`` casts, compressed ones are inflated one block at a
+time, and filters and aggregates run block by block, so a query holds one
+block per column in memory. ``SnapshotHistory`` opens a snapshot as a
+history without materializing its rows, which is what makes importing
+large snapshots fast.
+
+Usage:
+    from calculator.snapshot import SnapshotReader, save_snapshot
+
+    save_snapshot(calculator.history, "history.snap", compress=True)
+    with SnapshotReader("history.snap") as snapshot:
+        snapshot.aggregate("sum", "result", operation="multiply")
+        snapshot.count(where=[("a", ">", 10)])
+"""
+
+import array
+import itertools
+import json
+import mmap
+import operator
+import os
+import struct
+import sys
+import zlib
+from datetime import datetime
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from calculation import Calculation, CalculationFactory
+
+from sketch import ResultSketch
+
+from . import CalculatorHistory
+from .feed import HistoryFeed
+
+Number = Union[int, float]
+Condition = Tuple[str, str, Number]
+
+MAGIC = b"CSNP"
+VERSION = 1
+HEADER = struct.Struct("<4sI")
+TRAILER = struct.Struct("<QQ4s4x")
+
+#: Rows per block; every column is split at the same row boundaries.
+BLOCK_ROWS = 65536
+
+VALUE_COLUMNS = ("a", "b", "result")
+COLUMNS = VALUE_COLUMNS + ("operation", "timestamp")
+
+TAG_INT64 = 0
+TAG_FLOAT64 = 1
+TAG_BIGINT = 2
+
+INT64 = struct.Struct("<q")
+FLOAT64 = struct.Struct("<d")
+LENGTH = struct.Struct("<I")
+
+COMPARISONS: Dict[str, Callable[[Any, Any], bool]] = {
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+    ">=": operator.ge,
+    ">": operator.gt,
+}
+
+_MICROSECONDS = 10**6
+
+
+def encode_numbers(values: Sequence[Number]) -> Tuple[str, bytes]:
+    """
+    Encode a block of operands or results.
+
+    Returns:
+        Tuple of (encoding, segment bytes)
+    """
+    types = set(map(type, values))
+    if types <= {float}:
+        return "f8", _native(array.array("d", values)).tobytes()
+    if types == {int}:
+        try:
+            return "i8", _native(array.array("q", values)).tobytes()
+        except OverflowError:
+            pass
+    tags = bytearray()
+    slots = bytearray()
+    wide = bytearray()
+    wide_count = 0
+    for value in values:
+        if isinstance(value, float):
+            tags.append(TAG_FLOAT64)
+            slots += FLOAT64.pack(value)
+        elif -(2**63) <= value < 2**63:
+            tags.append(TAG_INT64)
+            slots += INT64.pack(value)
+        else:
+            tags.append(TAG_BIGINT)
+            slots += INT64.pack(wide_count)
+            data = value.to_bytes((value.bit_length() + 8) // 8, "little", signed=True)
+            wide += LENGTH.pack(len(data)) + data
+            wide_count += 1
+    tags += bytes(-len(tags) % 8)
+    return "mixed", bytes(tags + slots + wide)
+
+
+def decode_numbers(encoding: str, segment, rows: int) -> Sequence[Number]:
+    """Decode a block of operands or results (zero-copy for typed blocks)."""
+    if encoding == "f8":
+        return _cast(segment, "d")
+    if encoding == "i8":
+        return _cast(segment, "q")
+    tags = segment[:rows]
+    slots_start = rows + (-rows % 8)
+    slots = _cast(segment[slots_start : slots_start + 8 * rows], "q")
+    floats = _cast(segment[slots_start : slots_start + 8 * rows], "d")
+    wide: List[int] = []
+    position = slots_start + 8 * rows
+    while position < len(segment):
+        (length,) = LENGTH.unpack_from(segment, position)
+        position += LENGTH.size
+        data = bytes(segment[position : position + length])
+        wide.append(int.from_bytes(data, "little", signed=True))
+        position += length
+    values: List[Number] = []
+    for index, tag in enumerate(tags):
+        if tag == TAG_FLOAT64:
+            values.append(floats[index])
+        elif tag == TAG_INT64:
+            values.append(slots[index])
+        else:
+            values.append(wide[slots[index]])
+    return values
+
+
+def encode_varints(numbers: Iterable[int]) -> bytes:
+    """Encode signed integers as zig-zag LEB128 varints."""
+    out = bytearray()
+    append = out.append
+    for number in numbers:
+        number = number << 1 if number >= 0 else ((-number) << 1) - 1
+        while number >= 0x80:
+            append((number & 0x7F) | 0x80)
+            number >>= 7
+        append(number)
+    return bytes(out)
+
+
+def decode_varints(data) -> List[int]:
+    """Decode zig-zag LEB128 varints."""
+    numbers: List[int] = []
+    append = numbers.append
+    number = shift = 0
+    for byte in bytes(data):
+        number |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        append(number >> 1 if not number & 1 else -((number + 1) >> 1))
+        number = shift = 0
+    return numbers
+
+
+def _native(values: array.array) -> array.array:
+    """Return ``values`` in little-endian byte order."""
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+def _cast(segment, typecode: str) -> Sequence[Number]:
+    """View a little-endian segment as an array of ``typecode``."""
+    if sys.byteorder == "little":
+        return memoryview(segment).cast("B").cast(typecode)
+    values = array.array(typecode, bytes(segment))
+    values.byteswap()
+    return values
+
+
+def _microseconds(timestamp: datetime) -> int:
+    """Microseconds since the epoch for a (local) timestamp."""
+    return round(timestamp.timestamp() * _MICROSECONDS)
+
+
+def _datetime(microseconds: int) -> datetime:
+    """Inverse of ``_microseconds``."""
+    seconds, micros = divmod(microseconds, _MICROSECONDS)
+    return datetime.fromtimestamp(seconds).replace(microsecond=micros)
+
+
+def _history_calculations(history) -> Iterable[Calculation]:
+    """Iterate over a history (or any iterable of calculations) in order."""
+    if hasattr(history, "iter_range"):
+        return history.iter_range(0, len(history))
+    return history
+
+
+def save_snapshot(history, path: str, compress: bool = False) -> int:
+    """
+    Write a history to a snapshot file.
+
+    Rows are encoded and written one block at a time, so memory use does
+    not grow with the history. The file is written under a temporary name
+    and renamed into place, so a snapshot that is open (even the one being
+    re-saved) is never truncated.
+
+    Args:
+        history: History (anything with ``iter_range`` and ``len``) or an
+            iterable of executed calculations
+        path: Destination file (overwritten)
+        compress: zlib-compress each segment that shrinks
+
+    Returns:
+        Number of rows written
+    """
+    operations: Dict[str, int] = {}
+    columns: Dict[str, List[List[Any]]] = {name: [] for name in COLUMNS}
+    rows = 0
+    calculations = iter(_history_calculations(history))
+    partial = f"{path}.tmp"
+    with open(partial, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION))
+
+        def write(name: str, encoding: str, segment: bytes, *extra: Any) -> None:
+            compressed = 0
+            if compress:
+                packed = zlib.compress(segment, 1)
+                if len(packed) < len(segment):
+                    segment, compressed = packed, 1
+            file.write(bytes(-file.tell() % 8))
+            columns[name].append([file.tell(), len(segment), encoding, compressed])
+            columns[name][-1].extend(extra)
+            file.write(segment)
+
+        while True:
+            block = list(itertools.islice(calculations, BLOCK_ROWS))
+            if not block:
+                break
+            rows += len(block)
+            write("a", *encode_numbers([c.a for c in block]))
+            write("b", *encode_numbers([c.b for c in block]))
+            write("result", *encode_numbers([c.result for c in block]))
+            codes = bytearray()
+            for calculation in block:
+                name = calculation.operation.name
+                code = operations.get(name)
+                if code is None:
+                    if len(operations) == 256:
+                        raise ValueError("Snapshots support at most 256 operations")
+                    code = operations[name] = len(operations)
+                codes.append(code)
+            write("operation", "u1", bytes(codes))
+            stamps = [_microseconds(c.timestamp) for c in block]
+            deltas = map(operator.sub, stamps, [stamps[0]] + stamps[:-1])
+            write("timestamp", "varint", encode_varints(deltas), stamps[0])
+
+        directory = json.dumps(
+            {
+                "version": VERSION,
+                "rows": rows,
+                "block_rows": BLOCK_ROWS,
+                "operations": list(operations),
+                "columns": columns,
+            },
+            separators=(",", ":"),
+        ).encode()
+        offset = file.tell()
+        file.write(directory)
+        file.write(TRAILER.pack(offset, len(directory), MAGIC))
+    os.replace(partial, path)
+    return rows
+
+
+class SnapshotReader:
+    """Memory-mapped, read-only view of a snapshot file."""
+
+    def __init__(self, path: str):
+        """
+        Open a snapshot.
+
+        Args:
+            path: Snapshot file written by ``save_snapshot``
+
+        Raises:
+            ValueError: If the file is not a snapshot
+            OSError: If the file cannot be opened
+        """
+        self.path = path
+        with open(path, "rb") as file:
+            try:
+                self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ValueError(f"Not a snapshot: '{path}'") from None
+        size = len(self._map)
+        if size < HEADER.size + TRAILER.size or self._map[:4] != MAGIC:
+            self._map.close()
+            raise ValueError(f"Not a snapshot: '{path}'")
+        offset, length, magic = TRAILER.unpack_from(self._map, size - TRAILER.size)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f"Not a snapshot: '{path}' (truncated)")
+        directory = json.loads(bytes(self._map[offset : offset + length]))
+        self.rows: int = directory["rows"]
+        self.block_rows: int = directory["block_rows"]
+        self.operations: List[str] = directory["operations"]
+        self._columns: Dict[str, List[List[Any]]] = directory["columns"]
+        self._view = memoryview(self._map)
+
+    def __len__(self) -> int:
+        return self.rows
+
+    @property
+    def blocks(self) -> int:
+        """Number of row blocks."""
+        return len(self._columns["a"])
+
+    def block_size(self, block: int) -> int:
+        """Number of rows in ``block``."""
+        return min(self.block_rows, self.rows - block * self.block_rows)
+
+    def _segment(self, column: str, block: int) -> Tuple[List[Any], Any]:
+        """Return the directory entry and (inflated) bytes of one segment."""
+        entry = self._columns[column][block]
+        offset, length, _, compressed = entry[:4]
+        segment = self._view[offset : offset + length]
+        if compressed:
+            segment = zlib.decompress(segment)
+        return entry, segment
+
+    def block(self, column: str, block: int) -> Sequence[Any]:
+        """
+        Decode one block of a column.
+
+        Operand and result blocks are returned as ``memoryview`` casts of
+        the mapped file when they are typed and uncompressed. Operations are
+        returned as names and timestamps as ``datetime`` objects.
+
+        Raises:
+            ValueError: If the column does not exist
+        """
+        if column not in self._columns:
+            raise ValueError(
+                f"Unknown column: '{column}'. Columns are: {', '.join(COLUMNS)}"
+            )
+        entry, segment = self._segment(column, block)
+        if column == "operation":
+            names = self.operations
+            return [names[code] for code in bytes(segment)]
+        if column == "timestamp":
+            return [_datetime(stamp) for stamp in self._stamps(block)]
+        return decode_numbers(entry[2], segment, self.block_size(block))
+
+    def _codes(self, block: int) -> Sequence[int]:
+        """Operation dictionary codes of one block."""
+        return self._segment("operation", block)[1]
+
+    def _stamps(self, block: int) -> List[int]:
+        """Timestamps of one block in microseconds."""
+        entry, segment = self._segment("timestamp", block)
+        return list(itertools.accumulate(decode_varints(segment), initial=entry[4]))[1:]
+
+    def column(self, column: str) -> Iterator[Any]:
+        """Iterate over every value of a column, one block at a time."""
+        for block in range(self.blocks):
+            yield from self.block(column, block)
+
+    def select(
+        self,
+        column: str,
+        operation: Optional[str] = None,
+        where: Iterable[Condition] = (),
+    ) -> Iterator[Sequence[Any]]:
+        """
+        Yield the values of ``column`` in the rows matching the filters.
+
+        Filters are evaluated a block at a time with ``map`` over the
+        decoded columns, so no per-row Python code runs for typed blocks.
+
+        Args:
+            column: Column to return ('a', 'b', 'result', 'operation' or
+                'timestamp')
+            operation: Keep only rows of this operation (name or symbol)
+            where: Conditions such as ``("a", ">", 10)`` on 'a', 'b' or
+                'result'; all must hold
+
+        Returns:
+            Iterator over one sequence of matching values per block
+
+        Raises:
+            ValueError: If a column, comparison or operation is invalid
+        """
+        conditions = []
+        for name, comparison, value in where:
+            if name not in VALUE_COLUMNS:
+                raise ValueError(
+                    f"Cannot filter on '{name}'. "
+                    f"Filter columns are: {', '.join(VALUE_COLUMNS)}"
+                )
+            if comparison not in COMPARISONS:
+                raise ValueError(
+                    f"Invalid comparison: '{comparison}'. "
+                    f"Valid comparisons are: {', '.join(COMPARISONS)}"
+                )
+            conditions.append((name, COMPARISONS[comparison], value))
+        code = None
+        if operation is not None:
+            name = CalculationFactory.canonical_operation(operation)
+            if name not in self.operations:
+                return
+            code = self.operations.index(name)
+        for block in range(self.blocks):
+            values = self.block(column, block)
+            mask = self._mask(block, conditions, code)
+            yield values if mask is None else list(itertools.compress(values, mask))
+
+    def _mask(
+        self, block: int, conditions: List[Tuple[str, Callable, Number]], code
+    ) -> Optional[Iterator[bool]]:
+        """Lazily evaluate the filters over one block (None: no filters)."""
+        masks = [
+            map(compare, self.block(name, block), itertools.repeat(value))
+            for name, compare, value in conditions
+        ]
+        if code is not None:
+            masks.append(map(operator.eq, self._codes(block), itertools.repeat(code)))
+        if not masks:
+            return None
+        mask = masks[0]
+        for other in masks[1:]:
+            mask = map(operator.and_, mask, other)
+        return mask
+
+    def count(
+        self, operation: Optional[str] = None, where: Iterable[Condition] = ()
+    ) -> int:
+        """Count the rows matching the filters (see ``select``)."""
+        return sum(map(len, self.select("b", operation, where)))
+
+    def aggregate(
+        self,
+        reduction: str,
+        column: str = "result",
+        operation: Optional[str] = None,
+        where: Iterable[Condition] = (),
+    ) -> Number:
+        """
+        Reduce a column over the rows matching the filters.
+
+        Args:
+            reduction: Registered reduction ('sum', 'product', 'mean', 'min'
+                or 'max')
+            column: Column to reduce ('a', 'b' or 'result')
+            operation: Keep only rows of this operation (name or symbol)
+            where: Conditions, as for ``select``
+
+        Returns:
+            Result of the reduction
+
+        Raises:
+            ValueError: If the reduction or a filter is invalid, or the
+                reduction is undefined for the selected rows
+        """
+        if column not in VALUE_COLUMNS:
+            raise ValueError(
+                f"Cannot aggregate '{column}'. "
+                f"Columns are: {', '.join(VALUE_COLUMNS)}"
+            )
+        chunks = self.select(column, operation, where)
+        return CalculationFactory.reduce(
+            reduction, itertools.chain.from_iterable(chunks)
+        )
+
+    def sketch(
+        self, operation: Optional[str] = None, where: Iterable[Condition] = ()
+    ) -> ResultSketch:
+        """
+        Sketch the results and expressions of the rows matching the filters.
+
+        Columns are fed to the sketch a block at a time, without rebuilding
+        rows as ``Calculation`` objects.
+
+        Args:
+            operation: Keep only rows of this operation (name or symbol)
+            where: Conditions, as for ``select``
+        """
+        sketch = ResultSketch()
+        columns = [
+            self.select(name, operation, where)
+            for name in ("a", "b", "operation", "result")
+        ]
+        for a, b, names, results in zip(*columns):
+            sketch.add_batch(list(zip(a, b, names)), results)
+        return sketch
+
+    def calculations(
+        self, start: int = 0, stop: Optional[int] = None
+    ) -> Iterator[Calculation]:
+        """
+        Rebuild the calculations in rows ``[start, stop)``.
+
+        Only the blocks overlapping the range are decoded.
+        """
+        stop = self.rows if stop is None else min(stop, self.rows)
+        start = max(start, 0)
+        if start >= stop:
+            return
+        operations = [
+            CalculationFactory.get_operation(name) for name in self.operations
+        ]
+        for block in range(start // self.block_rows, (stop - 1) // self.block_rows + 1):
+            first = block * self.block_rows
+            low, high = max(start - first, 0), min(stop - first, self.block_size(block))
+            columns = zip(
+                self.block("a", block)[low:high],
+                self.block("b", block)[low:high],
+                self.block("result", block)[low:high],
+                bytes(self._codes(block)[low:high]),
+                self._stamps(block)[low:high],
+            )
+            for a, b, result, code, stamp in columns:
+                calculation = Calculation(a, b, operations[code])
+                calculation.timestamp = _datetime(stamp)
+                calculation._result = result
+                calculation._executed = True
+                yield calculation
+
+    def close(self) -> None:
+        """
+        Unmap the file.
+
+        If blocks returned by ``block`` or ``select`` are still referenced
+        the mapping stays open until they are released.
+        """
+        try:
+            self._view.release()
+            self._map.close()
+        except BufferError:
+            pass
+
+    def __enter__(self) -> "SnapshotReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class SnapshotHistory:
+    """
+    History backed by a snapshot, with new calculations appended in memory.
+
+    Opening reads only the snapshot's directory, so a history of any size
+    is available at once; rows are rebuilt as ``Calculation`` objects only
+    when they are listed. New calculations go to an in-memory
+    ``CalculatorHistory``, whose ``feed`` is the history's, and can be
+    saved with the rest by ``save_snapshot``.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open a snapshot as a history.
+
+        Raises:
+            ValueError: If the file is not a snapshot
+            OSError: If the file cannot be opened
+        """
+        self.snapshot: Optional[SnapshotReader] = SnapshotReader(path)
+        self._recent = CalculatorHistory()
+
+    @property
+    def feed(self) -> HistoryFeed:
+        """Change feed of the history (created on first access)."""
+        return self._recent.feed
+
+    @property
+    def _saved(self) -> int:
+        return len(self.snapshot) if self.snapshot is not None else 0
+
+    def add_calculation(self, calculation: Calculation) -> None:
+        """Append an executed calculation."""
+        self._recent.add_calculation(calculation)
+
+    def sketch(self) -> ResultSketch:
+        """Sketch the snapshot's columns and the recent calculations."""
+        sketch = self._recent.sketch()
+        if self.snapshot is not None:
+            sketch.merge(self.snapshot.sketch())
+        return sketch
+
+    def get_history(self) -> List[Calculation]:
+        """Return every calculation, rebuilding the snapshot's rows."""
+        return list(self.iter_range(0, len(self)))
+
+    def iter_range(self, start: int, stop: int) -> Iterator[Calculation]:
+        """
+        Iterate over a slice of the history.
+
+        Args:
+            start: Index of the first calculation (inclusive)
+            stop: Index of the last calculation (exclusive)
+        """
+        saved = self._saved
+        if self.snapshot is not None and start < saved:
+            yield from self.snapshot.calculations(start, min(stop, saved))
+        yield from self._recent.iter_range(max(start - saved, 0), stop - saved)
+
+    def get_last_calculation(self) -> Optional[Calculation]:
+        """Return the most recent calculation, or None if history is empty."""
+        last = self._recent.get_last_calculation()
+        if last is None and self._saved:
+            return next(self.snapshot.calculations(self._saved - 1))
+        return last
+
+    def clear_history(self) -> int:
+        """
+        Remove every calculation and close the snapshot.
+
+        Returns:
+            Number of calculations that were removed
+        """
+        count = len(self)
+        if self.snapshot is not None:
+            self.snapshot.close()
+            self.snapshot = None
+        self._recent.clear_history()
+        return count
+
+    def __len__(self) -> int:
+        return self._saved + len(self._recent)
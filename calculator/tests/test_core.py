@@ -8,6 +8,7 @@ ROOT = Path(__file__).resolve().parents[2]
 sys.path.insert(0, str(ROOT))
 
 import calculator.core as core
+from calculation import CalculationFactory
 
 
 class TestCoreFunctions(unittest.TestCase):
@@ -30,9 +31,46 @@ class TestCoreFunctions(unittest.TestCase):
         self.assertAlmostEqual(core.divide(7, 2), 3.5)
 
     def test_divide_by_zero(self):
-        with self.assertRaises(ValueError):
+        with self.assertRaisesRegex(ValueError, "Division by zero is not allowed"):
             core.divide(1, 0)
 
+    def test_power_modulo_floor_divide(self):
+        self.assertEqual(core.power(2, 10), 1024)
+        self.assertEqual(core.modulo(-7, 3), 2)
+        self.assertEqual(core.floor_divide(-7, 2), -4)
+
+
+class TestEvaluate(unittest.TestCase):
+    def test_names_symbols_and_aliases(self):
+        for operation in ("+", "add", "ADD", " add "):
+            self.assertEqual(core.evaluate(operation, 5, 3), 8)
+        self.assertEqual(core.evaluate("**", 2, 3), 8)
+        self.assertEqual(core.evaluate("//", 7, 2), 3)
+
+    def test_matches_operations(self):
+        for operation in CalculationFactory.valid_operations():
+            expected = CalculationFactory.create_calculation(7, 2, operation).execute()
+            self.assertEqual(core.evaluate(operation, 7, 2), expected)
+
+    def test_errors_match_operations(self):
+        for operation, b in (("/", 0), ("%", 0), ("//", 0.0), ("^", -1)):
+            a = 0 if operation == "^" else 1
+            with self.assertRaises(ValueError) as expected:
+                CalculationFactory.create_calculation(a, b, operation).execute()
+            with self.assertRaisesRegex(ValueError, str(expected.exception)):
+                core.evaluate(operation, a, b)
+
+    def test_unsupported_operation(self):
+        with self.assertRaisesRegex(ValueError, "Unsupported operation"):
+            core.evaluate("&", 1, 2)
+        with self.assertRaisesRegex(ValueError, "Unsupported operation"):
+            core.evaluate(None, 1, 2)
+
+    def test_exported_from_package(self):
+        from calculator import evaluate
+
+        self.assertIs(evaluate, core.evaluate)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,24 @@
+"""
+Client module for the calculation service.
+
+Provides synchronous and asyncio clients with keep-alive connection pooling
+and optional micro-batching. Both mirror
+``CalculationFactory.create_calculation(a, b, operation)``.
+
+Usage:
+    with CalculatorClient("http://127.0.0.1:8000", batch_window=0.001) as client:
+        calculation = client.create_calculation(5, 3, "add")
+        print(calculation.result)
+"""
+
+from .aio import AsyncCalculatorClient, AsyncRemoteCalculation
+from .common import ResponseError
+from .sync import CalculatorClient, RemoteCalculation
+
+__all__ = [
+    "AsyncCalculatorClient",
+    "AsyncRemoteCalculation",
+    "CalculatorClient",
+    "RemoteCalculation",
+    "ResponseError",
+]
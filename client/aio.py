@@ -0,0 +1,327 @@
+"""
+Asyncio client for the calculation service.
+
+Connections are pooled keep-alive HTTP/1.1 streams. With ``batch_window``
+set, calls made within the window are coalesced into one ``/batch`` request
+and each caller awaits its own future.
+"""
+
+import asyncio
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from calculation import CalculationFactory
+
+from .common import (
+    BatchResult,
+    Item,
+    Number,
+    _RemoteCalculationBase,
+    check_operands,
+    check_results,
+    decode_response,
+    decode_results,
+    encode_batch,
+    parse_base_url,
+)
+
+
+class AsyncRemoteCalculation(_RemoteCalculationBase):
+    """A calculation performed by the service; await it for the result."""
+
+    def __init__(
+        self, a: Number, b: Number, operation_type: str, future: asyncio.Future
+    ):
+        super().__init__(a, b, operation_type)
+        self._future = future
+
+    async def execute(self) -> Number:
+        """
+        Wait for and return the result.
+
+        Raises:
+            ValueError: If the calculation cannot be performed
+            ServiceOverloaded: If the service rejected the request
+        """
+        return await self._future
+
+    def __await__(self):
+        return self._future.__await__()
+
+    @property
+    def result(self) -> Number:
+        """Get the result; only available once the calculation has completed."""
+        if not self._future.done():
+            raise RuntimeError("Calculation is still pending; await it first")
+        return self._future.result()
+
+
+class _Connection:
+    """One keep-alive HTTP/1.1 connection."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.open = True
+
+    async def request(
+        self, host: str, method: str, path: str, body: bytes
+    ) -> Tuple[int, Dict[str, str], bytes]:
+        head = (
+            f"{method} {path} HTTP/1.1\r\nHost: {host}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+        )
+        self.writer.write(head.encode("latin-1") + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("Connection closed by server")
+        status = int(status_line.split()[1])
+        headers: Dict[str, str] = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", "0"))
+        data = await self.reader.readexactly(length) if length else b""
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, headers, data
+
+    def close(self) -> None:
+        self.open = False
+        self.writer.close()
+
+
+class AsyncConnectionPool:
+    """A bounded pool of keep-alive connections to one server."""
+
+    def __init__(self, host: str, port: int, size: int = 8):
+        self.host = host
+        self.port = port
+        self._slots = asyncio.Semaphore(size)
+        self._idle: List[_Connection] = []
+        self._closed = False
+
+    async def request(
+        self, method: str, path: str, body: bytes = b""
+    ) -> Tuple[int, Dict[str, str], bytes]:
+        """
+        Send a request on a pooled connection.
+
+        A request that fails because an idle connection was closed by the
+        server is retried once on a fresh connection.
+        """
+        async with self._slots:
+            for attempt in (1, 2):
+                connection = self._idle.pop() if self._idle else None
+                if connection is None:
+                    reader, writer = await asyncio.open_connection(self.host, self.port)
+                    connection = _Connection(reader, writer)
+                try:
+                    response = await connection.request(self.host, method, path, body)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    connection.close()
+                    if attempt == 2:
+                        raise
+                    continue
+                except BaseException:
+                    # Cancelled or failed mid-response: the connection is
+                    # in an unknown state and cannot be reused.
+                    connection.close()
+                    raise
+                if connection.open and not self._closed:
+                    self._idle.append(connection)
+                else:
+                    # Closed while this request was in flight.
+                    connection.close()
+                return response
+        raise AssertionError("unreachable")
+
+    async def close(self) -> None:
+        """Close idle connections, and in-flight ones as their requests finish."""
+        self._closed = True
+        idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+        for connection in idle:
+            try:
+                await connection.writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+
+class AsyncMicroBatcher:
+    """Coalesces items submitted within a window into batches on the event loop."""
+
+    def __init__(self, send, window: float, max_items: int):
+        """
+        Initialize the batcher.
+
+        Args:
+            send: Coroutine function sending a batch and returning one result
+                or error per item
+            window: Seconds to wait after the first queued item
+            max_items: Batch size that triggers an immediate send
+        """
+        self.send = send
+        self.window = window
+        self.max_items = max_items
+        self._items: List[Tuple[Item, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: "set[asyncio.Task]" = set()
+
+    def submit(self, item: Item) -> asyncio.Future:
+        """
+        Queue an item and return the future for its result.
+
+        Items with invalid operands fail their own future instead of being
+        sent, where they would fail the whole batch.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        try:
+            check_operands(item[0], item[1])
+        except ValueError as e:
+            future.set_exception(e)
+            return future
+        self._items.append((item, future))
+        if len(self._items) >= self.max_items:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self.flush)
+        return future
+
+    def flush(self) -> None:
+        """Send queued items now."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._items:
+            batch = self._items[: self.max_items]
+            del self._items[: self.max_items]
+            task = asyncio.ensure_future(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: List[Tuple[Item, asyncio.Future]]) -> None:
+        """Send one batch and resolve each caller's future."""
+        try:
+            results = await self.send([item for item, _ in batch])
+            check_results(results, batch)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def close(self) -> None:
+        """Send everything still queued and wait for in-flight batches."""
+        self.flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+class AsyncCalculatorClient:
+    """Asyncio client for the HTTP calculation service."""
+
+    def __init__(
+        self,
+        base_url: str = "http://127.0.0.1:8000",
+        pool_size: int = 8,
+        batch_window: Optional[float] = None,
+        max_batch: int = 256,
+    ):
+        """
+        Initialize the client.
+
+        Args:
+            base_url: Service URL, e.g. ``http://127.0.0.1:8000``
+            pool_size: Maximum number of keep-alive connections
+            batch_window: Enable micro-batching: calls made within this many
+                seconds (e.g. ``0.001``) are sent as one batch request
+            max_batch: Batch size that is sent without waiting for the window
+        """
+        host, port = parse_base_url(base_url)
+        self.pool = AsyncConnectionPool(host, port, pool_size)
+        self._batcher: Optional[AsyncMicroBatcher] = None
+        if batch_window is not None:
+            self._batcher = AsyncMicroBatcher(
+                self.calculate_batch, batch_window, max_batch
+            )
+
+    def create_calculation(
+        self, a: Number, b: Number, operation_type: str
+    ) -> AsyncRemoteCalculation:
+        """
+        Create a calculation performed by the service.
+
+        Mirrors ``CalculationFactory.create_calculation``; must be called from
+        a running event loop. Await the returned calculation for its result.
+
+        Raises:
+            ValueError: If the operation type is not supported
+        """
+        operation = CalculationFactory.canonical_operation(operation_type)
+        if self._batcher is not None:
+            future = self._batcher.submit((a, b, operation))
+        else:
+            future = asyncio.ensure_future(self._calculate(a, b, operation))
+        return AsyncRemoteCalculation(a, b, operation, future)
+
+    async def calculate(self, a: Number, b: Number, operation_type: str) -> Number:
+        """
+        Perform a calculation and return its result.
+
+        Raises:
+            ValueError: If the calculation cannot be performed
+            ServiceOverloaded: If the service rejected the request
+        """
+        return await self.create_calculation(a, b, operation_type)
+
+    async def calculate_batch(self, items: Sequence[Item]) -> List[BatchResult]:
+        """
+        Perform a batch of calculations in one request.
+
+        Returns:
+            One result or ``ValueError`` per item, in order
+        """
+        response = await self.pool.request("POST", "/batch", encode_batch(items))
+        return decode_results(decode_response(*response))
+
+    async def _calculate(self, a: Number, b: Number, operation: str) -> Number:
+        """Send a single ``/calculate`` request."""
+        body = json.dumps({"a": a, "b": b, "operation": operation}).encode()
+        response = await self.pool.request("POST", "/calculate", body)
+        return decode_response(*response)["result"]
+
+    async def metrics(self) -> Dict[str, Any]:
+        """Fetch the service metrics."""
+        return decode_response(*await self.pool.request("GET", "/metrics"))
+
+    def flush(self) -> None:
+        """Send any calls waiting for the micro-batching window."""
+        if self._batcher is not None:
+            self._batcher.flush()
+
+    async def close(self) -> None:
+        """Flush pending calls and close pooled connections."""
+        if self._batcher is not None:
+            await self._batcher.close()
+        await self.pool.close()
+
+    async def __aenter__(self) -> "AsyncCalculatorClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
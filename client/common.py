@@ -0,0 +1,118 @@
+"""
+Shared pieces of the synchronous and asyncio clients.
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+from urllib.parse import urlsplit
+
+from calculation import CalculationFactory
+from service.admission import ServiceOverloaded
+
+Number = Union[int, float]
+Item = Tuple[Number, Number, str]
+BatchResult = Union[Number, ValueError]
+
+
+class ResponseError(ValueError):
+    """An error response from the service, with its HTTP status."""
+
+    def __init__(self, message: str, status: int):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_base_url(base_url: str) -> Tuple[str, int]:
+    """Split ``http://host:port`` into host and port."""
+    url = urlsplit(base_url if "//" in base_url else f"http://{base_url}")
+    if url.scheme != "http":
+        raise ValueError(f"Unsupported URL scheme: '{url.scheme}'")
+    return url.hostname or "127.0.0.1", url.port or 80
+
+
+def check_operands(a: Any, b: Any) -> None:
+    """
+    Check both operands are numbers the service accepts.
+
+    Raises:
+        ValueError: If an operand is not an int or float (``bool`` included)
+    """
+    for field, value in (("a", a), ("b", b)):
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            raise ValueError(f"Field '{field}' must be a number")
+
+
+def encode_batch(items: Sequence[Item]) -> bytes:
+    """Encode a ``/batch`` request body."""
+    return json.dumps(
+        {"items": [{"a": a, "b": b, "operation": op} for a, b, op in items]},
+        separators=(",", ":"),
+    ).encode()
+
+
+def decode_response(
+    status: int, headers: Dict[str, str], body: bytes
+) -> Dict[str, Any]:
+    """
+    Decode a JSON response, mapping error statuses to exceptions.
+
+    Raises:
+        ServiceOverloaded: For 429 and 503 responses
+        ResponseError: For other error responses (invalid calculation)
+    """
+    try:
+        payload = json.loads(body) if body else {}
+    except ValueError:
+        payload = {"error": body.decode(errors="replace")}
+    if status == 200:
+        return payload
+    message = payload.get("error", f"HTTP {status}")
+    if status in (429, 503):
+        retry_after = float(headers.get("retry-after", "1") or 1)
+        raise ServiceOverloaded(message, status=status, retry_after=retry_after)
+    raise ResponseError(message, status)
+
+
+def decode_results(payload: Dict[str, Any]) -> List[BatchResult]:
+    """Convert ``/batch`` results into values and ``ValueError`` instances."""
+    return [
+        ValueError(item["error"]) if "error" in item else item["result"]
+        for item in payload["results"]
+    ]
+
+
+def check_results(results: Sequence[BatchResult], items: Sequence[Any]) -> None:
+    """
+    Check a batch response has one result per item.
+
+    Raises:
+        ValueError: If the counts differ; the results cannot then be matched
+            to their items
+    """
+    if len(results) != len(items):
+        raise ValueError(f"Expected {len(items)} results, got {len(results)}")
+
+
+class _RemoteCalculationBase:
+    """Fields shared by remote calculations."""
+
+    def __init__(self, a: Number, b: Number, operation_type: str):
+        operation = CalculationFactory.get_operation(operation_type)
+        self.a = a
+        self.b = b
+        self.operation = operation.name
+        self._symbol = operation.symbol
+        self._future: Optional[Any] = None
+
+    def _format(self) -> str:
+        future = self._future
+        if future is not None and future.done() and future.exception() is None:
+            return f"{self.a} {self._symbol} {self.b} = {future.result()}"
+        return f"{self.a} {self._symbol} {self.b} = ?"
+
+    def __str__(self) -> str:
+        """String representation matching ``Calculation``."""
+        return self._format()
+
+    def __repr__(self) -> str:
+        return f"RemoteCalculation({self.a}, {self.b}, {self.operation})"
@@ -0,0 +1,353 @@
+"""
+Synchronous client for the calculation service.
+
+Requests go through a pool of keep-alive ``http.client`` connections. With
+``batch_window`` set, calls made close together are coalesced by a
+background thread into a single ``/batch`` request; every caller still gets
+its own future.
+"""
+
+import http.client
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from calculation import CalculationFactory
+
+from .common import (
+    BatchResult,
+    Item,
+    Number,
+    _RemoteCalculationBase,
+    check_operands,
+    check_results,
+    decode_response,
+    decode_results,
+    encode_batch,
+    parse_base_url,
+)
+
+
+class RemoteCalculation(_RemoteCalculationBase):
+    """A calculation performed by the service, mirroring ``Calculation``."""
+
+    def __init__(self, a: Number, b: Number, operation_type: str, future: Future):
+        super().__init__(a, b, operation_type)
+        self._future = future
+
+    def execute(self, timeout: Optional[float] = None) -> Number:
+        """
+        Wait for and return the result.
+
+        Raises:
+            ValueError: If the calculation cannot be performed
+            ServiceOverloaded: If the service rejected the request
+        """
+        return self._future.result(timeout)
+
+    @property
+    def result(self) -> Number:
+        """Get the result of the calculation (waits if not yet available)."""
+        return self.execute()
+
+
+class ConnectionPool:
+    """A bounded pool of keep-alive HTTP connections to one server."""
+
+    def __init__(self, host: str, port: int, size: int = 8, timeout: float = 30.0):
+        """
+        Initialize the pool.
+
+        Args:
+            host: Server host
+            port: Server port
+            size: Maximum number of open connections
+            timeout: Socket timeout in seconds
+        """
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[Optional[http.client.HTTPConnection]]"
+        self._idle = queue.LifoQueue()
+        for _ in range(size):
+            self._idle.put(None)
+
+    def request(
+        self, method: str, path: str, body: Optional[bytes] = None
+    ) -> Tuple[int, Dict[str, str], bytes]:
+        """
+        Send a request on a pooled connection.
+
+        A request that fails because an idle keep-alive connection was closed
+        by the server is retried once on a fresh connection.
+
+        Returns:
+            Tuple of (status, lower-cased headers, body)
+        """
+        connection = self._idle.get()
+        try:
+            for attempt in (1, 2):
+                if connection is None:
+                    connection = http.client.HTTPConnection(
+                        self.host, self.port, timeout=self.timeout
+                    )
+                try:
+                    connection.request(
+                        method,
+                        path,
+                        body=body,
+                        headers={"Content-Type": "application/json"},
+                    )
+                    response = connection.getresponse()
+                    data = response.read()
+                except (http.client.HTTPException, ConnectionError):
+                    connection.close()
+                    connection = None
+                    if attempt == 2:
+                        raise
+                    continue
+                except BaseException:
+                    # Timed out or failed mid-response: the connection is in
+                    # an unknown state and cannot be reused.
+                    connection.close()
+                    connection = None
+                    raise
+                headers = {name.lower(): value for name, value in response.getheaders()}
+                if response.will_close:
+                    connection.close()
+                    connection = None
+                return response.status, headers, data
+        finally:
+            self._idle.put(connection)
+        raise AssertionError("unreachable")
+
+    def close(self) -> None:
+        """Close idle connections."""
+        connections = []
+        while True:
+            try:
+                connections.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        for connection in connections:
+            if connection is not None:
+                connection.close()
+            self._idle.put(None)
+
+
+class MicroBatcher:
+    """Coalesces individual items submitted within a time window into batches."""
+
+    def __init__(
+        self,
+        send: Callable[[List[Item]], List[BatchResult]],
+        window: float,
+        max_items: int,
+        concurrency: int = 4,
+    ):
+        """
+        Initialize the batcher and start its flusher thread.
+
+        Args:
+            send: Sends a batch and returns one result or error per item
+            window: Seconds to wait after the first queued item before
+                sending the batch
+            max_items: Batch size that triggers an immediate send
+            concurrency: Maximum number of batches in flight
+        """
+        self.send = send
+        self.window = window
+        self.max_items = max_items
+        self._condition = threading.Condition()
+        self._items: List[Tuple[Item, Future]] = []
+        self._first_at = 0.0
+        self._flush_requested = False
+        self._closed = False
+        self._executor = ThreadPoolExecutor(concurrency)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Item) -> Future:
+        """
+        Queue an item and return the future for its result.
+
+        Items with invalid operands fail their own future instead of being
+        sent, where they would fail the whole batch.
+        """
+        future: Future = Future()
+        try:
+            check_operands(item[0], item[1])
+        except ValueError as e:
+            future.set_exception(e)
+            return future
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Batcher is closed")
+            if not self._items:
+                self._first_at = time.monotonic()
+            self._items.append((item, future))
+            if len(self._items) == 1 or len(self._items) >= self.max_items:
+                self._condition.notify()
+        return future
+
+    def flush(self) -> None:
+        """Send queued items without waiting for the window to expire."""
+        with self._condition:
+            if self._items:
+                self._flush_requested = True
+                self._condition.notify()
+
+    def _run(self) -> None:
+        """Flusher thread: cut batches by size or window and send them."""
+        while True:
+            with self._condition:
+                while not self._items and not self._closed:
+                    self._condition.wait()
+                if not self._items:
+                    return
+                deadline = self._first_at + self.window
+                while (
+                    len(self._items) < self.max_items
+                    and not self._closed
+                    and not self._flush_requested
+                ):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch = self._items[: self.max_items]
+                del self._items[: self.max_items]
+                if self._items:
+                    self._first_at = time.monotonic()
+                else:
+                    self._flush_requested = False
+            self._executor.submit(self._send, batch)
+
+    def _send(self, batch: List[Tuple[Item, Future]]) -> None:
+        """Send one batch and resolve each caller's future."""
+        try:
+            results = self.send([item for item, _ in batch])
+            check_results(results, batch)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def close(self) -> None:
+        """Send everything still queued and stop the flusher."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        self._executor.shutdown(wait=True)
+
+
+class CalculatorClient:
+    """Synchronous client for the HTTP calculation service."""
+
+    def __init__(
+        self,
+        base_url: str = "http://127.0.0.1:8000",
+        pool_size: int = 8,
+        timeout: float = 30.0,
+        batch_window: Optional[float] = None,
+        max_batch: int = 256,
+    ):
+        """
+        Initialize the client.
+
+        Args:
+            base_url: Service URL, e.g. ``http://127.0.0.1:8000``
+            pool_size: Maximum number of keep-alive connections
+            timeout: Socket timeout in seconds
+            batch_window: Enable micro-batching: calls made within this many
+                seconds (e.g. ``0.001``) are sent as one batch request
+            max_batch: Batch size that is sent without waiting for the window
+        """
+        host, port = parse_base_url(base_url)
+        self.pool = ConnectionPool(host, port, pool_size, timeout)
+        self._batcher: Optional[MicroBatcher] = None
+        if batch_window is not None:
+            self._batcher = MicroBatcher(
+                self.calculate_batch, batch_window, max_batch, pool_size
+            )
+
+    def create_calculation(
+        self, a: Number, b: Number, operation_type: str
+    ) -> RemoteCalculation:
+        """
+        Create a calculation performed by the service.
+
+        Mirrors ``CalculationFactory.create_calculation``. With micro-batching
+        the request is queued and the returned calculation resolves when its
+        batch completes; otherwise the request is sent immediately.
+
+        Raises:
+            ValueError: If the operation type is not supported
+        """
+        operation = CalculationFactory.canonical_operation(operation_type)
+        if self._batcher is not None:
+            future = self._batcher.submit((a, b, operation))
+        else:
+            future = Future()
+            try:
+                future.set_result(self._calculate(a, b, operation))
+            except Exception as e:
+                future.set_exception(e)
+        return RemoteCalculation(a, b, operation, future)
+
+    def calculate(self, a: Number, b: Number, operation_type: str) -> Number:
+        """
+        Perform a calculation and return its result.
+
+        Raises:
+            ValueError: If the calculation cannot be performed
+            ServiceOverloaded: If the service rejected the request
+        """
+        return self.create_calculation(a, b, operation_type).result
+
+    def calculate_batch(self, items: Sequence[Item]) -> List[BatchResult]:
+        """
+        Perform a batch of calculations in one request.
+
+        Returns:
+            One result or ``ValueError`` per item, in order
+        """
+        payload = decode_response(
+            *self.pool.request("POST", "/batch", encode_batch(items))
+        )
+        return decode_results(payload)
+
+    def _calculate(self, a: Number, b: Number, operation: str) -> Number:
+        """Send a single ``/calculate`` request."""
+        body = json.dumps({"a": a, "b": b, "operation": operation}).encode()
+        return decode_response(*self.pool.request("POST", "/calculate", body))["result"]
+
+    def metrics(self) -> Dict:
+        """Fetch the service metrics."""
+        return decode_response(*self.pool.request("GET", "/metrics"))
+
+    def flush(self) -> None:
+        """Send any calls waiting for the micro-batching window."""
+        if self._batcher is not None:
+            self._batcher.flush()
+
+    def close(self) -> None:
+        """Flush pending calls and close pooled connections."""
+        if self._batcher is not None:
+            self._batcher.close()
+        self.pool.close()
+
+    def __enter__(self) -> "CalculatorClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
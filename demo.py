@@ -81,7 +81,7 @@ def demo_error_handling():
     error_cases = [
         ("5 / 0", "Division by zero"),
         ("abc + 3", "Invalid number"),
-        ("5 % 3", "Invalid operation"),
+        ("5 & 3", "Invalid operation"),
         ("5 +", "Invalid format"),
     ]
 
@@ -107,7 +107,7 @@ def main():
     print()
     print("🎯 Key Features Demonstrated:")
     print("  ✓ REPL interface")
-    print("  ✓ Arithmetic operations (+ - * /)")
+    print("  ✓ Arithmetic operations (+ - * / ^ % //)")
     print("  ✓ Floating-point support")
     print("  ✓ Calculation history with timestamps")
     print("  ✓ Input validation")
@@ -0,0 +1,313 @@
+"""
+Memory accounting and a process-wide memory budget.
+
+Long-lived structures that grow with traffic (calculation history, response
+caches) open a ``MemoryAccount`` on the global ``budget`` and charge it an
+estimate of the bytes each entry holds. Estimates are kept as running totals,
+so accounting costs one addition per insert; ``tracemalloc`` is used to
+report what the process actually allocates and to check the estimates, not
+on the hot path.
+
+When a limit is set and the accounted total exceeds it, accounts are asked
+to shrink in priority order, lowest first: caches (whose entries can be
+recomputed) before history. Eviction frees down to ``LOW_WATERMARK`` of the
+limit so that it runs once per batch of inserts rather than on every one.
+
+Usage:
+    from memory import budget, parse_size
+
+    budget.set_limit(parse_size("64M"))
+    print(budget.report())
+"""
+
+import threading
+import tracemalloc
+import weakref
+from typing import Any, Callable, Dict, List, Optional, Set
+
+__all__ = [
+    "PRIORITY_CACHE",
+    "PRIORITY_HISTORY",
+    "MemoryAccount",
+    "MemoryBudget",
+    "budget",
+    "format_size",
+    "parse_size",
+]
+
+#: Eviction priority of caches: evicted first.
+PRIORITY_CACHE = 0
+
+#: Eviction priority of calculation history: evicted after every cache.
+PRIORITY_HISTORY = 100
+
+_UNITS = {"": 1, "B": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+
+
+def parse_size(text: str) -> int:
+    """
+    Parse a byte count such as ``"65536"``, ``"512K"``, ``"64M"`` or ``"1G"``.
+
+    Suffixes are binary (``K`` is 1024 bytes) and case insensitive; a
+    trailing ``B`` or ``iB`` is accepted.
+
+    Raises:
+        ValueError: If the size is malformed, negative or not finite
+    """
+    normalized = text.strip().upper()
+    for suffix in ("IB", "B"):
+        if normalized.endswith(suffix) and len(normalized) > len(suffix):
+            normalized = normalized[: -len(suffix)]
+            break
+    unit = normalized[-1:] if normalized[-1:] in _UNITS else ""
+    number = normalized[: len(normalized) - len(unit)]
+    try:
+        # int() rejects 'inf' with OverflowError and 'nan' with ValueError.
+        size = int(float(number) * _UNITS[unit])
+    except (ValueError, OverflowError):
+        raise ValueError(f"Invalid size: '{text}'") from None
+    if size < 0:
+        raise ValueError(f"Invalid size: '{text}'")
+    return size
+
+
+def format_size(size: int) -> str:
+    """Format a byte count for display, e.g. ``1.5 MiB``."""
+    value = float(size)
+    for unit in ("B", "KiB", "MiB"):
+        if abs(value) < 1024:
+            return f"{size} B" if unit == "B" else f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} GiB"
+
+
+class MemoryAccount:
+    """Bytes charged by one structure, e.g. one history or one cache."""
+
+    __slots__ = ("budget", "name", "priority", "bytes", "pending", "batch", "_shrink")
+
+    def __init__(
+        self,
+        budget: "MemoryBudget",
+        name: str,
+        priority: int,
+        shrink: Optional[Callable[[int], int]],
+        batch: int = 0,
+    ):
+        self.budget = budget
+        self.name = name
+        self.priority = priority
+        self.bytes = 0
+        self.pending = 0
+        self.batch = batch
+        # Held weakly so that an account never keeps its owner alive.
+        self._shrink = weakref.WeakMethod(shrink) if shrink is not None else None
+
+    def charge(self, size: int) -> None:
+        """Record ``size`` more bytes, evicting if the budget is exceeded."""
+        if self.batch:
+            self.pending += size
+            if self.pending < self.batch:
+                return
+            size, self.pending = self.pending, 0
+        budget = self.budget
+        with budget._lock:
+            self.bytes += size
+            budget._used += size
+            over = budget._limit is not None and budget._used > budget._limit
+        if over:
+            budget.enforce()
+
+    def flush(self) -> None:
+        """Charge bytes held back by batching."""
+        if self.pending:
+            size, self.pending = self.pending, 0
+            with self.budget._lock:
+                self.bytes += size
+                self.budget._used += size
+
+    def release(self, size: int) -> None:
+        """Record that ``size`` bytes were freed."""
+        budget = self.budget
+        with budget._lock:
+            self.bytes -= size
+            budget._used -= size
+
+    def shrink(self, size: int) -> int:
+        """Ask the owner to free at least ``size`` bytes; return bytes freed."""
+        shrink = self._shrink() if self._shrink is not None else None
+        if shrink is None:
+            return 0
+        return shrink(size)
+
+    def close(self) -> None:
+        """Release everything still charged and leave the budget."""
+        self.pending = 0
+        self.release(self.bytes)
+        self.budget._remove(self)
+
+
+class MemoryBudget:
+    """Process-wide accounted memory with priority-ordered eviction."""
+
+    #: Fraction of the limit eviction frees down to.
+    LOW_WATERMARK = 0.9
+
+    def __init__(self, limit: Optional[int] = None):
+        """
+        Initialize the budget.
+
+        Args:
+            limit: Maximum accounted bytes, or None for no limit
+        """
+        self._lock = threading.Lock()
+        self._evicting = threading.Lock()
+        self._accounts: Set[MemoryAccount] = set()
+        self._limit: Optional[int] = None
+        self._used = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+        self.set_limit(limit)
+
+    @property
+    def limit(self) -> Optional[int]:
+        """Maximum accounted bytes, or None for no limit."""
+        return self._limit
+
+    @property
+    def used(self) -> int:
+        """Bytes currently charged by every account (excluding batched bytes)."""
+        return self._used
+
+    def set_limit(self, limit: Optional[int]) -> None:
+        """
+        Set (or with None, remove) the limit, evicting if it is already exceeded.
+
+        Raises:
+            ValueError: If the limit is not positive
+        """
+        if limit is not None and limit < 1:
+            raise ValueError("Memory budget must be positive")
+        self._limit = limit
+        if limit is not None and self._used > limit:
+            self.enforce()
+
+    def account(
+        self,
+        name: str,
+        priority: int,
+        shrink: Optional[Callable[[int], int]] = None,
+        batch: int = 0,
+    ) -> MemoryAccount:
+        """
+        Open an account.
+
+        Args:
+            name: Component name used in reports (accounts may share a name)
+            priority: Eviction priority; lower priorities are shrunk first
+            shrink: Bound method freeing at least the given number of bytes
+                and returning how many it freed (after releasing them from
+                the account). The account is closed when the method's owner
+                is garbage collected. Accounts without one are never
+                evicted and must be closed explicitly.
+            batch: Hold back charges until this many bytes have accumulated,
+                so the budget's lock is taken once per batch. A batched
+                account must only be charged from one thread at a time,
+                and may exceed the limit by up to ``batch`` bytes.
+
+        Returns:
+            The account
+        """
+        account = MemoryAccount(self, name, priority, shrink, batch)
+        with self._lock:
+            self._accounts.add(account)
+        if shrink is not None:
+            weakref.finalize(shrink.__self__, account.close)
+        return account
+
+    def _remove(self, account: MemoryAccount) -> None:
+        with self._lock:
+            self._accounts.discard(account)
+
+    def enforce(self) -> int:
+        """
+        Shrink accounts, lowest priority first, until under the low watermark.
+
+        Concurrent callers do not wait: the eviction already in progress
+        covers them.
+
+        Returns:
+            Bytes freed
+        """
+        if self._limit is None or not self._evicting.acquire(blocking=False):
+            return 0
+        try:
+            target = int(self._limit * self.LOW_WATERMARK)
+            with self._lock:
+                accounts = sorted(self._accounts, key=lambda a: (a.priority, -a.bytes))
+            freed = 0
+            for account in accounts:
+                excess = self._used - target
+                if excess <= 0:
+                    break
+                if account.bytes > 0:
+                    freed += account.shrink(min(excess, account.bytes))
+            self.evictions += 1
+            self.evicted_bytes += freed
+            return freed
+        finally:
+            self._evicting.release()
+
+    def usage(self) -> Dict[str, int]:
+        """Return accounted bytes per component name."""
+        with self._lock:
+            accounts = list(self._accounts)
+        usage: Dict[str, int] = {}
+        for account in sorted(accounts, key=lambda a: a.priority):
+            size = account.bytes + account.pending
+            usage[account.name] = usage.get(account.name, 0) + size
+        return usage
+
+    def report(self, top: int = 0) -> Dict[str, Any]:
+        """
+        Return accounted usage and, while ``tracemalloc`` is tracing, the
+        memory the process actually allocated.
+
+        Args:
+            top: Number of allocation sites (grouped by file) to include
+                when tracing; taking the snapshot is slow on large heaps
+
+        Returns:
+            Dictionary with ``components``, ``used``, ``limit``,
+            ``evictions``, ``evicted_bytes`` and, when tracing, ``traced``
+        """
+        usage = self.usage()
+        report: Dict[str, Any] = {
+            "components": usage,
+            "used": sum(usage.values()),
+            "limit": self._limit,
+            "evictions": self.evictions,
+            "evicted_bytes": self.evicted_bytes,
+        }
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            traced: Dict[str, Any] = {"current": current, "peak": peak}
+            if top:
+                traced["top"] = _top_files(top)
+            report["traced"] = traced
+        return report
+
+
+def _top_files(limit: int) -> List[Dict[str, Any]]:
+    """Return the files holding the most traced memory."""
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        (tracemalloc.Filter(False, tracemalloc.__file__),)
+    )
+    return [
+        {"file": str(stat.traceback[0].filename), "bytes": stat.size}
+        for stat in snapshot.statistics("filename")[:limit]
+    ]
+
+
+#: The process-wide budget (no limit until one is set).
+budget = MemoryBudget()
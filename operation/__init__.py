@@ -1,11 +1,18 @@
 """
 Operation module for calculator application.
 
-This module defines the base operation interface and concrete arithmetic operations.
+This module defines the base operation interface and concrete arithmetic operations,
+and the n-ary reductions (sum, product, mean, min, max) over streams of numbers.
 """
 
+import array
+import functools
+import itertools
+import math
+import operator
 from abc import ABC, abstractmethod
-from typing import Union
+from collections.abc import Sequence as SequenceABC
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
 
 Number = Union[int, float]
 
@@ -13,6 +20,19 @@ Number = Union[int, float]
 class Operation(ABC):
     """Abstract base class for all operations."""
 
+    #: Canonical name the operation is registered under (e.g. ``"add"``).
+    name: str = ""
+
+    #: Symbol used when rendering a calculation (e.g. ``5 + 3 = 8``).
+    symbol: str = "?"
+
+    #: Stable numeric identifier used by binary encodings (0 = unassigned).
+    code: int = 0
+
+    #: Whether ``work_bits`` can grow large enough for the calculation to be
+    #: run in a worker process (see ``calculation.offload``).
+    offloadable: bool = False
+
     @abstractmethod
     def execute(self, a: Number, b: Number) -> Number:
         """
@@ -30,6 +50,47 @@ class Operation(ABC):
         """
         pass
 
+    def execute_many(
+        self, left: Sequence[Number], right: Sequence[Number]
+    ) -> List[Number]:
+        """
+        Execute the operation on each pair of numbers in one pass.
+
+        Subclasses override this with a check of the whole batch followed by
+        a C-level ``map``; callers fall back to ``execute`` per pair to find
+        which pairs fail.
+
+        Args:
+            left: First numbers
+            right: Second numbers
+
+        Returns:
+            Results, one per pair
+
+        Raises:
+            ValueError: If the operation cannot be performed on some pair
+        """
+        return list(map(self.execute, left, right))
+
+    def work_bits(self, a: Number, b: Number) -> int:
+        """
+        Estimate the cost of ``execute(a, b)``.
+
+        Returns:
+            Size in bits of an integer multiplication of similar cost, or 0
+            for operations that take constant or linear time
+        """
+        return 0
+
+    def max_work_bits(self, left: Sequence[Number], right: Sequence[Number]) -> int:
+        """
+        Bound ``work_bits`` over many pairs, more cheaply than pair by pair.
+
+        Returns:
+            A value at least as large as every pair's ``work_bits``
+        """
+        return max(map(self.work_bits, left, right), default=0)
+
     @abstractmethod
     def __str__(self) -> str:
         """String representation of the operation."""
@@ -39,10 +100,20 @@ class Operation(ABC):
 class AddOperation(Operation):
     """Addition operation."""
 
+    name = "add"
+    symbol = "+"
+    code = 1
+
     def execute(self, a: Number, b: Number) -> Number:
         """Add two numbers."""
         return a + b
 
+    def execute_many(
+        self, left: Sequence[Number], right: Sequence[Number]
+    ) -> List[Number]:
+        """Add pairs of numbers."""
+        return list(map(operator.add, left, right))
+
     def __str__(self) -> str:
         return "addition"
 
@@ -50,10 +121,20 @@ class AddOperation(Operation):
 class SubtractOperation(Operation):
     """Subtraction operation."""
 
+    name = "subtract"
+    symbol = "-"
+    code = 2
+
     def execute(self, a: Number, b: Number) -> Number:
         """Subtract second number from first number."""
         return a - b
 
+    def execute_many(
+        self, left: Sequence[Number], right: Sequence[Number]
+    ) -> List[Number]:
+        """Subtract pairs of numbers."""
+        return list(map(operator.sub, left, right))
+
     def __str__(self) -> str:
         return "subtraction"
 
@@ -61,10 +142,32 @@ class SubtractOperation(Operation):
 class MultiplyOperation(Operation):
     """Multiplication operation."""
 
+    name = "multiply"
+    symbol = "*"
+    code = 3
+    offloadable = True
+
     def execute(self, a: Number, b: Number) -> Number:
         """Multiply two numbers."""
         return a * b
 
+    def execute_many(
+        self, left: Sequence[Number], right: Sequence[Number]
+    ) -> List[Number]:
+        """Multiply pairs of numbers."""
+        return list(map(operator.mul, left, right))
+
+    def work_bits(self, a: Number, b: Number) -> int:
+        """The cost of an integer product grows with the smaller operand."""
+        if type(a) is int and type(b) is int:
+            bits, other = a.bit_length(), b.bit_length()
+            return bits if bits < other else other
+        return 0
+
+    def max_work_bits(self, left: Sequence[Number], right: Sequence[Number]) -> int:
+        """No product costs more than one of the two largest operands."""
+        return min(max_int_bits(left), max_int_bits(right))
+
     def __str__(self) -> str:
         return "multiplication"
 
@@ -72,11 +175,639 @@ class MultiplyOperation(Operation):
 class DivideOperation(Operation):
     """Division operation."""
 
+    name = "divide"
+    symbol = "/"
+    code = 4
+
     def execute(self, a: Number, b: Number) -> Number:
         """Divide first number by second number."""
         if b == 0:
             raise ValueError("Division by zero is not allowed")
         return a / b
 
+    def execute_many(
+        self, left: Sequence[Number], right: Sequence[Number]
+    ) -> List[Number]:
+        """Divide pairs of numbers."""
+        if 0 in right:
+            raise ValueError("Division by zero is not allowed")
+        return list(map(operator.truediv, left, right))
+
     def __str__(self) -> str:
         return "division"
+
+
+class PowerOperation(Operation):
+    """Exponentiation operation."""
+
+    name = "power"
+    symbol = "^"
+    code = 5
+    offloadable = True
+
+    #: Largest exact integer result, in bits (about 315,000 decimal digits).
+    #: Larger powers are rejected before any work is done.
+    MAX_RESULT_BITS = 1 << 20
+
+    def execute(self, a: Number, b: Number) -> Number:
+        """
+        Raise the first number to the power of the second.
+
+        Integer powers are exact and use the built-in exponentiation by
+        squaring, after checking the size of the result.
+
+        Raises:
+            ValueError: If the result would be too large, zero is raised to
+                a negative power, or a negative number to a fractional power
+        """
+        if isinstance(a, int) and isinstance(b, int) and b > 0 and abs(a) > 1:
+            if self._exceeds_max_bits(a, b):
+                raise ValueError(
+                    f"Result of {a} ^ {b} would exceed {self.MAX_RESULT_BITS} bits"
+                )
+        if a == 0 and b < 0:
+            raise ValueError("Zero cannot be raised to a negative power")
+        if a < 0 and not (isinstance(b, int) or b.is_integer()):
+            raise ValueError("Negative numbers cannot be raised to a fractional power")
+        try:
+            return a**b
+        except OverflowError:
+            raise ValueError(f"Result of {a} ^ {b} is too large") from None
+
+    def work_bits(self, a: Number, b: Number) -> int:
+        """The final squaring, of a number half the result's size, dominates."""
+        if type(a) is int and type(b) is int and b > 1 and abs(a) > 1:
+            if not self._exceeds_max_bits(a, b):
+                return int(b * math.log2(abs(a))) // 2
+        return 0
+
+    def _exceeds_max_bits(self, a: int, b: int) -> bool:
+        """
+        Check whether ``a ** b`` (``|a| > 1``, ``b > 0``) exceeds the size limit.
+
+        Since ``|a| >= 2``, an exponent above the limit is rejected in
+        integer arithmetic first, so the float estimate never sees an
+        exponent too large to convert.
+        """
+        return b > self.MAX_RESULT_BITS or b * math.log2(abs(a)) > self.MAX_RESULT_BITS
+
+    def __str__(self) -> str:
+        return "exponentiation"
+
+
+class ModuloOperation(Operation):
+    """Modulo (remainder) operation."""
+
+    name = "modulo"
+    symbol = "%"
+    code = 6
+    offloadable = True
+
+    def execute(self, a: Number, b: Number) -> Number:
+        """Remainder of the first number divided by the second (sign of ``b``)."""
+        if b == 0:
+            raise ValueError("Modulo by zero is not allowed")
+        return a % b
+
+    def execute_many(
+        self, left: Sequence[Number], right: Sequence[Number]
+    ) -> List[Number]:
+        """Remainders of pairs of numbers."""
+        if 0 in right:
+            raise ValueError("Modulo by zero is not allowed")
+        return list(map(operator.mod, left, right))
+
+    def work_bits(self, a: Number, b: Number) -> int:
+        """Long division; see ``division_work_bits``."""
+        return division_work_bits(a, b)
+
+    def max_work_bits(self, left: Sequence[Number], right: Sequence[Number]) -> int:
+        """Long division never costs more than the largest dividend's size."""
+        return max_int_bits(left)
+
+    def __str__(self) -> str:
+        return "modulo"
+
+
+class FloorDivideOperation(Operation):
+    """Floor (integer) division operation."""
+
+    name = "floordiv"
+    symbol = "//"
+    code = 7
+    offloadable = True
+
+    def execute(self, a: Number, b: Number) -> Number:
+        """Divide and round down to the nearest integer."""
+        if b == 0:
+            raise ValueError("Division by zero is not allowed")
+        return a // b
+
+    def execute_many(
+        self, left: Sequence[Number], right: Sequence[Number]
+    ) -> List[Number]:
+        """Floor-divide pairs of numbers."""
+        if 0 in right:
+            raise ValueError("Division by zero is not allowed")
+        return list(map(operator.floordiv, left, right))
+
+    def work_bits(self, a: Number, b: Number) -> int:
+        """Long division; see ``division_work_bits``."""
+        return division_work_bits(a, b)
+
+    def max_work_bits(self, left: Sequence[Number], right: Sequence[Number]) -> int:
+        """Long division never costs more than the largest dividend's size."""
+        return max_int_bits(left)
+
+    def __str__(self) -> str:
+        return "floor division"
+
+
+def division_work_bits(a: Number, b: Number) -> int:
+    """
+    Estimate the cost of integer floor division or modulo.
+
+    Long division takes time proportional to the sizes of the quotient and
+    the divisor; it is about twice as slow as a multiplication of their
+    geometric mean size.
+    """
+    if type(a) is int and type(b) is int and b:
+        divisor = b.bit_length()
+        quotient = a.bit_length() - divisor
+        if quotient > 0:
+            return 2 * math.isqrt(quotient * divisor)
+    return 0
+
+
+def max_int_bits(values: Sequence[Number]) -> int:
+    """Bit length of the largest ``int`` in ``values`` (other types ignored)."""
+    types = set(map(type, values))
+    if types == {int}:
+        return max(map(int.bit_length, values))
+    if int not in types:
+        return 0
+    return max(value.bit_length() for value in values if type(value) is int)
+
+
+def powmod(base: int, exponent: int, modulus: int) -> int:
+    """
+    Compute ``base ** exponent % modulus`` without the full power.
+
+    Uses the built-in modular exponentiation (sliding-window squaring with
+    reduction after every step), so the cost grows with the size of the
+    modulus rather than of the power. A negative exponent gives a power of
+    the modular inverse of ``base``.
+
+    Raises:
+        ValueError: If an operand is not an integer, the modulus is zero, or
+            the base has no inverse for a negative exponent
+    """
+    if not all(type(value) is int for value in (base, exponent, modulus)):
+        raise ValueError("powmod requires integer operands")
+    if modulus == 0:
+        raise ValueError("Modulo by zero is not allowed")
+    try:
+        return pow(base, exponent, modulus)
+    except ValueError:
+        raise ValueError(f"{base} has no inverse modulo {modulus}") from None
+
+
+class PowModOperation(Operation):
+    """Modular exponentiation ``a ^ b mod modulus`` for a fixed modulus."""
+
+    name = "powmod"
+    symbol = "powmod"
+
+    def __init__(self, modulus: int):
+        """
+        Initialize the operation.
+
+        Args:
+            modulus: Modulus the power is reduced by
+        """
+        self.modulus = modulus
+
+    def execute(self, a: Number, b: Number) -> Number:
+        """Raise ``a`` to the power ``b`` modulo ``modulus``."""
+        return powmod(a, b, self.modulus)
+
+    def __str__(self) -> str:
+        return f"modular exponentiation (mod {self.modulus})"
+
+
+class Accumulator(ABC):
+    """Running state of one reduction, fed a chunk of values at a time."""
+
+    def __init__(self):
+        """Initialize an empty accumulator."""
+        self.count = 0
+
+    @abstractmethod
+    def update(self, values: Sequence[Number]) -> None:
+        """
+        Fold a chunk of values into the running state.
+
+        Args:
+            values: Chunk of numbers
+        """
+        pass
+
+    @abstractmethod
+    def result(self) -> Number:
+        """
+        Return the reduction of every value seen so far.
+
+        Raises:
+            ValueError: If the reduction is undefined (e.g. mean of no values)
+        """
+        pass
+
+
+class Reduction(ABC):
+    """Abstract base class for operations reducing many numbers to one."""
+
+    #: Canonical name the reduction is registered under (e.g. ``"sum"``).
+    name: str = ""
+
+    #: Values consumed at a time when reducing an iterable.
+    CHUNK_SIZE = 4096
+
+    @abstractmethod
+    def accumulator(self) -> Accumulator:
+        """Return a new, empty accumulator for this reduction."""
+        pass
+
+    def reduce(self, values: Iterable[Number], chunk_size: int = 0) -> Number:
+        """
+        Reduce an iterable, generator or array of numbers.
+
+        The values are consumed ``chunk_size`` at a time, so generators of any
+        length run in constant memory.
+
+        Args:
+            values: Numbers to reduce
+            chunk_size: Values per chunk (defaults to ``CHUNK_SIZE``)
+
+        Returns:
+            Result of the reduction
+
+        Raises:
+            ValueError: If the reduction is undefined for the values
+        """
+        accumulator = self.accumulator()
+        for chunk in chunked(values, chunk_size or self.CHUNK_SIZE):
+            accumulator.update(chunk)
+        return accumulator.result()
+
+    def __str__(self) -> str:
+        return self.name
+
+
+def chunked(values: Iterable[Number], size: int) -> Iterable[Sequence[Number]]:
+    """Split values into sequences of at most ``size`` items."""
+    if isinstance(values, (SequenceABC, array.array)) and not isinstance(
+        values, (str, bytes)
+    ):
+        for start in range(0, len(values), size):
+            yield values[start : start + size]
+        return
+    iterator = iter(values)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class CompensatedSum:
+    """Neumaier (improved Kahan) summation of float partial sums."""
+
+    __slots__ = ("total", "compensation")
+
+    def __init__(self):
+        self.total = 0.0
+        self.compensation = 0.0
+
+    def add(self, value: float) -> None:
+        """Add a value, carrying its rounding error in the compensation term."""
+        total = self.total + value
+        if not math.isfinite(total):
+            self.total, self.compensation = total, 0.0
+            return
+        if abs(self.total) >= abs(value):
+            self.compensation += (self.total - total) + value
+        else:
+            self.compensation += (value - total) + self.total
+        self.total = total
+
+    def value(self) -> float:
+        """The compensated sum."""
+        return self.total + self.compensation
+
+
+def float_sum(values: Sequence[Number]) -> float:
+    """
+    Correctly rounded float sum of a chunk (``math.fsum``).
+
+    Falls back to plain float addition when the chunk holds infinities or
+    NaNs, or its exact sum overflows, so the result follows float semantics
+    (``inf``, ``nan``) instead of raising.
+    """
+    try:
+        return math.fsum(values)
+    except (OverflowError, ValueError):
+        return sum(map(float, values))
+
+
+class SumAccumulator(Accumulator):
+    """
+    Accurate running sum.
+
+    Integer chunks are summed exactly. Float chunks are summed with
+    ``math.fsum`` and the chunk sums are combined with Neumaier compensation,
+    so the error does not grow with the number of values the way a fold of
+    ``AddOperation`` does.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.integers = 0
+        self.floats: Optional[CompensatedSum] = None
+
+    def update(self, values: Sequence[Number]) -> None:
+        self.count += len(values)
+        try:
+            total = sum(values)
+            if type(total) is int:
+                self.integers += total
+                return
+            partial = float_sum(values)
+        except OverflowError:  # an integer too large for a float among floats
+            self.integers += sum(value for value in values if type(value) is int)
+            partial = float_sum([value for value in values if type(value) is not int])
+        if self.floats is None:
+            self.floats = CompensatedSum()
+        self.floats.add(partial)
+
+    def result(self) -> Number:
+        if self.floats is None:
+            return self.integers
+        try:
+            return float_sum(
+                (float(self.integers), self.floats.total, self.floats.compensation)
+            )
+        except OverflowError:
+            raise ValueError("Sum is too large to represent as a float") from None
+
+
+class SumReduction(Reduction):
+    """Sum of the values (0 for no values)."""
+
+    name = "sum"
+
+    def accumulator(self) -> SumAccumulator:
+        return SumAccumulator()
+
+
+class MeanAccumulator(Accumulator):
+    """
+    Arithmetic mean whose intermediate sum cannot overflow.
+
+    Integer chunks are summed exactly. Each float chunk is summed with
+    ``math.fsum`` (scaled down by a power of two if its sum overflows) and
+    the chunk sums are added exactly, as integers in units of the smallest
+    float. The mean is then one correctly rounded division, so it fails
+    only if the mean itself is beyond the float range.
+    """
+
+    #: Binary digits after the point of the smallest positive float.
+    FRACTION_BITS = 1074
+
+    def __init__(self):
+        super().__init__()
+        self.integers = 0
+        #: Exact sum of the float chunk sums, times ``2 ** FRACTION_BITS``.
+        self.scaled = 0
+        #: Sum of the infinite or NaN chunk sums, if there were any.
+        self.special: Optional[float] = None
+
+    def update(self, values: Sequence[Number]) -> None:
+        self.count += len(values)
+        try:
+            total = sum(values)
+            if type(total) is int:
+                self.integers += total
+                return
+            floats = values
+        except OverflowError:  # an integer too large for a float among floats
+            self.integers += sum(value for value in values if type(value) is int)
+            floats = [value for value in values if type(value) is not int]
+        shift = 0
+        try:
+            partial = math.fsum(floats)
+        except OverflowError:
+            # Finite values whose sum overflows: scaling by a power of two
+            # is exact, and with 2 ** shift >= len(floats) it cannot overflow.
+            shift = len(floats).bit_length()
+            partial = math.fsum(math.ldexp(value, -shift) for value in floats)
+        except ValueError:  # inf - inf
+            partial = math.nan
+        if not math.isfinite(partial):
+            self.special = partial if self.special is None else self.special + partial
+            return
+        numerator, denominator = partial.as_integer_ratio()
+        self.scaled += (numerator << (self.FRACTION_BITS + shift)) // denominator
+
+    def result(self) -> Number:
+        if not self.count:
+            raise ValueError("Cannot take the mean of no values")
+        if self.special is not None:
+            return self.special
+        unit = 1 << self.FRACTION_BITS
+        try:
+            return (self.integers * unit + self.scaled) / (self.count * unit)
+        except OverflowError:
+            raise ValueError("Mean is too large to represent as a float") from None
+
+
+class MeanReduction(Reduction):
+    """Arithmetic mean of the values."""
+
+    name = "mean"
+
+    def accumulator(self) -> MeanAccumulator:
+        return MeanAccumulator()
+
+
+class ProductAccumulator(Accumulator):
+    """
+    Running product that neither overflows nor underflows part way.
+
+    Integer chunks are multiplied exactly. Float products are kept as a
+    mantissa and a binary exponent (``math.frexp``), so an intermediate
+    ``1e200 * 1e200`` followed by ``1e-300`` still gives ``1e100``.
+
+    With ``log_space`` the float factors are instead accumulated as a sign
+    and a compensated sum of ``log|x|``. This costs a few ulps of accuracy;
+    use it when only the magnitude matters, e.g. through ``log_abs`` for
+    products far beyond the float range.
+    """
+
+    def __init__(self, log_space: bool = False):
+        super().__init__()
+        self.log_space = log_space
+        self.integers = 1
+        self.mantissa = 1.0
+        self.exponent = 0
+        self.negative = False
+        self.zero = False
+        self.logs = CompensatedSum()
+        self.has_floats = False
+
+    def update(self, values: Sequence[Number]) -> None:
+        self.count += len(values)
+        if all(type(value) is int for value in values):
+            self.integers *= math.prod(values)
+            return
+        self.has_floats = True
+        update = self._update_logs if self.log_space else self._update_scaled
+        try:
+            update(values)
+        except OverflowError:  # an integer too large for a float among floats
+            self.integers *= math.prod(value for value in values if type(value) is int)
+            update([value for value in values if type(value) is not int])
+
+    def _update_scaled(self, values: Sequence[Number]) -> None:
+        """Fold a chunk into the mantissa and exponent."""
+        largest = max(map(abs, values))
+        smallest = min(map(abs, values))
+        if smallest == 0 or not math.isfinite(largest):
+            # Zero, inf or nan: the product is one of those whatever the rest.
+            self._scale(0.0 * largest if smallest == 0 else math.prod(values))
+            return
+        # A block of n factors within [2**-bits, 2**bits] cannot leave the
+        # normal float range (2**-1022 .. 2**1024) while it is multiplied.
+        bits = max(math.frexp(largest)[1], 1 - math.frexp(smallest)[1], 1)
+        block = max(1000 // bits, 1)
+        for start in range(0, len(values), block):
+            self._scale(math.prod(values[start : start + block]))
+
+    def _scale(self, value: float) -> None:
+        """Multiply the mantissa and renormalize it into [0.5, 1)."""
+        mantissa, exponent = math.frexp(self.mantissa * value)
+        self.mantissa = mantissa
+        self.exponent += exponent
+
+    def _update_logs(self, values: Sequence[Number]) -> None:
+        """Fold a chunk into the sign and the sum of logarithms."""
+        if self.zero or 0 in values:
+            self.zero = True
+            return
+        if sum(map(functools.partial(operator.gt, 0), values)) % 2:
+            self.negative = not self.negative
+        self.logs.add(float_sum(list(map(math.log, map(abs, values)))))
+
+    def log_abs(self) -> Tuple[int, float]:
+        """
+        Return the product as ``(sign, log|product|)``.
+
+        ``sign`` is -1, 0 or 1; ``log|product|`` is ``-inf`` for a zero
+        product. Unlike ``result`` this is finite for products beyond the
+        float range.
+        """
+        if self.log_space:
+            if self.zero or self.integers == 0:
+                return 0, float("-inf")
+            negative = self.negative ^ (self.integers < 0)
+            log = self.logs.value() + math.log(abs(self.integers))
+        else:
+            if self.mantissa == 0 or self.integers == 0:
+                return 0, float("-inf")
+            negative = (self.mantissa < 0) ^ (self.integers < 0)
+            log = (
+                math.log(abs(self.mantissa))
+                + self.exponent * math.log(2)
+                + math.log(abs(self.integers))
+            )
+        return (-1 if negative else 1), log
+
+    def result(self) -> Number:
+        if not self.has_floats:
+            return self.integers
+        if self.log_space:
+            sign, log = self.log_abs()
+            if sign == 0:
+                return 0.0
+            try:
+                return sign * math.exp(log)
+            except OverflowError:
+                return sign * math.inf
+        integers, shift = _scale_int(self.integers)
+        try:
+            return math.ldexp(self.mantissa * integers, self.exponent + shift)
+        except OverflowError:
+            return math.copysign(math.inf, self.mantissa * integers)
+
+
+def _scale_int(value: int) -> Tuple[float, int]:
+    """Split an integer into a float and a power of two that never overflow."""
+    shift = max(value.bit_length() - 64, 0)
+    return float(value >> shift), shift
+
+
+class ProductReduction(Reduction):
+    """Product of the values (1 for no values)."""
+
+    name = "product"
+
+    def __init__(self, log_space: bool = False):
+        """
+        Initialize the reduction.
+
+        Args:
+            log_space: Accumulate float factors as a sum of logarithms
+        """
+        self.log_space = log_space
+
+    def accumulator(self) -> ProductAccumulator:
+        return ProductAccumulator(self.log_space)
+
+
+class ExtremumAccumulator(Accumulator):
+    """Running minimum or maximum."""
+
+    def __init__(self, name: str, pick):
+        super().__init__()
+        self.name = name
+        self.pick = pick
+        self.best: Optional[Number] = None
+
+    def update(self, values: Sequence[Number]) -> None:
+        if not len(values):
+            return
+        self.count += len(values)
+        best = self.pick(values)
+        self.best = best if self.best is None else self.pick(self.best, best)
+
+    def result(self) -> Number:
+        if self.best is None:
+            raise ValueError(f"Cannot take the {self.name} of no values")
+        return self.best
+
+
+class MinReduction(Reduction):
+    """Smallest of the values."""
+
+    name = "min"
+
+    def accumulator(self) -> ExtremumAccumulator:
+        return ExtremumAccumulator("minimum", min)
+
+
+class MaxReduction(Reduction):
+    """Largest of the values."""
+
+    name = "max"
+
+    def accumulator(self) -> ExtremumAccumulator:
+        return ExtremumAccumulator("maximum", max)
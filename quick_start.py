@@ -21,6 +21,9 @@ def show_usage():
 1. INTERACTIVE MODE:
    python calculator/__init__.py
 
+   PIPE MODE (non-interactive, detected automatically):
+   cat exprs.txt | python -m calculator [--errors=stderr|inline|skip]
+
 2. DEMO MODE (See calculator in action):
    python demo.py
 
@@ -42,7 +45,11 @@ Basic Operations:
 
 Built-in Commands:
   help           Show help
-  history        Show calculation history
+  history        Show calculation history (first page)
+  history --page N --size K
+                 Show page N, K entries per page
+  history --tail [K]
+                 Show the last K calculations
   clear          Clear history
   exit           Exit calculator
 
@@ -0,0 +1,36 @@
+"""
+Service module for calculator application.
+
+This module exposes the calculation service used to serve many concurrent
+clients on top of ``CalculationFactory``, its admission control, and its
+HTTP front-end with response caching, pre-fork multi-worker mode and
+WebSocket calculation streams, and a binary RPC server over Unix domain
+sockets for co-located clients.
+"""
+
+from .admission import PRIORITIES, AdmissionController, Lane, ServiceOverloaded
+from .cache import ResponseCache
+from .core import CalculationService
+from .http import CalculationHTTPServer
+from .prefork import PreforkServer
+from .rpc import CalculationRPCServer, RPCClient
+from .runner import ServerThread
+from .singleflight import SingleFlight
+from .stream import StreamClient, StreamHandler
+
+__all__ = [
+    "PRIORITIES",
+    "AdmissionController",
+    "CalculationHTTPServer",
+    "CalculationRPCServer",
+    "CalculationService",
+    "Lane",
+    "PreforkServer",
+    "RPCClient",
+    "ResponseCache",
+    "ServerThread",
+    "ServiceOverloaded",
+    "SingleFlight",
+    "StreamClient",
+    "StreamHandler",
+]
@@ -0,0 +1,10 @@
+"""
+Entry point for ``python -m service``.
+
+Runs the calculation service over HTTP.
+"""
+
+from service.http import main
+
+if __name__ == "__main__":
+    main()
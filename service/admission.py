@@ -0,0 +1,247 @@
+"""
+Admission control for the calculation service.
+
+Work is admitted into named lanes (e.g. ``single`` and ``batch``), each with
+its own worker threads and one bounded queue per priority. When a queue is
+full the request is rejected immediately with a retry hint instead of being
+allowed to pile up, so a flood in one lane cannot delay the others.
+"""
+
+import collections
+import math
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+#: Priorities in the order they are served.
+PRIORITIES = ("high", "normal", "low")
+
+
+class ServiceOverloaded(Exception):
+    """Raised when a request is rejected by admission control."""
+
+    def __init__(self, message: str, status: int = 429, retry_after: float = 1.0):
+        """
+        Initialize the rejection.
+
+        Args:
+            message: Human readable reason
+            status: HTTP status to report: 429 when a queue is full,
+                503 when the service is shutting down
+            retry_after: Suggested delay in seconds before retrying
+        """
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class Lane:
+    """A pool of worker threads fed by bounded per-priority queues."""
+
+    #: Number of recent queue wait times kept for percentile metrics.
+    WAIT_SAMPLES = 1024
+
+    def __init__(self, name: str, workers: int = 4, capacity: int = 64):
+        """
+        Initialize the lane and start its workers.
+
+        Args:
+            name: Lane name used in metrics and error messages
+            workers: Number of worker threads
+            capacity: Maximum queued items per priority
+        """
+        if workers < 1 or capacity < 1:
+            raise ValueError("Lane workers and capacity must be positive")
+        self.name = name
+        self.capacity = capacity
+        self._condition = threading.Condition()
+        self._queues: Dict[str, Deque[Tuple[float, Callable[[], Any], Future]]] = {
+            priority: collections.deque() for priority in PRIORITIES
+        }
+        self._closed = False
+        self._busy = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self._waits: Deque[float] = collections.deque(maxlen=self.WAIT_SAMPLES)
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._service_time = 0.0
+        self._threads = [
+            threading.Thread(
+                target=self._worker, name=f"{name}-worker-{i}", daemon=True
+            )
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, fn: Callable[[], Any], priority: str = "normal") -> Future:
+        """
+        Queue ``fn`` for execution.
+
+        Args:
+            fn: Work to run on a lane worker
+            priority: One of ``PRIORITIES``
+
+        Returns:
+            Future resolved with the result of ``fn``
+
+        Raises:
+            ValueError: If the priority is unknown
+            ServiceOverloaded: If the lane is closed or the queue is full
+        """
+        if priority not in self._queues:
+            raise ValueError(
+                f"Invalid priority: '{priority}'. "
+                f"Valid priorities are: {', '.join(PRIORITIES)}"
+            )
+        future: Future = Future()
+        with self._condition:
+            if self._closed:
+                self.rejected += 1
+                raise ServiceOverloaded(
+                    f"Lane '{self.name}' is shutting down", status=503
+                )
+            queue = self._queues[priority]
+            if len(queue) >= self.capacity:
+                self.rejected += 1
+                raise ServiceOverloaded(
+                    f"Lane '{self.name}' queue for priority '{priority}' is full",
+                    status=429,
+                    retry_after=self._retry_after_locked(),
+                )
+            queue.append((time.monotonic(), fn, future))
+            self.admitted += 1
+            self._condition.notify()
+        return future
+
+    def _retry_after_locked(self) -> float:
+        """Estimate how long the current backlog takes to drain."""
+        depth = sum(len(queue) for queue in self._queues.values())
+        average = self._service_time / self.completed if self.completed else 0.0
+        return max(1.0, depth * average / len(self._threads))
+
+    def _worker(self) -> None:
+        """Run queued work, highest priority first, until the lane closes."""
+        while True:
+            with self._condition:
+                item = self._next_locked()
+                while item is None:
+                    if self._closed:
+                        return
+                    self._condition.wait()
+                    item = self._next_locked()
+                queued_at, fn, future = item
+                wait = time.monotonic() - queued_at
+                self._waits.append(wait)
+                self._wait_total += wait
+                self._wait_max = max(self._wait_max, wait)
+                self._busy += 1
+
+            started = time.monotonic()
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn())
+                except BaseException as e:
+                    future.set_exception(e)
+
+            with self._condition:
+                self._busy -= 1
+                self.completed += 1
+                self._service_time += time.monotonic() - started
+
+    def _next_locked(self) -> Optional[Tuple[float, Callable[[], Any], Future]]:
+        """Pop the oldest item of the highest non-empty priority."""
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            if queue:
+                return queue.popleft()
+        return None
+
+    def close(self, wait: bool = True) -> None:
+        """
+        Stop admitting work; queued work is still executed.
+
+        Args:
+            wait: Block until the workers have drained the queues
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return queue depth, throughput and queue wait-time metrics."""
+        with self._condition:
+            waits = sorted(self._waits)
+            waited = self.completed + self._busy
+            return {
+                "workers": len(self._threads),
+                "busy": self._busy,
+                "capacity": self.capacity,
+                "depth": {p: len(q) for p, q in self._queues.items()},
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "completed": self.completed,
+                "wait_seconds": {
+                    "mean": self._wait_total / waited if waited else 0.0,
+                    "max": self._wait_max,
+                    "p50": _percentile(waits, 0.50),
+                    "p99": _percentile(waits, 0.99),
+                },
+            }
+
+
+class AdmissionController:
+    """Routes work into lanes and rejects it fast when they are saturated."""
+
+    def __init__(self, lanes: Optional[Dict[str, Lane]] = None):
+        """
+        Initialize the controller.
+
+        Args:
+            lanes: Lanes by name. Defaults to a ``single`` lane with four
+                workers for individual calculations and a ``batch`` lane
+                with one worker and a short queue for batches.
+        """
+        if lanes is None:
+            lanes = {
+                "single": Lane("single", workers=4, capacity=256),
+                "batch": Lane("batch", workers=1, capacity=8),
+            }
+        self.lanes = lanes
+
+    def submit(
+        self, lane: str, fn: Callable[[], Any], priority: str = "normal"
+    ) -> Future:
+        """
+        Admit ``fn`` into a lane.
+
+        Raises:
+            ValueError: If the lane or priority is unknown
+            ServiceOverloaded: If the lane cannot accept more work
+        """
+        if lane not in self.lanes:
+            raise ValueError(f"Unknown lane: '{lane}'")
+        return self.lanes[lane].submit(fn, priority)
+
+    def close(self, wait: bool = True) -> None:
+        """Close every lane."""
+        for lane in set(self.lanes.values()):
+            lane.close(wait=wait)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return metrics for every lane."""
+        return {name: lane.metrics() for name, lane in self.lanes.items()}
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    rank = max(math.ceil(fraction * len(ordered)) - 1, 0)
+    return ordered[rank]
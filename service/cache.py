@@ -0,0 +1,162 @@
+"""
+Response cache for idempotent calculation requests.
+
+Calculation results are pure functions of the canonical operation and its
+operands, so the encoded response body can be stored and replayed byte for
+byte. Each entry carries a strong ETag derived from the body. The cache is
+charged to the process-wide memory ``budget`` and is the first thing
+evicted when the budget is exceeded.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, NamedTuple, Optional
+
+from memory import PRIORITY_CACHE, budget
+
+
+class CachedResponse(NamedTuple):
+    """An encoded response body and its strong ETag."""
+
+    body: bytes
+    etag: str
+
+
+def make_etag(body: bytes) -> str:
+    """Return a strong ETag for a response body."""
+    return f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Check an ``If-None-Match`` header against an ETag.
+
+    Uses the weak comparison required for ``If-None-Match``: ``W/`` prefixes
+    are ignored and ``*`` matches any current representation.
+    """
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class ResponseCache:
+    """Size-bounded LRU cache of encoded responses."""
+
+    #: Approximate bookkeeping cost of one entry, added to its body size.
+    ENTRY_OVERHEAD = 200
+
+    def __init__(self, max_entries: int = 100000, max_bytes: int = 64 << 20):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of cached responses
+            max_bytes: Maximum total size of cached responses
+        """
+        if max_entries < 1 or max_bytes < 1:
+            raise ValueError("Cache bounds must be positive")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.not_modified = 0
+        self._account = budget.account("response_cache", PRIORITY_CACHE, self._shrink)
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        """Return the cached response for ``key`` and mark it recently used."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Hashable, body: bytes) -> CachedResponse:
+        """
+        Store an encoded response body.
+
+        Bodies larger than the whole cache are returned but not stored.
+
+        Returns:
+            The cached response with its ETag
+        """
+        entry = CachedResponse(body, make_etag(body))
+        size = len(body) + self.ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return entry
+        with self._lock:
+            before = self._bytes
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous.body) + self.ENTRY_OVERHEAD
+            self._entries[key] = entry
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.body) + self.ENTRY_OVERHEAD
+                self.evictions += 1
+            delta = self._bytes - before
+        # Charged outside the lock: exceeding the budget may call _shrink.
+        if delta > 0:
+            self._account.charge(delta)
+        else:
+            self._account.release(-delta)
+        return entry
+
+    def _shrink(self, size: int) -> int:
+        """Evict least recently used entries until ``size`` bytes are freed."""
+        freed = 0
+        with self._lock:
+            while freed < size and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                freed += len(evicted.body) + self.ENTRY_OVERHEAD
+                self.evictions += 1
+            self._bytes -= freed
+        self._account.release(freed)
+        return freed
+
+    def record_not_modified(self) -> None:
+        """Count a request answered with 304 Not Modified."""
+        with self._lock:
+            self.not_modified += 1
+
+    def clear(self) -> int:
+        """Drop every entry and return how many were removed."""
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            freed, self._bytes = self._bytes, 0
+        self._account.release(freed)
+        return count
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return size and hit-rate metrics."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "not_modified": self.not_modified,
+            }
@@ -0,0 +1,179 @@
+"""
+Calculation service.
+
+The service is the entry point used by network front-ends and concurrent
+clients. It validates requests through ``CalculationFactory``, deduplicates
+identical in-flight calculations and, when configured with an
+``AdmissionController``, runs work in bounded lanes so that overload is
+rejected quickly rather than queued without limit.
+"""
+
+from concurrent.futures import Future
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+from calculation import CalculationFactory
+from calculation.batch import BatchItem, BatchResult
+from calculation.tuning import tuner
+from calculator.core import evaluate
+from tracing import tracer
+
+from .admission import AdmissionController, ServiceOverloaded
+from .singleflight import SingleFlight
+
+Number = Union[int, float]
+
+
+class CalculationService:
+    """Thread-safe calculation service with in-flight request coalescing."""
+
+    def __init__(
+        self,
+        coalesce: bool = True,
+        admission: Optional[AdmissionController] = None,
+    ):
+        """
+        Initialize the service.
+
+        Args:
+            coalesce: Share one execution between concurrent identical
+                requests (keyed by canonical operation and operands)
+            admission: Admission controller providing ``single`` and
+                ``batch`` lanes. Without one, work runs in the caller's
+                thread.
+        """
+        self.coalesce = coalesce
+        self.admission = admission
+        self._flights = SingleFlight()
+
+    def submit(
+        self, a: Number, b: Number, operation_type: str, priority: str = "normal"
+    ) -> Future:
+        """
+        Start a single calculation.
+
+        Args:
+            a: First operand
+            b: Second operand
+            operation_type: Operation name or symbol
+            priority: Admission priority ('high', 'normal' or 'low')
+
+        Returns:
+            Future resolved with the result. It fails with ``ValueError`` if
+            the calculation cannot be performed, or ``ServiceOverloaded`` if
+            admission control rejected it.
+
+        Raises:
+            ValueError: If the operation is unsupported
+        """
+        key = CalculationFactory.canonical_key(a, b, operation_type)
+        start = partial(
+            self._dispatch, "single", partial(self._execute, a, b, key[0]), priority
+        )
+        if not self.coalesce:
+            return start()
+        return self._flights.submit(key, start)
+
+    def calculate(
+        self, a: Number, b: Number, operation_type: str, priority: str = "normal"
+    ) -> Number:
+        """
+        Perform a single calculation and wait for its result.
+
+        Raises:
+            ValueError: If the operation is unsupported or cannot be performed
+            ServiceOverloaded: If admission control rejected the request
+        """
+        return self.submit(a, b, operation_type, priority).result()
+
+    def submit_batch(
+        self, items: Sequence[BatchItem], priority: str = "normal"
+    ) -> Future:
+        """
+        Start a batch of calculations in the batch lane.
+
+        Each operation's group runs on the engine the process-wide
+        ``Autotuner`` picks for it (``vectorized`` until it is calibrated).
+
+        Returns:
+            Future resolved with one result or ``ValueError`` per item
+        """
+        return self._dispatch("batch", partial(tuner.execute_batch, items), priority)
+
+    def calculate_batch(
+        self, items: Sequence[BatchItem], priority: str = "normal"
+    ) -> List[BatchResult]:
+        """
+        Perform a batch of calculations and wait for the results.
+
+        Raises:
+            ServiceOverloaded: If admission control rejected the batch
+        """
+        return self.submit_batch(items, priority).result()
+
+    def submit_reduction(
+        self, reduction_type: str, values: Sequence[Number], priority: str = "normal"
+    ) -> Future:
+        """
+        Start a reduction (sum, product, mean, min, max) in the batch lane.
+
+        Returns:
+            Future resolved with the result. It fails with ``ValueError`` if
+            the reduction is undefined for the values.
+
+        Raises:
+            ValueError: If the reduction is unsupported
+        """
+        reduction = CalculationFactory.get_reduction(reduction_type)
+        return self._dispatch("batch", partial(reduction.reduce, values), priority)
+
+    def reduce(
+        self, reduction_type: str, values: Sequence[Number], priority: str = "normal"
+    ) -> Number:
+        """
+        Perform a reduction and wait for its result.
+
+        Raises:
+            ValueError: If the reduction is unsupported or undefined
+            ServiceOverloaded: If admission control rejected the request
+        """
+        return self.submit_reduction(reduction_type, values, priority).result()
+
+    def _dispatch(self, lane: str, fn: Callable[[], Any], priority: str) -> Future:
+        """Run ``fn`` in an admission lane, or inline without admission control."""
+        future: Future
+        if self.admission is not None:
+            try:
+                return self.admission.submit(lane, fn, priority)
+            except ServiceOverloaded as e:
+                future = Future()
+                future.set_exception(e)
+                return future
+        future = Future()
+        try:
+            future.set_result(fn())
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    @staticmethod
+    def _execute(a: Number, b: Number, operation: str) -> Number:
+        """Execute a calculation (as a traced ``Calculation`` when sampled)."""
+        scope = tracer.start("service.calculate") if tracer.enabled else None
+        if scope is None:
+            return evaluate(operation, a, b)
+        with scope as trace:
+            trace.set_attribute("operation", operation)
+            return CalculationFactory.create_calculation(a, b, operation).execute()
+
+    def close(self) -> None:
+        """Stop admitting work and drain the admission lanes."""
+        if self.admission is not None:
+            self.admission.close()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return service counters."""
+        metrics: Dict[str, Any] = {"coalescing": self._flights.stats()}
+        if self.admission is not None:
+            metrics["admission"] = self.admission.metrics()
+        return metrics
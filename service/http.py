@@ -0,0 +1,727 @@
+"""
+HTTP front-end for the calculation service.
+
+A small HTTP/1.1 server built on asyncio streams. Requests are handed to a
+``CalculationService``; work runs in the service's admission lanes so the
+event loop only parses requests and writes responses.
+
+Endpoints:
+    GET  /calculate?a=5&b=3&operation=add
+    POST /calculate   {"a": 5, "b": 3, "operation": "add"}
+    POST /batch       {"items": [{"a": 5, "b": 3, "operation": "+"}, ...]}
+    POST /reduce      {"operation": "sum", "values": [1, 2, 3]}
+    GET  /stream      (WebSocket upgrade, see ``service.stream``)
+    GET  /history/feed?after=42   (server-sent events, with a history)
+    GET  /metrics
+    GET  /metrics/sketch   (with result sketching)
+    GET  /health
+
+Successful single calculations are served from a ``ResponseCache`` keyed by
+the canonical request, with a strong ``ETag`` and a long-lived
+``Cache-Control`` header; ``If-None-Match`` revalidation is answered with
+``304 Not Modified``.
+
+A server given a history records the calculations it computes (responses
+served from the cache are repeats and are not recorded again) and streams
+the history's change feed on ``/history/feed`` as server-sent events, one
+per change with the feed's sequence number as the event id. A reconnecting
+client resumes after its ``Last-Event-ID`` (or ``after``); ``policy`` picks
+what happens when the client falls behind (see ``calculator.feed``).
+
+A server given a ``sketch.ResultSketch`` feeds it every result computed
+for ``/calculate`` and ``/batch``: ``/metrics`` reports result quantiles and
+the number of distinct expressions, and ``/metrics/sketch`` serves the
+sketch's state so that the sketches of several workers or shards can be
+merged (``python -m sketch``).
+
+The optional ``X-Priority`` request header ('high', 'normal' or 'low') selects
+the admission priority. Requests rejected by admission control get a 429 or
+503 response with a ``Retry-After`` header.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import socket
+from http import HTTPStatus
+from typing import Any, Dict, List, Optional, Tuple, Union
+from urllib.parse import parse_qsl, urlsplit
+
+from calculation import Calculation, CalculationFactory
+from calculation.offload import dispatcher
+from calculation.tuning import STRATEGIES, format_report, tuner
+from calculator import CalculatorHistory
+from calculator.feed import POLICIES, FeedOverflow, HistoryEvent
+from memory import budget, parse_size
+from sketch import ResultSketch
+
+from .admission import PRIORITIES, AdmissionController, Lane, ServiceOverloaded
+from .cache import ResponseCache, etag_matches
+from .core import CalculationService
+from .rpc import CalculationRPCServer
+from .stream import StreamHandler
+
+Number = Union[int, float]
+Response = Tuple[int, Dict[str, str], bytes]
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+class HTTPError(Exception):
+    """An error that is reported to the client as an HTTP response."""
+
+    def __init__(
+        self, status: int, message: str, headers: Optional[Dict[str, str]] = None
+    ):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+class Request:
+    """A parsed HTTP request."""
+
+    def __init__(
+        self,
+        method: str,
+        target: str,
+        version: str,
+        headers: Dict[str, str],
+        body: bytes,
+    ):
+        url = urlsplit(target)
+        self.method = method
+        self.path = url.path
+        self.query = dict(parse_qsl(url.query, keep_blank_values=True))
+        self.version = version
+        self.headers = headers
+        self.body = body
+
+    @property
+    def keep_alive(self) -> bool:
+        """Whether the connection should stay open after the response."""
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+    def json(self) -> Any:
+        """Decode the body as JSON."""
+        try:
+            return json.loads(self.body)
+        except ValueError:
+            raise HTTPError(400, "Request body is not valid JSON") from None
+
+
+class CalculationHTTPServer:
+    """Serves a ``CalculationService`` over HTTP/1.1."""
+
+    MAX_HEADERS = 100
+
+    def __init__(
+        self,
+        service: Optional[CalculationService] = None,
+        host: str = "127.0.0.1",
+        port: int = 8000,
+        max_body_size: int = 1 << 20,
+        max_batch_items: int = 10000,
+        cache: Optional[ResponseCache] = None,
+        cache_max_age: int = 86400,
+        stream: Optional[StreamHandler] = None,
+        history: Optional[Any] = None,
+        sketch: Optional[ResultSketch] = None,
+    ):
+        """
+        Initialize the server.
+
+        Args:
+            service: Service handling the requests. Defaults to a coalescing
+                service with the default admission lanes.
+            host: Interface to bind
+            port: Port to bind (0 picks a free port)
+            max_body_size: Largest accepted request body in bytes
+            max_batch_items: Largest accepted batch
+            cache: Cache of encoded single-calculation responses. Defaults
+                to a ``ResponseCache`` with its default bounds.
+            cache_max_age: ``max-age`` in seconds advertised to clients and
+                downstream proxies for successful calculations
+            stream: Handler for WebSocket calculation streams on
+                ``/stream``. Defaults to a ``StreamHandler`` with its
+                default bounds.
+            history: History (with a ``feed``) to record computed
+                calculations in and to serve on ``/history/feed``
+            sketch: Sketch to feed computed results to
+        """
+        if service is None:
+            service = CalculationService(admission=AdmissionController())
+        self.service = service
+        self.host = host
+        self.port = port
+        self.max_body_size = max_body_size
+        self.max_batch_items = max_batch_items
+        self.cache = cache if cache is not None else ResponseCache()
+        self.cache_control = f"public, max-age={cache_max_age}, immutable"
+        self.stream = stream if stream is not None else StreamHandler()
+        self.history = history
+        self.sketch = sketch
+        # Created up front so that every recorded calculation is numbered.
+        self.feed = history.feed if history is not None else None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._in_flight = 0
+        self._draining = False
+
+    async def start(
+        self, sock: Optional[socket.socket] = None, backlog: int = 100
+    ) -> None:
+        """
+        Start accepting connections.
+
+        Args:
+            sock: Already bound listening socket to serve on instead of
+                binding ``host``/``port``
+            backlog: Length of the kernel's queue of pending connections
+        """
+        if sock is not None:
+            self._server = await asyncio.start_server(
+                self._handle_connection, sock=sock, backlog=backlog
+            )
+        else:
+            self._server = await asyncio.start_server(
+                self._handle_connection, self.host, self.port, backlog=backlog
+            )
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        """Start (if needed) and serve until cancelled."""
+        if self._server is None:
+            await self.start()
+        await self._server.serve_forever()
+
+    async def close(self) -> None:
+        """Stop accepting connections."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def drain(self, timeout: float = 10.0) -> bool:
+        """
+        Stop accepting connections and let in-flight requests finish.
+
+        Keep-alive connections are closed after their current response.
+
+        Args:
+            timeout: Longest time to wait for in-flight requests
+
+        Returns:
+            True if every in-flight request finished before the timeout
+        """
+        self._draining = True
+        if self._server is not None:
+            self._server.close()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while self._in_flight and loop.time() < deadline:
+            await asyncio.sleep(0.01)
+        return self._in_flight == 0
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Serve requests on one connection until it closes."""
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as e:
+                    writer.write(encode_response(*self._error(e), keep_alive=False))
+                    break
+                if request is None:
+                    break
+                if request.path == "/stream" and request.method == "GET":
+                    await self._stream(request, reader, writer)
+                    break
+                if request.path == "/history/feed" and request.method == "GET":
+                    await self._feed(request, reader, writer)
+                    break
+                self._in_flight += 1
+                try:
+                    status, headers, body = await self.handle(request)
+                    keep_alive = request.keep_alive and not self._draining
+                    writer.write(
+                        encode_response(status, headers, body, keep_alive=keep_alive)
+                    )
+                    await writer.drain()
+                finally:
+                    self._in_flight -= 1
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _stream(
+        self,
+        request: Request,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        """Hand an upgraded connection to the stream handler."""
+        if self._draining:
+            error = HTTPError(503, "Server is shutting down")
+        else:
+            try:
+                await self.stream.serve(reader, writer, request.headers)
+                return
+            except ValueError as e:
+                error = HTTPError(
+                    426, str(e), {"Upgrade": "websocket", "Sec-WebSocket-Version": "13"}
+                )
+        writer.write(encode_response(*self._error(error), keep_alive=False))
+
+    async def _feed(
+        self,
+        request: Request,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        """Stream the history's change feed as server-sent events."""
+        try:
+            subscription = self._subscribe(request)
+        except HTTPError as e:
+            writer.write(encode_response(*self._error(e), keep_alive=False))
+            return
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Cache-Control: no-store\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+        # The client sends nothing more; end of input means it went away.
+        hangup = asyncio.ensure_future(reader.read(1))
+        hangup.add_done_callback(lambda _: subscription.close())
+        try:
+            while True:
+                events = await subscription.get_batch()
+                if not events:
+                    break
+                writer.write(b"".join(map(encode_event, events)))
+                await writer.drain()
+        except FeedOverflow as e:
+            writer.write(
+                b"event: overflow\ndata: " + encode_json({"after": e.after}) + b"\n\n"
+            )
+        finally:
+            subscription.close()
+            hangup.cancel()
+
+    def _subscribe(self, request: Request):
+        """Open a feed subscription for a ``/history/feed`` request."""
+        if self.history is None:
+            raise HTTPError(404, "History is not enabled on this server")
+        after = request.headers.get("last-event-id") or request.query.get("after")
+        policy = request.query.get("policy") or None
+        if policy is not None and policy not in POLICIES:
+            raise HTTPError(400, f"Invalid policy: '{policy}'")
+        try:
+            after = None if after is None else int(after)
+        except ValueError:
+            raise HTTPError(400, "Invalid event id") from None
+        try:
+            return self.feed.subscribe(after, policy=policy)
+        except ValueError as e:
+            raise HTTPError(410, str(e)) from None
+
+    def _record(self, a: Number, b: Number, operation: str, result: Any) -> None:
+        """Add a computed calculation to the history."""
+        if isinstance(result, Exception):
+            return
+        calculation = Calculation(a, b, CalculationFactory.get_operation(operation))
+        calculation._result = result
+        calculation._executed = True
+        self.history.add_calculation(calculation)
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Request]:
+        """Read one request, or return None when the client closed the connection."""
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise HTTPError(400, "Malformed request line") from None
+
+        headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= self.MAX_HEADERS:
+                raise HTTPError(431, "Too many request headers")
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length") from None
+        if length < 0:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length > self.max_body_size:
+            raise HTTPError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return Request(method.upper(), target, version, headers, body)
+
+    async def handle(self, request: Request) -> Response:
+        """Route a request and build its response."""
+        try:
+            if request.path == "/calculate":
+                if request.method == "GET":
+                    payload: Any = request.query
+                elif request.method == "POST":
+                    payload = request.json()
+                else:
+                    raise HTTPError(405, "Method not allowed", {"Allow": "GET, POST"})
+                return await self._calculate(request, payload)
+            if request.path == "/batch":
+                if request.method != "POST":
+                    raise HTTPError(405, "Method not allowed", {"Allow": "POST"})
+                return await self._batch(request)
+            if request.path == "/reduce":
+                if request.method != "POST":
+                    raise HTTPError(405, "Method not allowed", {"Allow": "POST"})
+                return await self._reduce(request)
+            if request.path == "/metrics" and request.method == "GET":
+                return 200, dict(JSON_HEADERS), encode_json(self.metrics())
+            if request.path == "/metrics/sketch" and request.method == "GET":
+                if self.sketch is None:
+                    raise HTTPError(404, "Result sketching is not enabled")
+                return 200, dict(JSON_HEADERS), encode_json(self.sketch.to_dict())
+            if request.path == "/health" and request.method == "GET":
+                return 200, dict(JSON_HEADERS), encode_json({"status": "ok"})
+            raise HTTPError(404, f"Not found: {request.path}")
+        except HTTPError as e:
+            return self._error(e)
+        except ServiceOverloaded as e:
+            retry_after = str(max(1, math.ceil(e.retry_after)))
+            return self._error(
+                HTTPError(e.status, str(e), {"Retry-After": retry_after})
+            )
+        except (ValueError, ArithmeticError) as e:
+            return self._error(HTTPError(400, str(e)))
+
+    async def _calculate(self, request: Request, payload: Any) -> Response:
+        """Handle a single calculation, serving repeats from the response cache."""
+        a, b, operation = parse_item(payload)
+        key = CalculationFactory.canonical_key(a, b, operation)
+        entry = self.cache.get(key)
+        if entry is None:
+            future = self.service.submit(a, b, operation, priority(request))
+            result = finite_result(await asyncio.wrap_future(future))
+            entry = self.cache.put(key, encode_calculation(a, b, key[0], result))
+            if self.history is not None:
+                self._record(a, b, key[0], result)
+            if self.sketch is not None:
+                self.sketch.add(a, b, key[0], result)
+
+        headers = {"ETag": entry.etag, "Cache-Control": self.cache_control}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None and etag_matches(if_none_match, entry.etag):
+            self.cache.record_not_modified()
+            return 304, headers, b""
+        headers.update(JSON_HEADERS)
+        return 200, headers, entry.body
+
+    async def _batch(self, request: Request) -> Response:
+        """Handle a batch of calculations."""
+        payload = request.json()
+        items = payload.get("items") if isinstance(payload, dict) else None
+        if not isinstance(items, list):
+            raise HTTPError(400, "Batch body must be an object with an 'items' list")
+        if len(items) > self.max_batch_items:
+            raise HTTPError(413, f"Batch exceeds {self.max_batch_items} items")
+        parsed = [parse_item(item) for item in items]
+        future = self.service.submit_batch(parsed, priority(request))
+        results = [check_result(result) for result in await asyncio.wrap_future(future)]
+        if self.history is not None:
+            for (a, b, operation), result in zip(parsed, results):
+                self._record(a, b, operation, result)
+        if self.sketch is not None:
+            self.sketch.add_batch(parsed, results)
+        return (
+            200,
+            dict(JSON_HEADERS),
+            encode_json({"results": encode_results(results)}),
+        )
+
+    async def _reduce(self, request: Request) -> Response:
+        """Handle a reduction over a list of values."""
+        payload = request.json()
+        if not isinstance(payload, dict) or not isinstance(payload.get("values"), list):
+            raise HTTPError(400, "Reduce body must be an object with a 'values' list")
+        operation = payload.get("operation")
+        if not isinstance(operation, str):
+            raise HTTPError(400, "Field 'operation' must be a string")
+        values = [parse_number(value, "values") for value in payload["values"]]
+        name = CalculationFactory.get_reduction(operation).name
+        future = self.service.submit_reduction(name, values, priority(request))
+        result = finite_result(await asyncio.wrap_future(future))
+        return (
+            200,
+            dict(JSON_HEADERS),
+            encode_json({"operation": name, "count": len(values), "result": result}),
+        )
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return metrics reported on ``/metrics``."""
+        metrics = self.service.metrics()
+        metrics["response_cache"] = self.cache.metrics()
+        metrics["memory"] = budget.report()
+        metrics["offload"] = dispatcher.metrics()
+        metrics["autotune"] = tuner.metrics()
+        if self.history is not None:
+            metrics["history"] = {"size": len(self.history)}
+            metrics["history"].update(self.feed.metrics())
+        if self.sketch is not None:
+            metrics["results"] = self.sketch.summary()
+            metrics["results"]["memory"] = self.sketch.memory_usage()
+        metrics["stream"] = self.stream.metrics()
+        metrics["process"] = {"pid": os.getpid()}
+        return metrics
+
+    @staticmethod
+    def _error(error: HTTPError) -> Response:
+        """Build an error response."""
+        headers = dict(JSON_HEADERS)
+        headers["Cache-Control"] = "no-store"
+        headers.update(error.headers)
+        return error.status, headers, encode_json({"error": error.message})
+
+
+def priority(request: Request) -> str:
+    """Return the admission priority requested by the client."""
+    value = request.headers.get("x-priority", "normal").lower()
+    if value not in PRIORITIES:
+        raise HTTPError(400, f"Invalid priority: '{value}'")
+    return value
+
+
+def parse_item(payload: Any) -> Tuple[Number, Number, str]:
+    """
+    Extract ``(a, b, operation)`` from a JSON object or query string.
+
+    Raises:
+        HTTPError: If a field is missing or not a number
+    """
+    if not isinstance(payload, dict):
+        raise HTTPError(400, "Calculation must be an object")
+    missing = [field for field in ("a", "b", "operation") if field not in payload]
+    if missing:
+        raise HTTPError(400, f"Missing field(s): {', '.join(missing)}")
+    operation = payload["operation"]
+    if not isinstance(operation, str):
+        raise HTTPError(400, "Field 'operation' must be a string")
+    return parse_number(payload["a"], "a"), parse_number(payload["b"], "b"), operation
+
+
+def parse_number(value: Any, field: str) -> Number:
+    """Convert a JSON value or query parameter to an int or float."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            pass
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    raise HTTPError(400, f"Field '{field}' must be a number")
+
+
+def finite_result(result: Number) -> Number:
+    """
+    Return a result that JSON can represent.
+
+    Raises:
+        ValueError: If the result is an infinite or NaN float
+    """
+    if isinstance(result, float) and not math.isfinite(result):
+        raise ValueError("Result is not a finite number")
+    return result
+
+
+def check_result(result: Any) -> Any:
+    """Return a batch result, or the ``ValueError`` for a non-finite one."""
+    try:
+        return finite_result(result)
+    except ValueError as e:
+        return e
+
+
+def encode_json(payload: Any) -> bytes:
+    """Serialize a JSON response body."""
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+def encode_calculation(a: Number, b: Number, operation: str, result: Number) -> bytes:
+    """Serialize a single calculation result for a canonical operation name."""
+    return encode_json(
+        {
+            "operation": operation,
+            "a": a,
+            "b": b,
+            "result": result,
+        }
+    )
+
+
+def encode_results(results: List[Any]) -> List[Dict[str, Any]]:
+    """Convert batch results (values or errors) to JSON objects."""
+    return [
+        {"error": str(result)} if isinstance(result, Exception) else {"result": result}
+        for result in results
+    ]
+
+
+def encode_event(event: HistoryEvent) -> bytes:
+    """Serialize a history event as a server-sent event."""
+    return b"id: %d\ndata: %s\n\n" % (event.sequence, encode_json(event.as_dict()))
+
+
+def encode_response(
+    status: int, headers: Dict[str, str], body: bytes, keep_alive: bool = True
+) -> bytes:
+    """Serialize a complete HTTP/1.1 response."""
+    lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+    lines.extend(f"{name}: {value}" for name, value in headers.items())
+    lines.append(f"Content-Length: {len(body)}")
+    lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the HTTP calculation service."""
+    parser = argparse.ArgumentParser(
+        prog="service", description="Calculation service over HTTP."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--single-workers", type=int, default=4)
+    parser.add_argument("--single-queue", type=int, default=256)
+    parser.add_argument("--batch-workers", type=int, default=1)
+    parser.add_argument("--batch-queue", type=int, default=8)
+    parser.add_argument("--no-coalesce", action="store_true")
+    parser.add_argument("--cache-entries", type=int, default=100000)
+    parser.add_argument("--cache-bytes", type=int, default=64 << 20)
+    parser.add_argument("--cache-max-age", type=int, default=86400)
+    parser.add_argument(
+        "--memory-budget",
+        type=parse_size,
+        metavar="SIZE",
+        help="evict caches, then history, above SIZE accounted bytes (e.g. 512M)",
+    )
+    parser.add_argument(
+        "--rpc-socket",
+        metavar="PATH",
+        help="also serve the binary RPC protocol on this Unix domain socket",
+    )
+    parser.add_argument(
+        "--history",
+        action="store_true",
+        help="record computed calculations and stream them on /history/feed",
+    )
+    parser.add_argument(
+        "--sketch-results",
+        action="store_true",
+        help="report result quantiles and distinct expressions on /metrics",
+    )
+    parser.add_argument(
+        "--autotune",
+        action="store_true",
+        help="route batches to the engines measured fastest on this machine "
+        "(calibrates once, then reuses the cached calibration)",
+    )
+    parser.add_argument(
+        "--batch-strategy",
+        choices=STRATEGIES,
+        help="run every batch group on this engine instead",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of pre-forked worker processes (default: 1)",
+    )
+    parser.add_argument(
+        "--no-reuse-port",
+        action="store_true",
+        help="with --workers, share one accept socket instead of SO_REUSEPORT",
+    )
+    args = parser.parse_args(argv)
+    if args.workers > 1 and args.rpc_socket:
+        parser.error("--rpc-socket is not supported with --workers")
+    if args.memory_budget is not None:
+        try:
+            budget.set_limit(args.memory_budget)
+        except ValueError as e:
+            parser.error(str(e))
+    tuner.strategy = args.batch_strategy
+    if args.autotune:
+        cached = tuner.ensure_calibrated()
+        for line in format_report(tuner.report()):
+            print(line)
+        print("Loaded from cache." if cached else "Measured and cached.", flush=True)
+
+    def make_server(host: str, port: int) -> CalculationHTTPServer:
+        admission = AdmissionController(
+            {
+                "single": Lane("single", args.single_workers, args.single_queue),
+                "batch": Lane("batch", args.batch_workers, args.batch_queue),
+            }
+        )
+        service = CalculationService(coalesce=not args.no_coalesce, admission=admission)
+        return CalculationHTTPServer(
+            service,
+            host,
+            port,
+            cache=ResponseCache(args.cache_entries, args.cache_bytes),
+            cache_max_age=args.cache_max_age,
+            history=CalculatorHistory() if args.history else None,
+            sketch=ResultSketch() if args.sketch_results else None,
+        )
+
+    if args.workers > 1:
+        from .prefork import PreforkServer, run
+
+        reuse_port = False if args.no_reuse_port else None
+        run(
+            PreforkServer(
+                make_server, args.workers, args.host, args.port, reuse_port=reuse_port
+            )
+        )
+        return
+
+    server = make_server(args.host, args.port)
+    service = server.service
+    servers = [server]
+    if args.rpc_socket:
+        servers.append(CalculationRPCServer(args.rpc_socket))
+
+    async def serve() -> None:
+        for each in servers:
+            await each.start()
+        print(f"Serving on http://{server.host}:{server.port}", flush=True)
+        await asyncio.gather(*(each.serve_forever() for each in servers))
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+        tuner.close()
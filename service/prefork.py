@@ -0,0 +1,290 @@
+"""
+Pre-fork multi-worker mode for the HTTP calculation service.
+
+A single asyncio process serves from one core. ``PreforkServer`` is a
+supervisor that forks worker processes, each running its own event loop
+and ``CalculationHTTPServer``:
+
+* Where the platform supports ``SO_REUSEPORT`` every worker binds its own
+  listening socket to the same address and the kernel spreads incoming
+  connections across them. Otherwise the supervisor binds one listening
+  socket before forking and the workers share its accept queue.
+* Before forking, the supervisor warms up the operation registry and the
+  calculation code paths and freezes the garbage collector's view of the
+  heap, so the workers share those pages copy-on-write instead of each
+  touching (and copying) them.
+* Workers that exit unexpectedly are restarted, with a back-off when they
+  keep failing right after starting.
+* On SIGTERM or SIGINT the supervisor asks every worker to drain: stop
+  accepting, finish in-flight requests, then exit. Workers still running
+  after the grace period are killed.
+
+Fork is POSIX-only; ``PreforkServer`` raises ``RuntimeError`` elsewhere.
+"""
+
+import asyncio
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+from typing import Callable, Dict, Optional
+
+from calculation import CalculationFactory
+from calculation.batch import execute_batch
+
+from .http import CalculationHTTPServer
+
+#: Callable building the server a worker runs; called in the worker.
+ServerFactory = Callable[[str, int], CalculationHTTPServer]
+
+
+def warm_up() -> None:
+    """
+    Exercise the operation registry and calculation paths before forking.
+
+    Touching every registered operation once creates the interned strings,
+    bound methods and caches they use in the parent, and ``gc.freeze``
+    moves everything allocated so far out of the collector's generations so
+    that collections in the workers do not write to the shared pages.
+    """
+    for operation in set(CalculationFactory._operations.values()):
+        for a, b in ((6, 3), (6.0, 3.0), (2**70, 3)):
+            CalculationFactory.create_calculation(a, b, operation.name).execute()
+            CalculationFactory.canonical_key(a, b, operation.symbol)
+    execute_batch([(1, 2, name) for name in CalculationFactory.valid_operations()])
+    gc.collect()
+    if hasattr(gc, "freeze"):
+        gc.freeze()
+
+
+def reuse_port_supported() -> bool:
+    """Return True if sockets can share a port with ``SO_REUSEPORT``."""
+    if not hasattr(socket, "SO_REUSEPORT"):
+        return False
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+            probe.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    except OSError:
+        return False
+    return True
+
+
+def bind_socket(host: str, port: int, reuse_port: bool) -> socket.socket:
+    """Create a TCP socket bound to ``host``/``port``."""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    return sock
+
+
+class PreforkServer:
+    """Supervisor for a group of forked HTTP worker processes."""
+
+    #: Connections queued by the kernel per listening socket.
+    BACKLOG = 1024
+
+    #: A worker that exits sooner than this after starting counts as failing.
+    MIN_UPTIME = 1.0
+
+    #: Longest delay between restarts of a failing worker.
+    MAX_RESTART_DELAY = 5.0
+
+    def __init__(
+        self,
+        server_factory: Optional[ServerFactory] = None,
+        workers: Optional[int] = None,
+        host: str = "127.0.0.1",
+        port: int = 8000,
+        reuse_port: Optional[bool] = None,
+        drain_timeout: float = 10.0,
+    ):
+        """
+        Initialize the supervisor.
+
+        Args:
+            server_factory: Builds a worker's server from ``(host, port)``.
+                It is called after the fork, so every worker gets its own
+                service, admission lanes and response cache. Defaults to
+                ``CalculationHTTPServer`` with its default service.
+            workers: Number of worker processes (default: CPU count)
+            host: Interface to bind
+            port: Port to bind (0 picks a free port)
+            reuse_port: Give each worker its own ``SO_REUSEPORT`` socket.
+                Defaults to whether the platform supports it; when False
+                the workers share one accept socket.
+            drain_timeout: Seconds a worker may spend finishing in-flight
+                requests after SIGTERM before it is killed
+
+        Raises:
+            RuntimeError: If the platform cannot fork
+            ValueError: If ``workers`` is not positive
+        """
+        if not hasattr(os, "fork"):
+            raise RuntimeError("Pre-fork mode requires os.fork")
+        workers = workers if workers is not None else os.cpu_count() or 1
+        if workers < 1:
+            raise ValueError("Number of workers must be positive")
+        self.server_factory = server_factory or (
+            lambda host, port: CalculationHTTPServer(host=host, port=port)
+        )
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.reuse_port = reuse_port_supported() if reuse_port is None else reuse_port
+        self.drain_timeout = drain_timeout
+        self.restarts = 0
+        self._socket: Optional[socket.socket] = None
+        self._children: Dict[int, float] = {}
+        self._failures = 0
+        self._stopping = False
+
+    def bind(self) -> int:
+        """
+        Bind the listening address and return the port.
+
+        With ``SO_REUSEPORT`` the supervisor's socket only reserves the port
+        (it never listens, so the kernel does not route connections to it);
+        otherwise it is the shared listening socket the workers accept on.
+        """
+        if self._socket is None:
+            self._socket = bind_socket(self.host, self.port, self.reuse_port)
+            if not self.reuse_port:
+                self._socket.listen(self.BACKLOG)
+                self._socket.setblocking(False)
+            self.port = self._socket.getsockname()[1]
+        return self.port
+
+    def serve_forever(self) -> None:
+        """Fork the workers and supervise them until SIGTERM or SIGINT."""
+        self.bind()
+        warm_up()
+        previous = {
+            signum: signal.signal(signum, self._request_stop)
+            for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+        try:
+            for _ in range(self.workers):
+                self._spawn()
+            self._supervise()
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+            self._shutdown()
+
+    def _request_stop(self, signum, frame) -> None:
+        """Signal handler: begin a graceful shutdown."""
+        self._stopping = True
+
+    def _spawn(self) -> None:
+        """Fork one worker."""
+        pid = os.fork()
+        if pid == 0:
+            status = 1
+            try:
+                status = self._run_worker()
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(status)
+        self._children[pid] = time.monotonic()
+
+    def _supervise(self) -> None:
+        """Reap exited workers and restart them until asked to stop."""
+        while not self._stopping:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                pid = 0
+            if pid == 0 or pid not in self._children:
+                time.sleep(0.05)
+                continue
+            started = self._children.pop(pid)
+            if time.monotonic() - started < self.MIN_UPTIME:
+                self._failures += 1
+                delay = min(0.1 * 2**self._failures, self.MAX_RESTART_DELAY)
+                deadline = time.monotonic() + delay
+                while not self._stopping and time.monotonic() < deadline:
+                    time.sleep(0.05)
+            else:
+                self._failures = 0
+            if not self._stopping:
+                self.restarts += 1
+                self._spawn()
+
+    def _shutdown(self) -> None:
+        """Ask every worker to drain, then kill the ones that do not exit."""
+        for pid in self._children:
+            _signal(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.drain_timeout + 1.0
+        while self._children and time.monotonic() < deadline:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self._children.clear()
+                break
+            if pid:
+                self._children.pop(pid, None)
+            else:
+                time.sleep(0.02)
+        for pid in list(self._children):
+            _signal(pid, signal.SIGKILL)
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        self._children.clear()
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def _run_worker(self) -> int:
+        """Body of a worker process; returns its exit status."""
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        if self.reuse_port:
+            self._socket.close()
+            sock = bind_socket(self.host, self.port, reuse_port=True)
+            sock.listen(self.BACKLOG)
+            sock.setblocking(False)
+        else:
+            sock = self._socket
+        return asyncio.run(self._serve_worker(sock))
+
+    async def _serve_worker(self, sock: socket.socket) -> int:
+        """Serve on ``sock`` until SIGTERM, then drain."""
+        server = self.server_factory(self.host, self.port)
+        stop = asyncio.Event()
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+        await server.start(sock=sock, backlog=self.BACKLOG)
+        await stop.wait()
+        drained = await server.drain(self.drain_timeout)
+        server.service.close()
+        return 0 if drained else 1
+
+
+def _signal(pid: int, signum: int) -> None:
+    """Send a signal to a process that may already have exited."""
+    try:
+        os.kill(pid, signum)
+    except ProcessLookupError:
+        pass
+
+
+def run(server: PreforkServer) -> None:
+    """Bind, announce the address on stdout and supervise until stopped."""
+    port = server.bind()
+    mode = "SO_REUSEPORT" if server.reuse_port else "shared accept socket"
+    print(
+        f"Serving on http://{server.host}:{port} "
+        f"with {server.workers} workers ({mode})",
+        flush=True,
+    )
+    server.serve_forever()
@@ -0,0 +1,502 @@
+"""
+Consistent-hash job router for spreading batch work over worker nodes.
+
+A job (a sequence of ``(a, b, operation)`` items, e.g. read from a JSON-lines
+file) is split into fixed-size chunks. Each chunk is keyed by the job id and
+its index and placed on a node by a consistent-hash ring, so adding or
+removing a node only moves the chunks that hashed to it. Nodes are HTTP
+calculation services (``http://host:port``) or RPC socket servers
+(``unix:///path``).
+
+* A chunk that fails on a node (connection error, overload, 5xx response,
+  timeout) is retried on the next node of its preference list, and the
+  failing node is moved to the back of every preference list for a while.
+  A 4xx response fails the chunk's items instead.
+* A chunk still running after ``speculate_factor`` times the median chunk
+  time is speculatively re-run on the next node; whichever copy finishes
+  first wins and the other is cancelled.
+* Results are merged back in input order as chunks complete, with a bounded
+  window of chunks in flight, so arbitrarily long jobs stream through.
+
+Usage:
+    python -m service.router job.jsonl --node http://10.0.0.1:8000 \\
+        --node http://10.0.0.2:8000 --node unix:///tmp/calc.sock -o out.jsonl
+"""
+
+import argparse
+import asyncio
+import bisect
+import collections
+import hashlib
+import json
+import statistics
+import sys
+import time
+from typing import (
+    Any,
+    AsyncIterator,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from calculation import CalculationFactory
+from client import AsyncCalculatorClient, ResponseError
+from client.common import check_operands
+
+from .rpc import RPCClient
+
+Number = Union[int, float]
+Item = Tuple[Number, Number, str]
+BatchResult = Union[Number, ValueError]
+
+
+class RouterError(Exception):
+    """Raised when a chunk could not be completed on any node."""
+
+
+def _hash(key: str) -> int:
+    """Position of a key on the ring."""
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent-hash ring with virtual nodes."""
+
+    def __init__(self, nodes: Sequence[str], replicas: int = 64):
+        """
+        Initialize the ring.
+
+        Args:
+            nodes: Node names (endpoint URLs)
+            replicas: Virtual nodes per node; more give a more even spread
+
+        Raises:
+            ValueError: If there are no nodes
+        """
+        if not nodes:
+            raise ValueError("At least one node is required")
+        self.nodes = list(dict.fromkeys(nodes))
+        points = sorted(
+            (_hash(f"{node}#{replica}"), node)
+            for node in self.nodes
+            for replica in range(replicas)
+        )
+        self._positions = [position for position, _ in points]
+        self._owners = [node for _, node in points]
+
+    def preference(self, key: str) -> List[str]:
+        """Every node in the order a key tries them: owner first, then clockwise."""
+        start = bisect.bisect(self._positions, _hash(key))
+        order: Dict[str, None] = {}
+        for index in range(len(self._owners)):
+            order.setdefault(self._owners[(start + index) % len(self._owners)])
+            if len(order) == len(self.nodes):
+                break
+        return list(order)
+
+    def node_for(self, key: str) -> str:
+        """Node owning a key."""
+        return self._owners[
+            bisect.bisect(self._positions, _hash(key)) % len(self._owners)
+        ]
+
+
+class _Node:
+    """Connection to one worker endpoint."""
+
+    def __init__(self, url: str, max_in_flight: int):
+        self.url = url
+        self.slots = asyncio.Semaphore(max_in_flight)
+        self.chunks = 0
+        self.failures = 0
+        self.down_until = 0.0
+        self._client: Any = None
+        self._connecting = asyncio.Lock()
+        self._max_in_flight = max_in_flight
+
+    async def calculate_batch(self, items: Sequence[Item]) -> List[BatchResult]:
+        """
+        Send one chunk to the node.
+
+        A 4xx response rejects the request itself, which any other node
+        would reject too, so it becomes an error for every item instead of
+        a node failure.
+        """
+        client = await self._connect()
+        try:
+            return await client.calculate_batch(items)
+        except (ConnectionError, OSError):
+            # Another chunk may already have replaced the broken client.
+            if self._client is client:
+                await self.close()
+            raise
+        except ResponseError as e:
+            if 400 <= e.status < 500:
+                return [ValueError(str(e)) for _ in items]
+            raise
+
+    async def _connect(self) -> Any:
+        """Create the endpoint client on first use."""
+        async with self._connecting:
+            if self._client is None:
+                if self.url.startswith("unix://"):
+                    path = self.url[len("unix://") :]
+                    self._client = await RPCClient(path).connect()
+                else:
+                    self._client = AsyncCalculatorClient(self.url, self._max_in_flight)
+        return self._client
+
+    async def close(self) -> None:
+        """Close the endpoint client."""
+        client, self._client = self._client, None
+        if client is not None:
+            await client.close()
+
+
+class JobRouter:
+    """Splits jobs into chunks and runs them across worker nodes."""
+
+    def __init__(
+        self,
+        nodes: Sequence[str],
+        chunk_size: int = 1000,
+        replicas: int = 64,
+        max_in_flight: int = 4,
+        chunk_timeout: float = 30.0,
+        speculate_factor: float = 3.0,
+        speculate_min: float = 0.5,
+        down_for: float = 5.0,
+    ):
+        """
+        Initialize the router.
+
+        Args:
+            nodes: Worker endpoint URLs
+            chunk_size: Items per chunk
+            replicas: Virtual nodes per node on the hash ring
+            max_in_flight: Chunks sent to one node at a time
+            chunk_timeout: Seconds before a chunk attempt counts as failed
+            speculate_factor: Re-run a chunk elsewhere once it has run this
+                many times longer than the median chunk
+            speculate_min: Never speculate before this many seconds
+            down_for: Seconds a failing node is tried last
+
+        Raises:
+            ValueError: If there are no nodes, a node URL is invalid or the
+                chunk size is not positive
+        """
+        if chunk_size < 1:
+            raise ValueError("Chunk size must be positive")
+        for url in nodes:
+            if not url.startswith(("http://", "unix://")):
+                raise ValueError(
+                    f"Invalid node: '{url}'. Use 'http://host:port' or "
+                    "'unix:///path/to/socket'"
+                )
+        self.ring = HashRing(nodes, replicas)
+        self.chunk_size = chunk_size
+        self.chunk_timeout = chunk_timeout
+        self.speculate_factor = speculate_factor
+        self.speculate_min = speculate_min
+        self.down_for = down_for
+        self._max_in_flight = max_in_flight
+        self._nodes: Dict[str, _Node] = {}
+        self._durations: Deque[float] = collections.deque(maxlen=128)
+        self.stats = collections.Counter()
+
+    def _node(self, url: str) -> _Node:
+        """Endpoint for a URL (created lazily inside the running loop)."""
+        node = self._nodes.get(url)
+        if node is None:
+            node = self._nodes[url] = _Node(url, self._max_in_flight)
+        return node
+
+    def _candidates(self, key: str) -> List[_Node]:
+        """Preference list for a chunk, with recently failed nodes last."""
+        now = time.monotonic()
+        nodes = [self._node(url) for url in self.ring.preference(key)]
+        return sorted(nodes, key=lambda node: node.down_until > now)
+
+    def _straggler_after(self) -> float:
+        """Seconds after which a running chunk is re-run speculatively."""
+        if not self._durations:
+            return max(self.speculate_min, self.chunk_timeout / 4)
+        return max(
+            self.speculate_min,
+            self.speculate_factor * statistics.median(self._durations),
+        )
+
+    async def route(
+        self, items: Iterable[Item], job_id: str = "job"
+    ) -> AsyncIterator[BatchResult]:
+        """
+        Run a job and yield its results in input order.
+
+        Args:
+            items: ``(a, b, operation)`` tuples; consumed lazily
+            job_id: Identifies the job on the hash ring
+
+        Yields:
+            One result or ``ValueError`` per item
+
+        Raises:
+            RouterError: If a chunk failed on every node
+        """
+        window = max(2 * len(self.ring.nodes) * self._max_in_flight, 2)
+        chunks = enumerate(_chunked(items, self.chunk_size))
+        pending: Dict[int, asyncio.Task] = {}
+        next_index = 0
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(pending) < window:
+                    try:
+                        index, chunk = next(chunks)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending[index] = asyncio.ensure_future(
+                        self._run_chunk(f"{job_id}:{index}", chunk)
+                    )
+                if next_index not in pending:
+                    return
+                for result in await pending.pop(next_index):
+                    yield result
+                next_index += 1
+        finally:
+            for task in pending.values():
+                task.cancel()
+            await asyncio.gather(*pending.values(), return_exceptions=True)
+
+    async def run(
+        self, items: Iterable[Item], job_id: str = "job"
+    ) -> List[BatchResult]:
+        """Run a job and return all of its results in input order."""
+        return [result async for result in self.route(items, job_id)]
+
+    async def _run_chunk(self, key: str, chunk: List[Item]) -> List[BatchResult]:
+        """
+        Run one chunk; items with unknown operations or operands that are not
+        numbers fail locally, so they cannot fail the rest of the chunk.
+        """
+        results: List[Optional[BatchResult]] = [None] * len(chunk)
+        remote: List[Item] = []
+        positions: List[int] = []
+        for position, (a, b, operation) in enumerate(chunk):
+            try:
+                check_operands(a, b)
+                remote.append((a, b, CalculationFactory.canonical_operation(operation)))
+                positions.append(position)
+            except ValueError as e:
+                results[position] = e
+        if remote:
+            for position, result in zip(positions, await self._dispatch(key, remote)):
+                results[position] = result
+        self.stats["chunks"] += 1
+        return results
+
+    async def _dispatch(self, key: str, chunk: List[Item]) -> List[BatchResult]:
+        """Run a chunk with failover to later nodes and straggler speculation."""
+        candidates = self._candidates(key)
+        running: Dict[asyncio.Task, _Node] = {}
+        # The straggler clock starts once the first attempt gets a slot on its
+        # node, so chunks queued behind a node's in-flight limit are not
+        # mistaken for stragglers.
+        dispatched = time.monotonic()
+        started: List[float] = []
+        speculative: Optional[asyncio.Task] = None
+        errors: List[str] = []
+
+        def launch() -> asyncio.Task:
+            node = candidates.pop(0)
+            task = asyncio.ensure_future(self._attempt(node, chunk, started))
+            running[task] = node
+            return task
+
+        launch()
+        try:
+            while running:
+                timeout = None
+                if candidates and speculative is None:
+                    since = started[0] if started else dispatched
+                    due = since + self._straggler_after() - time.monotonic()
+                    if due <= 0:
+                        self.stats["speculative"] += 1
+                        speculative = launch()
+                        continue
+                    # The threshold tightens as chunks complete; re-check it.
+                    timeout = min(due, self.speculate_min)
+                done, _ = await asyncio.wait(
+                    running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    node = running.pop(task)
+                    if task.exception() is None:
+                        if task is speculative:
+                            self.stats["speculative_wins"] += 1
+                        node.chunks += 1
+                        return task.result()
+                    node.failures += 1
+                    node.down_until = time.monotonic() + self.down_for
+                    errors.append(f"{node.url}: {task.exception()!r}")
+                    if candidates:
+                        self.stats["retries"] += 1
+                        launch()
+            raise RouterError(f"Chunk {key} failed on every node: {'; '.join(errors)}")
+        finally:
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+
+    async def _attempt(
+        self, node: _Node, chunk: List[Item], started: List[float]
+    ) -> List[BatchResult]:
+        """Send a chunk to one node, bounded by the chunk timeout."""
+        async with node.slots:
+            begin = time.monotonic()
+            started.append(begin)
+            results = await asyncio.wait_for(
+                node.calculate_batch(chunk), self.chunk_timeout
+            )
+            self._durations.append(time.monotonic() - begin)
+        if len(results) != len(chunk):
+            raise RouterError(
+                f"{node.url} returned {len(results)} results for {len(chunk)} items"
+            )
+        return results
+
+    async def close(self) -> None:
+        """Close every node connection."""
+        await asyncio.gather(*(node.close() for node in self._nodes.values()))
+
+    def metrics(self) -> Dict[str, Any]:
+        """Chunk, retry and speculation counters, and per-node counts."""
+        return {
+            "chunks": self.stats["chunks"],
+            "retries": self.stats["retries"],
+            "speculative": self.stats["speculative"],
+            "speculative_wins": self.stats["speculative_wins"],
+            "nodes": {
+                url: {"chunks": node.chunks, "failures": node.failures}
+                for url, node in self._nodes.items()
+            },
+        }
+
+
+def _chunked(items: Iterable[Item], size: int) -> Iterator[List[Item]]:
+    """Split an iterable into lists of at most ``size`` items."""
+    chunk: List[Item] = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def read_job(lines: Iterable[str]) -> Iterator[Item]:
+    """
+    Parse a JSON-lines job of ``{"a": ..., "b": ..., "operation": ...}``.
+
+    Raises:
+        ValueError: If a line is not a valid job record
+    """
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+            yield record["a"], record["b"], record["operation"]
+        except (ValueError, KeyError, TypeError):
+            raise ValueError(f"line {line_number}: invalid job record") from None
+
+
+def format_result(item: Item, result: BatchResult) -> str:
+    """Format one output line."""
+    a, b, operation = item
+    record: Dict[str, Any] = {"a": a, "b": b, "operation": operation}
+    if isinstance(result, ValueError):
+        record["error"] = str(result)
+    else:
+        record["result"] = result
+    return json.dumps(record)
+
+
+async def run_job(router: JobRouter, lines: Iterable[str], output, job_id: str) -> int:
+    """Route a JSON-lines job, writing ordered results; return the error count."""
+    errors = 0
+    items: Deque[Item] = collections.deque()
+
+    def remember(source: Iterator[Item]) -> Iterator[Item]:
+        for item in source:
+            items.append(item)
+            yield item
+
+    async for result in router.route(remember(read_job(lines)), job_id):
+        errors += isinstance(result, ValueError)
+        output.write(format_result(items.popleft(), result) + "\n")
+    return errors
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run ``python -m service.router``."""
+    parser = argparse.ArgumentParser(
+        prog="service.router",
+        description="Distribute a JSON-lines calculation job across worker nodes.",
+    )
+    parser.add_argument("job", help="JSON-lines job file ('-' for stdin)")
+    parser.add_argument(
+        "--node",
+        action="append",
+        required=True,
+        help="worker endpoint, 'http://host:port' or 'unix:///path' (repeatable)",
+    )
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--max-in-flight", type=int, default=4)
+    parser.add_argument("--chunk-timeout", type=float, default=30.0)
+    parser.add_argument("--job-id", default="job")
+    args = parser.parse_args(argv)
+
+    async def run() -> int:
+        router = JobRouter(
+            args.node,
+            chunk_size=args.chunk_size,
+            max_in_flight=args.max_in_flight,
+            chunk_timeout=args.chunk_timeout,
+        )
+        source = output = None
+        try:
+            source = sys.stdin if args.job == "-" else open(args.job, encoding="utf-8")
+            output = (
+                open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+            )
+            errors = await run_job(router, source, output, args.job_id)
+        finally:
+            await router.close()
+            if source not in (None, sys.stdin):
+                source.close()
+            if output not in (None, sys.stdout):
+                output.close()
+        print(json.dumps(router.metrics()), file=sys.stderr)
+        return errors
+
+    try:
+        errors = asyncio.run(run())
+    except (OSError, ValueError, RouterError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,453 @@
+"""
+Binary RPC over a Unix domain socket.
+
+Co-located clients can skip HTTP and JSON entirely: requests and responses
+are length-prefixed binary frames exchanged over a Unix domain socket. A
+connection may pipeline any number of requests; each is answered as soon
+as it completes, tagged with its request id, so responses can arrive out of
+order (large batches run in a thread pool and huge single calculations in
+the offload pool, while other single calculations are answered inline).
+
+Wire format (integers are big-endian)::
+
+    frame    := length:u32 payload
+    request  := id:u32 kind:u8 (single | batch)
+    single   := op:u8 operand operand
+    batch    := count:u32 (op:u8 operand operand)*
+    operand  := 0:u8 int64 | 1:u8 float64 | 2:u8 length:u32 signed-bytes
+    response := id:u32 kind:u8 (item | count:u32 item* | message)
+    item     := 0:u8 operand | 1:u8 message
+    message  := length:u32 utf-8
+
+``op`` is the operation's ``code``. A response of kind ``ERROR`` carries a
+message explaining why the request could not be decoded.
+"""
+
+import asyncio
+import os
+import struct
+from concurrent.futures import Executor
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from calculation import CalculationFactory
+from calculation.batch import BatchResult, execute_batch
+from calculation.offload import dispatcher
+
+Number = Union[int, float]
+
+ERROR = 0
+SINGLE = 1
+BATCH = 2
+
+OK = 0
+FAILED = 1
+
+INT64 = 0
+FLOAT64 = 1
+BIGINT = 2
+
+LENGTH = struct.Struct("!I")
+HEADER = struct.Struct("!IB")
+COUNT = struct.Struct("!I")
+BYTE = struct.Struct("!B")
+INT = struct.Struct("!q")
+FLOAT = struct.Struct("!d")
+
+INT64_MIN = -(1 << 63)
+INT64_MAX = (1 << 63) - 1
+
+
+class ProtocolError(Exception):
+    """Raised when a frame cannot be decoded."""
+
+
+def encode_operand(buffer: bytearray, value: Number) -> None:
+    """Append an operand to ``buffer``."""
+    if isinstance(value, float):
+        buffer += BYTE.pack(FLOAT64)
+        buffer += FLOAT.pack(value)
+    elif isinstance(value, int):
+        if INT64_MIN <= value <= INT64_MAX:
+            buffer += BYTE.pack(INT64)
+            buffer += INT.pack(value)
+        else:
+            data = value.to_bytes(value.bit_length() // 8 + 1, "big", signed=True)
+            buffer += BYTE.pack(BIGINT)
+            buffer += LENGTH.pack(len(data))
+            buffer += data
+    else:
+        raise ValueError(f"Unsupported operand type: {type(value).__name__}")
+
+
+def decode_operand(data: bytes, offset: int) -> Tuple[Number, int]:
+    """Decode an operand at ``offset``; return it and the next offset."""
+    try:
+        (tag,) = BYTE.unpack_from(data, offset)
+        offset += 1
+        if tag == INT64:
+            return INT.unpack_from(data, offset)[0], offset + INT.size
+        if tag == FLOAT64:
+            return FLOAT.unpack_from(data, offset)[0], offset + FLOAT.size
+        if tag == BIGINT:
+            (length,) = LENGTH.unpack_from(data, offset)
+            offset += LENGTH.size
+            if offset + length > len(data):
+                raise ProtocolError("Truncated operand")
+            value = int.from_bytes(data[offset : offset + length], "big", signed=True)
+            return value, offset + length
+    except struct.error:
+        raise ProtocolError("Truncated operand") from None
+    raise ProtocolError(f"Unknown operand tag: {tag}")
+
+
+def encode_message(buffer: bytearray, message: str) -> None:
+    """Append a length-prefixed UTF-8 message to ``buffer``."""
+    data = message.encode()
+    buffer += LENGTH.pack(len(data))
+    buffer += data
+
+
+def decode_message(data: bytes, offset: int) -> Tuple[str, int]:
+    """Decode a message at ``offset``; return it and the next offset."""
+    try:
+        (length,) = LENGTH.unpack_from(data, offset)
+    except struct.error:
+        raise ProtocolError("Truncated message") from None
+    offset += LENGTH.size
+    return data[offset : offset + length].decode(), offset + length
+
+
+def encode_item(buffer: bytearray, result: BatchResult) -> None:
+    """Append a result or error item to ``buffer``."""
+    if isinstance(result, Exception):
+        buffer += BYTE.pack(FAILED)
+        encode_message(buffer, str(result))
+    else:
+        buffer += BYTE.pack(OK)
+        encode_operand(buffer, result)
+
+
+def decode_item(data: bytes, offset: int) -> Tuple[BatchResult, int]:
+    """Decode a result item; errors are returned as ``ValueError``."""
+    try:
+        (status,) = BYTE.unpack_from(data, offset)
+    except struct.error:
+        raise ProtocolError("Truncated item") from None
+    if status == OK:
+        return decode_operand(data, offset + 1)
+    message, offset = decode_message(data, offset + 1)
+    return ValueError(message), offset
+
+
+def encode_frame(payload: bytearray) -> bytes:
+    """Prefix a payload with its length."""
+    return LENGTH.pack(len(payload)) + payload
+
+
+class CalculationRPCServer:
+    """Serves single and batch calculations over a Unix domain socket."""
+
+    def __init__(
+        self,
+        path: str,
+        inline_batch_limit: int = 256,
+        executor: Optional[Executor] = None,
+        max_frame_size: int = 16 << 20,
+    ):
+        """
+        Initialize the server.
+
+        Args:
+            path: Filesystem path of the Unix domain socket
+            inline_batch_limit: Batches with more items than this run in
+                ``executor`` so they do not delay other requests
+            executor: Executor for large batches (the loop's default
+                executor when None)
+            max_frame_size: Largest accepted frame; larger frames close
+                the connection
+        """
+        self.path = path
+        self.inline_batch_limit = inline_batch_limit
+        self.executor = executor
+        self.max_frame_size = max_frame_size
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        """Bind the socket and start accepting connections."""
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(
+            self._handle_connection, self.path
+        )
+
+    async def serve_forever(self) -> None:
+        """Start (if needed) and serve until cancelled."""
+        if self._server is None:
+            await self.start()
+        await self._server.serve_forever()
+
+    async def close(self) -> None:
+        """Stop accepting connections and remove the socket file."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Read pipelined frames and answer each one when it completes."""
+        pending = set()
+        write_lock = asyncio.Lock()
+        try:
+            while True:
+                (length,) = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+                if length > self.max_frame_size:
+                    break
+                payload = await reader.readexactly(length)
+                task = asyncio.ensure_future(self._respond(payload, writer, write_lock))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            writer.close()
+
+    async def _respond(
+        self, payload: bytes, writer: asyncio.StreamWriter, write_lock: asyncio.Lock
+    ) -> None:
+        """Process one request and write its response frame."""
+        response = await self.process(payload)
+        async with write_lock:
+            writer.write(encode_frame(response))
+            await writer.drain()
+
+    async def process(self, payload: bytes) -> bytearray:
+        """Decode a request payload and build the response payload."""
+        try:
+            request_id, kind = HEADER.unpack_from(payload)
+        except struct.error:
+            response = bytearray(HEADER.pack(0, ERROR))
+            encode_message(response, "Truncated request header")
+            return response
+
+        response = bytearray(HEADER.pack(request_id, kind))
+        try:
+            if kind == SINGLE:
+                code, a, b, _ = _decode_call(payload, HEADER.size)
+                encode_item(response, await _execute(code, a, b))
+            elif kind == BATCH:
+                calls = _decode_batch(payload, HEADER.size)
+                if len(calls) > self.inline_batch_limit:
+                    loop = asyncio.get_running_loop()
+                    results = await loop.run_in_executor(
+                        self.executor, _execute_batch, calls
+                    )
+                else:
+                    results = _execute_batch(calls)
+                response += COUNT.pack(len(results))
+                for result in results:
+                    encode_item(response, result)
+            else:
+                raise ProtocolError(f"Unknown request kind: {kind}")
+        except (ProtocolError, ValueError, ArithmeticError) as e:
+            # Also covers results that cannot be encoded.
+            response = bytearray(HEADER.pack(request_id, ERROR))
+            encode_message(response, str(e))
+        return response
+
+
+def _decode_call(data: bytes, offset: int) -> Tuple[int, Number, Number, int]:
+    """Decode ``op operand operand``."""
+    try:
+        (code,) = BYTE.unpack_from(data, offset)
+    except struct.error:
+        raise ProtocolError("Truncated calculation") from None
+    a, offset = decode_operand(data, offset + 1)
+    b, offset = decode_operand(data, offset)
+    return code, a, b, offset
+
+
+def _decode_batch(data: bytes, offset: int) -> List[Tuple[int, Number, Number]]:
+    """Decode ``count (op operand operand)*``."""
+    try:
+        (count,) = COUNT.unpack_from(data, offset)
+    except struct.error:
+        raise ProtocolError("Truncated batch") from None
+    offset += COUNT.size
+    calls = []
+    for _ in range(count):
+        code, a, b, offset = _decode_call(data, offset)
+        calls.append((code, a, b))
+    return calls
+
+
+async def _execute(code: int, a: Number, b: Number) -> BatchResult:
+    """
+    Execute one coded calculation, returning its error instead of raising.
+
+    Huge calculations run in a worker process (see ``calculation.offload``)
+    so that they do not stall the event loop.
+    """
+    try:
+        operation = CalculationFactory.get_operation_by_code(code)
+        return await dispatcher.execute_async(operation, a, b)
+    except ValueError as e:
+        return e
+    except Exception as e:
+        # Arithmetic errors, and offload timeouts or worker failures.
+        return ValueError(str(e) or type(e).__name__)
+
+
+def _execute_batch(calls: Sequence[Tuple[int, Number, Number]]) -> List[BatchResult]:
+    """Execute coded calculations through the grouped batch engine."""
+    names: Dict[int, Optional[str]] = {}
+    items = []
+    for code, a, b in calls:
+        if code not in names:
+            try:
+                names[code] = CalculationFactory.get_operation_by_code(code).name
+            except ValueError:
+                names[code] = None
+        items.append((a, b, names[code]))
+    results = execute_batch([item for item in items if item[2] is not None])
+    if len(results) == len(items):
+        return results
+
+    merged: List[BatchResult] = []
+    remaining = iter(results)
+    for code, _, _ in calls:
+        if names[code] is None:
+            merged.append(ValueError(f"Unsupported operation code: {code}"))
+        else:
+            merged.append(next(remaining))
+    return merged
+
+
+class RPCClient:
+    """Asyncio client for ``CalculationRPCServer`` with request pipelining."""
+
+    def __init__(self, path: str):
+        """
+        Initialize the client.
+
+        Args:
+            path: Filesystem path of the server's Unix domain socket
+        """
+        self.path = path
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._next_id = 0
+        self._receiver: Optional[asyncio.Task] = None
+
+    async def connect(self) -> "RPCClient":
+        """Open the connection and start reading responses."""
+        self._reader, self._writer = await asyncio.open_unix_connection(self.path)
+        self._receiver = asyncio.ensure_future(self._receive())
+        return self
+
+    async def close(self) -> None:
+        """Close the connection, failing any outstanding requests."""
+        if self._writer is not None:
+            self._writer.close()
+        if self._receiver is not None:
+            await asyncio.gather(self._receiver, return_exceptions=True)
+
+    async def __aenter__(self) -> "RPCClient":
+        return await self.connect()
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def calculate(self, a: Number, b: Number, operation_type: str) -> Number:
+        """
+        Perform a single calculation.
+
+        Raises:
+            ValueError: If the operation is unsupported or cannot be performed
+        """
+        payload = bytearray()
+        payload += BYTE.pack(CalculationFactory.get_operation(operation_type).code)
+        encode_operand(payload, a)
+        encode_operand(payload, b)
+        result = await self._call(SINGLE, payload)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def calculate_batch(
+        self, items: Sequence[Tuple[Number, Number, str]]
+    ) -> List[BatchResult]:
+        """
+        Perform a batch of calculations.
+
+        Returns:
+            One result or ``ValueError`` per item, in order
+        """
+        payload = bytearray(COUNT.pack(len(items)))
+        codes: Dict[str, int] = {}
+        for a, b, operation_type in items:
+            code = codes.get(operation_type)
+            if code is None:
+                code = CalculationFactory.get_operation(operation_type).code
+                codes[operation_type] = code
+            payload += BYTE.pack(code)
+            encode_operand(payload, a)
+            encode_operand(payload, b)
+        return await self._call(BATCH, payload)
+
+    async def _call(self, kind: int, body: bytearray):
+        """Send a request and wait for the response with the same id."""
+        if self._writer is None:
+            raise ConnectionError("Client is not connected")
+        request_id = self._next_id
+        self._next_id = (self._next_id + 1) & 0xFFFFFFFF
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        payload = bytearray(HEADER.pack(request_id, kind))
+        payload += body
+        self._writer.write(encode_frame(payload))
+        await self._writer.drain()
+        return await future
+
+    async def _receive(self) -> None:
+        """Resolve pending requests as their responses arrive."""
+        try:
+            while True:
+                header = await self._reader.readexactly(LENGTH.size)
+                payload = await self._reader.readexactly(LENGTH.unpack(header)[0])
+                request_id, kind = HEADER.unpack_from(payload)
+                future = self._pending.pop(request_id, None)
+                if future is None or future.done():
+                    continue
+                try:
+                    future.set_result(_decode_response(kind, payload, HEADER.size))
+                except ProtocolError as e:
+                    future.set_exception(e)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Connection closed"))
+            self._pending.clear()
+
+
+def _decode_response(kind: int, data: bytes, offset: int):
+    """Decode the body of a response payload."""
+    if kind == SINGLE:
+        return decode_item(data, offset)[0]
+    if kind == BATCH:
+        (count,) = COUNT.unpack_from(data, offset)
+        offset += COUNT.size
+        results = []
+        for _ in range(count):
+            result, offset = decode_item(data, offset)
+            results.append(result)
+        return results
+    raise ProtocolError(decode_message(data, offset)[0])
@@ -0,0 +1,66 @@
+"""
+Background runner for asyncio servers.
+
+Runs a server object exposing ``async start()`` and ``async close()`` on an
+event loop in a separate thread, so synchronous code (tests, benchmarks,
+load generators) can talk to it.
+"""
+
+import asyncio
+import threading
+from typing import Any, Optional
+
+
+class ServerThread:
+    """Context manager running an asyncio server in a daemon thread."""
+
+    def __init__(self, server: Any):
+        """
+        Initialize the runner.
+
+        Args:
+            server: Object with ``async start()`` and ``async close()``
+        """
+        self.server = server
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._started = threading.Event()
+        self._error: Optional[BaseException] = None
+
+    def start(self) -> Any:
+        """Start the server and block until it is accepting connections."""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._started.wait()
+        if self._error is not None:
+            raise self._error
+        return self.server
+
+    def _run(self) -> None:
+        """Thread body: start the server and run the loop until stopped."""
+        self.loop = asyncio.new_event_loop()
+        try:
+            self.loop.run_until_complete(self.server.start())
+        except BaseException as e:
+            self._error = e
+            self._started.set()
+            self.loop.close()
+            return
+        self._started.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.run_until_complete(self.server.close())
+            self.loop.close()
+
+    def stop(self) -> None:
+        """Stop the server and wait for the thread to exit."""
+        if self.loop is not None and self._thread is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join()
+
+    def __enter__(self) -> Any:
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
@@ -0,0 +1,134 @@
+"""
+Single-flight call deduplication.
+
+Concurrent callers asking for the same key share one execution: the first
+caller (the leader) runs the work while later callers wait on its future.
+Asynchronous callers each get a future of their own, so one of them
+cancelling does not affect the others.
+"""
+
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class SingleFlight:
+    """Deduplicates identical in-flight calls."""
+
+    def __init__(self):
+        """Initialize an empty in-flight map and zeroed counters."""
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Hashable, Future] = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Run ``fn`` once for all concurrent callers sharing ``key``.
+
+        Args:
+            key: Identity of the work
+            fn: Callable executed by the leader
+
+        Returns:
+            The value returned by the leader's call to ``fn``
+
+        Raises:
+            Exception: Whatever ``fn`` raised, re-raised in every waiter
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key)
+            future.set_exception(e)
+            raise
+        self._finish(key)
+        future.set_result(result)
+        return result
+
+    def submit(self, key: Hashable, start: Callable[[], Future]) -> Future:
+        """
+        Share one asynchronous execution between callers sharing ``key``.
+
+        Args:
+            key: Identity of the work
+            start: Callable run by the leader that starts the work and
+                returns a future for its result
+
+        Returns:
+            The caller's own future, resolved with the leader's result or
+            exception. Cancelling it only detaches this caller; the shared
+            execution carries on for the others.
+        """
+        shared, leader = self._join(key)
+        if leader:
+            try:
+                inner = start()
+            except BaseException as e:
+                self._finish(key)
+                shared.set_exception(e)
+            else:
+                inner.add_done_callback(lambda done: self._complete(key, shared, done))
+        return _follow(shared)
+
+    def _complete(self, key: Hashable, future: Future, done: Future) -> None:
+        """Copy the outcome of the leader's future to the shared future."""
+        self._finish(key)
+        if done.cancelled():
+            future.cancel()
+        elif done.exception() is not None:
+            future.set_exception(done.exception())
+        else:
+            future.set_result(done.result())
+
+    def _join(self, key: Hashable) -> Tuple[Future, bool]:
+        """Return the future for ``key`` and whether the caller leads it."""
+        with self._lock:
+            self.calls += 1
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            self._in_flight[key] = future
+            self.executions += 1
+            return future, True
+
+    def _finish(self, key: Hashable) -> None:
+        """Forget ``key`` so the next caller starts a fresh execution."""
+        with self._lock:
+            del self._in_flight[key]
+
+    def stats(self) -> Dict[str, int]:
+        """Return coalescing counters."""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._in_flight),
+            }
+
+
+def _follow(shared: Future) -> Future:
+    """Return a new future that takes on the outcome of ``shared``."""
+    future: Future = Future()
+
+    def copy(done: Future) -> None:
+        if done.cancelled():
+            future.cancel()
+        elif future.set_running_or_notify_cancel():
+            # Running futures can no longer be cancelled, so setting the
+            # outcome cannot race with the caller cancelling.
+            if done.exception() is not None:
+                future.set_exception(done.exception())
+            else:
+                future.set_result(done.result())
+
+    shared.add_done_callback(copy)
+    return future
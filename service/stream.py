@@ -0,0 +1,577 @@
+"""
+Streaming calculations over WebSocket.
+
+Clients with a continuous feed of small calculations can upgrade an HTTP
+connection on ``GET /stream`` to a WebSocket (RFC 6455) and keep it open.
+Each calculation is one text frame, answered by one text frame carrying the
+same ``id`` (any JSON value chosen by the client)::
+
+    -> {"id": 7, "a": 5, "b": 3, "operation": "+"}
+    <- {"id": 7, "result": 8}
+    <- {"id": 8, "error": "Division by zero is not allowed"}
+
+Responses are sent in the order the requests arrived. Every complete frame
+read from the socket at once forms a micro-batch: it is evaluated in one
+pass of the batch engine and answered with one write, so a busy stream
+costs far fewer system calls and event-loop iterations than one request
+per HTTP round trip. Calculations big enough to be offloaded run in a
+worker process (see ``calculation.offload``) without blocking the loop.
+
+Unsent responses are bounded by ``send_buffer`` bytes per connection. While
+a client is over the bound, the server stops reading its requests (so TCP
+flow control pushes back on the sender); a client that does not catch up
+within ``slow_consumer_timeout`` seconds is disconnected.
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import struct
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from calculation import CalculationFactory
+from calculation.batch import BatchResult, execute_batch
+from calculation.offload import dispatcher
+
+Number = Union[int, float]
+
+#: Appended to the client's key to compute ``Sec-WebSocket-Accept``.
+GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+CONTINUATION = 0x0
+TEXT = 0x1
+BINARY = 0x2
+CLOSE = 0x8
+PING = 0x9
+PONG = 0xA
+
+NORMAL_CLOSURE = 1000
+PROTOCOL_ERROR = 1002
+UNSUPPORTED_DATA = 1003
+POLICY_VIOLATION = 1008
+MESSAGE_TOO_BIG = 1009
+
+SHORT_LENGTH = struct.Struct("!H")
+LONG_LENGTH = struct.Struct("!Q")
+CLOSE_CODE = struct.Struct("!H")
+
+READ_SIZE = 1 << 16
+
+
+class ProtocolError(Exception):
+    """Raised when the peer violates the WebSocket protocol."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def accept_key(key: str) -> str:
+    """Compute ``Sec-WebSocket-Accept`` for a ``Sec-WebSocket-Key``."""
+    digest = hashlib.sha1((key + GUID).encode("latin-1")).digest()
+    return base64.b64encode(digest).decode("ascii")
+
+
+def apply_mask(data: bytes, mask: bytes) -> bytes:
+    """XOR ``data`` with the repeated 4-byte ``mask`` (its own inverse)."""
+    length = len(data)
+    if not length:
+        return b""
+    key = (mask * (length // 4 + 1))[:length]
+    masked = int.from_bytes(data, "big") ^ int.from_bytes(key, "big")
+    return masked.to_bytes(length, "big")
+
+
+def encode_frame(opcode: int, payload: bytes, mask: Optional[bytes] = None) -> bytes:
+    """
+    Serialize a final (unfragmented) frame.
+
+    Args:
+        opcode: Frame opcode
+        payload: Frame payload
+        mask: Masking key; clients must mask, servers must not
+    """
+    length = len(payload)
+    mask_bit = 0x80 if mask else 0
+    header = bytearray((0x80 | opcode,))
+    if length < 126:
+        header.append(mask_bit | length)
+    elif length < 1 << 16:
+        header.append(mask_bit | 126)
+        header += SHORT_LENGTH.pack(length)
+    else:
+        header.append(mask_bit | 127)
+        header += LONG_LENGTH.pack(length)
+    if mask:
+        header += mask
+        payload = apply_mask(payload, mask)
+    return bytes(header) + payload
+
+
+def decode_frame(
+    buffer: bytearray, offset: int, max_size: int, masked: bool = True
+) -> Optional[Tuple[bool, int, bytes, int]]:
+    """
+    Decode the frame starting at ``offset`` in ``buffer``.
+
+    Args:
+        buffer: Bytes received so far
+        offset: Start of the frame
+        max_size: Largest accepted payload
+        masked: Whether the frame must be masked (frames sent by clients)
+
+    Returns:
+        ``(fin, opcode, payload, next_offset)``, or None if the frame is
+        not complete yet
+
+    Raises:
+        ProtocolError: If the frame is malformed or too large
+    """
+    available = len(buffer) - offset
+    if available < 2:
+        return None
+    first, second = buffer[offset], buffer[offset + 1]
+    if first & 0x70:
+        raise ProtocolError(PROTOCOL_ERROR, "Reserved bits set")
+    if bool(second & 0x80) != masked:
+        raise ProtocolError(
+            PROTOCOL_ERROR, "Client frames must be masked" if masked else "Masked frame"
+        )
+    length = second & 0x7F
+    position = offset + 2
+    if length == 126:
+        if available < 4:
+            return None
+        (length,) = SHORT_LENGTH.unpack_from(buffer, position)
+        position += SHORT_LENGTH.size
+    elif length == 127:
+        if available < 10:
+            return None
+        (length,) = LONG_LENGTH.unpack_from(buffer, position)
+        position += LONG_LENGTH.size
+    if length > max_size:
+        raise ProtocolError(MESSAGE_TOO_BIG, f"Frame exceeds {max_size} bytes")
+    mask = None
+    if masked:
+        mask = bytes(buffer[position : position + 4])
+        position += 4
+    end = position + length
+    if end > len(buffer):
+        return None
+    payload = bytes(buffer[position:end])
+    if mask is not None:
+        payload = apply_mask(payload, mask)
+    return bool(first & 0x80), first & 0x0F, payload, end
+
+
+def parse_message(data: bytes) -> Tuple[Any, Number, Number, str]:
+    """
+    Extract ``(id, a, b, operation)`` from a request frame.
+
+    The id is returned before validation finishes so that errors can be
+    reported against it.
+
+    Raises:
+        ValueError: With ``args[1]`` set to the id (or None), if the frame
+            is not a valid calculation
+    """
+    try:
+        payload = json.loads(data)
+    except ValueError:
+        raise ValueError("Frame is not valid JSON", None) from None
+    if not isinstance(payload, dict):
+        raise ValueError("Calculation must be an object", None)
+    message_id = payload.get("id")
+    missing = [field for field in ("a", "b", "operation") if field not in payload]
+    if missing:
+        raise ValueError(f"Missing field(s): {', '.join(missing)}", message_id)
+    for field in ("a", "b"):
+        value = payload[field]
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            raise ValueError(f"Field '{field}' must be a number", message_id)
+    if not isinstance(payload["operation"], str):
+        raise ValueError("Field 'operation' must be a string", message_id)
+    return message_id, payload["a"], payload["b"], payload["operation"]
+
+
+def encode_result(message_id: Any, result: BatchResult) -> bytes:
+    """Serialize the response frame payload for one calculation."""
+    if not isinstance(result, Exception):
+        try:
+            return json.dumps(
+                {"id": message_id, "result": result},
+                separators=(",", ":"),
+                allow_nan=False,
+            ).encode()
+        except ValueError:
+            # Infinite or NaN floats, and integers beyond
+            # ``sys.get_int_max_str_digits()``.
+            if isinstance(result, float):
+                result = ValueError("Result is not a finite number")
+            else:
+                result = ValueError("Result is too large to encode")
+    payload = {"id": message_id, "error": str(result.args[0])}
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+async def evaluate(items: List[Tuple[Number, Number, str]]) -> List[BatchResult]:
+    """
+    Evaluate a micro-batch, offloading calculations that need it.
+
+    Returns:
+        One result or ``ValueError`` per item, in order
+    """
+    threshold = dispatcher.threshold_bits
+    heavy: Dict[int, Any] = {}
+    if threshold is not None:
+        for index, (a, b, operation_type) in enumerate(items):
+            try:
+                operation = CalculationFactory.get_operation(operation_type)
+            except ValueError:
+                continue
+            if dispatcher.should_offload(operation, a, b):
+                heavy[index] = dispatcher.execute_async(operation, a, b)
+    if not heavy:
+        return execute_batch(items)
+
+    light = [i for i in range(len(items)) if i not in heavy]
+    results: List[BatchResult] = [None] * len(items)
+    for index, result in zip(light, execute_batch([items[i] for i in light])):
+        results[index] = result
+    done = await asyncio.gather(*heavy.values(), return_exceptions=True)
+    for index, result in zip(heavy, done):
+        if isinstance(result, Exception) and not isinstance(result, ValueError):
+            result = ValueError(str(result) or type(result).__name__)
+        results[index] = result
+    return results
+
+
+class StreamHandler:
+    """Serves calculation streams on upgraded HTTP connections."""
+
+    def __init__(
+        self,
+        max_frame_size: int = 1 << 16,
+        send_buffer: int = 1 << 20,
+        slow_consumer_timeout: float = 5.0,
+    ):
+        """
+        Initialize the handler.
+
+        Args:
+            max_frame_size: Largest accepted message; larger ones close the
+                stream with code 1009
+            send_buffer: Bytes of unsent responses at which a connection
+                stops reading requests until the client catches up
+            slow_consumer_timeout: Seconds a client may stay over
+                ``send_buffer`` before it is disconnected
+        """
+        self.max_frame_size = max_frame_size
+        self.send_buffer = send_buffer
+        self.slow_consumer_timeout = slow_consumer_timeout
+        self.connections = 0
+        self.active = 0
+        self.messages = 0
+        self.batches = 0
+        self.slow_consumers = 0
+
+    @staticmethod
+    def handshake(headers: Dict[str, str]) -> bytes:
+        """
+        Build the ``101 Switching Protocols`` response for an upgrade request.
+
+        Args:
+            headers: Request headers with lower-case names
+
+        Raises:
+            ValueError: If the request is not a valid WebSocket upgrade
+        """
+        if headers.get("upgrade", "").lower() != "websocket":
+            raise ValueError("Expected 'Upgrade: websocket'")
+        if headers.get("sec-websocket-version") != "13":
+            raise ValueError("Unsupported WebSocket version")
+        key = headers.get("sec-websocket-key", "")
+        try:
+            if len(base64.b64decode(key, validate=True)) != 16:
+                raise ValueError()
+        except ValueError:
+            raise ValueError("Invalid Sec-WebSocket-Key") from None
+        return (
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept_key(key)}\r\n\r\n"
+        ).encode("latin-1")
+
+    async def serve(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        headers: Dict[str, str],
+    ) -> None:
+        """
+        Complete the handshake and serve the stream until it closes.
+
+        Raises:
+            ValueError: If the request is not a valid WebSocket upgrade
+                (nothing has been written yet)
+        """
+        writer.write(self.handshake(headers))
+        writer.transport.set_write_buffer_limits(high=self.send_buffer)
+        self.connections += 1
+        self.active += 1
+        try:
+            await self._serve(reader, writer)
+        except ProtocolError as e:
+            writer.write(encode_frame(CLOSE, _close_payload(e.code, e.message)))
+        finally:
+            self.active -= 1
+
+    async def _serve(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Read frames and answer each read's complete messages as a batch."""
+        buffer = bytearray()
+        fragments: List[bytes] = []
+        fragment_size = 0
+        while True:
+            data = await reader.read(READ_SIZE)
+            if not data:
+                return
+            buffer += data
+            messages = []
+            offset = 0
+            while True:
+                frame = decode_frame(buffer, offset, self.max_frame_size)
+                if frame is None:
+                    break
+                fin, opcode, payload, offset = frame
+                if opcode >= CLOSE:
+                    if opcode == CLOSE:
+                        await self._answer(messages, writer)
+                        writer.write(encode_frame(CLOSE, payload[:2]))
+                        return
+                    if opcode == PING:
+                        writer.write(encode_frame(PONG, payload))
+                    elif opcode != PONG:
+                        raise ProtocolError(PROTOCOL_ERROR, "Unknown opcode")
+                    continue
+                if (opcode == CONTINUATION) != bool(fragments):
+                    raise ProtocolError(PROTOCOL_ERROR, "Unexpected continuation")
+                if opcode == BINARY:
+                    raise ProtocolError(UNSUPPORTED_DATA, "Expected text frames")
+                if opcode not in (TEXT, CONTINUATION):
+                    raise ProtocolError(PROTOCOL_ERROR, "Unknown opcode")
+                if fin and not fragments:
+                    messages.append(payload)
+                    continue
+                fragment_size += len(payload)
+                if fragment_size > self.max_frame_size:
+                    raise ProtocolError(
+                        MESSAGE_TOO_BIG, f"Message exceeds {self.max_frame_size} bytes"
+                    )
+                fragments.append(payload)
+                if fin:
+                    messages.append(b"".join(fragments))
+                    fragments = []
+                    fragment_size = 0
+            del buffer[:offset]
+            await self._answer(messages, writer)
+
+    async def _answer(
+        self, messages: List[bytes], writer: asyncio.StreamWriter
+    ) -> None:
+        """Evaluate a micro-batch, write its responses and apply backpressure."""
+        if not messages:
+            return
+        ids = []
+        items = []
+        errors: Dict[int, ValueError] = {}
+        for index, message in enumerate(messages):
+            try:
+                message_id, a, b, operation_type = parse_message(message)
+            except ValueError as e:
+                ids.append(e.args[1])
+                errors[index] = e
+                continue
+            ids.append(message_id)
+            items.append((a, b, operation_type))
+        results = iter(await evaluate(items))
+        self.messages += len(messages)
+        self.batches += 1
+        writer.write(
+            b"".join(
+                encode_frame(
+                    TEXT, encode_result(message_id, errors.get(index) or next(results))
+                )
+                for index, message_id in enumerate(ids)
+            )
+        )
+
+        if writer.transport.get_write_buffer_size() > self.send_buffer:
+            try:
+                await asyncio.wait_for(writer.drain(), self.slow_consumer_timeout)
+            except asyncio.TimeoutError:
+                self.slow_consumers += 1
+                writer.transport.abort()
+                raise ConnectionResetError("Slow consumer disconnected") from None
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return stream counters."""
+        return {
+            "connections": self.connections,
+            "active": self.active,
+            "messages": self.messages,
+            "batches": self.batches,
+            "slow_consumers": self.slow_consumers,
+        }
+
+
+def _close_payload(code: int, reason: str) -> bytes:
+    """Build the payload of a close frame."""
+    return CLOSE_CODE.pack(code) + reason.encode()[:123]
+
+
+class StreamClient:
+    """Asyncio client for the ``/stream`` endpoint with request pipelining."""
+
+    def __init__(self, host: str, port: int, path: str = "/stream"):
+        """
+        Initialize the client.
+
+        Args:
+            host: Server host
+            port: Server port
+            path: Path of the stream endpoint
+        """
+        self.host = host
+        self.port = port
+        self.path = path
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._next_id = 0
+        self._receiver: Optional[asyncio.Task] = None
+        self.close_code: Optional[int] = None
+
+    async def connect(self) -> "StreamClient":
+        """
+        Open the connection, upgrade it and start reading responses.
+
+        Raises:
+            ConnectionError: If the server refused the upgrade
+        """
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        key = base64.b64encode(os.urandom(16)).decode("ascii")
+        self._writer.write(
+            f"GET {self.path} HTTP/1.1\r\n"
+            f"Host: {self.host}:{self.port}\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\n"
+            "Sec-WebSocket-Version: 13\r\n\r\n".encode("latin-1")
+        )
+        head = await self._reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if lines[0].split()[1:2] != ["101"] or headers.get(
+            "sec-websocket-accept"
+        ) != accept_key(key):
+            self._writer.close()
+            raise ConnectionError(f"Upgrade refused: {lines[0]}")
+        self._receiver = asyncio.ensure_future(self._receive())
+        return self
+
+    async def close(self) -> None:
+        """Close the stream, failing any outstanding requests."""
+        if self._writer is not None:
+            if not self._writer.is_closing():
+                self._send(CLOSE, CLOSE_CODE.pack(NORMAL_CLOSURE))
+            self._writer.close()
+        if self._receiver is not None:
+            await asyncio.gather(self._receiver, return_exceptions=True)
+
+    async def __aenter__(self) -> "StreamClient":
+        return await self.connect()
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    def submit(self, a: Number, b: Number, operation_type: str) -> asyncio.Future:
+        """
+        Send a calculation without waiting for flow control.
+
+        Returns:
+            Future resolved with the result, or with ``ValueError`` if the
+            calculation failed
+        """
+        if self._writer is None:
+            raise ConnectionError("Client is not connected")
+        message_id = self._next_id
+        self._next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = future
+        message = {"id": message_id, "a": a, "b": b, "operation": operation_type}
+        self._send(TEXT, json.dumps(message, separators=(",", ":")).encode())
+        return future
+
+    async def calculate(self, a: Number, b: Number, operation_type: str) -> Number:
+        """
+        Perform a single calculation.
+
+        Raises:
+            ValueError: If the calculation cannot be performed
+        """
+        future = self.submit(a, b, operation_type)
+        await self._writer.drain()
+        return await future
+
+    def _send(self, opcode: int, payload: bytes) -> None:
+        """Write a masked frame."""
+        self._writer.write(encode_frame(opcode, payload, os.urandom(4)))
+
+    async def _receive(self) -> None:
+        """Resolve pending calculations as their responses arrive."""
+        buffer = bytearray()
+        try:
+            while True:
+                data = await self._reader.read(READ_SIZE)
+                if not data:
+                    return
+                buffer += data
+                offset = 0
+                while True:
+                    frame = decode_frame(buffer, offset, 1 << 62, masked=False)
+                    if frame is None:
+                        break
+                    _, opcode, payload, offset = frame
+                    if opcode == CLOSE:
+                        if len(payload) >= 2:
+                            self.close_code = CLOSE_CODE.unpack_from(payload)[0]
+                        return
+                    if opcode == TEXT:
+                        self._resolve(json.loads(payload))
+                del buffer[:offset]
+        except ConnectionError:
+            pass
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Connection closed"))
+            self._pending.clear()
+
+    def _resolve(self, response: Dict[str, Any]) -> None:
+        """Complete the future waiting for a response."""
+        future = self._pending.pop(response.get("id"), None)
+        if future is None or future.done():
+            return
+        if "error" in response:
+            future.set_exception(ValueError(response["error"]))
+        else:
+            future.set_result(response["result"])
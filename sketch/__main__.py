@@ -0,0 +1,12 @@
+"""
+Entry point for ``python -m sketch``.
+
+Merges saved result sketches and prints their summary.
+"""
+
+import sys
+
+from sketch import main
+
+if __name__ == "__main__":
+    sys.exit(main())
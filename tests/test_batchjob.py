@@ -0,0 +1,207 @@
+"""
+Tests for checkpointed, resumable batch evaluation of JSON-lines files.
+"""
+
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+import pytest
+
+from calculator import main
+from calculator.batchjob import BatchJob, pack_number, unpack_number
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+OPERATIONS = ["+", "-", "*", "/", "%", "^", "//", "bogus"]
+
+
+def write_input(path, count, seed=7):
+    """Write ``count`` lines of mixed calculations, batches and bad lines."""
+    rng = random.Random(seed)
+    with open(path, "w") as file:
+        for i in range(count):
+            if i % 97 == 0:
+                file.write("not json\n")
+            elif i % 89 == 0:
+                file.write("# comment\n\n")
+            elif i % 50 == 0:
+                items = [
+                    {"a": rng.randint(-9, 9), "b": rng.randint(0, 3), "operation": op}
+                    for op in rng.sample(OPERATIONS, 3)
+                ]
+                file.write(json.dumps({"items": items}) + "\n")
+            else:
+                b = rng.choice([rng.randint(-5, 5), rng.random()])
+                record = {"a": rng.randint(-999, 999), "b": b}
+                record["operation"] = rng.choice(OPERATIONS)
+                file.write(json.dumps(record) + "\n")
+
+
+@pytest.fixture
+def paths(tmp_path):
+    """Input, output and reference output paths, with a written input."""
+    source = str(tmp_path / "in.jsonl")
+    write_input(source, 3000)
+    return source, str(tmp_path / "out.jsonl"), str(tmp_path / "expected.jsonl")
+
+
+def read(path):
+    with open(path, "rb") as file:
+        return file.read()
+
+
+class TestBatchJob:
+    """Test cases for evaluating files."""
+
+    def test_output(self, tmp_path):
+        """Test each calculation produces one result line, in input order."""
+        source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+        source.write_text(
+            '{"a": 5, "b": 3, "operation": "+"}\n'
+            "\n"
+            "# skipped\n"
+            '{"a": 1, "b": 0, "operation": "/"}\n'
+            '{"items": [{"a": 2, "b": 3, "operation": "^"}, '
+            '{"a": 1, "b": 2, "operation": "bogus"}]}\n'
+            '{"a": "1", "b": 2, "operation": "+"}\n'
+            "[1, 2]"
+        )
+        aggregates = BatchJob(str(source), str(output)).run()
+        lines = [json.loads(line) for line in output.read_text().splitlines()]
+        assert lines[0] == {"a": 5, "b": 3, "operation": "+", "result": 8}
+        assert lines[1]["error"] == "Division by zero is not allowed"
+        assert lines[2] == {"a": 2, "b": 3, "operation": "^", "result": 8}
+        assert "Unsupported operation" in lines[3]["error"]
+        assert lines[4] == {
+            "line": 6,
+            "error": "Expected 'a', 'b' and 'operation' fields",
+        }
+        assert lines[5] == {"line": 7, "error": "Expected a JSON object"}
+        assert (aggregates.lines, aggregates.calculations) == (7, 4)
+        assert (aggregates.errors, aggregates.total) == (2, 16)
+        assert aggregates.operations == {"add": 1, "power": 1}
+
+    def test_overflow(self, tmp_path):
+        """Test overflowing results become error lines or a saturated total."""
+        source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+        huge = 10**400
+        source.write_text(
+            json.dumps({"a": huge, "b": 1, "operation": "*"})
+            + "\n"
+            + json.dumps({"a": 1.5, "b": 1, "operation": "*"})
+            + "\n"
+            + json.dumps({"a": huge, "b": 3, "operation": "/"})
+            + "\n"
+            + json.dumps({"a": 2, "b": 2, "operation": "+"})
+            + "\n"
+        )
+        job = BatchJob(str(source), str(output), chunk=1, interval=0)
+        aggregates = job.run()
+        lines = [json.loads(line) for line in output.read_text().splitlines()]
+        assert [line.get("result") for line in lines] == [huge, 1.5, None, 4]
+        assert "too large" in lines[2]["error"]
+        assert (aggregates.calculations, aggregates.errors) == (4, 1)
+        assert aggregates.total == float("inf")
+        assert (aggregates.minimum, aggregates.maximum) == (1.5, huge)
+        assert job.checkpoints == 4
+        assert json.loads(json.dumps(aggregates.summary()))["total"] == float("inf")
+
+    def test_resume_after_crash(self, paths, monkeypatch):
+        """Test output written after the last checkpoint is replaced, not duplicated."""
+        source, output, expected = paths
+        reference = BatchJob(source, expected).run().summary()
+
+        save = BatchJob._save
+
+        def crash(job, *args):
+            if job.checkpoints == 4:
+                raise KeyboardInterrupt
+            save(job, *args)
+
+        monkeypatch.setattr(BatchJob, "_save", crash)
+        with pytest.raises(KeyboardInterrupt):
+            BatchJob(source, output, chunk=100, interval=0).run()
+        with open(output + ".checkpoint") as file:
+            checkpoint = json.load(file)
+        assert checkpoint["aggregates"]["lines"] == 400
+        assert os.path.getsize(output) > checkpoint["output_offset"]
+
+        monkeypatch.setattr(BatchJob, "_save", save)
+        job = BatchJob(source, output)
+        assert job.run(resume=True).summary() == reference
+        assert job.resumed
+        assert read(output) == read(expected)
+        assert not os.path.exists(job.checkpoint_path)
+
+    def test_resume_without_checkpoint(self, paths):
+        """Test resuming without a checkpoint starts from the beginning."""
+        source, output, expected = paths
+        BatchJob(source, expected).run()
+        job = BatchJob(source, output)
+        job.run(resume=True)
+        assert not job.resumed
+        assert read(output) == read(expected)
+
+    def test_changed_input(self, paths):
+        """Test a checkpoint is refused once its input or output changed."""
+        source, output, _ = paths
+        job = BatchJob(source, output, chunk=100, interval=0)
+        job._remove_checkpoint = lambda: None
+        job.run()
+        with open(output, "r+b") as file:
+            file.truncate(10)
+        with pytest.raises(ValueError, match="shorter than its checkpoint"):
+            BatchJob(source, output).run(resume=True)
+        with open(source, "a") as file:
+            file.write('{"a": 1, "b": 2, "operation": "+"}\n')
+        with pytest.raises(ValueError, match="has changed"):
+            BatchJob(source, output).run(resume=True)
+        with open(job.checkpoint_path, "w") as file:
+            file.write("{}")
+        with pytest.raises(ValueError, match="Invalid checkpoint"):
+            BatchJob(source, output).run(resume=True)
+
+    def test_pack_number(self):
+        """Test aggregates are checkpointed exactly."""
+        for value in [0, -(2**20000), 3**7, 1.5, -0.1, float("inf"), None]:
+            assert unpack_number(pack_number(value)) == value
+
+    def test_cli(self, paths, capsys):
+        """Test ``python -m calculator batch`` prints the aggregates."""
+        source, output, _ = paths
+        assert main(["batch", source, output]) == 0
+        summary = json.loads(capsys.readouterr().out)
+        assert summary["lines"] == 3000 + 3000 // 89 - 3000 // (89 * 97)
+        assert main(["batch", source + ".missing", output]) == 2
+
+
+class TestKill:
+    """Test jobs killed at random points resume to identical output."""
+
+    def test_random_kills(self, paths):
+        """Test repeated SIGKILLs during a run never change the final output."""
+        source, output, expected = paths
+        write_input(source, 40000, seed=11)
+        BatchJob(source, expected).run()
+        command = [sys.executable, "-m", "calculator", "batch", source, output]
+        command += ["--chunk", "64", "--checkpoint-interval", "0", "--resume"]
+        rng = random.Random(3)
+        kills = 0
+        for _ in range(50):
+            process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL)
+            time.sleep(rng.uniform(0.05, 0.4))
+            if process.poll() is not None:
+                break
+            process.kill()
+            process.wait()
+            kills += 1
+        else:
+            pytest.fail("Job never completed")
+        assert process.returncode == 0
+        assert kills >= 2
+        assert read(output) == read(expected)
+        assert not os.path.exists(output + ".checkpoint")
@@ -14,6 +14,7 @@ from operation import (
     AddOperation,
     DivideOperation,
     MultiplyOperation,
+    Operation,
     SubtractOperation,
 )
 
@@ -87,6 +88,22 @@ class TestCalculation:
         calc = Calculation(5, 3, self.add_op)
         assert str(calc) == "5 + 3 = ?"
 
+    def test_str_cached_after_execution(self):
+        """Test formatted line is built once after execution."""
+        calc = Calculation(5, 3, self.add_op)
+        calc.execute()
+        assert str(calc) is str(calc)
+
+    def test_str_uses_operation_symbol(self):
+        """Test operations without a symbol render as '?'."""
+
+        class NoSymbolOperation(AddOperation):
+            symbol = Operation.symbol
+
+        calc = Calculation(5, 3, NoSymbolOperation())
+        calc.execute()
+        assert str(calc) == "5 ? 3 = 8"
+
     def test_repr_representation(self):
         """Test developer representation."""
         calc = Calculation(5, 3, self.add_op)
@@ -154,7 +171,7 @@ class TestCalculationFactory:
         assert isinstance(calc, Calculation)
 
     @pytest.mark.parametrize(
-        "invalid_operation", ["invalid", "modulo", "%", "", " ", "power", "^", None]
+        "invalid_operation", ["invalid", "root", "&", "", " ", "log", "$", None]
     )
     def test_create_calculation_invalid_operations(self, invalid_operation):
         """Test factory raises error for invalid operations."""
@@ -188,3 +205,35 @@ class TestCalculationFactory:
             assert "add" in error_msg
             assert "+" in error_msg
             assert "Valid operations are:" in error_msg
+
+    @pytest.mark.parametrize("operation_type", ["add", "+", " ADD ", "Add"])
+    def test_canonical_operation(self, operation_type):
+        """Test names, symbols, case and whitespace map to one canonical name."""
+        assert CalculationFactory.canonical_operation(operation_type) == "add"
+
+    def test_canonical_key_equivalent_requests(self):
+        """Test equivalent requests share a canonical key."""
+        assert CalculationFactory.canonical_key(
+            2, 3, "+"
+        ) == CalculationFactory.canonical_key(2, 3, " add ")
+
+    @pytest.mark.parametrize(
+        "first, second",
+        [((1, 2), (1.0, 2)), ((0.0, 1), (-0.0, 1)), ((1, 2), (2, 1))],
+    )
+    def test_canonical_key_distinguishes_operands(self, first, second):
+        """Test operands that compare equal but can give different results."""
+        assert CalculationFactory.canonical_key(
+            *first, "multiply"
+        ) != CalculationFactory.canonical_key(*second, "multiply")
+
+    def test_canonical_key_invalid_operation(self):
+        """Test canonical key rejects unsupported operations."""
+        with pytest.raises(ValueError, match="Unsupported operation"):
+            CalculationFactory.canonical_key(1, 2, "&")
+
+    def test_operations_are_shared(self):
+        """Test factory reuses the registered stateless operation instances."""
+        first = CalculationFactory.create_calculation(1, 2, "add")
+        second = CalculationFactory.create_calculation(3, 4, "+")
+        assert first.operation is second.operation
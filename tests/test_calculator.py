@@ -1,6 +1,9 @@
+import io
 import unittest
+from unittest.mock import patch
 
-from calculator import add
+from calculation import CalculationFactory
+from calculator import Calculator, CalculatorHistory, InputValidator, add, main
 
 
 class TestCalculator(unittest.TestCase):
@@ -11,5 +14,247 @@ class TestCalculator(unittest.TestCase):
         self.assertAlmostEqual(add(1.5, 2.25), 3.75)
 
 
+class TestInputValidator(unittest.TestCase):
+    def test_operations_follow_the_registry(self):
+        validator = InputValidator()
+        for operation in CalculationFactory.valid_operations():
+            self.assertEqual(validator.validate_operation(operation), operation)
+        with self.assertRaises(ValueError):
+            validator.validate_operation("powmod")
+
+
+class TestHistoryPaging(unittest.TestCase):
+    def setUp(self):
+        self.output = io.StringIO()
+        self.calculator = Calculator(output=self.output)
+        with patch("builtins.print"):
+            for i in range(1, 51):
+                self.calculator._handle_calculation(f"{i} + 0")
+
+    def _history(self, args=""):
+        self.output.seek(0)
+        self.output.truncate()
+        self.calculator._show_history(args)
+        return self.output.getvalue().splitlines()
+
+    def _entries(self, lines):
+        return [
+            line
+            for line in lines
+            if line.endswith(tuple("0123456789")) and "] " in line
+        ]
+
+    def test_iter_range_does_not_copy(self):
+        history = self.calculator.history
+        self.assertEqual([c.a for c in history.iter_range(48, 100)], [49, 50])
+        self.assertEqual(list(history.iter_range(60, 70)), [])
+
+    def test_default_shows_first_page(self):
+        lines = self._history()
+        self.assertEqual(lines[0], "Calculation History (50 entries):")
+        entries = self._entries(lines)
+        self.assertEqual(len(entries), Calculator.HISTORY_PAGE_SIZE)
+        self.assertTrue(entries[0].startswith(" 1. ["))
+        self.assertTrue(entries[0].endswith("1 + 0 = 1"))
+        self.assertIn("Page 1 of 3", lines[-1])
+
+    def test_page_and_size(self):
+        entries = self._entries(self._history("--page 3 --size 7"))
+        self.assertEqual(len(entries), 7)
+        self.assertTrue(entries[0].startswith("15. ["))
+        self.assertTrue(entries[-1].endswith("21 + 0 = 21"))
+
+    def test_last_partial_page(self):
+        entries = self._entries(self._history("--page 3"))
+        self.assertEqual(len(entries), 10)
+        self.assertTrue(entries[-1].endswith("50 + 0 = 50"))
+
+    def test_tail(self):
+        entries = self._entries(self._history("--tail 3"))
+        self.assertEqual(
+            [e.split("] ")[1] for e in entries],
+            ["48 + 0 = 48", "49 + 0 = 49", "50 + 0 = 50"],
+        )
+        self.assertEqual(len(self._entries(self._history("--size 5 --tail"))), 5)
+
+    def test_page_out_of_range(self):
+        with patch("builtins.print") as mock_print:
+            self.calculator._show_history("--page 9")
+        mock_print.assert_called_once_with("Error: Page 9 out of range (1-3).")
+
+    def test_invalid_options(self):
+        for args in ("--page", "--size 0", "--page x", "--bogus"):
+            with patch("builtins.print") as mock_print:
+                self.calculator._show_history(args)
+            self.assertTrue(mock_print.call_args[0][0].startswith("Error:"), args)
+        self.assertEqual(self.output.getvalue(), "")
+
+    def test_empty_history(self):
+        output = io.StringIO()
+        Calculator(output=output)._show_history()
+        self.assertEqual(output.getvalue(), "No calculations in history.\n")
+
+    def test_history_command_dispatch(self):
+        with patch("builtins.input", side_effect=["history --tail 1", "exit"]), patch(
+            "builtins.print"
+        ):
+            self.calculator.start()
+        self.assertIn("50 + 0 = 50", self.output.getvalue())
+
+    def test_large_history_written_in_chunks(self):
+        history = CalculatorHistory()
+        calc = self.calculator.history.get_last_calculation()
+        for _ in range(2000):
+            history.add_calculation(calc)
+        self.calculator.history = history
+        stream = unittest.mock.MagicMock()
+        self.calculator.output = stream
+        self.calculator._show_history("--size 2000")
+        self.assertLess(stream.write.call_count, 10)
+
+
+class TestPipeMode(unittest.TestCase):
+    LINES = "5 + 3\n\n# comment\n10 / 0\nabc + 1\n2 * 4\n"
+
+    def _run(self, text, errors="stderr", binary=False):
+        output, error_output = io.StringIO(), io.StringIO()
+        calculator = Calculator(output=output)
+        stream = io.BytesIO(text.encode()) if binary else io.StringIO(text)
+        failures = calculator.run_pipe(stream, errors=errors, error_stream=error_output)
+        return calculator, failures, output.getvalue(), error_output.getvalue()
+
+    def test_errors_to_stderr(self):
+        calculator, failures, out, err = self._run(self.LINES)
+        self.assertEqual(out, "5 + 3 = 8\n2 * 4 = 8\n")
+        self.assertEqual(failures, 2)
+        self.assertEqual(
+            err.splitlines(),
+            [
+                "line 4: Error: Division by zero is not allowed",
+                "line 5: Error: Invalid number: 'abc'",
+            ],
+        )
+        self.assertEqual(len(calculator.history), 2)
+        self.assertFalse(calculator.running)
+
+    def test_errors_inline(self):
+        _, failures, out, err = self._run(self.LINES, errors="inline")
+        self.assertEqual(
+            out.splitlines(),
+            [
+                "5 + 3 = 8",
+                "Error: Division by zero is not allowed",
+                "Error: Invalid number: 'abc'",
+                "2 * 4 = 8",
+            ],
+        )
+        self.assertEqual(err, "")
+
+    def test_errors_skip(self):
+        _, failures, out, err = self._run(self.LINES + "5 +", errors="skip")
+        self.assertEqual(out, "5 + 3 = 8\n2 * 4 = 8\n")
+        self.assertEqual((failures, err), (3, ""))
+
+    def test_invalid_error_mode(self):
+        with self.assertRaises(ValueError):
+            Calculator().run_pipe(io.StringIO(""), errors="loud")
+
+    def test_binary_blocks_and_missing_trailing_newline(self):
+        lines = "".join(f"{i} * 2\n" for i in range(5000)) + "1 - 1"
+        with patch.object(Calculator, "READ_BLOCK_SIZE", 7):
+            _, failures, out, _ = self._run(lines, binary=True)
+        results = out.splitlines()
+        self.assertEqual(failures, 0)
+        self.assertEqual(len(results), 5001)
+        self.assertEqual(results[4999], "4999 * 2 = 9998")
+        self.assertEqual(results[-1], "1 - 1 = 0")
+
+    def test_commands(self):
+        calculator, _, out, _ = self._run("1 + 1\nclear\n2 + 2\nhistory\nexit\n3 + 3\n")
+        lines = out.splitlines()
+        self.assertEqual(lines[0], "1 + 1 = 2")
+        self.assertEqual(lines[1], "2 + 2 = 4")
+        self.assertEqual(lines[2], "Calculation History (1 entries):")
+        self.assertTrue(lines[-1].endswith("2 + 2 = 4"))
+        self.assertEqual(len(calculator.history), 1)
+
+    def test_reductions(self):
+        calculator, failures, out, _ = self._run(
+            "sum 0.1 0.1 0.1 0.1 0.1 0.1 0.1 0.1 0.1 0.1\nmean 1 2\nmax\nmin 4\n",
+            errors="inline",
+        )
+        self.assertEqual(
+            out.splitlines(),
+            [
+                "sum of 10 values = 1.0",
+                "mean of 2 values = 1.5",
+                "Error: Cannot take the maximum of no values",
+                "min of 1 value = 4",
+            ],
+        )
+        self.assertEqual(failures, 1)
+        self.assertEqual(len(calculator.history), 0)
+
+    def test_power_modulo_and_powmod(self):
+        calculator, failures, out, _ = self._run(
+            "2 ^ 10\n7 % 3\n7 // 2\npowmod 4 13 497\npowmod 2 3 0\n",
+            errors="inline",
+        )
+        self.assertEqual(
+            out.splitlines(),
+            [
+                "2 ^ 10 = 1024",
+                "7 % 3 = 1",
+                "7 // 2 = 3",
+                "4 ^ 13 mod 497 = 445",
+                "Error: Modulo by zero is not allowed",
+            ],
+        )
+        self.assertEqual(failures, 1)
+        self.assertEqual(len(calculator.history), 3)
+
+    def test_overflow_is_reported(self):
+        huge = "1" + "0" * 400
+        lines = f"{huge} / 3\n{huge} * 1.5\n2 + 2\n"
+        for errors in ("stderr", "inline"):
+            _, failures, out, err = self._run(lines, errors=errors)
+            self.assertEqual(failures, 2)
+            self.assertEqual(out.splitlines()[-1], "2 + 2 = 4")
+            reported = err if errors == "stderr" else out
+            self.assertEqual(reported.count("Error: "), 2)
+
+    def test_overflow_in_interactive_mode(self):
+        calculator = Calculator()
+        with patch("builtins.print") as mock_print:
+            calculator._handle_input("1" + "0" * 400 + " / 3")
+        message = mock_print.call_args[0][0]
+        self.assertTrue(message.startswith("Error: "))
+        self.assertEqual(len(calculator.history), 0)
+
+    def test_no_prompts_or_banners(self):
+        with patch("builtins.print") as mock_print, patch(
+            "builtins.input"
+        ) as mock_input:
+            self._run(self.LINES)
+        mock_print.assert_not_called()
+        mock_input.assert_not_called()
+
+    def test_main_pipe_mode(self):
+        stdout = io.StringIO()
+        with patch("sys.stdin", io.StringIO("6 / 3\n1 / 0\n")), patch(
+            "sys.stdout", stdout
+        ), patch("sys.stderr", io.StringIO()):
+            status = main(["--errors=inline"])
+        self.assertEqual(status, 1)
+        self.assertEqual(
+            stdout.getvalue(), "6 / 3 = 2.0\nError: Division by zero is not allowed\n"
+        )
+
+    def test_main_interactive_flag(self):
+        with patch.object(Calculator, "start") as start:
+            self.assertEqual(main(["--interactive"]), 0)
+        start.assert_called_once_with()
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,282 @@
+"""
+Tests for the synchronous and asyncio service clients.
+"""
+
+import asyncio
+import socket
+import threading
+import time
+from decimal import Decimal
+
+import pytest
+
+from client import AsyncCalculatorClient, CalculatorClient
+from client.common import parse_base_url
+from client.sync import ConnectionPool, MicroBatcher
+from service import (
+    AdmissionController,
+    CalculationHTTPServer,
+    CalculationService,
+    Lane,
+    ServerThread,
+    ServiceOverloaded,
+)
+from tests.test_service import wait_for
+
+
+@pytest.fixture
+def server():
+    """Run an HTTP service in a background thread."""
+    service = CalculationService(
+        admission=AdmissionController(
+            {
+                "single": Lane("single", workers=2, capacity=8),
+                "batch": Lane("batch", workers=1, capacity=1),
+            }
+        )
+    )
+    runner = ServerThread(CalculationHTTPServer(service, port=0))
+    yield runner.start()
+    runner.stop()
+    service.close()
+
+
+@pytest.fixture
+def url(server):
+    """Base URL of the running service."""
+    return f"http://127.0.0.1:{server.port}"
+
+
+def batches_completed(server):
+    """Number of batch requests the service has executed."""
+    return server.service.metrics()["admission"]["batch"]["completed"]
+
+
+class TestParseBaseUrl:
+    """Test cases for base URL parsing."""
+
+    @pytest.mark.parametrize(
+        "url, expected",
+        [
+            ("http://127.0.0.1:8000", ("127.0.0.1", 8000)),
+            ("localhost:9000", ("localhost", 9000)),
+            ("http://example.com", ("example.com", 80)),
+        ],
+    )
+    def test_valid(self, url, expected):
+        """Test supported URLs."""
+        assert parse_base_url(url) == expected
+
+    def test_invalid_scheme(self):
+        """Test unsupported schemes."""
+        with pytest.raises(ValueError):
+            parse_base_url("https://example.com")
+
+
+class TestCalculatorClient:
+    """Test cases for the synchronous client."""
+
+    def test_create_calculation(self, url):
+        """Test the factory-like API."""
+        with CalculatorClient(url) as client:
+            calculation = client.create_calculation(5, 3, " + ")
+            assert calculation.operation == "add"
+            assert calculation.result == 8
+            assert str(calculation) == "5 + 3 = 8"
+            assert client.calculate(9, 2, "divide") == 4.5
+
+    def test_errors(self, url):
+        """Test calculation and validation errors."""
+        with CalculatorClient(url) as client:
+            with pytest.raises(ValueError, match="Division by zero"):
+                client.calculate(1, 0, "/")
+            with pytest.raises(ValueError, match="Unsupported operation"):
+                client.create_calculation(1, 0, "&")
+
+    def test_connections_are_reused(self, url):
+        """Test sequential calls share a keep-alive connection."""
+        with CalculatorClient(url, pool_size=1) as client:
+            client.calculate(1, 1, "+")
+            connection = client.pool._idle.queue[0]
+            client.calculate(2, 2, "+")
+            assert client.pool._idle.queue[0] is connection
+
+    def test_calculate_batch(self, url):
+        """Test explicit batches."""
+        with CalculatorClient(url) as client:
+            results = client.calculate_batch([(1, 2, "+"), (1, 0, "/")])
+        assert results[0] == 3
+        assert isinstance(results[1], ValueError)
+
+    def test_micro_batching_coalesces_calls(self, server, url):
+        """Test calls within the window become one batch request."""
+        with CalculatorClient(url, batch_window=0.5) as client:
+            calculations = [client.create_calculation(i, 2, "*") for i in range(20)]
+            client.flush()
+            assert [c.result for c in calculations] == [i * 2 for i in range(20)]
+        wait_for(lambda: batches_completed(server) == 1)
+        assert server.service.metrics()["coalescing"]["calls"] == 0
+
+    def test_micro_batching_max_batch(self, server, url):
+        """Test a full batch is sent without waiting for the window."""
+        with CalculatorClient(url, batch_window=60, max_batch=4) as client:
+            calculations = [client.create_calculation(i, 1, "+") for i in range(4)]
+            assert [c.execute(timeout=5) for c in calculations] == [1, 2, 3, 4]
+
+    def test_micro_batching_per_call_errors(self, url):
+        """Test each caller gets its own error."""
+        with CalculatorClient(url, batch_window=0.001) as client:
+            good = client.create_calculation(1, 1, "+")
+            bad = client.create_calculation(1, 0, "/")
+            assert good.result == 2
+            with pytest.raises(ValueError, match="Division by zero"):
+                bad.result
+
+    def test_micro_batching_invalid_operands(self, server, url):
+        """Test a non-numeric operand fails only its own call."""
+        with CalculatorClient(url, batch_window=0.05) as client:
+            calculations = [
+                client.create_calculation(1, 1, "+"),
+                client.create_calculation("1", 1, "+"),
+                client.create_calculation(1, Decimal(1), "+"),
+                client.create_calculation(True, 1, "+"),
+                client.create_calculation(2, 2, "*"),
+            ]
+            assert calculations[0].result == 2
+            assert calculations[4].result == 4
+            for calculation, field in zip(calculations[1:4], "aba"):
+                with pytest.raises(ValueError, match=f"'{field}' must be a number"):
+                    calculation.result
+        wait_for(lambda: batches_completed(server) == 1)
+
+    def test_overload_raises_service_overloaded(self, server, url):
+        """Test 429 responses surface as ServiceOverloaded with retry_after."""
+        release = threading.Event()
+        admission = server.service.admission
+        admission.submit("batch", lambda: release.wait(5))
+        wait_for(lambda: admission.metrics()["batch"]["busy"] == 1)
+        admission.submit("batch", lambda: None)
+        try:
+            with CalculatorClient(url) as client:
+                with pytest.raises(ServiceOverloaded) as info:
+                    client.calculate_batch([(1, 1, "+")])
+            assert info.value.status == 429
+            assert info.value.retry_after >= 1
+        finally:
+            release.set()
+
+
+class TestPoolAndBatcher:
+    """Test cases for the sync connection pool and micro-batcher."""
+
+    def test_timed_out_connection_is_discarded(self):
+        """Test a connection that timed out mid-request is not reused."""
+        with socket.socket() as listener:
+            listener.bind(("127.0.0.1", 0))
+            listener.listen()
+            pool = ConnectionPool("127.0.0.1", listener.getsockname()[1], 1, 0.1)
+            with pytest.raises(OSError):
+                pool.request("GET", "/health")
+            assert pool._idle.queue == [None]
+
+    def test_flush_with_nothing_queued(self):
+        """Test an empty flush does not cut the next batch short."""
+        batcher = MicroBatcher(lambda items: [a + b for a, b, _ in items], 60, 10)
+        batcher.flush()
+        future = batcher.submit((1, 2, "+"))
+        time.sleep(0.1)
+        assert not future.done()
+        batcher.close()
+        assert future.result(timeout=5) == 3
+
+    def test_missing_results_fail_every_future(self):
+        """Test a response with too few results fails the whole batch."""
+        batcher = MicroBatcher(lambda items: [1], 60, 2)
+        futures = [batcher.submit((1, 0, "+")), batcher.submit((1, 1, "+"))]
+        for future in futures:
+            with pytest.raises(ValueError, match="Expected 2 results, got 1"):
+                future.result(timeout=5)
+        batcher.close()
+
+
+class TestAsyncCalculatorClient:
+    """Test cases for the asyncio client."""
+
+    def test_create_calculation(self, url):
+        """Test the factory-like API without batching."""
+
+        async def main():
+            async with AsyncCalculatorClient(url) as client:
+                calculation = client.create_calculation(6, 7, "multiply")
+                assert await calculation == 42
+                assert calculation.result == 42
+                assert str(calculation) == "6 * 7 = 42"
+                return await client.calculate(1, 2, "-")
+
+        assert asyncio.run(main()) == -1
+
+    def test_pending_result(self, url):
+        """Test result is unavailable before the calculation completes."""
+
+        async def main():
+            async with AsyncCalculatorClient(url, batch_window=60) as client:
+                calculation = client.create_calculation(1, 1, "+")
+                with pytest.raises(RuntimeError):
+                    calculation.result
+                client.flush()
+                return await calculation.execute()
+
+        assert asyncio.run(main()) == 2
+
+    def test_micro_batching_coalesces_calls(self, server, url):
+        """Test concurrent calls within the window become one batch."""
+
+        async def main():
+            async with AsyncCalculatorClient(url, batch_window=0.05) as client:
+                return await asyncio.gather(
+                    *(client.calculate(i, 1, "+") for i in range(50))
+                )
+
+        assert asyncio.run(main()) == [i + 1 for i in range(50)]
+        wait_for(lambda: batches_completed(server) == 1)
+
+    def test_micro_batching_errors(self, url):
+        """Test per-call errors in a batch."""
+
+        async def main():
+            async with AsyncCalculatorClient(url, batch_window=0.001) as client:
+                return await asyncio.gather(
+                    client.calculate(1, 0, "/"),
+                    client.calculate(2, 2, "+"),
+                    return_exceptions=True,
+                )
+
+        error, value = asyncio.run(main())
+        assert isinstance(error, ValueError)
+        assert value == 4
+
+    def test_micro_batching_invalid_operands(self, url):
+        """Test a non-numeric operand fails only its own call."""
+
+        async def main():
+            async with AsyncCalculatorClient(url, batch_window=0.001) as client:
+                return await asyncio.gather(
+                    client.calculate(1, None, "+"),
+                    client.calculate(2, 2, "+"),
+                    return_exceptions=True,
+                )
+
+        error, value = asyncio.run(main())
+        assert str(error) == "Field 'b' must be a number"
+        assert value == 4
+
+    def test_concurrent_requests_use_pool(self, url):
+        """Test many concurrent single requests through a small pool."""
+
+        async def main():
+            async with AsyncCalculatorClient(url, pool_size=3) as client:
+                return await asyncio.gather(
+                    *(client.calculate(i, i, "*") for i in range(30))
+                )
+
+        assert asyncio.run(main()) == [i * i for i in range(30)]
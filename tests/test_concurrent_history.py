@@ -0,0 +1,199 @@
+"""
+Tests for the thread-safe calculation history.
+"""
+
+import gc
+import io
+import threading
+from contextlib import redirect_stdout
+
+import pytest
+
+from calculation import CalculationFactory
+from calculator import Calculator, CalculatorHistory
+from calculator.history import ConcurrentHistory
+from memory import budget
+
+
+def executed(a, b, operation="+"):
+    """Create and execute a calculation."""
+    calculation = CalculationFactory.create_calculation(a, b, operation)
+    calculation.execute()
+    return calculation
+
+
+class PausingSequence:
+    """Sequence counter that stops the first append after it takes a number."""
+
+    def __init__(self, counter):
+        self.counter = counter
+        self.armed = True
+        self.taken = threading.Event()
+        self.resume = threading.Event()
+
+    def __next__(self):
+        value = next(self.counter)
+        if self.armed:
+            self.armed = False
+            self.taken.set()
+            self.resume.wait(5)
+        return value
+
+
+def in_flight(history, calculation):
+    """Start an append in another thread, stopped after taking its number.
+
+    Returns:
+        Function finishing the append
+    """
+    sequence = history._sequence = PausingSequence(history._sequence)
+    thread = threading.Thread(target=history.add_calculation, args=(calculation,))
+    thread.start()
+    sequence.taken.wait(5)
+
+    def finish():
+        sequence.resume.set()
+        thread.join()
+
+    return finish
+
+
+@pytest.fixture(autouse=True)
+def no_limit():
+    """Remove any budget limit set by a test."""
+    yield
+    budget.set_limit(None)
+
+
+class TestConcurrentHistory:
+    """Test cases for ConcurrentHistory."""
+
+    def test_single_thread(self):
+        """Test the history behaves like CalculatorHistory in one thread."""
+        history = ConcurrentHistory()
+        assert len(history) == 0 and history.get_last_calculation() is None
+        calculations = [executed(i, 1) for i in range(5)]
+        for calculation in calculations:
+            history.add_calculation(calculation)
+        assert history.get_history() == calculations
+        assert list(history.iter_range(1, 3)) == calculations[1:3]
+        assert history.get_last_calculation() is calculations[-1]
+        assert len(history) == 5
+        assert history.clear_history() == 5
+        assert len(history) == 0 and history.get_history() == []
+
+    @pytest.mark.parametrize("strict", [False, True])
+    def test_many_threads(self, strict):
+        """Test appends from many threads are all kept, each thread in order."""
+        history = ConcurrentHistory(strict=strict)
+        start = threading.Barrier(8)
+
+        def append(worker):
+            start.wait()
+            for i in range(2000):
+                history.add_calculation(executed(worker, i))
+
+        threads = [threading.Thread(target=append, args=(w,)) for w in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        calculations = history.get_history()
+        assert len(calculations) == len(history) == 16000
+        for worker in range(8):
+            assert [c.b for c in calculations if c.a == worker] == list(range(2000))
+        final = executed(99, 0)
+        history.add_calculation(final)
+        assert history.get_last_calculation() is final
+
+    def test_last_calculation_across_threads(self):
+        """Test the last calculation is the last appended by any thread."""
+        history = ConcurrentHistory()
+        first, second = executed(1, 1), executed(2, 2)
+        history.add_calculation(first)
+        thread = threading.Thread(target=history.add_calculation, args=(second,))
+        thread.start()
+        thread.join()
+        assert history.get_last_calculation() is second
+        history.add_calculation(first)
+        assert history.get_last_calculation() is first
+
+    def test_strict_hides_calculations_after_a_gap(self):
+        """Test strict reads stop at an append that is still in progress."""
+        relaxed, strict = ConcurrentHistory(), ConcurrentHistory(strict=True)
+        first, pending, after = executed(1, 1), executed(2, 2), executed(3, 3)
+        for history in (relaxed, strict):
+            history.add_calculation(first)
+            finish = in_flight(history, pending)
+            history.add_calculation(after)
+            if history is relaxed:
+                assert history.get_history() == [first, after]
+                assert history.get_last_calculation() is after
+                assert len(history) == 2
+            else:
+                assert history.get_history() == [first]
+                assert history.get_last_calculation() is first
+                assert len(history) == 1
+            finish()
+            assert history.get_history() == [first, pending, after]
+            assert history.get_last_calculation() is after
+
+    def test_strict_gap_at_start(self):
+        """Test strict reads show nothing until the first append finishes."""
+        history = ConcurrentHistory(strict=True)
+        finish = in_flight(history, executed(1, 1))
+        history.add_calculation(executed(2, 2))
+        assert history.get_history() == [] and len(history) == 0
+        assert history.get_last_calculation() is None
+        finish()
+        assert len(history) == 2
+
+    def test_clear_drops_stragglers(self):
+        """Test an append begun before a clear does not reappear after it."""
+        history = ConcurrentHistory(strict=True)
+        history.add_calculation(executed(1, 1))
+        finish = in_flight(history, executed(2, 2))
+        history.add_calculation(executed(3, 3))
+        assert history.clear_history() == 2
+        finish()
+        later = executed(4, 4)
+        history.add_calculation(later)
+        assert history.get_history() == [later]
+        assert history.get_last_calculation() is later
+
+    def test_evicts_oldest_across_threads(self):
+        """Test eviction under the memory budget removes the oldest first."""
+        history = ConcurrentHistory()
+
+        def append(start):
+            for i in range(start, start + 200):
+                history.add_calculation(executed(i, 0))
+
+        append(0)
+        thread = threading.Thread(target=append, args=(200,))
+        thread.start()
+        thread.join()
+        append(400)
+        assert history.memory_usage() == 600 * CalculatorHistory.ENTRY_OVERHEAD
+        # Close accounts of unreachable histories from earlier tests now, not
+        # between measuring the other accounts and evicting.
+        gc.collect()
+        others = budget.used - history._account.bytes
+        budget.set_limit(others + 300 * CalculatorHistory.ENTRY_OVERHEAD)
+        remaining = [c.a for c in history.get_history()]
+        assert history.evicted > 300 and len(remaining) + history.evicted == 600
+        assert remaining == list(range(history.evicted, 600))
+        assert (
+            history.memory_usage() == len(remaining) * CalculatorHistory.ENTRY_OVERHEAD
+        )
+
+    def test_calculator_uses_concurrent_history(self):
+        """Test the REPL records into a ConcurrentHistory."""
+        history = ConcurrentHistory()
+        calculator = Calculator(history=history)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            calculator._handle_input("5 + 3")
+            calculator._handle_input("history")
+        assert history.get_last_calculation().result == 8
+        assert output.getvalue().splitlines()[-1].endswith("5 + 3 = 8")
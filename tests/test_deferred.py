@@ -0,0 +1,109 @@
+"""
+Unit tests for deferred bulk execution of calculations.
+"""
+
+import pickle
+import threading
+
+import pytest
+
+import calculation
+from calculation import Calculation, CalculationFactory
+from calculation.deferred import DeferredCalculation, DeferredExecution
+from calculation.offload import dispatcher
+
+
+class TestDeferredExecution:
+    """Test cases for DeferredExecution."""
+
+    def test_first_result_flushes_queue(self):
+        """Test nothing runs until a result is needed, then everything runs."""
+        with DeferredExecution() as execution:
+            calculations = [
+                CalculationFactory.create_calculation(i, 2, operation)
+                for i in range(10)
+                for operation in "+-*/"
+            ]
+            assert len(execution) == 40
+            assert str(calculations[2]) == "0 * 2 = ?"
+            assert calculations[2].result == 0
+            assert len(execution) == 0 and execution.flushes == 1
+            assert all(c._executed for c in calculations)
+        assert [c.result for c in calculations[4:8]] == [3, -1, 2, 0.5]
+        assert str(calculations[6]) == "1 * 2 = 2"
+        assert execution.flushes == 1 and execution.executed == 40
+
+    def test_exit_flushes_queue(self):
+        """Test leaving the context evaluates what is still queued."""
+        with DeferredExecution() as execution:
+            calculation = CalculationFactory.create_calculation(6, 7, "*")
+        assert isinstance(calculation, DeferredCalculation)
+        assert calculation._executed and calculation.result == 42
+        assert execution.flushes == 1
+        after = CalculationFactory.create_calculation(6, 7, "*")
+        assert type(after) is Calculation
+
+    def test_errors_raise_on_access(self):
+        """Test failing calculations raise only when their result is used."""
+        with DeferredExecution():
+            good = CalculationFactory.create_calculation(1, 4, "/")
+            bad = CalculationFactory.create_calculation(1, 0, "/")
+            too_big = CalculationFactory.create_calculation(10, 10**9, "^")
+        assert good.result == 0.25
+        assert str(bad) == "1 / 0 = ?"
+        with pytest.raises(ValueError, match="Division by zero"):
+            bad.result
+        with pytest.raises(ValueError, match="exceed"):
+            too_big.execute()
+
+    def test_max_pending_flushes_early(self):
+        """Test a full queue is evaluated without waiting to be asked."""
+        with DeferredExecution(max_pending=4) as execution:
+            calculations = [
+                CalculationFactory.create_calculation(i, 1, "+") for i in range(10)
+            ]
+            assert execution.flushes == 2 and len(execution) == 2
+        assert [c.result for c in calculations] == list(range(1, 11))
+
+    def test_nested_contexts(self):
+        """Test an inner context queues and flushes on its own."""
+        with DeferredExecution() as outer:
+            first = CalculationFactory.create_calculation(1, 1, "+")
+            with DeferredExecution() as inner:
+                second = CalculationFactory.create_calculation(2, 2, "+")
+            assert second._executed and not first._executed
+            third = CalculationFactory.create_calculation(3, 3, "+")
+            assert len(outer) == 2 and inner.executed == 1
+        assert (first.result, second.result, third.result) == (2, 4, 6)
+
+    def test_factory_is_only_swapped_while_active(self):
+        """Test other threads stay eager and the plain factory comes back."""
+        created = []
+
+        def create():
+            created.append(CalculationFactory.create_calculation(1, 2, "+"))
+
+        assert calculation._new_calculation is calculation._create
+        with DeferredExecution() as execution:
+            thread = threading.Thread(target=create)
+            thread.start()
+            thread.join()
+            assert len(execution) == 0
+        assert type(created[0]) is Calculation
+        assert calculation._new_calculation is calculation._create
+
+    def test_huge_calculations_are_left_to_offload(self, monkeypatch):
+        """Test flushing skips calculations the dispatcher would offload."""
+        monkeypatch.setattr(dispatcher, "threshold_bits", 1 << 20)
+        a = 1 << (1 << 20)
+        with DeferredExecution():
+            small = CalculationFactory.create_calculation(3, 3, "*")
+            huge = CalculationFactory.create_calculation(a, a, "*")
+        assert small._executed and not huge._executed
+
+    def test_pickle(self):
+        """Test a deferred calculation pickles without its execution."""
+        with DeferredExecution():
+            calculation = CalculationFactory.create_calculation(2, 3, "^")
+        copy = pickle.loads(pickle.dumps(calculation))
+        assert copy.result == 8 and copy._execution is None
@@ -0,0 +1,291 @@
+"""
+Tests for the history change feed and its server-sent events endpoint.
+"""
+
+import asyncio
+import json
+import socket
+import threading
+
+import pytest
+
+from calculation import CalculationFactory
+from calculator import CalculatorHistory
+from calculator.feed import DISCONNECT, FeedOverflow, HistoryFeed
+from calculator.history import ConcurrentHistory
+from service import CalculationHTTPServer, ServerThread
+
+
+def record(history, a, b, operation="+"):
+    """Execute a calculation and add it to ``history``."""
+    calculation = CalculationFactory.create_calculation(a, b, operation)
+    calculation.execute()
+    history.add_calculation(calculation)
+    return calculation
+
+
+def collect(subscription, count):
+    """Iterate a subscription until ``count`` events arrive."""
+
+    async def main():
+        events = []
+        async for event in subscription:
+            events.append(event)
+            if len(events) == count:
+                break
+        return events
+
+    return asyncio.run(asyncio.wait_for(main(), 5))
+
+
+class TestFeed:
+    """Test cases for publishing and subscribing."""
+
+    def test_events(self):
+        """Test appends and clears publish numbered, compact events."""
+        history = CalculatorHistory()
+        subscription = history.feed.subscribe()
+        record(history, 2, 3)
+        record(history, 6, 4, "/")
+        history.clear_history()
+        events = subscription.poll()
+        assert [e.sequence for e in events] == [1, 2, 3]
+        assert events[0].as_dict() == {
+            "sequence": 1,
+            "kind": "add",
+            "timestamp": events[0].timestamp,
+            "a": 2,
+            "b": 3,
+            "operation": "add",
+            "result": 5,
+        }
+        assert events[1].result == 1.5
+        assert events[2].kind == "clear"
+        assert set(events[2].as_dict()) == {"sequence", "kind", "timestamp"}
+        assert subscription.after == 3
+
+    def test_async_iteration(self):
+        """Test a subscriber is woken by appends from another thread."""
+        history = CalculatorHistory()
+        subscription = history.feed.subscribe()
+
+        def produce():
+            for i in range(50):
+                record(history, i, 1)
+
+        async def main():
+            thread = threading.Thread(target=produce)
+            thread.start()
+            events = []
+            async for event in subscription:
+                events.append(event)
+                if len(events) == 50:
+                    break
+            thread.join()
+            return events
+
+        events = asyncio.run(asyncio.wait_for(main(), 5))
+        assert [e.a for e in events] == list(range(50))
+
+    def test_close_ends_iteration(self):
+        """Test closing a subscription ends iteration after queued events."""
+        feed = HistoryFeed()
+        subscription = feed.subscribe()
+        feed.publish_clear()
+        subscription.close()
+        assert len(feed) == 0
+        assert [e.kind for e in collect(subscription, 10)] == ["clear"]
+
+    def test_resume(self):
+        """Test a subscriber resumes after the last sequence it saw."""
+        history = CalculatorHistory()
+        feed = history.feed
+        for i in range(5):
+            record(history, i, 0)
+        assert [e.a for e in feed.subscribe(after=2).poll()] == [2, 3, 4]
+        assert feed.subscribe(after=5).poll() == []
+        assert [e.a for e in collect(feed.subscribe(after=0), 5)] == [
+            0,
+            1,
+            2,
+            3,
+            4,
+        ]
+        with pytest.raises(ValueError, match="has not been published"):
+            feed.subscribe(after=6)
+
+    def test_resume_too_old(self):
+        """Test resuming before the retained events fails."""
+        feed = HistoryFeed(retain=3)
+        for _ in range(5):
+            feed.publish_clear()
+        assert len(feed.subscribe(after=2).poll()) == 3
+        with pytest.raises(ValueError, match="no longer retained"):
+            feed.subscribe(after=1)
+
+    def test_drop_oldest(self):
+        """Test a full queue drops its oldest events."""
+        feed = HistoryFeed(maxsize=3)
+        subscription = feed.subscribe()
+        fast = feed.subscribe(maxsize=100)
+        for _ in range(5):
+            feed.publish_clear()
+        assert [e.sequence for e in subscription.poll()] == [3, 4, 5]
+        assert subscription.dropped == 2
+        assert len(fast.poll()) == 5
+        assert feed.metrics()["dropped"] == 2
+
+    def test_disconnect(self):
+        """Test a full ``disconnect`` queue ends with FeedOverflow."""
+        feed = HistoryFeed(maxsize=2, policy=DISCONNECT)
+        subscription = feed.subscribe()
+        for _ in range(3):
+            feed.publish_clear()
+        assert len(feed) == 0
+        with pytest.raises(FeedOverflow) as overflow:
+            collect(subscription, 10)
+        assert overflow.value.after == 2
+        resumed = feed.subscribe(after=overflow.value.after)
+        assert [e.sequence for e in resumed.poll()] == [3]
+
+    def test_invalid_options(self):
+        """Test policies and queue lengths are validated."""
+        with pytest.raises(ValueError, match="Unknown policy"):
+            HistoryFeed(policy="block")
+        with pytest.raises(ValueError, match="Unknown policy"):
+            HistoryFeed().subscribe(policy="block")
+        with pytest.raises(ValueError, match="at least 1"):
+            HistoryFeed().subscribe(maxsize=-1)
+
+    def test_concurrent_history(self):
+        """Test ConcurrentHistory publishes appends from every thread."""
+        history = ConcurrentHistory()
+        subscription = history.feed.subscribe(maxsize=10000)
+        threads = [
+            threading.Thread(target=lambda: [record(history, 1, 1) for _ in range(100)])
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        events = subscription.poll()
+        assert [e.sequence for e in events] == list(range(1, 401))
+        history.clear_history()
+        assert subscription.poll()[0].kind == "clear"
+
+    def test_lazy(self):
+        """Test a history publishes nothing until its feed is first used."""
+        history = CalculatorHistory()
+        record(history, 1, 2)
+        assert history._feed is None
+        assert history.feed.sequence == 0
+        record(history, 1, 2)
+        assert history.feed.sequence == 1
+
+
+@pytest.fixture
+def server():
+    """Run an HTTP server that records calculations in a history."""
+    runner = ServerThread(CalculationHTTPServer(port=0, history=CalculatorHistory()))
+    yield runner.start()
+    runner.stop()
+
+
+def get(port, target):
+    """Make a ``GET`` request on a new connection and return the response."""
+    with socket.create_connection(("127.0.0.1", port), timeout=5) as conn:
+        conn.sendall(
+            f"GET {target} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n".encode()
+        )
+        data = b""
+        while chunk := conn.recv(65536):
+            data += chunk
+    return data.decode()
+
+
+class EventStream:
+    """Blocking reader of a ``/history/feed`` response."""
+
+    def __init__(self, port, target="/history/feed", headers=""):
+        self.socket = socket.create_connection(("127.0.0.1", port), timeout=5)
+        self.socket.sendall(
+            f"GET {target} HTTP/1.1\r\nHost: localhost\r\n{headers}\r\n".encode()
+        )
+        self.file = self.socket.makefile("rb")
+        self.status = self.file.readline().decode().strip()
+        while self.file.readline() != b"\r\n":
+            pass
+
+    def next(self):
+        """Return the next event's fields."""
+        fields = {}
+        while True:
+            line = self.file.readline().decode()
+            if line in ("\n", ""):
+                return fields
+            name, _, value = line.rstrip("\n").partition(": ")
+            fields[name] = value
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+
+class TestEndpoint:
+    """Test cases for ``GET /history/feed``."""
+
+    def test_stream(self, server):
+        """Test computed calculations are streamed as they are recorded."""
+        feed = EventStream(server.port)
+        assert feed.status == "HTTP/1.1 200 OK"
+        get(server.port, "/calculate?a=2&b=3&operation=add")
+        get(server.port, "/calculate?a=2&b=3&operation=add")  # cached
+        get(server.port, "/calculate?a=1&b=0&operation=divide")  # failed
+        get(server.port, "/calculate?a=6&b=4&operation=multiply")
+        first, second = feed.next(), feed.next()
+        feed.close()
+        assert first["id"] == "1"
+        data = json.loads(first["data"])
+        assert (data["a"], data["b"], data["operation"], data["result"]) == (
+            2,
+            3,
+            "add",
+            5,
+        )
+        assert json.loads(second["data"])["result"] == 24
+
+    def test_resume(self, server):
+        """Test Last-Event-ID and ``after`` replay the events that followed."""
+        for i in range(3):
+            get(server.port, f"/calculate?a={i}&b=10&operation=add")
+        feed = EventStream(server.port, headers="Last-Event-ID: 1\r\n")
+        assert [feed.next()["id"], feed.next()["id"]] == ["2", "3"]
+        feed.close()
+        feed = EventStream(server.port, "/history/feed?after=2")
+        assert json.loads(feed.next()["data"])["a"] == 2
+        feed.close()
+
+    def test_errors(self, server):
+        """Test bad resume points and policies are rejected."""
+        assert get(server.port, "/history/feed?after=x").startswith("HTTP/1.1 400")
+        assert get(server.port, "/history/feed?policy=x").startswith("HTTP/1.1 400")
+        assert get(server.port, "/history/feed?after=9").startswith("HTTP/1.1 410")
+
+    def test_disabled(self):
+        """Test servers without a history have no feed."""
+        with ServerThread(CalculationHTTPServer(port=0)) as server:
+            assert get(server.port, "/history/feed").startswith("HTTP/1.1 404")
+
+    def test_client_leaves(self, server):
+        """Test a departed client's subscription is closed."""
+        history = server.history
+        feed = EventStream(server.port)
+        assert len(history.feed) == 1
+        feed.close()
+        for _ in range(100):
+            if not len(history.feed):
+                break
+            threading.Event().wait(0.01)
+        assert len(history.feed) == 0
+        assert server.metrics()["history"]["subscribers"] == 0
@@ -0,0 +1,345 @@
+"""
+Integration tests for the HTTP front-end of the calculation service.
+
+A server is started on an ephemeral port in a background thread and
+exercised with ``http.client``.
+"""
+
+import http.client
+import json
+import threading
+
+import pytest
+from tests.test_service import wait_for
+
+from service import (
+    AdmissionController,
+    CalculationHTTPServer,
+    CalculationService,
+    Lane,
+    ResponseCache,
+    ServerThread,
+)
+from service.cache import etag_matches
+
+
+@pytest.fixture
+def server():
+    """Run an HTTP server with small admission lanes."""
+    service = CalculationService(
+        admission=AdmissionController(
+            {
+                "single": Lane("single", workers=2, capacity=8),
+                "batch": Lane("batch", workers=1, capacity=1),
+            }
+        )
+    )
+    runner = ServerThread(CalculationHTTPServer(service, port=0, max_batch_items=5))
+    yield runner.start()
+    runner.stop()
+    service.close()
+
+
+def request(server, method, path, body=None, headers=None):
+    """Send one request and return (status, headers, decoded JSON body)."""
+    connection = http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+    payload = json.dumps(body) if body is not None else None
+    connection.request(method, path, body=payload, headers=headers or {})
+    response = connection.getresponse()
+    data = json.loads(response.read())
+    connection.close()
+    return response.status, dict(response.getheaders()), data
+
+
+class TestCalculateEndpoint:
+    """Test cases for /calculate."""
+
+    @pytest.mark.parametrize(
+        "path, expected",
+        [
+            ("/calculate?a=5&b=3&operation=add", 8),
+            ("/calculate?a=5&b=3&operation=%2B", 8),
+            ("/calculate?a=2.5&b=2&operation=*", 5.0),
+            ("/calculate?a=9&b=3&operation=divide", 3.0),
+        ],
+    )
+    def test_get(self, server, path, expected):
+        """Test GET calculations from query parameters."""
+        status, _, data = request(server, "GET", path)
+        assert status == 200
+        assert data["result"] == expected
+
+    def test_post(self, server):
+        """Test POST calculations with a JSON body."""
+        status, headers, data = request(
+            server, "POST", "/calculate", {"a": 10, "b": 4, "operation": " - "}
+        )
+        assert status == 200
+        assert headers["Content-Type"] == "application/json"
+        assert data == {"operation": "subtract", "a": 10, "b": 4, "result": 6}
+
+    @pytest.mark.parametrize(
+        "body, message",
+        [
+            ({"a": 1, "b": 0, "operation": "/"}, "Division by zero"),
+            ({"a": 1, "b": 2, "operation": "&"}, "Unsupported operation"),
+            ({"a": 10**400, "b": 3, "operation": "/"}, "too large"),
+            ({"a": 10**400, "b": 1.5, "operation": "*"}, "too large"),
+            ({"a": 1e308, "b": 10, "operation": "*"}, "not a finite number"),
+            ({"a": 2, "b": 10**400, "operation": "^"}, "would exceed"),
+            ({"a": "x", "b": 2, "operation": "+"}, "must be a number"),
+            ({"a": True, "b": 2, "operation": "+"}, "must be a number"),
+            ({"a": 1, "operation": "+"}, "Missing field"),
+            ([1, 2], "must be an object"),
+        ],
+    )
+    def test_errors(self, server, body, message):
+        """Test invalid calculations are reported as 400 responses."""
+        status, _, data = request(server, "POST", "/calculate", body)
+        assert status == 400
+        assert message in data["error"]
+
+    def test_invalid_priority(self, server):
+        """Test unknown priorities are rejected."""
+        status, _, _ = request(
+            server,
+            "GET",
+            "/calculate?a=1&b=1&operation=%2B",
+            headers={"X-Priority": "x"},
+        )
+        assert status == 400
+
+    def test_keep_alive(self, server):
+        """Test several requests share one connection."""
+        connection = http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+        for i in range(3):
+            connection.request("GET", f"/calculate?a={i}&b=1&operation=add")
+            response = connection.getresponse()
+            assert json.loads(response.read())["result"] == i + 1
+        connection.close()
+
+
+class TestOtherEndpoints:
+    """Test cases for /batch, /metrics, /health and routing."""
+
+    def test_batch(self, server):
+        """Test batch results are returned in order with per-item errors."""
+        items = [
+            {"a": 1, "b": 2, "operation": "+"},
+            {"a": 1, "b": 0, "operation": "/"},
+            {"a": 3, "b": 3, "operation": "multiply"},
+        ]
+        status, _, data = request(server, "POST", "/batch", {"items": items})
+        assert status == 200
+        assert data["results"] == [
+            {"result": 3},
+            {"error": "Division by zero is not allowed"},
+            {"result": 9},
+        ]
+
+    def test_batch_overflow_is_a_per_item_error(self, server):
+        """Test overflowing and non-finite items do not fail the batch."""
+        items = [
+            {"a": 10**400, "b": 3, "operation": "/"},
+            {"a": 1e308, "b": 10, "operation": "*"},
+            {"a": 2, "b": 2, "operation": "+"},
+        ]
+        status, _, data = request(server, "POST", "/batch", {"items": items})
+        assert status == 200
+        assert "too large" in data["results"][0]["error"]
+        assert data["results"][1] == {"error": "Result is not a finite number"}
+        assert data["results"][2] == {"result": 4}
+
+    @pytest.mark.parametrize(
+        "body, status, expected",
+        [
+            ({"operation": "sum", "values": [0.1] * 10}, 200, 1.0),
+            ({"operation": "AVG", "values": [1, "2"]}, 200, 1.5),
+            ({"operation": "max", "values": []}, 400, "no values"),
+            ({"operation": "median", "values": [1]}, 400, "Unsupported reduction"),
+            ({"operation": "sum", "values": ["x"]}, 400, "must be a number"),
+            ({"operation": "sum"}, 400, "'values' list"),
+        ],
+    )
+    def test_reduce(self, server, body, status, expected):
+        """Test reductions over a list of values."""
+        code, _, data = request(server, "POST", "/reduce", body)
+        assert code == status
+        if status == 200:
+            assert data["result"] == expected
+            assert data["count"] == len(body["values"])
+        else:
+            assert expected in data["error"]
+
+    def test_batch_too_large(self, server):
+        """Test oversized batches are refused."""
+        items = [{"a": 1, "b": 1, "operation": "+"}] * 6
+        status, _, _ = request(server, "POST", "/batch", {"items": items})
+        assert status == 413
+
+    def test_batch_overload_returns_429(self, server):
+        """Test a saturated batch lane answers 429 with Retry-After."""
+        release = threading.Event()
+        admission = server.service.admission
+        admission.submit("batch", lambda: release.wait(5))
+        wait_for(lambda: admission.metrics()["batch"]["busy"] == 1)
+        admission.submit("batch", lambda: None)
+        try:
+            status, headers, data = request(
+                server,
+                "POST",
+                "/batch",
+                {"items": [{"a": 1, "b": 1, "operation": "+"}]},
+            )
+            assert status == 429
+            assert int(headers["Retry-After"]) >= 1
+            assert "full" in data["error"]
+
+            status, _, data = request(server, "GET", "/calculate?a=1&b=1&operation=%2B")
+            assert (status, data["result"]) == (200, 2)
+        finally:
+            release.set()
+
+    def test_metrics(self, server):
+        """Test metrics expose coalescing and admission counters."""
+        request(server, "GET", "/calculate?a=1&b=1&operation=%2B")
+        status, _, data = request(server, "GET", "/metrics")
+        assert status == 200
+        assert data["coalescing"]["calls"] == 1
+        assert data["admission"]["single"]["completed"] == 1
+        assert set(data["admission"]["batch"]["depth"]) == {"high", "normal", "low"}
+        assert "offloaded" in data["offload"]
+
+    def test_health(self, server):
+        """Test the health endpoint."""
+        assert request(server, "GET", "/health")[2] == {"status": "ok"}
+
+    def test_not_found_and_method(self, server):
+        """Test unknown paths and methods."""
+        assert request(server, "GET", "/nope")[0] == 404
+        status, headers, _ = request(server, "GET", "/batch")
+        assert status == 405
+        assert headers["Allow"] == "POST"
+
+    def test_invalid_json(self, server):
+        """Test malformed JSON bodies."""
+        connection = http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+        connection.request("POST", "/calculate", body="{not json")
+        response = connection.getresponse()
+        assert response.status == 400
+        connection.close()
+
+
+class TestResponseCache:
+    """Test cases for ResponseCache."""
+
+    def test_put_and_get(self):
+        """Test cached bodies are returned with a strong ETag."""
+        cache = ResponseCache()
+        entry = cache.put("k", b"body")
+        assert entry.etag.startswith('"') and entry.etag.endswith('"')
+        assert cache.get("k") == entry
+        assert cache.get("missing") is None
+        metrics = cache.metrics()
+        assert (metrics["hits"], metrics["misses"]) == (1, 1)
+        assert metrics["hit_ratio"] == 0.5
+
+    def test_entry_bound_evicts_least_recently_used(self):
+        """Test the entry limit evicts the least recently used response."""
+        cache = ResponseCache(max_entries=2)
+        cache.put("a", b"1")
+        cache.put("b", b"2")
+        cache.get("a")
+        cache.put("c", b"3")
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.metrics()["evictions"] == 1
+
+    def test_byte_bound(self):
+        """Test the byte limit bounds the total cached size."""
+        overhead = ResponseCache.ENTRY_OVERHEAD
+        cache = ResponseCache(max_bytes=3 * (100 + overhead))
+        for key in range(10):
+            cache.put(key, b"x" * 100)
+        assert len(cache) == 3
+        assert cache.metrics()["bytes"] <= cache.max_bytes
+        cache.put("huge", b"x" * cache.max_bytes)
+        assert cache.get("huge") is None
+
+    @pytest.mark.parametrize(
+        "header, expected",
+        [
+            ('"abc"', True),
+            ('W/"abc"', True),
+            ('"x", "abc"', True),
+            ("*", True),
+            ('"x"', False),
+        ],
+    )
+    def test_etag_matches(self, header, expected):
+        """Test If-None-Match comparison."""
+        assert etag_matches(header, '"abc"') is expected
+
+
+class TestHTTPCaching:
+    """Test cases for HTTP response caching and revalidation."""
+
+    def test_equivalent_requests_hit_cache(self, server):
+        """Test '+', 'add' and padded names share one cached response."""
+        first = request(server, "GET", "/calculate?a=2&b=3&operation=add")
+        second = request(server, "GET", "/calculate?a=2&b=3&operation=%20%2B%20")
+        third = request(
+            server, "POST", "/calculate", {"a": 2, "b": 3, "operation": "ADD"}
+        )
+        assert first[0] == second[0] == third[0] == 200
+        assert first[2] == second[2] == third[2]
+        assert first[1]["ETag"] == second[1]["ETag"] == third[1]["ETag"]
+        assert "max-age" in first[1]["Cache-Control"]
+
+        metrics = request(server, "GET", "/metrics")[2]
+        assert metrics["response_cache"]["hits"] == 2
+        assert metrics["response_cache"]["misses"] == 1
+        assert metrics["coalescing"]["calls"] == 1
+
+    def test_distinct_operands_do_not_share(self, server):
+        """Test that 1 and 1.0 are cached separately."""
+        integer = request(server, "GET", "/calculate?a=1&b=2&operation=add")
+        real = request(server, "GET", "/calculate?a=1.0&b=2&operation=add")
+        assert integer[2]["result"] == 3
+        assert real[2]["result"] == 3.0
+        assert integer[1]["ETag"] != real[1]["ETag"]
+
+    def test_if_none_match_returns_304(self, server):
+        """Test conditional requests are answered with 304 and no body."""
+        _, headers, _ = request(server, "GET", "/calculate?a=4&b=5&operation=*")
+        connection = http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+        connection.request(
+            "GET",
+            "/calculate?a=4&b=5&operation=multiply",
+            headers={"If-None-Match": headers["ETag"]},
+        )
+        response = connection.getresponse()
+        assert response.status == 304
+        assert response.read() == b""
+        assert response.getheader("ETag") == headers["ETag"]
+        connection.close()
+
+        metrics = request(server, "GET", "/metrics")[2]
+        assert metrics["response_cache"]["not_modified"] == 1
+
+    def test_stale_etag_returns_body(self, server):
+        """Test a non-matching ETag gets the full response."""
+        status, _, data = request(
+            server,
+            "GET",
+            "/calculate?a=4&b=5&operation=*",
+            headers={"If-None-Match": '"stale"'},
+        )
+        assert (status, data["result"]) == (200, 20)
+
+    def test_errors_are_not_cached(self, server):
+        """Test error responses carry no-store and are not cached."""
+        status, headers, _ = request(server, "GET", "/calculate?a=1&b=0&operation=/")
+        assert status == 400
+        assert headers["Cache-Control"] == "no-store"
+        assert len(server.cache) == 0
@@ -56,7 +56,7 @@ class TestCalculatorIntegration:
         test_cases = [
             "5 / 0",  # Division by zero
             "abc + 3",  # Invalid number
-            "5 % 3",  # Invalid operation
+            "5 & 3",  # Invalid operation
             "5 +",  # Invalid format (prints 2 messages)
         ]
 
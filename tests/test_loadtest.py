@@ -0,0 +1,223 @@
+"""
+Tests for the traffic-replaying load generator.
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from calculator import main
+from calculator.loadtest import (
+    LatencyHistogram,
+    LoadTest,
+    make_target,
+    parse_capture,
+)
+from service import CalculationHTTPServer, CalculationRPCServer, ServerThread
+
+CAPTURE = [
+    '{"a": 5, "b": 3, "operation": "+"}',
+    '{"a": 6, "b": 0, "operation": "divide"}',
+    '{"items": [{"a": 2, "b": 3, "operation": "*"}]}',
+]
+
+
+def replay(records, target, closed=True, **settings):
+    """Run a load test against a target spec and return the report."""
+
+    async def run():
+        target_instance = make_target(target)
+        await target_instance.open()
+        try:
+            test = LoadTest(records, target_instance, settings.pop("requests", None))
+            if closed:
+                return await test.run_closed(settings.get("concurrency", 4))
+            return await test.run_open(settings.get("rate"))
+        finally:
+            await target_instance.close()
+
+    return asyncio.run(run())
+
+
+class TestLatencyHistogram:
+    """Test cases for the latency histogram."""
+
+    def test_percentiles_within_precision(self):
+        """Test percentiles are within the histogram's relative error."""
+        histogram = LatencyHistogram()
+        for micros in range(1, 10001):
+            histogram.record(micros / 1e6)
+        assert histogram.total == 10000
+        assert histogram.percentile(50) == pytest.approx(0.005, rel=0.01)
+        assert histogram.percentile(99) == pytest.approx(0.0099, rel=0.01)
+        assert histogram.percentile(100) == pytest.approx(0.01)
+
+    def test_empty(self):
+        """Test an empty histogram reports zeros."""
+        histogram = LatencyHistogram()
+        assert histogram.percentile(99) == 0.0
+        assert histogram.summary() == {"count": 0}
+
+    def test_corrected_backfills_missing_samples(self):
+        """Test a stall is back-filled with the omitted requests."""
+        histogram = LatencyHistogram()
+        histogram.record_corrected(1.0, 0.1)
+        assert histogram.total == 10
+        assert histogram.percentile(50) == pytest.approx(0.5, rel=0.01)
+
+    def test_merge(self):
+        """Test merging combines counts and extremes."""
+        first, second = LatencyHistogram(), LatencyHistogram()
+        first.record(0.001)
+        second.record(0.002, count=3)
+        first.merge(second)
+        assert first.total == 4
+        assert first.max == 0.002
+
+
+class TestParseCapture:
+    """Test cases for capture parsing."""
+
+    def test_json_lines(self):
+        """Test single and batch JSON records are parsed."""
+        records = parse_capture(CAPTURE)
+        assert records[0] == {"a": 5, "b": 3, "operation": "+"}
+        assert records[2] == {"items": [(2, 3, "*")]}
+
+    def test_json_timings_and_unrelated_objects(self):
+        """Test recorded times are kept and unrelated objects skipped."""
+        records = parse_capture(
+            ['{"a": 1, "b": 2, "operation": "+", "t": 1.5}', '{"title": "x"}']
+        )
+        assert records == [{"a": 1, "b": 2, "operation": "+", "t": 1.5}]
+
+    def test_repl_session(self):
+        """Test REPL input is parsed and commands are skipped."""
+        records = parse_capture(
+            ["Calculator> 5 + 3", "history", "2.5 * 4", "# comment", "x + 1"]
+        )
+        assert records == [
+            {"a": 5, "b": 3, "operation": "+"},
+            {"a": 2.5, "b": 4, "operation": "*"},
+        ]
+
+    @pytest.mark.parametrize(
+        "line, match",
+        [
+            ('{"items": [{"a": 1, "b": 2}]}', "need 'a', 'b' and 'operation'"),
+            ('{"items": [1]}', "need 'a', 'b' and 'operation'"),
+            ('{"a": 1, "b": 2, "operation": "+", "t": null}', "arrival time"),
+            ('{"a": 1,', "line 2"),
+        ],
+    )
+    def test_malformed_json_records(self, line, match):
+        """Test malformed JSON records are rejected with their line number."""
+        with pytest.raises(ValueError, match=match):
+            parse_capture(["5 + 3", line])
+
+    def test_empty_capture(self):
+        """Test a capture without requests is rejected."""
+        with pytest.raises(ValueError, match="no replayable requests"):
+            parse_capture(["help", ""])
+
+
+class TestTargets:
+    """Test cases for replaying against each target."""
+
+    def test_invalid_target(self):
+        """Test unknown targets are rejected."""
+        with pytest.raises(ValueError, match="Invalid target"):
+            make_target("ftp://example")
+
+    def test_engine_closed_loop(self):
+        """Test closed-loop replay against the in-process engine."""
+        report = replay(parse_capture(CAPTURE), "engine", requests=30)
+        assert report["mode"] == "closed"
+        assert report["requests"] == 30
+        assert report["errors"]["by_type"] == {"ValueError": 10}
+        assert report["latency_ms"]["uncorrected"]["count"] == 30
+        assert report["latency_ms"]["corrected"]["count"] >= 30
+
+    def test_engine_open_loop(self):
+        """Test open-loop replay keeps the schedule."""
+        report = replay(
+            parse_capture(CAPTURE), "engine", closed=False, rate=1000, requests=50
+        )
+        assert report["mode"] == "open"
+        assert report["requests"] == 50
+        assert report["duration_s"] >= 0.049
+        assert report["histogram_ms"]["corrected"]
+
+    def test_open_loop_recorded_timings(self):
+        """Test recorded arrival times are replayed at the requested speed."""
+        records = parse_capture(
+            [
+                '{"a": 1, "b": 1, "operation": "+", "t": 10.0}',
+                '{"a": 1, "b": 1, "operation": "+", "t": 10.2}',
+            ]
+        )
+
+        async def run():
+            test = LoadTest(records, make_target("engine"))
+            return await test.run_open(speed=2.0)
+
+        assert asyncio.run(run())["duration_s"] >= 0.099
+
+    def test_open_loop_requires_rate_or_timings(self):
+        """Test open loop without a rate needs recorded timings."""
+        with pytest.raises(ValueError, match="pass a rate"):
+            replay(parse_capture(CAPTURE), "engine", closed=False)
+
+    def test_http_target(self):
+        """Test replay against the HTTP service counts server errors."""
+        with ServerThread(CalculationHTTPServer(port=0)) as server:
+            report = replay(parse_capture(CAPTURE), f"http://127.0.0.1:{server.port}")
+        assert report["requests"] == 3
+        assert report["errors"]["by_type"] == {"ResponseError": 1}
+
+    def test_socket_target(self, tmp_path):
+        """Test replay against the RPC socket server."""
+        path = str(tmp_path / "calc.sock")
+        with ServerThread(CalculationRPCServer(path)):
+            report = replay(parse_capture(CAPTURE), f"unix://{path}", requests=9)
+        assert report["requests"] == 9
+        assert report["errors"]["rate"] == pytest.approx(1 / 3)
+
+
+class TestCommandLine:
+    """Test cases for ``python -m calculator loadtest``."""
+
+    def test_writes_json_report(self, tmp_path):
+        """Test the subcommand writes a JSON report."""
+        capture = tmp_path / "capture.jsonl"
+        capture.write_text("\n".join(CAPTURE))
+        output = tmp_path / "report.json"
+        status = main(
+            [
+                "loadtest",
+                str(capture),
+                "--concurrency",
+                "2",
+                "--requests",
+                "12",
+                "--output",
+                str(output),
+            ]
+        )
+        assert status == 0
+        report = json.loads(output.read_text())
+        assert report["target"] == "engine"
+        assert report["requests"] == 12
+
+    def test_missing_capture(self, tmp_path, capsys):
+        """Test a missing capture reports an error."""
+        assert main(["loadtest", str(tmp_path / "missing.jsonl")]) == 2
+        assert "Error:" in capsys.readouterr().err
+
+    def test_malformed_capture(self, tmp_path, capsys):
+        """Test a batch item missing a field is a usage error, not a traceback."""
+        capture = tmp_path / "capture.jsonl"
+        capture.write_text('{"items": [{"a": 1, "operation": "+"}]}\n')
+        assert main(["loadtest", str(capture)]) == 2
+        assert "Capture line 1" in capsys.readouterr().err
@@ -0,0 +1,210 @@
+"""
+Unit tests for memory accounting and the memory budget.
+"""
+
+import gc
+import io
+import tracemalloc
+from contextlib import redirect_stdout
+
+import pytest
+
+from calculation import Calculation, CalculationFactory
+from calculator import Calculator, CalculatorHistory
+from memory import (
+    PRIORITY_CACHE,
+    PRIORITY_HISTORY,
+    MemoryBudget,
+    budget,
+    format_size,
+    parse_size,
+)
+from service.cache import ResponseCache
+
+
+@pytest.fixture(autouse=True)
+def no_limit():
+    """Remove any budget limit set by a test."""
+    yield
+    budget.set_limit(None)
+
+
+class Store:
+    """Minimal accounted store of fixed-size entries."""
+
+    def __init__(self, budget, name, priority, entry_size=100):
+        self.entries = []
+        self.entry_size = entry_size
+        self.account = budget.account(name, priority, self._shrink)
+
+    def add(self, count=1):
+        for _ in range(count):
+            self.entries.append(object())
+            self.account.charge(self.entry_size)
+
+    def _shrink(self, size):
+        count = min(len(self.entries), -(-size // self.entry_size))
+        del self.entries[:count]
+        self.account.release(count * self.entry_size)
+        return count * self.entry_size
+
+
+class TestSizes:
+    """Test cases for size parsing and formatting."""
+
+    @pytest.mark.parametrize(
+        "text, expected",
+        [("65536", 65536), ("512K", 512 << 10), ("64m", 64 << 20), ("1GiB", 1 << 30)],
+    )
+    def test_parse_size(self, text, expected):
+        """Test sizes with binary suffixes."""
+        assert parse_size(text) == expected
+
+    @pytest.mark.parametrize("text", ["", "M", "lots", "-1K", "inf", "-infM", "nan"])
+    def test_parse_invalid_size(self, text):
+        """Test malformed sizes raise ValueError."""
+        with pytest.raises(ValueError, match="Invalid size"):
+            parse_size(text)
+
+    def test_format_size(self):
+        """Test sizes are shown in the largest fitting binary unit."""
+        assert format_size(512) == "512 B"
+        assert format_size(1536) == "1.5 KiB"
+        assert format_size(3 << 30) == "3.0 GiB"
+
+
+class TestMemoryBudget:
+    """Test cases for MemoryBudget."""
+
+    def test_evicts_in_priority_order(self):
+        """Test caches shrink before history, down to the low watermark."""
+        private = MemoryBudget()
+        cache = Store(private, "cache", PRIORITY_CACHE)
+        history = Store(private, "history", PRIORITY_HISTORY)
+        history.add(50)
+        cache.add(20)
+        private.set_limit(6000)
+        assert len(cache.entries) == 4 and len(history.entries) == 50
+        assert private.used == 6000 * MemoryBudget.LOW_WATERMARK
+        private.set_limit(4000)
+        assert not cache.entries and len(history.entries) == 36
+        assert private.usage() == {"cache": 0, "history": 3600}
+        assert private.evictions == 2
+
+    def test_closed_when_owner_is_collected(self):
+        """Test an owner's bytes are released when it is garbage collected."""
+        private = MemoryBudget()
+        store = Store(private, "cache", PRIORITY_CACHE)
+        store.add(3)
+        assert private.used == 300
+        del store
+        gc.collect()
+        assert private.used == 0 and private.usage() == {}
+
+    def test_batched_account(self):
+        """Test batched charges are reported but reach the total in batches."""
+        private = MemoryBudget()
+        account = private.account("history", PRIORITY_HISTORY, batch=1000)
+        account.charge(600)
+        assert private.used == 0 and private.usage() == {"history": 600}
+        account.charge(600)
+        assert private.used == 1200
+        account.close()
+
+    def test_invalid_limit(self):
+        """Test non-positive limits are rejected."""
+        with pytest.raises(ValueError, match="positive"):
+            MemoryBudget(0)
+
+    def test_report_with_tracemalloc(self):
+        """Test the report includes traced allocations while tracing."""
+        assert "traced" not in budget.report()
+        tracemalloc.start()
+        try:
+            report = budget.report(top=3)
+        finally:
+            tracemalloc.stop()
+        assert report["traced"]["current"] > 0
+        assert len(report["traced"]["top"]) <= 3
+
+
+class TestHistoryAccounting:
+    """Test cases for history and cache accounting with the global budget."""
+
+    def test_entry_size_matches_tracemalloc(self):
+        """Test the per-calculation estimate is close to what is allocated."""
+        operation = CalculationFactory.get_operation("*")
+        history = CalculatorHistory()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            for i in range(20000):
+                calculation = Calculation(i * 0.5, 3.25, operation)
+                calculation.execute()
+                history.add_calculation(calculation)
+            allocated = tracemalloc.get_traced_memory()[0] - before
+        finally:
+            tracemalloc.stop()
+        assert history.memory_usage() == pytest.approx(allocated, rel=0.25)
+
+    def test_big_integers_are_charged(self):
+        """Test a huge result is charged at its own size."""
+        history = CalculatorHistory()
+        calculation = CalculationFactory.create_calculation(2, 100000, "^")
+        calculation.execute()
+        history.add_calculation(calculation)
+        assert history.memory_usage() > 100000 // 8
+
+    def test_cache_evicted_before_history(self):
+        """Test the response cache is emptied before any history is evicted."""
+        cache = ResponseCache()
+        history = CalculatorHistory()
+        for i in range(100):
+            cache.put(i, b"x" * 1000)
+            calculation = CalculationFactory.create_calculation(i, 1, "+")
+            calculation.execute()
+            history.add_calculation(calculation)
+        budget.set_limit(budget.used - 60000)
+        assert len(history) == 100
+        assert len(cache) < 50
+        assert budget.used <= budget.limit
+        history.clear_history()
+        assert history.memory_usage() == 0
+
+    def test_memory_command(self):
+        """Test the REPL memory command sets the budget and reports usage."""
+        calculator = Calculator()
+        output = io.StringIO()
+        with redirect_stdout(output):
+            calculator._handle_input("memory budget 64M")
+            calculator._handle_input("5 * 3")
+            calculator._handle_input("memory")
+            calculator._handle_input("memory budget none")
+        lines = output.getvalue().splitlines()
+        assert lines[0] == "Memory budget set to 64.0 MiB."
+        assert lines[2].startswith("Accounted memory:")
+        assert lines[2].endswith("of 64.0 MiB budget")
+        assert any(line.split()[0] == "history" for line in lines[3:])
+        assert lines[-1].startswith("Error: Invalid size")
+        assert budget.limit == 64 << 20
+
+    def test_ten_million_calculations_under_budget(self):
+        """Test 10**7 calculations stay within a 1 MiB budget throughout."""
+        limit = 1 << 20
+        slack = CalculatorHistory.CHARGE_BATCH
+        budget.set_limit(limit)
+        history = CalculatorHistory()
+        operation = CalculationFactory.get_operation("*")
+        add = history.add_calculation
+        for i in range(10**7):
+            calculation = Calculation(i, 3, operation)
+            calculation.execute()
+            add(calculation)
+            if not i & 0xFFFF:
+                assert budget.used <= limit + slack
+                assert history.memory_usage() <= limit + slack
+        assert len(history) + history.evicted == 10**7
+        assert history.get_last_calculation().result == (10**7 - 1) * 3
+        assert len(history) * CalculatorHistory.ENTRY_OVERHEAD <= limit + slack
+        assert budget.evictions > 0
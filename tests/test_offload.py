@@ -0,0 +1,149 @@
+"""
+Unit tests for offloading huge calculations to worker processes.
+"""
+
+import asyncio
+import random
+import time
+
+import pytest
+
+from calculation import CalculationFactory
+from calculation.offload import OFFLOAD_BITS, OffloadDispatcher, dispatcher
+from operation import (
+    AddOperation,
+    DivideOperation,
+    FloorDivideOperation,
+    MultiplyOperation,
+    PowerOperation,
+)
+
+#: Multiplying two numbers of this size takes over a second.
+HUGE = 1 << 22
+
+
+@pytest.fixture(scope="module")
+def offload():
+    """A private dispatcher that offloads everything it can."""
+    private = OffloadDispatcher(threshold_bits=0)
+    yield private
+    private.close()
+
+
+def huge(bits):
+    """Return a random integer of exactly ``bits`` bits."""
+    return random.getrandbits(bits - 1) | (1 << (bits - 1))
+
+
+class TestWorkBits:
+    """Test cases for the cost estimates used to decide on offloading."""
+
+    def test_estimates(self):
+        """Test estimates grow with the operands of expensive operations."""
+        a, b = huge(1 << 20), huge(1 << 10)
+        assert MultiplyOperation().work_bits(a, b) == 1 << 10
+        assert MultiplyOperation().work_bits(a, 2.5) == 0
+        assert PowerOperation().work_bits(3, 400000) > OFFLOAD_BITS
+        assert PowerOperation().work_bits(3, 10**9) == 0
+        assert FloorDivideOperation().work_bits(a, b) > 2 * b.bit_length()
+        assert FloorDivideOperation().work_bits(b, a) == 0
+        assert AddOperation().work_bits(a, a) == 0
+
+    @pytest.mark.parametrize("operation_type", ["*", "^", "%", "//"])
+    def test_max_work_bits_is_a_bound(self, operation_type):
+        """Test the bulk bound is at least every pair's estimate."""
+        operation = CalculationFactory.get_operation(operation_type)
+        left = [huge(5000), -huge(300), 7, 2.5, 3]
+        right = [huge(200), 3, huge(900), 10**6, 2000]
+        assert operation.max_work_bits(left, right) >= max(
+            map(operation.work_bits, left, right)
+        )
+        assert operation.max_work_bits([1.5], [2.5]) == 0
+
+    def test_should_offload(self):
+        """Test only offloadable operations over the threshold are offloaded."""
+        a = huge(OFFLOAD_BITS)
+        assert dispatcher.should_offload(MultiplyOperation(), a, a)
+        assert not dispatcher.should_offload(MultiplyOperation(), a, 12345)
+        assert not dispatcher.should_offload(AddOperation(), a, a)
+        assert not dispatcher.should_offload(DivideOperation(), a, a)
+        assert not OffloadDispatcher(None).should_offload(MultiplyOperation(), a, a)
+
+    def test_small_calculations_stay_inline(self):
+        """Test everyday calculations never start a worker."""
+        private = OffloadDispatcher()
+        for operation in "+-*/^%":
+            calculation = CalculationFactory.create_calculation(7, 3, operation)
+            assert private.execute(calculation.operation, 7, 3) == calculation.execute()
+        assert private.offloaded == 0 and "pool" not in private.metrics()
+
+
+class TestOffloadDispatcher:
+    """Test cases for running calculations in worker processes."""
+
+    def test_result_matches_inline(self, offload):
+        """Test an offloaded multiplication returns the exact product."""
+        a, b = huge(1 << 16), huge(1 << 16)
+        assert offload.execute(MultiplyOperation(), a, b) == a * b
+        assert offload.execute(PowerOperation(), 3, 1000) == 3**1000
+        assert offload.metrics()["pool"]["completed"] >= 2
+
+    def test_errors_propagate(self, offload):
+        """Test a ValueError raised in the worker reaches the caller."""
+        with pytest.raises(ValueError, match="Division by zero"):
+            offload.execute(FloorDivideOperation(), huge(64), 0)
+
+    def test_timeout_replaces_worker(self, offload):
+        """Test a calculation past its deadline is stopped and the worker replaced."""
+        started = offload.pool.started
+        a, b = huge(HUGE), huge(HUGE)
+        begin = time.monotonic()
+        with pytest.raises(TimeoutError, match="deadline"):
+            offload.execute(MultiplyOperation(), a, b, timeout=0.2)
+        assert time.monotonic() - begin < 1
+        assert offload.execute(MultiplyOperation(), 6, 7) == 42
+        assert offload.pool.started == started + 1
+
+    def test_cancel_stops_worker(self, offload):
+        """Test cancelling the awaiting task abandons the calculation."""
+        a, b = huge(HUGE), huge(HUGE)
+        cancelled = offload.pool.cancelled
+
+        async def run():
+            task = asyncio.ensure_future(
+                offload.execute_async(MultiplyOperation(), a, b)
+            )
+            await asyncio.sleep(0.1)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            # Let the executor thread notice the cancellation.
+            await asyncio.sleep(3 * offload.pool.POLL_INTERVAL)
+
+        asyncio.run(run())
+        assert offload.pool.cancelled == cancelled + 1
+        assert offload.execute(MultiplyOperation(), 6, 7) == 42
+
+    def test_closed_pool(self):
+        """Test a closed pool refuses work."""
+        private = OffloadDispatcher(threshold_bits=0)
+        pool = private.pool
+        private.close()
+        with pytest.raises(RuntimeError, match="closed"):
+            pool.run(MultiplyOperation(), 6, 7)
+
+
+class TestCalculationAsync:
+    """Test cases for Calculation.execute_async."""
+
+    def test_execute_async(self):
+        """Test execute_async returns and caches the result."""
+        calculation = CalculationFactory.create_calculation(6, 7, "*")
+        assert asyncio.run(calculation.execute_async()) == 42
+        assert calculation.result == 42
+
+    def test_execute_async_error(self):
+        """Test execute_async raises the operation's ValueError."""
+        calculation = CalculationFactory.create_calculation(6, 0, "/")
+        with pytest.raises(ValueError):
+            asyncio.run(calculation.execute_async())
@@ -7,12 +7,19 @@ parameterized tests and edge case coverage.
 
 import pytest
 
+from calculation import CalculationFactory
+from calculation.batch import execute_batch
 from operation import (
     AddOperation,
     DivideOperation,
+    FloorDivideOperation,
+    ModuloOperation,
     MultiplyOperation,
     Operation,
+    PowerOperation,
+    PowModOperation,
     SubtractOperation,
+    powmod,
 )
 
 
@@ -162,6 +169,170 @@ class TestDivideOperation:
         assert isinstance(self.divide_op, Operation)
 
 
+class TestPowerOperation:
+    """Test cases for PowerOperation."""
+
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.power_op = PowerOperation()
+
+    @pytest.mark.parametrize(
+        "a, b, expected",
+        [
+            (2, 10, 1024),
+            (-3, 3, -27),
+            (2, 0, 1),
+            (0, 0, 1),
+            (2, -2, 0.25),
+            (9, 0.5, 3.0),
+            (-8.0, 2.0, 64.0),
+            (3, 200, 3**200),
+        ],
+    )
+    def test_execute_valid_inputs(self, a, b, expected):
+        """Test exponentiation with various valid inputs."""
+        result = self.power_op.execute(a, b)
+        assert result == pytest.approx(expected, rel=1e-12)
+        assert type(result) is type(expected)
+
+    def test_result_size_guard(self):
+        """Test huge integer powers are rejected before they are computed."""
+        with pytest.raises(ValueError, match="would exceed"):
+            self.power_op.execute(10, 10**9)
+        assert self.power_op.execute(1, 10**18) == 1
+        assert self.power_op.execute(-1, 10**18 + 1) == -1
+
+    @pytest.mark.parametrize("a", [2, -2, 10**400])
+    def test_huge_exponent(self, a):
+        """Test exponents too large for a float are rejected by the guard."""
+        with pytest.raises(ValueError, match="would exceed"):
+            self.power_op.execute(a, 10**400)
+        assert self.power_op.work_bits(a, 10**400) == 0
+
+    @pytest.mark.parametrize(
+        "a, b, message",
+        [
+            (0, -1, "Zero cannot be raised"),
+            (-8, 1 / 3, "fractional power"),
+            (10.0, 400, "too large"),
+        ],
+    )
+    def test_execute_invalid_inputs(self, a, b, message):
+        """Test undefined or overflowing powers raise ValueError."""
+        with pytest.raises(ValueError, match=message):
+            self.power_op.execute(a, b)
+
+    def test_str_representation(self):
+        """Test string representation."""
+        assert str(self.power_op) == "exponentiation"
+
+
+class TestModuloOperation:
+    """Test cases for ModuloOperation and FloorDivideOperation."""
+
+    @pytest.mark.parametrize(
+        "a, b, quotient, remainder",
+        [(7, 3, 2, 1), (-7, 3, -3, 2), (7, -3, -3, -2), (7.5, 2, 3.0, 1.5)],
+    )
+    def test_execute_valid_inputs(self, a, b, quotient, remainder):
+        """Test floor division and modulo agree: a == b * (a // b) + a % b."""
+        assert FloorDivideOperation().execute(a, b) == quotient
+        assert ModuloOperation().execute(a, b) == remainder
+
+    @pytest.mark.parametrize(
+        "operation, message",
+        [(ModuloOperation(), "Modulo by zero"), (FloorDivideOperation(), "Division")],
+    )
+    def test_execute_by_zero(self, operation, message):
+        """Test modulo and floor division by zero raise ValueError."""
+        with pytest.raises(ValueError, match=message):
+            operation.execute(5, 0)
+
+
+class TestPowMod:
+    """Test cases for modular exponentiation."""
+
+    def test_values(self):
+        """Test powmod matches the full power reduced by the modulus."""
+        assert powmod(4, 13, 497) == 445
+        assert powmod(3, 200, 1000) == 3**200 % 1000
+        assert powmod(3, -1, 7) == 5
+        assert PowModOperation(497).execute(4, 13) == 445
+        assert PowModOperation.symbol != PowerOperation.symbol
+
+    def test_big_integers(self):
+        """Test exponents far too large for a full power are cheap."""
+        modulus = 2**521 - 1
+        assert powmod(3, modulus - 1, modulus) == 1
+
+    @pytest.mark.parametrize(
+        "args, message",
+        [
+            ((2, 3, 0), "Modulo by zero"),
+            ((2, -1, 4), "no inverse"),
+            ((2.0, 3, 5), "integer operands"),
+        ],
+    )
+    def test_invalid(self, args, message):
+        """Test invalid operands raise ValueError."""
+        with pytest.raises(ValueError, match=message):
+            powmod(*args)
+
+
+class TestRegisteredOperations:
+    """Test cases for the new operations through the factory and batch path."""
+
+    @pytest.mark.parametrize(
+        "operation_type, expected",
+        [("^", 8), ("**", 8), ("pow", 8), ("%", 2), ("mod", 2), ("//", 0)],
+    )
+    def test_lookup(self, operation_type, expected):
+        """Test operations are registered under their symbols and names."""
+        calculation = CalculationFactory.create_calculation(2, 3, operation_type)
+        assert calculation.execute() == expected
+
+    def test_codes(self):
+        """Test operations can be looked up by binary code."""
+        assert isinstance(CalculationFactory.get_operation_by_code(5), PowerOperation)
+        assert isinstance(CalculationFactory.get_operation_by_code(6), ModuloOperation)
+        assert isinstance(
+            CalculationFactory.get_operation_by_code(7), FloorDivideOperation
+        )
+
+    def test_batch(self):
+        """Test the operations run in the batch path, with per-item errors."""
+        results = execute_batch(
+            [(2, 10, "^"), (17, 5, "%"), (17, 5, "//"), (1, 0, "%"), (10, 10**9, "^")]
+        )
+        assert results[:3] == [1024, 2, 3]
+        assert isinstance(results[3], ValueError)
+        assert isinstance(results[4], ValueError)
+
+    def test_batch_overflow(self):
+        """Test float overflow in a batch is a per-item ValueError."""
+        results = execute_batch([(10**400, 3, "/"), (10**400, 1.5, "*"), (6, 3, "/")])
+        assert isinstance(results[0], ValueError)
+        assert isinstance(results[1], ValueError)
+        assert results[2] == 2.0
+
+    @pytest.mark.parametrize("operation_type", ["+", "-", "*", "/", "^", "%", "//"])
+    def test_execute_many_matches_execute(self, operation_type):
+        """Test bulk execution gives the same results as pairwise execution."""
+        operation = CalculationFactory.get_operation(operation_type)
+        left = [7, -3, 2.5, 10**20, 0]
+        right = [2, 5, -4, 3, 1.5]
+        assert operation.execute_many(left, right) == list(
+            map(operation.execute, left, right)
+        )
+
+    @pytest.mark.parametrize("operation_type", ["/", "%", "//"])
+    def test_execute_many_zero_divisor(self, operation_type):
+        """Test bulk division rejects the whole batch if any divisor is zero."""
+        operation = CalculationFactory.get_operation(operation_type)
+        with pytest.raises(ValueError, match="by zero"):
+            operation.execute_many([1, 2], [3, 0.0])
+
+
 class TestOperationAbstractBase:
     """Test cases for the abstract Operation base class."""
 
@@ -190,3 +361,16 @@ class TestOperationAbstractBase:
 
             # Check inheritance
             assert isinstance(operation, Operation)
+
+    @pytest.mark.parametrize(
+        "operation_class, expected_symbol",
+        [
+            (AddOperation, "+"),
+            (SubtractOperation, "-"),
+            (MultiplyOperation, "*"),
+            (DivideOperation, "/"),
+        ],
+    )
+    def test_operation_symbol(self, operation_class, expected_symbol):
+        """Test that each operation carries its display symbol."""
+        assert operation_class.symbol == expected_symbol
@@ -0,0 +1,164 @@
+"""
+Tests for pre-fork multi-worker mode.
+"""
+
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+import pytest
+
+from service import CalculationHTTPServer, CalculationService, ServerThread
+from service.prefork import PreforkServer
+from tests.test_service import wait_for
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork")
+
+
+@pytest.fixture
+def start_prefork():
+    """Start ``python -m service --workers ...``; return (process, base URL)."""
+    processes = []
+
+    def start(*args):
+        process = subprocess.Popen(
+            [sys.executable, "-m", "service", "--port", "0", *args],
+            cwd=ROOT,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        processes.append(process)
+        banner = process.stdout.readline()
+        assert banner.startswith("Serving on "), banner
+        url = banner.split()[2]
+        wait_for(lambda: healthy(url), timeout=10)
+        return process, url
+
+    yield start
+    for process in processes:
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+        process.stdout.close()
+
+
+def get(url, path):
+    """GET a JSON document over a new connection."""
+    with urllib.request.urlopen(url + path, timeout=5) as response:
+        return json.load(response)
+
+
+def healthy(url):
+    """True once a worker answers on ``url``."""
+    try:
+        return get(url, "/health") == {"status": "ok"}
+    except OSError:
+        return False
+
+
+def worker_pid(url):
+    """PID of the worker that served a new connection."""
+    return get(url, "/metrics")["process"]["pid"]
+
+
+class TestPreforkServer:
+    """Test cases for the pre-fork supervisor."""
+
+    def test_invalid_worker_count(self):
+        """Test the worker count must be positive."""
+        with pytest.raises(ValueError, match="positive"):
+            PreforkServer(workers=0)
+
+    @pytest.mark.parametrize("args", [[], ["--no-reuse-port"]])
+    def test_workers_serve_requests(self, start_prefork, args):
+        """Test every worker serves, with SO_REUSEPORT or a shared socket."""
+        process, url = start_prefork("--workers", "2", *args)
+        result = get(url, "/calculate?a=6&b=7&operation=multiply")
+        assert result["result"] == 42
+        pids = {worker_pid(url) for _ in range(60)}
+        assert process.pid not in pids
+        if not args:
+            assert len(pids) == 2
+
+    def test_crashed_worker_is_restarted(self, start_prefork):
+        """Test a killed worker is replaced and service continues."""
+        _, url = start_prefork("--workers", "2")
+        victim = worker_pid(url)
+        os.kill(victim, signal.SIGKILL)
+        seen = set()
+
+        def replaced():
+            # Connections queued on the killed worker's socket are reset.
+            try:
+                seen.add(worker_pid(url))
+            except OSError:
+                pass
+            return len(seen - {victim}) == 2
+
+        wait_for(replaced, timeout=10)
+        assert get(url, "/health") == {"status": "ok"}
+
+    def test_sigterm_stops_gracefully(self, start_prefork):
+        """Test SIGTERM drains the workers and exits cleanly."""
+        process, url = start_prefork("--workers", "2")
+        get(url, "/health")
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=15) == 0
+        with pytest.raises(OSError):
+            get(url, "/health")
+
+
+class SlowService(CalculationService):
+    """Service whose calculations block until released."""
+
+    release = threading.Event()
+
+    @staticmethod
+    def _execute(a, b, operation):
+        SlowService.release.wait(5)
+        return CalculationService._execute(a, b, operation)
+
+
+class TestDrain:
+    """Test cases for draining an HTTP server."""
+
+    def test_in_flight_request_completes(self):
+        """Test drain stops accepting but finishes in-flight requests."""
+        SlowService.release.clear()
+        server = CalculationHTTPServer(SlowService(), port=0)
+        runner = ServerThread(server)
+        runner.start()
+        url = f"http://127.0.0.1:{server.port}"
+        responses = []
+
+        def slow_request():
+            with urllib.request.urlopen(
+                url + "/calculate?a=1&b=2&operation=add", timeout=5
+            ) as response:
+                responses.append((response.headers["Connection"], json.load(response)))
+
+        thread = threading.Thread(target=slow_request)
+        thread.start()
+        wait_for(lambda: server._in_flight == 1)
+
+        drained = asyncio.run_coroutine_threadsafe(server.drain(5), runner.loop)
+        time.sleep(0.05)
+        with pytest.raises(OSError):
+            get(url, "/health")
+        SlowService.release.set()
+
+        assert drained.result(5) is True
+        thread.join(5)
+        assert responses == [
+            ("close", {"a": 1, "b": 2, "operation": "add", "result": 3})
+        ]
+        runner.stop()
+        server.service.close()
@@ -0,0 +1,195 @@
+"""
+Unit tests for the n-ary reductions (sum, product, mean, min, max).
+"""
+
+import array
+import math
+import random
+
+import pytest
+
+from calculation import CalculationFactory
+from operation import (
+    AddOperation,
+    MaxReduction,
+    MeanReduction,
+    MinReduction,
+    ProductReduction,
+    SumReduction,
+)
+
+
+class TestSumReduction:
+    """Test cases for SumReduction."""
+
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.sum = SumReduction()
+
+    @pytest.mark.parametrize(
+        "values, expected",
+        [([], 0), ([1, 2, 3], 6), ([1.5, 2.5], 4.0), ([10**30, 1], 10**30 + 1)],
+    )
+    def test_values(self, values, expected):
+        """Test sums of small inputs keep their type."""
+        result = self.sum.reduce(values)
+        assert result == expected and type(result) is type(expected)
+
+    def test_more_accurate_than_folding_add(self):
+        """Test the sum of 0.1 ten times is exactly 1.0, unlike a fold."""
+        add = AddOperation()
+        folded = 0.0
+        for _ in range(10):
+            folded = add.execute(folded, 0.1)
+        assert folded != 1.0
+        assert self.sum.reduce([0.1] * 10) == 1.0
+
+    def test_cancellation(self):
+        """Test large terms that cancel do not swallow small ones."""
+        assert self.sum.reduce([1e100, 1.0, -1e100]) == 1.0
+        values = [1e16, 1.0, -1e16] * 5000
+        assert self.sum.reduce(values, chunk_size=7) == 5000.0
+
+    def test_matches_fsum_across_chunks(self):
+        """Test chunked compensated summation agrees with math.fsum."""
+        generator = random.Random(7)
+        values = [generator.uniform(-1, 1) * 10 ** generator.randint(-8, 8)]
+        values += [generator.uniform(-1, 1) for _ in range(20000)]
+        assert self.sum.reduce(values, chunk_size=100) == pytest.approx(
+            math.fsum(values), rel=1e-15, abs=1e-12
+        )
+
+    def test_generator_and_array(self):
+        """Test generators and arrays are consumed in chunks."""
+        assert self.sum.reduce((i for i in range(10001)), chunk_size=64) == 50005000
+        assert self.sum.reduce(array.array("d", [0.5] * 1000)) == 500.0
+
+    def test_float_semantics_for_special_values(self):
+        """Test infinities and overflow give inf/nan rather than raising."""
+        assert self.sum.reduce([math.inf, 1.0]) == math.inf
+        assert math.isnan(self.sum.reduce([math.inf, -math.inf]))
+        assert self.sum.reduce([1e308, 1e308]) == math.inf
+
+    def test_huge_integer_with_floats(self):
+        """Test integers beyond the float range are kept exact until the end."""
+        assert self.sum.reduce([10**400, 0.5, -(10**400)]) == 0.5
+        with pytest.raises(ValueError, match="too large"):
+            self.sum.reduce([10**400, 0.5])
+
+
+class TestProductReduction:
+    """Test cases for ProductReduction."""
+
+    @pytest.mark.parametrize("log_space", [False, True])
+    def test_values(self, log_space):
+        """Test products of small inputs."""
+        product = ProductReduction(log_space)
+        assert product.reduce([]) == 1
+        assert product.reduce([2] * 100) == 2**100
+        assert product.reduce([-2.0, 3.0]) == pytest.approx(-6.0)
+        assert product.reduce([0.0, 1e300, 1e300]) == 0.0
+
+    @pytest.mark.parametrize("log_space", [False, True])
+    def test_no_intermediate_overflow(self, log_space):
+        """Test an intermediate product beyond the float range is recovered."""
+        product = ProductReduction(log_space)
+        assert product.reduce([1e200, 1e200, 1e-300]) == pytest.approx(1e100)
+        assert product.reduce([2.0] * 1500 + [0.5] * 1500) == pytest.approx(1.0)
+        assert product.reduce([10**400, 1e-300]) == pytest.approx(1e100)
+
+    def test_running_product_outside_float_range(self):
+        """Test a product whose running value over- then underflows is ~1."""
+        generator = random.Random(5)
+        growth = [generator.uniform(1.0, 2.0) for _ in range(5000)]
+        factors = growth + [1 / factor for factor in growth]
+        assert math.prod(factors) == math.inf
+        assert ProductReduction().reduce(factors) == pytest.approx(1.0)
+        assert ProductReduction().reduce(factors[::-1]) == pytest.approx(1.0)
+
+    def test_matches_plain_product_in_range(self):
+        """Test the scaled product agrees with math.prod when it does not overflow."""
+        generator = random.Random(3)
+        values = [generator.uniform(0.5, 2) for _ in range(200)]
+        assert ProductReduction().reduce(values, chunk_size=16) == pytest.approx(
+            math.prod(values), rel=1e-13
+        )
+
+    def test_overflow_gives_signed_infinity(self):
+        """Test a product beyond the float range is +-inf."""
+        assert ProductReduction().reduce([1e308, 10.0]) == math.inf
+        assert ProductReduction().reduce([-1e308, 10.0]) == -math.inf
+
+    def test_log_abs(self):
+        """Test log_abs reports products far beyond the float range."""
+        accumulator = ProductReduction(log_space=True).accumulator()
+        accumulator.update([1e300] * 10)
+        accumulator.update([-1.0])
+        sign, log = accumulator.log_abs()
+        assert sign == -1
+        assert log == pytest.approx(3000 * math.log(10))
+        assert accumulator.result() == -math.inf
+
+
+class TestOtherReductions:
+    """Test cases for mean, min and max."""
+
+    def test_mean(self):
+        """Test the mean uses the compensated sum."""
+        assert MeanReduction().reduce([1, 2, 3, 4]) == 2.5
+        assert MeanReduction().reduce([0.1] * 10) == 0.1
+
+    def test_mean_of_huge_integers(self):
+        """Test a mean beyond the float range raises ValueError."""
+        assert MeanReduction().reduce([10**400, -(10**400), 3]) == 1.0
+        with pytest.raises(ValueError, match="Mean is too large"):
+            MeanReduction().reduce([10**400, 10**400])
+        with pytest.raises(ValueError, match="Mean is too large"):
+            MeanReduction().reduce([10**400, 0.5])
+
+    def test_mean_when_the_sum_overflows(self):
+        """Test a representable mean of floats whose sum overflows."""
+        assert MeanReduction().reduce([1e308, 1e308]) == 1e308
+        assert MeanReduction().reduce([1.7e308] * 1000, chunk_size=7) == 1.7e308
+        assert MeanReduction().reduce([1e308, 1e308, -1e308]) == pytest.approx(
+            1e308 / 3
+        )
+        assert MeanReduction().reduce([5e-324, 5e-324]) == 5e-324
+
+    def test_mean_special_values(self):
+        """Test infinities and NaNs follow float semantics."""
+        assert MeanReduction().reduce([math.inf, 1]) == math.inf
+        assert math.isnan(MeanReduction().reduce([math.inf, -math.inf]))
+
+    @pytest.mark.parametrize(
+        "reduction, expected", [(MinReduction(), -4), (MaxReduction(), 9.5)]
+    )
+    def test_extremes(self, reduction, expected):
+        """Test min and max across chunks."""
+        values = iter([3, -4, 9.5, 0] * 100)
+        assert reduction.reduce(values, chunk_size=3) == expected
+
+    @pytest.mark.parametrize(
+        "reduction", [MeanReduction(), MinReduction(), MaxReduction()]
+    )
+    def test_empty(self, reduction):
+        """Test reductions undefined for no values raise ValueError."""
+        with pytest.raises(ValueError, match="no values"):
+            reduction.reduce([])
+
+
+class TestFactoryReductions:
+    """Test cases for reductions registered with CalculationFactory."""
+
+    @pytest.mark.parametrize(
+        "name, expected",
+        [("sum", 10), ("PRODUCT", 24), ("prod", 24), ("avg", 2.5), ("min", 1)],
+    )
+    def test_reduce(self, name, expected):
+        """Test reductions are looked up by name or alias."""
+        assert CalculationFactory.reduce(name, [1, 2, 3, 4]) == expected
+
+    def test_unsupported(self):
+        """Test unknown reductions are rejected."""
+        with pytest.raises(ValueError, match="Unsupported reduction"):
+            CalculationFactory.reduce("median", [1])
+        assert "sum" in CalculationFactory.valid_reductions()
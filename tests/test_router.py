@@ -0,0 +1,288 @@
+"""
+Tests for the consistent-hash job router.
+"""
+
+import asyncio
+import collections
+import io
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+
+import pytest
+
+from service.router import HashRing, JobRouter, RouterError, main, read_job, run_job
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+OPERATIONS = ["+", "-", "*", "/"]
+
+
+def start_worker(*args):
+    """Start ``python -m service --port 0``; return (process, base URL)."""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "service", "--port", "0", *args],
+        cwd=ROOT,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    banner = process.stdout.readline()
+    assert banner.startswith("Serving on "), banner
+    return process, banner.split()[2]
+
+
+def stop_worker(process):
+    """Stop a worker started by ``start_worker``."""
+    if process.poll() is None:
+        os.kill(process.pid, signal.SIGCONT)
+        process.kill()
+    process.wait()
+    process.stdout.close()
+
+
+@pytest.fixture(scope="module")
+def workers(tmp_path_factory):
+    """Two HTTP workers, the second also serving RPC; return their node URLs."""
+    socket_path = str(tmp_path_factory.mktemp("router") / "calc.sock")
+    first, first_url = start_worker()
+    second, second_url = start_worker("--rpc-socket", socket_path)
+    yield [first_url, second_url, "unix://" + socket_path]
+    stop_worker(first)
+    stop_worker(second)
+
+
+@pytest.fixture
+def spare_worker():
+    """A worker the test may stop or kill; return (process, base URL)."""
+    process, url = start_worker()
+    yield process, url
+    stop_worker(process)
+
+
+def dead_node():
+    """URL of a port nothing listens on."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{probe.getsockname()[1]}"
+
+
+def make_items(count):
+    """Items cycling through every operation."""
+    return [(i, i % 7 + 1, OPERATIONS[i % 4]) for i in range(count)]
+
+
+def expected(items):
+    """Locally computed results for ``make_items``."""
+    functions = {
+        "+": lambda a, b: a + b,
+        "-": lambda a, b: a - b,
+        "*": lambda a, b: a * b,
+        "/": lambda a, b: a / b,
+    }
+    return [functions[operation](a, b) for a, b, operation in items]
+
+
+def run(router, items, job_id="job"):
+    """Run a job and close the router."""
+
+    async def go():
+        try:
+            return await router.run(items, job_id)
+        finally:
+            await router.close()
+
+    return asyncio.run(go())
+
+
+class TestHashRing:
+    """Test cases for HashRing."""
+
+    def test_preference_lists_every_node_once(self):
+        """Test a key's preference list is a permutation of the nodes."""
+        ring = HashRing(["a", "b", "c"])
+        for i in range(50):
+            preference = ring.preference(f"job:{i}")
+            assert sorted(preference) == ["a", "b", "c"]
+            assert preference[0] == ring.node_for(f"job:{i}")
+
+    def test_keys_are_spread(self):
+        """Test virtual nodes spread keys roughly evenly."""
+        ring = HashRing(["a", "b", "c", "d"], replicas=128)
+        counts = collections.Counter(ring.node_for(f"job:{i}") for i in range(4000))
+        assert set(counts) == {"a", "b", "c", "d"}
+        assert min(counts.values()) > 500
+
+    def test_removing_a_node_only_moves_its_keys(self):
+        """Test keys owned by remaining nodes keep their owner."""
+        before = HashRing(["a", "b", "c", "d"])
+        after = HashRing(["a", "b", "c"])
+        for i in range(1000):
+            owner = before.node_for(f"job:{i}")
+            if owner != "d":
+                assert after.node_for(f"job:{i}") == owner
+
+    def test_requires_nodes(self):
+        """Test an empty ring is rejected."""
+        with pytest.raises(ValueError, match="node"):
+            HashRing([])
+
+
+class TestJobRouter:
+    """Test cases for JobRouter against local worker processes."""
+
+    def test_results_in_input_order(self, workers):
+        """Test results from HTTP and RPC nodes are merged in order."""
+        items = make_items(2000)
+        router = JobRouter(workers, chunk_size=64)
+        assert run(router, items) == expected(items)
+        metrics = router.metrics()
+        assert metrics["chunks"] == 32
+        assert set(metrics["nodes"]) == set(workers)
+        assert all(node["chunks"] for node in metrics["nodes"].values())
+
+    def test_item_errors(self, workers):
+        """Test per-item errors come back as ValueError in place."""
+        items = [(1, 2, "+"), (1, 0, "/"), (1, 2, "^^"), (3, 4, "*")]
+        results = run(JobRouter(workers, chunk_size=2), items)
+        assert results[0] == 3 and results[3] == 12
+        assert isinstance(results[1], ValueError)
+        assert "zero" in str(results[1])
+        assert isinstance(results[2], ValueError)
+        assert "Unsupported operation" in str(results[2])
+
+    def test_invalid_operands_fail_only_their_item(self, workers):
+        """Test non-numeric operands fail locally without touching the chunk."""
+        items = make_items(40)
+        items[5] = (True, 2, "+")
+        items[17] = ("x", 6, "*")
+        items[30] = (1, None, "-")
+        router = JobRouter(workers, chunk_size=8)
+        results = run(router, items)
+        for position, field in ((5, "a"), (17, "a"), (30, "b")):
+            assert str(results[position]) == f"Field '{field}' must be a number"
+        valid = [i for i in range(40) if i not in (5, 17, 30)]
+        assert [results[i] for i in valid] == expected([items[i] for i in valid])
+        assert router.metrics()["retries"] == 0
+
+    def test_rejected_chunk_fails_its_items(self, workers):
+        """Test a 4xx response is an error per item, not a node failure."""
+        items = make_items(10001)
+        router = JobRouter(workers[:1], chunk_size=10001)
+        results = run(router, items)
+        assert all(isinstance(result, ValueError) for result in results)
+        assert "exceeds" in str(results[0])
+        metrics = router.metrics()
+        assert metrics["retries"] == 0
+        assert all(not node["failures"] for node in metrics["nodes"].values())
+
+    def test_failed_node_is_retried_elsewhere(self, workers):
+        """Test chunks owned by an unreachable node run on other nodes."""
+        dead = dead_node()
+        items = make_items(500)
+        router = JobRouter([dead, workers[0]], chunk_size=10)
+        assert run(router, items) == expected(items)
+        metrics = router.metrics()
+        assert metrics["retries"] >= 1
+        assert metrics["nodes"][dead]["chunks"] == 0
+        assert metrics["nodes"][workers[0]]["chunks"] == 50
+
+    def test_stragglers_are_speculatively_rerun(self, workers, spare_worker):
+        """Test chunks stuck on a stalled node finish on another node."""
+        process, url = spare_worker
+        os.kill(process.pid, signal.SIGSTOP)
+        items = make_items(400)
+        router = JobRouter(
+            [url, workers[0]], chunk_size=10, chunk_timeout=30, speculate_min=0.05
+        )
+        assert run(router, items) == expected(items)
+        metrics = router.metrics()
+        assert metrics["speculative"] >= 1
+        assert metrics["speculative_wins"] >= 1
+        assert metrics["nodes"][url]["chunks"] == 0
+
+    def test_every_node_failing(self):
+        """Test a chunk that fails everywhere raises RouterError."""
+        router = JobRouter([dead_node(), dead_node()])
+        with pytest.raises(RouterError, match="every node"):
+            run(router, make_items(5))
+
+    def test_empty_job(self, workers):
+        """Test an empty job yields nothing."""
+        assert run(JobRouter(workers), []) == []
+
+    @pytest.mark.parametrize(
+        "kwargs, match",
+        [({"nodes": ["ftp://x"]}, "Invalid node"), ({"chunk_size": 0}, "positive")],
+    )
+    def test_invalid_settings(self, kwargs, match):
+        """Test invalid nodes and chunk sizes are rejected."""
+        settings = {"nodes": ["http://127.0.0.1:1"], **kwargs}
+        with pytest.raises(ValueError, match=match):
+            JobRouter(settings.pop("nodes"), **settings)
+
+
+class TestJobFiles:
+    """Test cases for JSON-lines jobs and the command line."""
+
+    def test_read_job(self):
+        """Test job records are parsed and blank lines skipped."""
+        lines = [
+            '{"a": 1, "b": 2, "operation": "+"}',
+            "",
+            '{"a": 3, "b": 4, "operation": "*"}',
+        ]
+        assert list(read_job(lines)) == [(1, 2, "+"), (3, 4, "*")]
+
+    def test_read_job_rejects_bad_lines(self):
+        """Test invalid lines report their line number."""
+        with pytest.raises(ValueError, match="line 2"):
+            list(read_job(['{"a": 1, "b": 2, "operation": "+"}', '{"a": 1}']))
+
+    def test_run_job_writes_ordered_lines(self, workers):
+        """Test output lines pair each input record with its result."""
+        lines = [
+            json.dumps({"a": a, "b": b, "operation": op}) for a, b, op in make_items(30)
+        ]
+        lines.append(json.dumps({"a": 1, "b": 0, "operation": "/"}))
+        output = io.StringIO()
+        router = JobRouter(workers, chunk_size=4)
+
+        async def go():
+            try:
+                return await run_job(router, lines, output, "file")
+            finally:
+                await router.close()
+
+        assert asyncio.run(go()) == 1
+        records = [json.loads(line) for line in output.getvalue().splitlines()]
+        assert [record["result"] for record in records[:-1]] == expected(make_items(30))
+        assert records[-1]["operation"] == "/"
+        assert "zero" in records[-1]["error"]
+
+    def test_main(self, workers, tmp_path, capsys):
+        """Test the command line writes results and a metrics summary."""
+        job = tmp_path / "job.jsonl"
+        out = tmp_path / "out.jsonl"
+        job.write_text(
+            "".join(
+                json.dumps({"a": a, "b": b, "operation": op}) + "\n"
+                for a, b, op in make_items(100)
+            )
+        )
+        argv = [str(job), "-o", str(out), "--chunk-size", "16"]
+        for node in workers:
+            argv += ["--node", node]
+        assert main(argv) == 0
+        results = [json.loads(line)["result"] for line in out.read_text().splitlines()]
+        assert results == expected(make_items(100))
+        assert json.loads(capsys.readouterr().err)["chunks"] == 7
+
+    def test_main_reports_errors(self, tmp_path, capsys):
+        """Test unreadable jobs exit with status 2."""
+        assert (
+            main([str(tmp_path / "missing.jsonl"), "--node", "http://127.0.0.1:1"]) == 2
+        )
+        assert capsys.readouterr().err.startswith("Error: ")
@@ -0,0 +1,237 @@
+"""
+Tests for the Unix domain socket binary RPC server and client.
+"""
+
+import asyncio
+import os
+import threading
+
+import pytest
+
+from calculation.offload import dispatcher
+from service import CalculationRPCServer, RPCClient, ServerThread
+from service import rpc
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    """Path for the server socket."""
+    return str(tmp_path / "calc.sock")
+
+
+@pytest.fixture
+def server(socket_path):
+    """Run an RPC server in a background thread."""
+    runner = ServerThread(CalculationRPCServer(socket_path, inline_batch_limit=4))
+    yield runner.start()
+    runner.stop()
+
+
+def run(coroutine_function, path):
+    """Connect a client and run ``coroutine_function(client)`` to completion."""
+
+    async def main():
+        async with RPCClient(path) as client:
+            return await coroutine_function(client)
+
+    return asyncio.run(main())
+
+
+class TestEncoding:
+    """Test cases for the wire encoding."""
+
+    @pytest.mark.parametrize(
+        "value",
+        [
+            0,
+            -1,
+            2**63 - 1,
+            -(2**63),
+            2**63,
+            -(2**200),
+            10**1000,
+            1.5,
+            -0.0,
+            float("inf"),
+        ],
+    )
+    def test_operand_round_trip(self, value):
+        """Test operands of every type survive encoding."""
+        buffer = bytearray()
+        rpc.encode_operand(buffer, value)
+        decoded, offset = rpc.decode_operand(bytes(buffer), 0)
+        assert decoded == value
+        assert type(decoded) is type(value)
+        assert offset == len(buffer)
+
+    def test_truncated_operand(self):
+        """Test truncated data raises ProtocolError."""
+        buffer = bytearray()
+        rpc.encode_operand(buffer, 2**100)
+        with pytest.raises(rpc.ProtocolError):
+            rpc.decode_operand(bytes(buffer[:-1]), 0)
+
+    def test_unsupported_operand_type(self):
+        """Test non-numeric operands are rejected."""
+        with pytest.raises(ValueError):
+            rpc.encode_operand(bytearray(), "5")
+
+
+class TestServerProcess:
+    """Test request processing without a socket."""
+
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.server = CalculationRPCServer("unused")
+
+    def _process(self, payload):
+        return asyncio.run(self.server.process(payload))
+
+    def test_unknown_kind(self):
+        """Test unknown request kinds produce an ERROR response."""
+        response = self._process(rpc.HEADER.pack(7, 9))
+        request_id, kind = rpc.HEADER.unpack_from(response)
+        assert (request_id, kind) == (7, rpc.ERROR)
+        assert (
+            "Unknown request kind" in rpc.decode_message(response, rpc.HEADER.size)[0]
+        )
+
+    def test_truncated_header(self):
+        """Test a truncated header produces an ERROR response."""
+        response = self._process(b"\x00")
+        assert rpc.HEADER.unpack_from(response)[1] == rpc.ERROR
+
+    def test_unknown_operation_code(self):
+        """Test unknown operation codes are reported per item."""
+        payload = bytearray(rpc.HEADER.pack(1, rpc.BATCH))
+        payload += rpc.COUNT.pack(2)
+        for code in (99, 1):
+            payload += rpc.BYTE.pack(code)
+            rpc.encode_operand(payload, 2)
+            rpc.encode_operand(payload, 3)
+        response = self._process(bytes(payload))
+        results = rpc._decode_response(rpc.BATCH, response, rpc.HEADER.size)
+        assert str(results[0]) == "Unsupported operation code: 99"
+        assert results[1] == 5
+
+    def test_overflow_is_a_failed_item(self):
+        """Test an overflowing calculation is reported as a FAILED item."""
+        payload = bytearray(rpc.HEADER.pack(2, rpc.SINGLE))
+        payload += rpc.BYTE.pack(4)
+        rpc.encode_operand(payload, 10**400)
+        rpc.encode_operand(payload, 3)
+        response = self._process(bytes(payload))
+        result = rpc._decode_response(rpc.SINGLE, response, rpc.HEADER.size)
+        assert isinstance(result, ValueError)
+        assert "too large" in str(result)
+
+    def test_unencodable_result(self, monkeypatch):
+        """Test a result that fails to encode produces an ERROR response."""
+        payload = bytearray(rpc.HEADER.pack(3, rpc.SINGLE))
+        payload += rpc.BYTE.pack(1)
+        rpc.encode_operand(payload, 2)
+        rpc.encode_operand(payload, 3)
+
+        def overflow(buffer, value):
+            raise OverflowError("result out of range")
+
+        monkeypatch.setattr(rpc, "encode_operand", overflow)
+        response = self._process(bytes(payload))
+        assert rpc.HEADER.unpack_from(response) == (3, rpc.ERROR)
+        assert rpc.decode_message(response, rpc.HEADER.size)[0] == (
+            "result out of range"
+        )
+
+
+class TestRPC:
+    """End-to-end tests over a Unix domain socket."""
+
+    @pytest.mark.parametrize(
+        "a, b, operation, expected",
+        [(5, 3, "add", 8), (5, 3, "-", 2), (2**70, 2, "*", 2**71), (9, 2, "/", 4.5)],
+    )
+    def test_single(self, server, socket_path, a, b, operation, expected):
+        """Test single calculations."""
+        result = run(lambda client: client.calculate(a, b, operation), socket_path)
+        assert result == expected
+
+    def test_single_error(self, server, socket_path):
+        """Test calculation errors are raised as ValueError."""
+        with pytest.raises(ValueError, match="Division by zero"):
+            run(lambda client: client.calculate(1, 0, "/"), socket_path)
+
+    def test_unsupported_operation_client_side(self, server, socket_path):
+        """Test unsupported operations are rejected before sending."""
+        with pytest.raises(ValueError, match="Unsupported operation"):
+            run(lambda client: client.calculate(1, 0, "&"), socket_path)
+
+    @pytest.mark.parametrize("size", [3, 50])
+    def test_batch(self, server, socket_path, size):
+        """Test inline and offloaded batches return ordered results."""
+        items = [(i, 1, "+") for i in range(size)] + [(1, 0, "/")]
+        results = run(lambda client: client.calculate_batch(items), socket_path)
+        assert results[:-1] == [i + 1 for i in range(size)]
+        assert isinstance(results[-1], ValueError)
+
+    def test_pipelining(self, server, socket_path):
+        """Test many concurrent requests on one connection."""
+
+        async def calls(client):
+            return await asyncio.gather(
+                *(client.calculate(i, i, "*") for i in range(200))
+            )
+
+        assert run(calls, socket_path) == [i * i for i in range(200)]
+
+    def test_out_of_order_responses(self, server, socket_path, monkeypatch):
+        """Test a single answered while an earlier large batch is still running."""
+        release = threading.Event()
+        original = rpc._execute_batch
+
+        def slow_batch(calls):
+            release.wait(5)
+            return original(calls)
+
+        monkeypatch.setattr(rpc, "_execute_batch", slow_batch)
+        order = []
+
+        async def calls(client):
+            async def batch():
+                await client.calculate_batch([(1, 1, "+")] * 10)
+                order.append("batch")
+
+            async def single():
+                await client.calculate(1, 1, "+")
+                order.append("single")
+                release.set()
+
+            await asyncio.gather(batch(), single())
+
+        run(calls, socket_path)
+        assert order == ["single", "batch"]
+
+    def test_offloaded_single(self, server, socket_path, monkeypatch):
+        """Test a huge single calculation runs in a worker, not inline."""
+        monkeypatch.setattr(dispatcher, "threshold_bits", 1 << 10)
+
+        async def calls(client):
+            return await asyncio.gather(
+                client.calculate(3, 5000, "^"),
+                client.calculate(4, 2, "-"),
+                client.calculate(2, 10**400, "^"),
+                return_exceptions=True,
+            )
+
+        offloaded = dispatcher.offloaded
+        results = run(calls, socket_path)
+        assert results[:2] == [3**5000, 2]
+        assert "would exceed" in str(results[2])
+        assert dispatcher.offloaded == offloaded + 1
+
+    def test_socket_removed_on_close(self, socket_path):
+        """Test the socket file is cleaned up when the server stops."""
+        runner = ServerThread(CalculationRPCServer(socket_path))
+        runner.start()
+        assert os.path.exists(socket_path)
+        runner.stop()
+        assert not os.path.exists(socket_path)
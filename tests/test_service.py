@@ -0,0 +1,328 @@
+"""
+Unit tests for the service module.
+
+This module contains tests for the CalculationService and the SingleFlight
+request coalescing it relies on.
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from service import (
+    AdmissionController,
+    CalculationService,
+    Lane,
+    ServiceOverloaded,
+    SingleFlight,
+)
+
+
+def wait_for(predicate, timeout=5.0):
+    """Poll ``predicate`` until it is true or ``timeout`` expires."""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met before timeout")
+        time.sleep(0.001)
+
+
+class TestSingleFlight:
+    """Test cases for SingleFlight."""
+
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.flights = SingleFlight()
+
+    def _run_concurrently(self, keys, fn):
+        """Call ``do`` for every key from its own thread while ``fn`` blocks."""
+        results = [None] * len(keys)
+
+        def call(index, key):
+            try:
+                results[index] = self.flights.do(key, fn)
+            except Exception as e:
+                results[index] = e
+
+        threads = [
+            threading.Thread(target=call, args=(i, key)) for i, key in enumerate(keys)
+        ]
+        for thread in threads:
+            thread.start()
+        return threads, results
+
+    def test_sequential_calls_execute_each_time(self):
+        """Test that calls which do not overlap are not coalesced."""
+        assert self.flights.do("k", lambda: 1) == 1
+        assert self.flights.do("k", lambda: 2) == 2
+        assert self.flights.stats() == {
+            "calls": 2,
+            "executions": 2,
+            "coalesced": 0,
+            "in_flight": 0,
+        }
+
+    def test_concurrent_identical_calls_share_execution(self):
+        """Test that waiters on the same key get the leader's result."""
+        release = threading.Event()
+        executions = []
+
+        def work():
+            executions.append(1)
+            release.wait(5)
+            return 42
+
+        threads, results = self._run_concurrently(["k"] * 8, work)
+        wait_for(lambda: self.flights.stats()["calls"] == 8)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert results == [42] * 8
+        assert len(executions) == 1
+        stats = self.flights.stats()
+        assert stats["executions"] == 1
+        assert stats["coalesced"] == 7
+        assert stats["in_flight"] == 0
+
+    def test_distinct_keys_are_not_coalesced(self):
+        """Test that different keys run independently."""
+        release = threading.Event()
+        threads, results = self._run_concurrently(
+            ["a", "b", "a"], lambda: release.wait(5) or "done"
+        )
+        wait_for(lambda: self.flights.stats()["calls"] == 3)
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert self.flights.stats()["executions"] == 2
+
+    def test_exception_propagates_to_all_waiters(self):
+        """Test that a failed execution raises in every waiter."""
+        release = threading.Event()
+
+        def work():
+            release.wait(5)
+            raise ValueError("boom")
+
+        threads, results = self._run_concurrently(["k"] * 4, work)
+        wait_for(lambda: self.flights.stats()["calls"] == 4)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert all(isinstance(r, ValueError) for r in results)
+        assert self.flights.stats()["in_flight"] == 0
+
+    def test_cancelling_one_submit_leaves_the_others(self):
+        """Test each submit caller can cancel its own future only."""
+        inner = Future()
+        leader = self.flights.submit("k", lambda: inner)
+        waiters = [self.flights.submit("k", lambda: Future()) for _ in range(2)]
+        assert waiters[0].cancel()
+        assert leader.cancel()
+        inner.set_result(42)
+        assert leader.cancelled() and waiters[0].cancelled()
+        assert waiters[1].result(timeout=5) == 42
+        assert self.flights.stats()["executions"] == 1
+        assert self.flights.stats()["in_flight"] == 0
+
+
+class TestCalculationService:
+    """Test cases for CalculationService."""
+
+    @pytest.mark.parametrize(
+        "a, b, operation, expected",
+        [(5, 3, "add", 8), (5, 3, " - ", 2), (4, 6, "MULTIPLY", 24), (9, 3, "/", 3.0)],
+    )
+    @pytest.mark.parametrize("coalesce", [True, False])
+    def test_calculate(self, a, b, operation, expected, coalesce):
+        """Test single calculations with and without coalescing."""
+        service = CalculationService(coalesce=coalesce)
+        assert service.calculate(a, b, operation) == expected
+
+    @pytest.mark.parametrize("coalesce", [True, False])
+    def test_errors(self, coalesce):
+        """Test that calculation errors surface as ValueError."""
+        service = CalculationService(coalesce=coalesce)
+        with pytest.raises(ValueError, match="Division by zero"):
+            service.calculate(1, 0, "divide")
+        with pytest.raises(ValueError, match="Unsupported operation"):
+            service.calculate(1, 0, "&")
+
+    def test_reduce(self):
+        """Test reductions run through the service."""
+        service = CalculationService(admission=AdmissionController())
+        try:
+            assert service.reduce("sum", [0.1] * 10) == 1.0
+            assert service.reduce("product", [2, 3, 4]) == 24
+            with pytest.raises(ValueError, match="no values"):
+                service.reduce("mean", [])
+            with pytest.raises(ValueError, match="Unsupported reduction"):
+                service.reduce("median", [1])
+        finally:
+            service.close()
+
+    def test_equivalent_requests_coalesce(self, monkeypatch):
+        """Test that '+' and ' add ' requests share one execution."""
+        service = CalculationService()
+        release = threading.Event()
+        original = CalculationService._execute
+
+        def slow_execute(a, b, operation):
+            release.wait(5)
+            return original(a, b, operation)
+
+        monkeypatch.setattr(CalculationService, "_execute", staticmethod(slow_execute))
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda op=op: results.append(service.calculate(2, 3, op))
+            )
+            for op in ("+", " add ", "ADD", "+")
+        ]
+        for thread in threads:
+            thread.start()
+        wait_for(lambda: service.metrics()["coalescing"]["calls"] == 4)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert results == [5] * 4
+        assert service.metrics()["coalescing"]["executions"] == 1
+        assert service.metrics()["coalescing"]["coalesced"] == 3
+
+
+class TestLane:
+    """Test cases for admission lanes."""
+
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.release = threading.Event()
+        self.lane = Lane("test", workers=1, capacity=2)
+
+    def teardown_method(self):
+        """Release blocked work and stop the lane."""
+        self.release.set()
+        self.lane.close()
+
+    def _block_worker(self):
+        """Occupy the only worker until ``release`` is set."""
+        future = self.lane.submit(lambda: self.release.wait(5))
+        wait_for(lambda: self.lane.metrics()["busy"] == 1)
+        return future
+
+    def test_runs_work(self):
+        """Test that admitted work runs and resolves its future."""
+        assert self.lane.submit(lambda: 7).result(timeout=5) == 7
+
+    def test_rejects_when_queue_full(self):
+        """Test fast 429 rejection with a retry hint once the queue is full."""
+        self._block_worker()
+        self.lane.submit(lambda: 1)
+        self.lane.submit(lambda: 2)
+        with pytest.raises(ServiceOverloaded) as info:
+            self.lane.submit(lambda: 3)
+        assert info.value.status == 429
+        assert info.value.retry_after >= 1.0
+        metrics = self.lane.metrics()
+        assert metrics["depth"]["normal"] == 2
+        assert metrics["rejected"] == 1
+
+    def test_priorities_have_separate_queues(self):
+        """Test a full low-priority queue does not block high priority."""
+        self._block_worker()
+        self.lane.submit(lambda: "low", "low")
+        self.lane.submit(lambda: "low", "low")
+        with pytest.raises(ServiceOverloaded):
+            self.lane.submit(lambda: "low", "low")
+        assert self.lane.submit(lambda: "high", "high") is not None
+
+    def test_high_priority_served_first(self):
+        """Test that queued high-priority work runs before normal work."""
+        order = []
+        self._block_worker()
+        done = [
+            self.lane.submit(lambda: order.append("normal")),
+            self.lane.submit(lambda: order.append("high"), "high"),
+        ]
+        self.release.set()
+        for future in done:
+            future.result(timeout=5)
+        assert order == ["high", "normal"]
+
+    def test_invalid_priority(self):
+        """Test unknown priorities are rejected."""
+        with pytest.raises(ValueError, match="Invalid priority"):
+            self.lane.submit(lambda: 1, "urgent")
+
+    def test_closed_lane_rejects_with_503(self):
+        """Test that a closed lane drains queued work and rejects new work."""
+        self._block_worker()
+        queued = self.lane.submit(lambda: "queued")
+        self.release.set()
+        self.lane.close()
+        assert queued.result(timeout=5) == "queued"
+        with pytest.raises(ServiceOverloaded) as info:
+            self.lane.submit(lambda: 1)
+        assert info.value.status == 503
+
+    def test_wait_time_metrics(self):
+        """Test that queue wait times are recorded."""
+        self._block_worker()
+        queued = self.lane.submit(lambda: None)
+        time.sleep(0.02)
+        self.release.set()
+        queued.result(timeout=5)
+        waits = self.lane.metrics()["wait_seconds"]
+        assert waits["max"] >= 0.02
+        assert waits["p99"] >= waits["p50"]
+
+
+class TestServiceAdmission:
+    """Test cases for CalculationService with admission control."""
+
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.release = threading.Event()
+        self.service = CalculationService(
+            admission=AdmissionController(
+                {
+                    "single": Lane("single", workers=2, capacity=16),
+                    "batch": Lane("batch", workers=1, capacity=1),
+                }
+            )
+        )
+
+    def teardown_method(self):
+        """Release blocked work and stop the service."""
+        self.release.set()
+        self.service.close()
+
+    def test_batch(self):
+        """Test batches return one result or error per item in order."""
+        results = self.service.calculate_batch(
+            [(1, 2, "+"), (1, 0, "/"), (3, 4, "&"), (6, 3, "divide")]
+        )
+        assert results[0] == 3
+        assert isinstance(results[1], ValueError)
+        assert isinstance(results[2], ValueError)
+        assert results[3] == 2.0
+
+    def test_singles_served_during_batch_flood(self):
+        """Test single calculations keep flowing while the batch lane is saturated."""
+        self.service.admission.submit("batch", lambda: self.release.wait(5))
+        wait_for(lambda: self.service.metrics()["admission"]["batch"]["busy"] == 1)
+        self.service.submit_batch([(1, 1, "+")])
+        rejected = self.service.submit_batch([(1, 1, "+")])
+        with pytest.raises(ServiceOverloaded):
+            rejected.result(timeout=5)
+
+        started = time.monotonic()
+        assert [self.service.calculate(i, 1, "+") for i in range(50)] == list(
+            range(1, 51)
+        )
+        assert time.monotonic() - started < 2.0
+        assert self.service.metrics()["admission"]["batch"]["rejected"] == 1
@@ -0,0 +1,154 @@
+"""
+Tests for the shared-memory calculation history.
+"""
+
+import multiprocessing
+from multiprocessing import shared_memory
+
+import pytest
+
+from calculation import CalculationFactory
+from calculator import Calculator
+from calculator.history import SharedMemoryHistory, decode_value, encode_value
+
+
+def executed(a, b, operation="+"):
+    """Create and execute a calculation."""
+    calculation = CalculationFactory.create_calculation(a, b, operation)
+    calculation.execute()
+    return calculation
+
+
+def append_many(history, worker, count):
+    """Child process body: append ``count`` additions tagged by worker."""
+    for i in range(count):
+        history.add_calculation(executed(worker, i))
+
+
+@pytest.fixture
+def history():
+    """A small shared history, removed after the test."""
+    with SharedMemoryHistory(capacity=8) as shared:
+        yield shared
+
+
+class TestSharedMemoryHistory:
+    """Test cases for SharedMemoryHistory."""
+
+    def test_empty(self, history):
+        """Test a new history is empty."""
+        assert len(history) == 0
+        assert history.get_history() == []
+        assert history.get_last_calculation() is None
+
+    def test_add_and_read(self, history):
+        """Test calculations are read back in order with their results."""
+        first, second = executed(5, 3), executed(2.5, 4, "*")
+        history.add_calculation(first)
+        history.add_calculation(second)
+        assert len(history) == 2
+        assert [str(c) for c in history.get_history()] == [str(first), str(second)]
+        last = history.get_last_calculation()
+        assert str(last) == "2.5 * 4 = 10.0"
+        assert last.timestamp == second.timestamp
+        assert [str(c) for c in history.iter_range(1, 5)] == [str(second)]
+
+    def test_ring_keeps_most_recent(self, history):
+        """Test older calculations are overwritten once the ring is full."""
+        for i in range(20):
+            history.add_calculation(executed(i, 1))
+        assert len(history) == 8
+        assert [c.a for c in history.get_history()] == list(range(12, 20))
+
+    def test_clear(self, history):
+        """Test clearing hides earlier calculations."""
+        for i in range(3):
+            history.add_calculation(executed(i, 1))
+        assert history.clear_history() == 3
+        assert len(history) == 0
+        assert history.get_last_calculation() is None
+        history.add_calculation(executed(9, 1))
+        assert [c.a for c in history.get_history()] == [9]
+
+    @pytest.mark.parametrize(
+        "value",
+        [0, -1, 2**63 - 1, -(2**63), 2**63, -(2**200), 1.5, -0.0, float("inf")],
+    )
+    def test_value_round_trip(self, value):
+        """Test values are stored exactly when they fit."""
+        field = encode_value(value)
+        assert len(field) <= 32
+        decoded = decode_value(field.ljust(32, b"\0"))
+        assert decoded == value and type(decoded) is type(value)
+
+    def test_wide_integers_are_approximated(self):
+        """Test integers wider than the record are stored as floats."""
+        assert decode_value(encode_value(3**300).ljust(32, b"\0")) == float(3**300)
+        assert decode_value(encode_value(-(10**400)).ljust(32, b"\0")) == float("-inf")
+
+    def test_attach_by_name(self, history):
+        """Test a second handle on the same segment sees the same records."""
+        other = SharedMemoryHistory(name=history.name, create=False, lock=history._lock)
+        history.add_calculation(executed(1, 2))
+        other.add_calculation(executed(3, 4))
+        assert [c.a for c in history.get_history()] == [1, 3]
+        assert other.capacity == 8
+        other.close()
+        assert len(history) == 2
+
+    def test_attach_rejects_other_segments(self):
+        """Test attaching to a segment that is not a history fails."""
+        segment = shared_memory.SharedMemory(create=True, size=64)
+        try:
+            with pytest.raises(ValueError, match="not a history"):
+                SharedMemoryHistory(name=segment.name, create=False)
+        finally:
+            segment.close()
+            segment.unlink()
+
+    def test_invalid_capacity(self):
+        """Test the capacity must be positive."""
+        with pytest.raises(ValueError, match="positive"):
+            SharedMemoryHistory(capacity=0)
+
+    def test_calculator_uses_shared_history(self, history):
+        """Test the calculator records into an injected history."""
+        calculator = Calculator(history=history)
+        calculator._evaluate(["6", "*", "7"])
+        assert str(history.get_last_calculation()) == "6 * 7 = 42"
+        assert "6 * 7 = 42" in "".join(calculator._history_lines())
+
+
+class TestConcurrentWriters:
+    """Test cases for appends from several processes."""
+
+    @pytest.mark.parametrize("method", ["fork", "spawn"])
+    def test_every_append_is_recorded(self, method):
+        """Test concurrent writers lose no records and tear none."""
+        if method not in multiprocessing.get_all_start_methods():
+            pytest.skip(f"{method} start method unavailable")
+        context = multiprocessing.get_context(method)
+        workers, count = 4, 250
+        with SharedMemoryHistory(
+            capacity=workers * count, lock=context.Lock()
+        ) as shared:
+            processes = [
+                context.Process(target=append_many, args=(shared, worker, count))
+                for worker in range(workers)
+            ]
+            for process in processes:
+                process.start()
+            while any(process.is_alive() for process in processes):
+                for calculation in shared.get_history():
+                    assert calculation.result == calculation.a + calculation.b
+            for process in processes:
+                process.join()
+                assert process.exitcode == 0
+
+            records = shared.get_history()
+            assert len(shared) == len(records) == workers * count
+            assert sorted((c.a, c.b) for c in records) == [
+                (worker, i) for worker in range(workers) for i in range(count)
+            ]
+            for worker in range(workers):
+                assert [c.b for c in records if c.a == worker] == list(range(count))
@@ -0,0 +1,271 @@
+"""
+Unit tests for the streaming quantile and distinct-count sketches.
+"""
+
+import bisect
+import json
+import random
+
+import pytest
+from tests.test_http import request
+
+from calculation import CalculationFactory
+from calculation.batch import execute_batch
+from calculator import Calculator, CalculatorHistory
+from calculator.batchjob import BatchJob
+from calculator.snapshot import SnapshotReader, save_snapshot
+from service import CalculationHTTPServer, ServerThread
+from sketch import HyperLogLog, KLLSketch, ResultSketch, expression_key, main
+
+
+def near(estimate, count):
+    """Whether a distinct-count estimate is within 2% of ``count``."""
+    return abs(estimate - count) <= 0.02 * count
+
+
+def rank_error(sketch, ordered, q):
+    """Distance between ``q`` and the true rank of the sketch's estimate."""
+    return abs(bisect.bisect_left(ordered, sketch.quantile(q)) / len(ordered) - q)
+
+
+@pytest.fixture(scope="module")
+def values():
+    """A skewed stream of 200,000 values."""
+    rng = random.Random(5)
+    return [rng.lognormvariate(0, 2) for _ in range(200000)]
+
+
+class TestKLLSketch:
+    """Test cases for the quantile sketch."""
+
+    def test_accuracy(self, values):
+        """Test quantiles are within 2% of rank in bounded memory."""
+        sketch = KLLSketch()
+        sketch.update(values)
+        ordered = sorted(values)
+        for q in (0.01, 0.25, 0.5, 0.9, 0.99, 0.999):
+            assert rank_error(sketch, ordered, q) < 0.02
+        assert sketch.quantile(0) == ordered[0]
+        assert sketch.quantile(1) == ordered[-1]
+        assert len(sketch) == len(values)
+        assert sketch.retained < 1000
+        assert 0.45 < sketch.rank(ordered[len(ordered) // 2]) < 0.55
+
+    def test_add_and_update(self, values):
+        """Test the sketch does not depend on how the stream is split."""
+        one, bulk = KLLSketch(), KLLSketch()
+        for value in values[:20202]:
+            one.add(value)
+        for start in range(0, 20202, 777):
+            bulk.update(values[start : start + 777])
+        assert one.to_dict() == bulk.to_dict()
+
+    def test_merge(self, values):
+        """Test merged shards keep the accuracy of one sketch."""
+        shards = [KLLSketch() for _ in range(8)]
+        for i, shard in enumerate(shards):
+            shard.update(values[i::8])
+        merged = shards[0]
+        for shard in shards[1:]:
+            merged.merge(shard)
+        ordered = sorted(values)
+        assert merged.count == len(values)
+        for q in (0.5, 0.9, 0.99):
+            assert rank_error(merged, ordered, q) < 0.02
+        with pytest.raises(ValueError, match="k=200 and k=100"):
+            merged.merge(KLLSketch(100))
+
+    def test_state(self, values):
+        """Test sketches are deterministic and survive serialization."""
+        first, second = KLLSketch(), KLLSketch()
+        first.update(values[:5000])
+        second.update(values[:5000])
+        state = json.loads(json.dumps(first.to_dict()))
+        assert state == second.to_dict()
+        restored = KLLSketch.from_dict(state)
+        assert restored.quantile(0.5) == first.quantile(0.5)
+        restored.update(values[5000:6000])
+        first.update(values[5000:6000])
+        assert restored.to_dict() == first.to_dict()
+        with pytest.raises(ValueError, match="Invalid quantile sketch"):
+            KLLSketch.from_dict({"k": 200})
+
+    def test_special_values(self):
+        """Test NaN is ignored and huge integers saturate."""
+        sketch = KLLSketch()
+        sketch.update([float("nan"), 2**2000, -(2**2000), 1])
+        sketch.add(float("nan"))
+        assert sketch.count == 3
+        assert (sketch.min, sketch.max) == (float("-inf"), float("inf"))
+
+    def test_invalid(self):
+        """Test parameters and queries are validated."""
+        with pytest.raises(ValueError, match="at least 8"):
+            KLLSketch(4)
+        with pytest.raises(ValueError, match="empty"):
+            KLLSketch().quantile(0.5)
+        sketch = KLLSketch()
+        sketch.add(1)
+        with pytest.raises(ValueError, match="between 0 and 1"):
+            sketch.quantile(1.5)
+
+
+class TestHyperLogLog:
+    """Test cases for the distinct-count sketch."""
+
+    @pytest.mark.parametrize("count", [0, 10, 1000, 50000])
+    def test_accuracy(self, count):
+        """Test estimates are within 3% (exact for tiny counts)."""
+        sketch = HyperLogLog()
+        sketch.update(b"%d" % i for i in range(count))
+        sketch.update(b"%d" % i for i in range(count))  # Repeats are free.
+        if count <= 10:
+            assert sketch.estimate() == count
+        else:
+            assert abs(sketch.estimate() - count) < 0.03 * count
+        assert sketch.memory_usage() == 1 << 14
+
+    def test_merge(self):
+        """Test a merge counts the union of both streams."""
+        left, right, union = HyperLogLog(), HyperLogLog(), HyperLogLog()
+        left.update(b"%d" % i for i in range(0, 6000))
+        right.update(b"%d" % i for i in range(4000, 10000))
+        union.update(b"%d" % i for i in range(10000))
+        assert left.merge(right).registers == union.registers
+        with pytest.raises(ValueError, match="precision"):
+            left.merge(HyperLogLog(10))
+
+    def test_state(self):
+        """Test registers survive serialization and are validated."""
+        sketch = HyperLogLog(10)
+        sketch.update([b"a", b"b"])
+        restored = HyperLogLog.from_dict(json.loads(json.dumps(sketch.to_dict())))
+        assert restored.registers == sketch.registers
+        with pytest.raises(ValueError, match="register count"):
+            HyperLogLog.from_dict({"precision": 12, "registers": "AAAA"})
+        with pytest.raises(ValueError, match="between 4 and 18"):
+            HyperLogLog(20)
+
+
+class TestResultSketch:
+    """Test cases for sketching calculations."""
+
+    ITEMS = [(i % 50, 3, "+*-"[i % 3]) for i in range(3000)] + [(1, 0, "/")] * 10
+
+    def test_summary(self):
+        """Test counts, distinct expressions and quantiles of a batch."""
+        sketch = ResultSketch()
+        sketch.add_batch(self.ITEMS, execute_batch(self.ITEMS))
+        summary = sketch.summary()
+        assert (summary["count"], summary["errors"]) == (3010, 10)
+        assert near(summary["distinct"], 151)
+        assert list(summary) == [
+            "count",
+            "errors",
+            "distinct",
+            "min",
+            "p50",
+            "p90",
+            "p99",
+            "max",
+        ]
+        assert summary["min"] == -3 and summary["max"] == 147
+        assert sketch.summary([0.999])["p99.9"] == 147
+        assert ResultSketch().summary() == {"count": 0, "errors": 0, "distinct": 0}
+
+    def test_expression_key(self):
+        """Test operation aliases are one expression and numbers are exact."""
+        assert expression_key(2, 3, "+") == expression_key(2, 3, "add")
+        assert expression_key(2, 3, "+") != expression_key(2.0, 3, "+")
+        assert expression_key(2**20000, 1, "*").startswith(b"multiply|")
+        assert expression_key(1, 2, "bogus") == b"bogus|1|2"
+
+    def test_merge_shards(self, tmp_path, capsys):
+        """Test shard states merge through the CLI."""
+        paths = []
+        for shard in range(3):
+            items = self.ITEMS[shard::3]
+            sketch = ResultSketch()
+            sketch.add_batch(items, execute_batch(items))
+            path = tmp_path / f"shard{shard}.json"
+            path.write_text(json.dumps(sketch.to_dict()))
+            paths.append(str(path))
+        assert main(paths + ["--quantiles", "0.5", "-o", str(tmp_path / "m")]) == 0
+        summary = json.loads(capsys.readouterr().out)
+        assert summary["count"] == 3010
+        assert near(summary["distinct"], 151)
+        assert "p50" in summary and "p99" not in summary
+        merged = ResultSketch.from_dict(json.loads((tmp_path / "m").read_text()))
+        assert merged.count == 3010
+        (tmp_path / "bad.json").write_text("[]")
+        assert main([str(tmp_path / "bad.json")]) == 2
+
+    def test_history(self, tmp_path):
+        """Test histories and snapshots are sketched without sorting results."""
+        history = CalculatorHistory()
+        for a, b, operation in self.ITEMS[:300]:
+            calculation = CalculationFactory.create_calculation(a, b, operation)
+            calculation.execute()
+            history.add_calculation(calculation)
+        summary = history.sketch().summary()
+        assert summary["count"] == 300
+        assert near(summary["distinct"], 150)
+        path = str(tmp_path / "history.snap")
+        save_snapshot(history, path)
+        with SnapshotReader(path) as snapshot:
+            assert near(snapshot.sketch().summary()["distinct"], 150)
+            assert snapshot.sketch(operation="+").summary()["count"] == 100
+
+    def test_repl(self, capsys):
+        """Test the ``stats`` command summarizes the history."""
+        calculator = Calculator()
+        calculator._handle_input("stats")
+        assert "Calculations: 0" in capsys.readouterr().out
+        for line in ("2 + 3", "4 * 5", "2 + 3"):
+            calculator._handle_input(line)
+        calculator._handle_input("stats")
+        output = capsys.readouterr().out
+        assert "Calculations: 3 (2 distinct expressions, estimated)" in output
+        assert "Results: min 5, p50 5, p90 20, p99 20, max 20" in output
+
+    def test_batch_job(self, tmp_path):
+        """Test batch job summaries include the sketched figures."""
+        source = tmp_path / "in.jsonl"
+        source.write_text(
+            "".join(
+                json.dumps({"a": a, "b": b, "operation": op}) + "\n"
+                for a, b, op in self.ITEMS
+            )
+        )
+        summary = BatchJob(str(source), str(tmp_path / "out.jsonl")).run().summary()
+        assert near(summary["distinct"], 151)
+        assert set(summary["quantiles"]) == {"p50", "p90", "p99"}
+
+
+class TestService:
+    """Test cases for result sketches on the HTTP server."""
+
+    def test_metrics(self):
+        """Test computed results are reported and the state is served."""
+        server = CalculationHTTPServer(port=0, sketch=ResultSketch())
+        with ServerThread(server):
+            request(server, "GET", "/calculate?a=2&b=3&operation=add")
+            request(server, "GET", "/calculate?a=2&b=3&operation=add")  # cached
+            body = {"items": [{"a": 1, "b": 0, "operation": "/"}] * 2}
+            request(server, "POST", "/batch", body)
+            _, _, metrics = request(server, "GET", "/metrics")
+            _, _, state = request(server, "GET", "/metrics/sketch")
+        assert metrics["results"]["count"] == 3
+        assert metrics["results"]["errors"] == 2
+        assert metrics["results"]["distinct"] == 2
+        assert metrics["results"]["p50"] == 5
+        assert ResultSketch.from_dict(state).count == 3
+
+    def test_disabled(self):
+        """Test servers without a sketch do not report one."""
+        server = CalculationHTTPServer(port=0)
+        with ServerThread(server):
+            status, _, _ = request(server, "GET", "/metrics/sketch")
+            _, _, metrics = request(server, "GET", "/metrics")
+        assert status == 404
+        assert "results" not in metrics
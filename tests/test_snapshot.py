@@ -0,0 +1,204 @@
+"""
+Unit tests for columnar history snapshots.
+"""
+
+import io
+import math
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+
+import pytest
+
+from calculation import CalculationFactory
+from calculator import Calculator, CalculatorHistory
+from calculator import snapshot as snapshot_module
+from calculator.snapshot import (
+    SnapshotHistory,
+    SnapshotReader,
+    decode_numbers,
+    decode_varints,
+    encode_numbers,
+    encode_varints,
+    save_snapshot,
+)
+
+
+def make_history(count, start=datetime(2024, 3, 1, 12, 0, 0)):
+    """Build a history of ``count`` calculations over every operation type."""
+    history = CalculatorHistory()
+    operations = ["+", "-", "*", "/", "^"]
+    for i in range(count):
+        operation = operations[i % len(operations)]
+        a = i * 0.5 if i % 3 == 0 else i
+        b = 3 if operation != "^" else 2
+        if i % 101 == 0:
+            a = 10**40 + i
+        calculation = CalculationFactory.create_calculation(a, b, operation)
+        calculation.execute()
+        calculation.timestamp = start + timedelta(microseconds=i * 1234567)
+        history.add_calculation(calculation)
+    return history
+
+
+def rows(calculations):
+    """Comparable rows of calculations."""
+    return [(c.a, c.b, c.operation.name, c.result, c.timestamp) for c in calculations]
+
+
+class TestEncodings:
+    """Test cases for the column encodings."""
+
+    @pytest.mark.parametrize(
+        "values, encoding",
+        [
+            ([1.5, -2.0, math.inf], "f8"),
+            ([1, -(2**63), 2**63 - 1], "i8"),
+            ([1, 2.5, 10**30, -(10**50)], "mixed"),
+        ],
+    )
+    def test_numbers_round_trip(self, values, encoding):
+        """Test typed and mixed blocks decode to the same values and types."""
+        kind, segment = encode_numbers(values)
+        decoded = list(decode_numbers(kind, segment, len(values)))
+        assert kind == encoding
+        assert decoded == values
+        assert [type(value) for value in decoded] == [type(value) for value in values]
+
+    def test_varints_round_trip(self):
+        """Test signed deltas survive zig-zag varint encoding."""
+        numbers = [0, 1, -1, 63, -64, 64, 2**40, -(2**40)]
+        assert decode_varints(encode_varints(numbers)) == numbers
+        assert len(encode_varints([1, -1, 63])) == 3
+
+
+class TestSnapshot:
+    """Test cases for saving and querying snapshots."""
+
+    @pytest.fixture(autouse=True)
+    def small_blocks(self, monkeypatch):
+        """Use small blocks so that tests cross block boundaries."""
+        monkeypatch.setattr(snapshot_module, "BLOCK_ROWS", 64)
+
+    @pytest.mark.parametrize("compress", [False, True])
+    def test_round_trip(self, tmp_path, compress):
+        """Test every row, type and timestamp is restored exactly."""
+        history = make_history(300)
+        path = str(tmp_path / "history.snap")
+        assert save_snapshot(history, path, compress=compress) == 300
+        with SnapshotReader(path) as snapshot:
+            assert len(snapshot) == 300 and snapshot.blocks == 5
+            assert rows(snapshot.calculations()) == rows(history.get_history())
+            assert rows(snapshot.calculations(62, 130)) == rows(
+                history.get_history()[62:130]
+            )
+
+    def test_smaller_than_text(self, tmp_path):
+        """Test a snapshot of full-precision floats is smaller than text."""
+        history = CalculatorHistory()
+        for i in range(2000):
+            calculation = CalculationFactory.create_calculation(i / 7, 3.5, "*")
+            calculation.execute()
+            history.add_calculation(calculation)
+        text = sum(len(f"{c}\n") for c in history.get_history())
+        for compress in (False, True):
+            path = tmp_path / f"history-{compress}.snap"
+            save_snapshot(history, str(path), compress=compress)
+            assert path.stat().st_size < text
+        assert (tmp_path / "history-True.snap").stat().st_size < text / 3
+
+    @pytest.mark.parametrize("compress", [False, True])
+    def test_queries_match_history(self, tmp_path, compress):
+        """Test filters and aggregates agree with a scan of the history."""
+        history = make_history(500)
+        path = str(tmp_path / "history.snap")
+        save_snapshot(history, path, compress=compress)
+        calculations = history.get_history()
+        with SnapshotReader(path) as snapshot:
+            assert snapshot.count() == 500
+            assert snapshot.count(operation="*") == sum(
+                c.operation.name == "multiply" for c in calculations
+            )
+            where = [("a", ">", 100), ("result", "<", 10**6)]
+            expected = [
+                c.result
+                for c in calculations
+                if c.operation.name == "add" and c.a > 100 and c.result < 10**6
+            ]
+            assert snapshot.count("add", where) == len(expected)
+            assert snapshot.aggregate("sum", "result", "+", where) == pytest.approx(
+                sum(expected)
+            )
+            assert snapshot.aggregate("max", "a") == max(c.a for c in calculations)
+            assert list(snapshot.column("operation"))[:3] == [
+                "add",
+                "subtract",
+                "multiply",
+            ]
+
+    def test_query_errors(self, tmp_path):
+        """Test invalid queries raise ValueError."""
+        path = str(tmp_path / "history.snap")
+        save_snapshot(make_history(10), path)
+        with SnapshotReader(path) as snapshot:
+            assert snapshot.count(operation="%") == 0
+            with pytest.raises(ValueError, match="Cannot filter"):
+                snapshot.count(where=[("operation", "==", 1)])
+            with pytest.raises(ValueError, match="Invalid comparison"):
+                snapshot.count(where=[("a", "~", 1)])
+            with pytest.raises(ValueError, match="Unsupported operation"):
+                snapshot.count(operation="bogus")
+            with pytest.raises(ValueError, match="no values"):
+                snapshot.aggregate("mean", "a", where=[("a", "<", -1)])
+
+    def test_not_a_snapshot(self, tmp_path):
+        """Test other and truncated files are rejected."""
+        other = tmp_path / "other.snap"
+        other.write_bytes(b"5 + 3 = 8\n" * 10)
+        with pytest.raises(ValueError, match="Not a snapshot"):
+            SnapshotReader(str(other))
+        path = tmp_path / "history.snap"
+        save_snapshot(make_history(10), str(path))
+        path.write_bytes(path.read_bytes()[:-5])
+        with pytest.raises(ValueError, match="Not a snapshot"):
+            SnapshotReader(str(path))
+
+    def test_snapshot_history(self, tmp_path):
+        """Test a loaded snapshot acts as a history that can grow and be re-saved."""
+        history = make_history(150)
+        path = str(tmp_path / "history.snap")
+        save_snapshot(history, path)
+        loaded = SnapshotHistory(path)
+        assert len(loaded) == 150
+        assert rows([loaded.get_last_calculation()]) == rows(
+            [history.get_last_calculation()]
+        )
+        extra = CalculationFactory.create_calculation(1, 2, "+")
+        extra.execute()
+        loaded.add_calculation(extra)
+        assert len(loaded) == 151
+        assert loaded.get_last_calculation() is extra
+        assert rows(loaded.iter_range(148, 151)) == rows(
+            history.get_history()[148:] + [extra]
+        )
+        assert save_snapshot(loaded, path) == 151
+        assert len(SnapshotHistory(path)) == 151
+        assert loaded.clear_history() == 151
+        assert len(loaded) == 0 and loaded.get_last_calculation() is None
+
+    def test_repl_commands(self, tmp_path):
+        """Test snapshot save and load from the REPL."""
+        path = str(tmp_path / "history.snap")
+        calculator = Calculator()
+        output = io.StringIO()
+        with redirect_stdout(output):
+            calculator._handle_input("5 + 3")
+            calculator._handle_input(f"snapshot save {path} --compress")
+            calculator._handle_input("clear")
+            calculator._handle_input(f"snapshot load {path}")
+            calculator._handle_input("history")
+            calculator._handle_input("snapshot load")
+        lines = output.getvalue().splitlines()
+        assert lines[1] == f"Saved 1 calculation(s) to {path}."
+        assert lines[3] == f"Loaded 1 calculation(s) from {path}."
+        assert lines[-2].endswith("5 + 3 = 8")
+        assert lines[-1].startswith("Error: Usage: snapshot")
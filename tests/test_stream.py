@@ -0,0 +1,277 @@
+"""
+Tests for WebSocket calculation streams.
+
+Servers run on an ephemeral port in a background thread; the asyncio
+``StreamClient`` or a raw socket speaking the frame format talks to them.
+"""
+
+import asyncio
+import base64
+import json
+import os
+import socket
+import time
+
+import pytest
+
+from calculation.offload import dispatcher
+from service import (
+    CalculationHTTPServer,
+    ServerThread,
+    StreamClient,
+    StreamHandler,
+)
+from service import stream
+from service.stream import accept_key, apply_mask, decode_frame, encode_frame
+
+
+@pytest.fixture
+def server():
+    """Run an HTTP server with a small stream send buffer."""
+    handler = StreamHandler(
+        max_frame_size=1024, send_buffer=4096, slow_consumer_timeout=0.3
+    )
+    runner = ServerThread(CalculationHTTPServer(port=0, stream=handler))
+    yield runner.start()
+    runner.stop()
+
+
+def run(coroutine_function, server):
+    """Connect a client and run ``coroutine_function(client)`` to completion."""
+
+    async def main():
+        async with StreamClient("127.0.0.1", server.port) as client:
+            return await coroutine_function(client)
+
+    return asyncio.run(main())
+
+
+class RawStream:
+    """Blocking WebSocket connection for sending arbitrary frames."""
+
+    def __init__(self, port, receive_buffer=None):
+        self.socket = socket.socket()
+        if receive_buffer:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, receive_buffer)
+        self.socket.settimeout(5)
+        self.socket.connect(("127.0.0.1", port))
+        key = base64.b64encode(os.urandom(16)).decode()
+        self.socket.sendall(
+            f"GET /stream HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\n"
+            f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\n"
+            f"Sec-WebSocket-Version: 13\r\n\r\n".encode()
+        )
+        self.buffer = bytearray()
+        while b"\r\n\r\n" not in self.buffer:
+            self.buffer += self.socket.recv(4096)
+        head, _, rest = bytes(self.buffer).partition(b"\r\n\r\n")
+        self.head = head.decode()
+        self.buffer = bytearray(rest)
+        assert accept_key(key) in self.head
+
+    def send(self, opcode, payload, fin=True):
+        frame = bytearray(encode_frame(opcode, payload, b"abcd"))
+        if not fin:
+            frame[0] &= 0x7F
+        self.socket.sendall(frame)
+
+    def receive(self):
+        """Return ``(opcode, payload)`` of the next frame."""
+        while True:
+            frame = decode_frame(self.buffer, 0, 1 << 30, masked=False)
+            if frame is not None:
+                _, opcode, payload, end = frame
+                del self.buffer[:end]
+                return opcode, payload
+            data = self.socket.recv(65536)
+            if not data:
+                raise ConnectionError("closed")
+            self.buffer += data
+
+    def close(self):
+        self.socket.close()
+
+
+def message(**fields):
+    return json.dumps(fields).encode()
+
+
+def stream_metrics(server):
+    """Return stream metrics once every connection has been closed."""
+    deadline = time.monotonic() + 5
+    while server.metrics()["stream"]["active"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return server.metrics()["stream"]
+
+
+class TestFrames:
+    """Test cases for frame encoding."""
+
+    def test_accept_key(self):
+        """Test the RFC 6455 example handshake."""
+        assert accept_key("dGhlIHNhbXBsZSBub25jZQ==") == "s3pPLMBiTxaQ9kYGzzhZRbK+xOo="
+
+    @pytest.mark.parametrize("length", [0, 5, 125, 126, 65535, 65536])
+    def test_round_trip(self, length):
+        """Test every length encoding, masked and unmasked."""
+        payload = os.urandom(length)
+        for mask in (None, b"\x01\x02\x03\x04"):
+            frame = bytearray(encode_frame(stream.TEXT, payload, mask))
+            assert (
+                decode_frame(frame[:-1], 0, 1 << 20, bool(mask)) is None or not length
+            )
+            assert decode_frame(frame, 0, 1 << 20, bool(mask)) == (
+                True,
+                stream.TEXT,
+                payload,
+                len(frame),
+            )
+        assert apply_mask(apply_mask(payload, b"wxyz"), b"wxyz") == payload
+
+    def test_rejects(self):
+        """Test unmasked client frames and oversized frames are refused."""
+        with pytest.raises(stream.ProtocolError, match="masked"):
+            decode_frame(bytearray(encode_frame(stream.TEXT, b"x")), 0, 10)
+        with pytest.raises(stream.ProtocolError) as error:
+            decode_frame(
+                bytearray(encode_frame(stream.TEXT, b"x" * 11, b"abcd")), 0, 10
+            )
+        assert error.value.code == stream.MESSAGE_TOO_BIG
+
+
+class TestStream:
+    """Test cases for the /stream endpoint."""
+
+    def test_results_in_order(self, server):
+        """Test pipelined calculations are answered in order with their ids."""
+
+        async def scenario(client):
+            futures = [client.submit(i, 3, "*") for i in range(500)]
+            futures.append(client.submit(1, 0, "/"))
+            futures.append(client.submit(1, 2, "bogus"))
+            return await asyncio.gather(*futures, return_exceptions=True)
+
+        results = run(scenario, server)
+        assert results[:500] == [i * 3 for i in range(500)]
+        assert str(results[500]) == "Division by zero is not allowed"
+        assert "Unsupported operation" in str(results[501])
+        metrics = stream_metrics(server)
+        assert metrics["messages"] == 502
+        assert metrics["batches"] <= 502 and metrics["active"] == 0
+
+    def test_calculate(self, server):
+        """Test single calculations, including big integers."""
+
+        async def scenario(client):
+            return [
+                await client.calculate(5, 3, "+"),
+                await client.calculate(10**30, 10**30, "*"),
+            ]
+
+        assert run(scenario, server) == [8, 10**60]
+
+    def test_invalid_messages(self, server):
+        """Test malformed requests get error responses keyed by id."""
+        connection = RawStream(server.port)
+        connection.send(stream.TEXT, b"not json")
+        connection.send(stream.TEXT, message(id="x", a=1, b="2", operation="+"))
+        connection.send(stream.TEXT, message(id=[1], a=1, operation="+"))
+        replies = [json.loads(connection.receive()[1]) for _ in range(3)]
+        assert replies == [
+            {"id": None, "error": "Frame is not valid JSON"},
+            {"id": "x", "error": "Field 'b' must be a number"},
+            {"id": [1], "error": "Missing field(s): b"},
+        ]
+        connection.close()
+
+    def test_control_and_fragments(self, server):
+        """Test ping, fragmented messages and the closing handshake."""
+        connection = RawStream(server.port)
+        data = message(id=1, a=2, b=10, operation="^")
+        connection.send(stream.TEXT, data[:10], fin=False)
+        connection.send(stream.PING, b"hello")
+        connection.send(stream.CONTINUATION, data[10:])
+        assert connection.receive() == (stream.PONG, b"hello")
+        assert json.loads(connection.receive()[1]) == {"id": 1, "result": 1024}
+        connection.send(stream.CLOSE, b"\x03\xe8")
+        assert connection.receive() == (stream.CLOSE, b"\x03\xe8")
+        connection.close()
+
+    @pytest.mark.parametrize(
+        "opcode, payload, code",
+        [
+            (stream.BINARY, b"\x00", stream.UNSUPPORTED_DATA),
+            (stream.TEXT, b"x" * 2000, stream.MESSAGE_TOO_BIG),
+            (stream.CONTINUATION, b"{}", stream.PROTOCOL_ERROR),
+        ],
+    )
+    def test_protocol_errors(self, server, opcode, payload, code):
+        """Test protocol violations close the stream with the matching code."""
+        connection = RawStream(server.port)
+        connection.send(opcode, payload)
+        opcode, payload = connection.receive()
+        assert opcode == stream.CLOSE
+        assert int.from_bytes(payload[:2], "big") == code
+        connection.close()
+
+    def test_rejected_upgrade(self, server):
+        """Test a plain GET on /stream asks the client to upgrade."""
+        with socket.create_connection(("127.0.0.1", server.port), timeout=5) as sock:
+            sock.sendall(b"GET /stream HTTP/1.1\r\nHost: localhost\r\n\r\n")
+            response = sock.recv(4096).decode()
+        assert response.startswith("HTTP/1.1 426")
+        assert "Upgrade: websocket" in response
+
+    def test_slow_consumer(self, server):
+        """Test a client that never reads is disconnected once over the bound."""
+        connection = RawStream(server.port, receive_buffer=4096)
+        frame = encode_frame(
+            stream.TEXT, message(id=0, a=1, b=1, operation="+"), b"abcd"
+        )
+        deadline = time.monotonic() + 10
+        with pytest.raises(OSError):
+            while time.monotonic() < deadline:
+                connection.socket.sendall(frame * 1000)
+        connection.close()
+        metrics = stream_metrics(server)
+        assert metrics["slow_consumers"] == 1 and metrics["active"] == 0
+
+    def test_offloaded(self, server, monkeypatch):
+        """Test huge calculations run in a worker without reordering responses."""
+        monkeypatch.setattr(dispatcher, "threshold_bits", 1 << 10)
+
+        async def scenario(client):
+            futures = [
+                client.submit(1, 2, "+"),
+                client.submit(3, 5000, "^"),
+                client.submit(4, 2, "-"),
+            ]
+            return await asyncio.gather(*futures)
+
+        offloaded = dispatcher.offloaded
+        assert run(scenario, server) == [3, 3**5000, 2]
+        assert dispatcher.offloaded == offloaded + 1
+
+    def test_huge_exponent(self, server, monkeypatch):
+        """Test an exponent too large for a float fails only its own request."""
+        monkeypatch.setattr(dispatcher, "threshold_bits", 1 << 10)
+
+        async def scenario(client):
+            futures = [client.submit(2, 10**400, "^"), client.submit(1, 2, "+")]
+            return await asyncio.gather(*futures, return_exceptions=True)
+
+        results = run(scenario, server)
+        assert "would exceed" in str(results[0])
+        assert results[1] == 3
+
+    def test_non_finite_result(self, server):
+        """Test an overflowing float is an error for its id, not Infinity."""
+
+        async def scenario(client):
+            futures = [client.submit(1e308, 10, "*"), client.submit(1, 2, "+")]
+            return await asyncio.gather(*futures, return_exceptions=True)
+
+        results = run(scenario, server)
+        assert isinstance(results[0], ValueError)
+        assert str(results[0]) == "Result is not a finite number"
+        assert results[1] == 3
@@ -0,0 +1,213 @@
+"""
+Tests for stage-level tracing.
+"""
+
+import json
+import threading
+
+import pytest
+
+from calculator import Calculator
+from service import CalculationService
+from tracing import Tracer, span, tracer
+
+
+@pytest.fixture(autouse=True)
+def reset_tracer():
+    """Leave the process-wide tracer off and empty after each test."""
+    yield
+    tracer.configure(sample_rate=0.0, capacity=256)
+    tracer.clear()
+
+
+def stage_names(trace):
+    """Names of a trace's spans in the order they were started."""
+    return [item.name for item in trace.spans]
+
+
+class TestTracer:
+    """Test cases for the Tracer."""
+
+    def test_off_by_default(self):
+        """Test nothing is recorded when sampling is off."""
+        local = Tracer()
+        assert not local.enabled
+        with local.trace("request") as trace:
+            with span("stage") as stage:
+                stage.set_attribute("ignored", 1)
+            trace.set_attribute("ignored", 1)
+        assert local.last() is None
+
+    def test_sampled_trace_nests_spans(self):
+        """Test spans are parented to the innermost open span."""
+        local = Tracer(sample_rate=1.0)
+        with local.trace("request"):
+            with span("outer"):
+                with span("inner"):
+                    pass
+        trace = local.last()
+        root, outer, inner = trace.spans
+        assert stage_names(trace) == ["request", "outer", "inner"]
+        assert root.parent_id is None
+        assert outer.parent_id == root.span_id
+        assert inner.parent_id == outer.span_id
+        assert all(item.end_ns >= item.start_ns for item in trace.spans)
+
+    def test_span_records_error(self):
+        """Test an exception marks the span and still propagates."""
+        local = Tracer(sample_rate=1.0)
+        with pytest.raises(ValueError):
+            with local.trace("request"):
+                with span("stage"):
+                    raise ValueError("boom")
+        stage = local.last().spans[1]
+        assert stage.error == "ValueError: boom"
+
+    def test_head_sampling_rate(self):
+        """Test roughly ``sample_rate`` of traces are kept."""
+        local = Tracer(sample_rate=0.25, capacity=10000)
+        for _ in range(4000):
+            with local.trace("request"):
+                pass
+        assert 800 < len(local.recent()) < 1200
+
+    def test_ring_buffer_keeps_recent(self):
+        """Test only the most recent traces are kept."""
+        local = Tracer(sample_rate=1.0, capacity=3)
+        for number in range(5):
+            with local.trace("request") as trace:
+                trace.set_attribute("number", number)
+        assert [t.root.attributes["number"] for t in local.recent()] == [2, 3, 4]
+        local.configure(capacity=1)
+        assert local.last().root.attributes["number"] == 4
+        assert local.clear() == 1
+
+    def test_traces_are_per_thread(self):
+        """Test a trace in one thread does not capture another's spans."""
+        local = Tracer(sample_rate=1.0)
+        entered, release = threading.Event(), threading.Event()
+
+        def other():
+            entered.wait()
+            with span("foreign"):
+                pass
+            release.set()
+
+        thread = threading.Thread(target=other)
+        thread.start()
+        with local.trace("request"):
+            entered.set()
+            release.wait()
+        thread.join()
+        assert stage_names(local.last()) == ["request"]
+
+    def test_recording_only_while_sampled(self):
+        """Test unsampled requests get no scope and leave recording off."""
+        local = Tracer(sample_rate=1e-12)
+        assert local.enabled and local.start("request") is None
+        local.configure(sample_rate=1.0)
+        with local.start("request"):
+            assert local.recording
+            with local.start("nested") as nested:
+                assert nested.name == "nested"
+        assert not local.recording
+        assert stage_names(local.last()) == ["request", "nested"]
+
+    @pytest.mark.parametrize("settings", [{"sample_rate": 1.5}, {"capacity": 0}])
+    def test_invalid_configuration(self, settings):
+        """Test invalid sample rates and capacities are rejected."""
+        with pytest.raises(ValueError):
+            Tracer().configure(**settings)
+
+    def test_export_otlp_json(self, tmp_path):
+        """Test export writes OTLP/JSON spans."""
+        local = Tracer(sample_rate=1.0)
+        with local.trace("request") as trace:
+            trace.set_attribute("input", "5 + 3")
+            with span("stage"):
+                pass
+        path = tmp_path / "traces.json"
+        assert local.export(str(path)) == 1
+
+        payload = json.loads(path.read_text())
+        spans = payload["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        root, stage = spans
+        assert len(root["traceId"]) == 32 and len(root["spanId"]) == 16
+        assert "parentSpanId" not in root
+        assert stage["parentSpanId"] == root["spanId"]
+        assert root["attributes"] == [
+            {"key": "input", "value": {"stringValue": "5 + 3"}}
+        ]
+        assert int(stage["endTimeUnixNano"]) >= int(stage["startTimeUnixNano"])
+
+
+class TestCalculatorTracing:
+    """Test cases for tracing the calculator's stages."""
+
+    def test_stages_of_a_calculation(self):
+        """Test parse, factory, execute and history are traced."""
+        tracer.configure(sample_rate=1.0)
+        Calculator()._evaluate(["5", "+", "3"])
+        trace = tracer.last()
+        assert stage_names(trace) == [
+            "calculation",
+            "parse",
+            "factory",
+            "execute",
+            "history",
+        ]
+        assert trace.root.attributes == {"input": "5 + 3"}
+
+    def test_failed_calculation_is_traced(self):
+        """Test a failing stage is recorded with its error."""
+        tracer.configure(sample_rate=1.0)
+        with pytest.raises(ValueError):
+            Calculator()._evaluate(["5", "/", "0"])
+        trace = tracer.last()
+        assert stage_names(trace) == ["calculation", "parse", "factory", "execute"]
+        assert trace.spans[-1].error.startswith("ValueError")
+        assert trace.root.error is not None
+
+    def test_unsampled_calculation_runs_untraced(self, monkeypatch):
+        """Test an unsampled calculation never opens a span."""
+        tracer.configure(sample_rate=0.5)
+        monkeypatch.setattr("tracing.random.random", lambda: 0.9)
+        for module in ("calculation", "calculator", "calculator.history"):
+            monkeypatch.setattr(f"{module}.span", None)
+        Calculator()._evaluate(["5", "+", "3"])
+        assert CalculationService(coalesce=False).calculate(2, 3, "*") == 6
+        assert tracer.last() is None
+
+    def test_service_calculation_is_traced(self):
+        """Test service calculations are traced too."""
+        tracer.configure(sample_rate=1.0)
+        assert CalculationService(coalesce=False).calculate(2, 3, "*") == 6
+        assert stage_names(tracer.last()) == ["service.calculate", "factory", "execute"]
+
+    def test_trace_commands(self, capsys, tmp_path):
+        """Test the REPL trace command."""
+        calculator = Calculator()
+        calculator._handle_input("trace last")
+        assert "No traces recorded" in capsys.readouterr().out
+
+        calculator._handle_input("trace on")
+        calculator._handle_input("5 + 3")
+        calculator._handle_input("trace last")
+        output = capsys.readouterr().out
+        assert "Tracing enabled (sample rate 1)." in output
+        assert "calculation" in output and "execute" in output
+        assert "input=5 + 3" in output
+
+        path = tmp_path / "traces.json"
+        calculator._handle_input(f"trace export {path}")
+        assert "Exported 1 trace(s)" in capsys.readouterr().out
+        assert path.exists()
+
+        calculator._handle_input("trace off")
+        assert not tracer.enabled
+
+    @pytest.mark.parametrize("command", ["trace on 2", "trace bogus", "trace export"])
+    def test_invalid_trace_commands(self, capsys, command):
+        """Test invalid trace commands report an error."""
+        Calculator()._handle_input(command)
+        assert capsys.readouterr().out.startswith("Error:")
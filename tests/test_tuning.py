@@ -0,0 +1,179 @@
+"""
+Unit tests for the batch execution autotuner.
+"""
+
+import json
+
+import pytest
+
+from calculation import CalculationFactory
+from calculation.batch import execute_batch
+from calculation.tuning import (
+    STRATEGIES,
+    Autotuner,
+    format_report,
+    operand_dtype,
+    tuner,
+)
+from service import CalculationService
+
+ITEMS = [
+    (7, 2, "+"),
+    (2**100, 3, "*"),
+    (1.5, 0.5, "/"),
+    (1, 0, "/"),
+    (9, 4, "%"),
+    (2, 10, "^"),
+    (3, 2, "bogus"),
+] * 5
+
+MULTIPLY = CalculationFactory.get_operation("*")
+
+
+@pytest.fixture(scope="module")
+def pooled():
+    """A tuner with two workers per pool, so that work is really split."""
+    autotuner = Autotuner(workers=2)
+    yield autotuner
+    autotuner.close()
+
+
+def same(results, expected):
+    """Compare results, treating errors with equal messages as equal."""
+    return [str(r) if isinstance(r, Exception) else r for r in results] == [
+        str(e) if isinstance(e, Exception) else e for e in expected
+    ]
+
+
+class TestEngines:
+    """Test cases for the execution engines."""
+
+    @pytest.mark.parametrize("strategy", STRATEGIES)
+    def test_same_results(self, pooled, strategy):
+        """Test every engine returns execute_batch's results and errors."""
+        results = pooled.execute_batch(ITEMS, strategy=strategy)
+        assert same(results, execute_batch(ITEMS))
+        assert pooled.routed[strategy] >= 5
+
+    @pytest.mark.parametrize(
+        "left, right, dtype",
+        [
+            ([1, 2], [3, -4], "int"),
+            ([1, 2.5], [3, 4], "float"),
+            ([1, 2.5], [2**64, 4], "bigint"),
+            ([], [], "int"),
+        ],
+    )
+    def test_operand_dtype(self, left, right, dtype):
+        """Test groups are classified by their widest operand type."""
+        assert operand_dtype(left, right) == dtype
+
+
+class TestRouting:
+    """Test cases for choosing engines from the cost model."""
+
+    COSTS = {
+        "multiply/int/serial": (0.0, 2e-6),
+        "multiply/int/vectorized": (1e-5, 1e-6),
+    }
+
+    def test_uncalibrated(self):
+        """Test groups use the vectorized engine until calibrated."""
+        autotuner = Autotuner()
+        assert not autotuner.calibrated
+        assert autotuner.choose(MULTIPLY, "int", 10**6) == "vectorized"
+
+    def test_cheapest_engine(self):
+        """Test the predicted cheapest engine wins, by a margin, per size bucket."""
+        autotuner = Autotuner()
+        autotuner.costs = dict(self.COSTS)
+        assert autotuner.choose(MULTIPLY, "int", 1) == "serial"
+        assert autotuner.choose(MULTIPLY, "int", 15) == "serial"
+        assert autotuner.choose(MULTIPLY, "int", 16) == "vectorized"
+        assert autotuner.choose(MULTIPLY, "bigint", 1) == "vectorized"
+        assert autotuner.thresholds(MULTIPLY, "int") == [
+            (1, "serial"),
+            (16, "vectorized"),
+        ]
+        autotuner.execute_batch([(1, 2, "*"), (3, 4, "*"), (5, 6, "+")])
+        assert autotuner.routed["serial"] == 1
+        assert autotuner.routed["vectorized"] == 1
+
+    def test_override(self):
+        """Test an override beats the cost model and is validated."""
+        autotuner = Autotuner(strategy="serial")
+        autotuner.costs = dict(self.COSTS)
+        assert autotuner.choose(MULTIPLY, "int", 10**6) == "serial"
+        autotuner.strategy = None
+        assert autotuner.choose(MULTIPLY, "int", 10**6) == "vectorized"
+        with pytest.raises(ValueError, match="Unknown strategy"):
+            autotuner.strategy = "gpu"
+        with pytest.raises(ValueError, match="Unknown strategy"):
+            autotuner.execute_batch(ITEMS, strategy="gpu")
+
+    def test_report(self):
+        """Test the report lists thresholds for every operation and type."""
+        autotuner = Autotuner(strategy="thread")
+        report = autotuner.report()
+        assert report["override"] == "thread"
+        assert set(report["thresholds"]) == {
+            "add",
+            "subtract",
+            "multiply",
+            "divide",
+            "power",
+            "modulo",
+            "floordiv",
+        }
+        assert report["thresholds"]["add"]["bigint"] == [(1, "thread")]
+        lines = format_report(report)
+        assert lines[1] == "Override: every group uses thread"
+        assert "  add        int     thread from 1" in lines
+
+    def test_service_batches(self, monkeypatch):
+        """Test the service's batch lane routes through the global tuner."""
+        monkeypatch.setattr(tuner, "_strategy", "serial")
+        routed = tuner.routed["serial"]
+        service = CalculationService()
+        assert service.calculate_batch([(1, 2, "+"), (3, 4, "*")]) == [3, 12]
+        assert tuner.routed["serial"] == routed + 2
+
+
+class TestCalibration:
+    """Test cases for measuring and caching calibrations."""
+
+    def test_calibrate(self, tmp_path):
+        """Test a calibration fits a cost per operation, type and engine."""
+        autotuner = Autotuner(str(tmp_path / "tune.json"), workers=1)
+        costs = autotuner.calibrate(["+", "multiply"], sizes=(4, 32), repeat=1)
+        assert set(costs) == {
+            f"{name}/{dtype}/{strategy}"
+            for name in ("add", "multiply")
+            for dtype in ("int", "bigint", "float")
+            for strategy in ("serial", "vectorized")
+        }
+        assert all(fixed >= 0 and per_item >= 0 for fixed, per_item in costs.values())
+        assert autotuner.calibrated
+        with pytest.raises(ValueError, match="sizes"):
+            autotuner.calibrate(sizes=(32, 4))
+
+    def test_cache(self, tmp_path):
+        """Test calibrations are cached and invalidated by the fingerprint."""
+        path = tmp_path / "cache" / "tune.json"
+        options = {"operations": ["-"], "sizes": (2, 8), "repeat": 1}
+        autotuner = Autotuner(str(path), workers=1)
+        assert autotuner.ensure_calibrated(**options) is False
+        assert path.exists()
+
+        loaded = Autotuner(str(path), workers=1)
+        assert loaded.ensure_calibrated(**options) is True
+        assert loaded.costs == autotuner.costs
+        assert Autotuner(str(path), workers=3).load() is False
+
+        data = json.loads(path.read_text())
+        data["fingerprint"]["python"] = "2.7.18"
+        path.write_text(json.dumps(data))
+        assert Autotuner(str(path), workers=1).load() is False
+        path.write_text("{not json")
+        assert Autotuner(str(path), workers=1).load() is False
+        assert Autotuner(str(tmp_path / "missing.json")).load() is False
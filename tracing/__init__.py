@@ -0,0 +1,388 @@
+"""
+Lightweight stage-level tracing for calculations.
+
+A trace is started for each request with ``tracer.trace(name)``; the
+sampling decision is made once, when the trace starts (head-based
+sampling). Code marks its stages with ``span(name)``, which returns a
+shared no-op context manager unless the current context belongs to a
+sampled trace.
+
+Hot paths avoid even that. Request entry points check ``tracer.enabled``
+and call ``tracer.start(name)``, which returns ``None`` for a request that
+is not sampled, so unsampled requests run exactly the untraced code.
+Stages check ``tracer.recording``, which is only true while a sampled
+trace is open, and skip the ``with`` block otherwise. With sampling off,
+or between sampled requests, tracing costs one attribute lookup per stage.
+
+Finished traces are kept in a ring buffer of recent traces and can be
+exported as OTLP/JSON (the OpenTelemetry protocol's JSON encoding), which
+OpenTelemetry collectors and most trace viewers can import.
+
+Usage:
+    from tracing import span, tracer
+
+    tracer.configure(sample_rate=0.01)
+    with tracer.trace("calculation"):
+        with span("parse"):
+            ...
+    print(tracer.last())
+"""
+
+import collections
+import json
+import os
+import random
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional
+
+__all__ = ["Span", "Trace", "Tracer", "span", "tracer"]
+
+_current: "ContextVar[Optional[Trace]]" = ContextVar("current_trace", default=None)
+
+
+class Span:
+    """A timed stage of a trace."""
+
+    __slots__ = (
+        "name",
+        "span_id",
+        "parent_id",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "error",
+    )
+
+    def __init__(self, name: str, span_id: str, parent_id: Optional[str]):
+        self.name = name
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = {}
+        self.error: Optional[str] = None
+
+    @property
+    def duration_ns(self) -> int:
+        """Duration in nanoseconds (0 while the span is open)."""
+        return self.end_ns - self.start_ns if self.end_ns is not None else 0
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Attach a key/value attribute to the span."""
+        self.attributes[key] = value
+
+    def to_otlp(self, trace_id: str) -> Dict[str, Any]:
+        """Encode the span as an OTLP/JSON span object."""
+        encoded: Dict[str, Any] = {
+            "traceId": trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": [
+                {"key": key, "value": _otlp_value(value)}
+                for key, value in self.attributes.items()
+            ],
+            "status": (
+                {"code": 2, "message": self.error} if self.error else {"code": 1}
+            ),
+        }
+        if self.parent_id is not None:
+            encoded["parentSpanId"] = self.parent_id
+        return encoded
+
+
+class Trace:
+    """The spans recorded for one sampled request."""
+
+    def __init__(self, name: str):
+        self.trace_id = os.urandom(16).hex()
+        self.spans: List[Span] = []
+        self._stack: List[Span] = []
+        self.root = self.start_span(name)
+
+    def start_span(self, name: str) -> Span:
+        """Open a child of the innermost open span."""
+        parent = self._stack[-1].span_id if self._stack else None
+        opened = Span(name, os.urandom(8).hex(), parent)
+        self.spans.append(opened)
+        self._stack.append(opened)
+        return opened
+
+    def end_span(self, ended: Span, error: Optional[BaseException] = None) -> None:
+        """Close the innermost open span."""
+        ended.end_ns = time.time_ns()
+        if error is not None:
+            ended.error = f"{type(error).__name__}: {error}"
+        self._stack.pop()
+
+    @property
+    def name(self) -> str:
+        """Name of the root span."""
+        return self.root.name
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Attach an attribute to the root span."""
+        self.root.set_attribute(key, value)
+
+    def format(self) -> List[str]:
+        """Render the trace as indented lines with stage durations."""
+        depth = {self.root.span_id: 0}
+        lines = [f"Trace {self.trace_id}"]
+        for item in self.spans:
+            level = depth[item.span_id] = (
+                depth[item.parent_id] + 1 if item.parent_id in depth else 0
+            )
+            label = f"{'  ' * (level + 1)}{item.name}"
+            line = f"{label:<26} {item.duration_ns / 1e3:10.1f} us"
+            if item.attributes:
+                line += "  " + " ".join(f"{k}={v}" for k, v in item.attributes.items())
+            if item.error:
+                line += f"  error={item.error}"
+            lines.append(line)
+        return lines
+
+
+class _SpanScope:
+    """Context manager that records a span of a sampled trace."""
+
+    __slots__ = ("_trace", "_span")
+
+    def __init__(self, trace: Trace, name: str):
+        self._trace = trace
+        self._span = trace.start_span(name)
+
+    def __enter__(self) -> Span:
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._trace.end_span(self._span, exc)
+
+
+class _TraceScope:
+    """Context manager that makes a sampled trace current."""
+
+    def __init__(self, tracer: "Tracer", trace: Trace):
+        self._tracer = tracer
+        self._trace = trace
+        self._token = None
+
+    def __enter__(self) -> Trace:
+        self._tracer._opened()
+        self._token = _current.set(self._trace)
+        return self._trace
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        _current.reset(self._token)
+        self._tracer._closed()
+        self._trace.end_span(self._trace.root, exc)
+        self._tracer.record(self._trace)
+
+
+class _NoopScope:
+    """Shared context manager used when the request is not sampled."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopScope":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+
+_NOOP = _NoopScope()
+
+
+def span(name: str):
+    """
+    Mark a stage of the current trace.
+
+    Args:
+        name: Stage name, e.g. ``"execute"``
+
+    Returns:
+        Context manager yielding the ``Span`` when the current request is
+        sampled, or a shared no-op otherwise
+    """
+    trace = _current.get()
+    if trace is None:
+        return _NOOP
+    return _SpanScope(trace, name)
+
+
+class Tracer:
+    """Starts sampled traces and keeps a ring buffer of finished ones."""
+
+    def __init__(self, sample_rate: float = 0.0, capacity: int = 256):
+        """
+        Initialize the tracer.
+
+        Args:
+            sample_rate: Fraction of traces to record, 0.0 (off) to 1.0
+            capacity: Number of finished traces kept
+        """
+        self._lock = threading.Lock()
+        self._traces: Deque[Trace] = collections.deque(maxlen=capacity)
+        self._open = 0
+        self.sample_rate = 0.0
+        #: True when any traces may be sampled; checked by request entry
+        #: points before ``start``.
+        self.enabled = False
+        #: True while a sampled trace is open in any thread; checked by
+        #: stages before ``span``.
+        self.recording = False
+        self.configure(sample_rate)
+
+    def configure(
+        self, sample_rate: Optional[float] = None, capacity: Optional[int] = None
+    ) -> None:
+        """
+        Change the sample rate and/or ring buffer capacity.
+
+        Raises:
+            ValueError: If the sample rate is outside [0, 1] or the
+                capacity is not positive
+        """
+        if sample_rate is not None:
+            if not 0.0 <= sample_rate <= 1.0:
+                raise ValueError("Sample rate must be between 0 and 1")
+            self.sample_rate = sample_rate
+            self.enabled = sample_rate > 0.0
+        if capacity is not None:
+            if capacity < 1:
+                raise ValueError("Trace capacity must be positive")
+            with self._lock:
+                self._traces = collections.deque(self._traces, maxlen=capacity)
+
+    def start(self, name: str):
+        """
+        Make the sampling decision for a request.
+
+        Returns:
+            Context manager yielding the ``Trace`` when sampled (a child
+            span if a trace is already current), or ``None`` when the
+            request is not sampled and should run untraced
+        """
+        if self.recording:
+            current = _current.get()
+            if current is not None:
+                return _SpanScope(current, name)
+        rate = self.sample_rate
+        if rate <= 0.0 or (rate < 1.0 and random.random() >= rate):
+            return None
+        return _TraceScope(self, Trace(name))
+
+    def trace(self, name: str):
+        """
+        Start a trace, or a child span if a trace is already current.
+
+        Returns:
+            Context manager yielding the ``Trace`` when sampled, or a
+            shared no-op otherwise
+        """
+        scope = self.start(name)
+        return _NOOP if scope is None else scope
+
+    def _opened(self) -> None:
+        """Count a sampled trace as open, turning ``recording`` on."""
+        with self._lock:
+            self._open += 1
+            self.recording = True
+
+    def _closed(self) -> None:
+        """Count a sampled trace as finished."""
+        with self._lock:
+            self._open -= 1
+            self.recording = self._open > 0
+
+    def record(self, trace: Trace) -> None:
+        """Add a finished trace to the ring buffer."""
+        with self._lock:
+            self._traces.append(trace)
+
+    def last(self) -> Optional[Trace]:
+        """Return the most recently finished trace, if any."""
+        with self._lock:
+            return self._traces[-1] if self._traces else None
+
+    def recent(self) -> List[Trace]:
+        """Return the buffered traces, oldest first."""
+        with self._lock:
+            return list(self._traces)
+
+    def clear(self) -> int:
+        """Drop all buffered traces and return how many there were."""
+        with self._lock:
+            count = len(self._traces)
+            self._traces.clear()
+            return count
+
+    def to_otlp(
+        self, service_name: str = "calculator", traces: Optional[List[Trace]] = None
+    ) -> Dict[str, Any]:
+        """Encode traces (default: the buffered ones) as an OTLP/JSON request."""
+        if traces is None:
+            traces = self.recent()
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {
+                                "key": "service.name",
+                                "value": {"stringValue": service_name},
+                            }
+                        ]
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "calculator.tracing"},
+                            "spans": [
+                                item.to_otlp(trace.trace_id)
+                                for trace in traces
+                                for item in trace.spans
+                            ],
+                        }
+                    ],
+                }
+            ]
+        }
+
+    def export(self, path: str, service_name: str = "calculator") -> int:
+        """
+        Write the buffered traces to ``path`` as OTLP/JSON.
+
+        The file is written to a temporary name and renamed into place.
+
+        Returns:
+            Number of traces exported
+        """
+        traces = self.recent()
+        payload = self.to_otlp(service_name, traces)
+        temporary = f"{path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as output:
+            json.dump(payload, output)
+        os.replace(temporary, path)
+        return len(traces)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    """Encode an attribute value as an OTLP ``AnyValue``."""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int) and -(2**63) <= value < 2**63:
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+#: Process-wide tracer; sampling is off until configured.
+tracer = Tracer()